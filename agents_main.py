@@ -2,15 +2,18 @@ import logging
 import os
 import re
 import subprocess
+import threading
 import time
 
 from github_broker import AgentClient
 
 # --- 待機時間設定 (秒) ---
 SUCCESS_SLEEP_SECONDS = 5
-NO_TASK_SLEEP_SECONDS = 5 * 60  # 5分
+TASK_WAIT_SECONDS = 60  # タスクがない場合にブローカー側で待機する秒数 (ロングポーリング)
+NO_TASK_SLEEP_SECONDS = 5
 ERROR_SLEEP_SECONDS = 10 * 60  # 10分
 CONTEXT_UPDATE_TIMEOUT_SECONDS = 300  # 5分
+HEARTBEAT_INTERVAL_SECONDS = 30  # リースの有効期限 (120秒) より十分短くする
 # --------------------------
 
 # --- ロギング設定 ---
@@ -48,18 +51,43 @@ def _handle_subprocess_error(e: subprocess.CalledProcessError, run_once: bool) -
     return True  # continue
 
 
+def _start_heartbeat(
+    client: AgentClient, issue_id: int, fencing_token: int
+) -> threading.Event:
+    """
+    タスク実行中、一定間隔でリースを延長するハートビートをバックグラウンドで送信する。
+    返されたEventをsetするとハートビートを停止する。
+    """
+    stop_event = threading.Event()
+
+    def _run():
+        while not stop_event.wait(HEARTBEAT_INTERVAL_SECONDS):
+            if not client.send_heartbeat(issue_id, fencing_token):
+                logging.warning(
+                    f"Issue #{issue_id} のリースが失われました。ハートビートを停止します。"
+                )
+                return
+
+    threading.Thread(target=_run, daemon=True).start()
+    return stop_event
+
+
 def main(run_once=False):
     # --- エージェントの設定 ---
     agent_id = os.getenv("AGENT_NAME", "sample-agent-001")
     host = os.getenv("BROKER_HOST", "localhost")
     port = int(os.getenv("BROKER_PORT", 8080))
+    # 担当できる役割 (カンマ区切り)。未設定の場合はすべての役割のタスクを受け取る
+    roles = [
+        role.strip() for role in os.getenv("AGENT_ROLES", "").split(",") if role.strip()
+    ]
 
-    client = AgentClient(agent_id=agent_id, host=host, port=port)
+    client = AgentClient(agent_id=agent_id, host=host, port=port, roles=roles or None)
 
     while True:
         try:
             logging.info("サーバーに新しいタスクをリクエストしています...")
-            assigned_task = client.request_task()
+            assigned_task = client.request_task(wait_seconds=TASK_WAIT_SECONDS)
 
             if assigned_task:
                 logging.info(
@@ -79,6 +107,14 @@ def main(run_once=False):
                         f"タスクタイプ: {task_type}, 必須ロール: {required_role}, 使用モデル: {gemini_model}"
                     )
 
+                    fencing_token = assigned_task.get("fencing_token")
+                    heartbeat_stop = (
+                        _start_heartbeat(
+                            client, assigned_task["issue_id"], fencing_token
+                        )
+                        if fencing_token is not None
+                        else None
+                    )
                     try:
                         # 1. コンテキスト更新
                         logging.info("コンテキスト更新スクリプトを実行しています...")
@@ -133,6 +169,9 @@ def main(run_once=False):
                         logging.error(
                             f"タスク実行中に予期せぬエラーが発生しました: {e}"
                         )
+                    finally:
+                        if heartbeat_stop is not None:
+                            heartbeat_stop.set()
                 else:
                     logging.warning(
                         "割り当てられたタスクにプロンプトが含まれていません。"
@@ -144,7 +183,7 @@ def main(run_once=False):
                 time.sleep(SUCCESS_SLEEP_SECONDS)
             else:
                 logging.info(
-                    f"利用可能なタスクがありません。{NO_TASK_SLEEP_SECONDS // 60}分後に再試行します。"
+                    f"利用可能なタスクがありません。{NO_TASK_SLEEP_SECONDS}秒後に再試行します。"
                 )
                 if run_once:
                     break
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 import threading
 from contextlib import asynccontextmanager
@@ -7,8 +8,12 @@ from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 
 from github_broker.application.exceptions import LockAcquisitionError
+from github_broker.application.task_service import TaskService
+from github_broker.infrastructure.async_github_client import AsyncGitHubClient
+from github_broker.infrastructure.async_redis_client import AsyncRedisClient
 from github_broker.infrastructure.config import Settings
 from github_broker.infrastructure.di_container import create_container
+from github_broker.infrastructure.task_notifier import TaskAvailabilityNotifier
 from github_broker.interface.api import router as api_router
 
 logger = logging.getLogger(__name__)
@@ -21,11 +26,24 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Uvicorn server starting up...")
     app.state.di_container = create_container()
+    task_service = app.state.di_container.resolve(TaskService)
+    # リクエストを受け付ける前に購読を確定させ、起動直後の通知を取りこぼさないようにする
+    await app.state.di_container.resolve(TaskAvailabilityNotifier).start()
+    workers = [
+        asyncio.create_task(task_service.run_github_outbox_worker()),
+        asyncio.create_task(task_service.run_review_timeout_scheduler()),
+    ]
     try:
         yield
     finally:
         # Shutdown
         logger.info("Uvicorn server shutting down...")
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await app.state.di_container.resolve(AsyncGitHubClient).aclose()
+        await app.state.di_container.resolve(TaskAvailabilityNotifier).aclose()
+        await app.state.di_container.resolve(AsyncRedisClient).aclose()
 
 
 app = FastAPI(lifespan=lifespan)
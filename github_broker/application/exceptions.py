@@ -7,3 +7,9 @@ class LockAcquisitionError(Exception):
     """タスクのロック取得に失敗した場合に発生します。"""
 
     pass
+
+
+class UnknownRoleError(ValueError):
+    """タスクリクエストで、agents.yml に定義されていない役割が指定された場合に発生します。"""
+
+    pass
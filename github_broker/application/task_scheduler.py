@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+from typing import Any
+
+from github_broker.domain.task import Task
+from github_broker.infrastructure.redis_client import CACHED_TASK_FIELDS_KEY
+
+logger = logging.getLogger(__name__)
+
+
+def get_issue_priority(issue: dict[str, Any]) -> int | None:
+    """Issueの取り込み時に計算された優先度の数値を返します。計算済みの値がない場合はその場で計算します。"""
+    task_fields = issue.get(CACHED_TASK_FIELDS_KEY)
+    if task_fields is not None:
+        return task_fields["priority"]
+    return Task.from_issue(issue).get_priority()
+
+
+def get_issue_created_at(issue: dict[str, Any]) -> float | None:
+    """Issueの作成日時をUNIX時刻で返します。作成日時がない場合はNone。"""
+    created_at = issue.get("created_at")
+    if not created_at:
+        return None
+    try:
+        return datetime.fromisoformat(created_at).timestamp()
+    except ValueError:
+        return None
+
+
+class TaskScheduler:
+    """
+    タスク候補の選択と割り当て (`TaskService._find_first_assignable_task`) の間で、
+    候補を試す順序と、割り当てに使用する役割を決めます。
+
+    既定の実装は、優先度の高い順（同じ優先度では候補キューの順）に候補を並べ、
+    Issueの最初の役割ラベルで割り当てます。割り当ての記録は行いません。
+    """
+
+    # Noneでない場合、Issueの作成からこの秒数が経つごとに優先度を1段階引き上げる
+    age_boost_seconds: float | None = None
+
+    def effective_priority(self, issue: dict[str, Any], now: float) -> int | None:
+        """順序付けに使用する優先度の数値（小さいほど優先）を返します。"""
+        return get_issue_priority(issue)
+
+    def order(
+        self, candidates: list[dict[str, Any]], role_labels: list[str], now: float
+    ) -> list[dict[str, Any]]:
+        """候補Issueを、割り当てを試す順に並べ替えます。"""
+
+        def get_priority_key(issue: dict[str, Any]) -> int | float:
+            priority = self.effective_priority(issue, now)
+            return float("inf") if priority is None else priority
+
+        return sorted(candidates, key=get_priority_key)
+
+    def acquire(self, agent_id: str, issue_roles: list[str]) -> str | None:
+        """
+        Issueを割り当てる役割を選び、その役割の枠を確保します。
+
+        Returns:
+            str | None: 割り当てに使用する役割。どの役割にも空きがない場合はNone。
+        """
+        return issue_roles[0]
+
+    def release(self, agent_id: str) -> None:
+        """エージェントのタスクが完了・解放された際に、確保した枠を返却します。"""
+
+    def record_assignment(self, agent_id: str, role: str) -> None:
+        """割り当てが確定したことを記録します。"""
+
+
+class WeightedFairTaskScheduler(TaskScheduler):
+    """
+    役割ごとの重みに応じた公平なスケジューリング (Weighted Fair Queuing) を行うスケジューラ。
+
+    - 同じ優先度の候補の中では、割り当てた数を重みで割った値（仮想時間）が最も小さい役割の
+      Issueから試します。重みが2の役割は、重みが1の役割の約2倍のタスクを受け取ります。
+    - `age_boost_seconds` を指定すると、古いIssueの優先度を経過時間に応じて引き上げ、
+      低い優先度のIssueがいつまでも割り当てられない状態を防ぎます。
+    - `max_concurrent_tasks` を指定すると、役割ごとの同時実行タスク数を制限し、
+      他の役割のために処理能力を確保します。
+
+    割り当ての状態はプロセス内に保持されるため、ブローカーを複数プロセスで動かす場合は
+    プロセスごとの近似になります。
+    """
+
+    def __init__(
+        self,
+        role_weights: dict[str, float] | None = None,
+        max_concurrent_tasks: dict[str, int] | None = None,
+        age_boost_seconds: float | None = None,
+    ):
+        self.role_weights = role_weights or {}
+        self.max_concurrent_tasks = max_concurrent_tasks or {}
+        self.age_boost_seconds = age_boost_seconds
+        # 役割ごとの、これまでに割り当てたタスク数を重みで割った値
+        self._virtual_times: dict[str, float] = {}
+        # エージェントごとの、作業中のタスクの役割。同期処理のスレッドからも解放されるためロックで保護する
+        self._active_roles: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def effective_priority(self, issue: dict[str, Any], now: float) -> int | None:
+        priority = get_issue_priority(issue)
+        if priority is None or not self.age_boost_seconds:
+            return priority
+        created_at = get_issue_created_at(issue)
+        if created_at is None:
+            return priority
+        boost = int(max(now - created_at, 0) // self.age_boost_seconds)
+        return max(priority - boost, 0)
+
+    def _get_weight(self, role: str) -> float:
+        return self.role_weights.get(role, 1.0)
+
+    def _get_finish_time(self, role: str) -> float:
+        return self._virtual_times.get(role, 0.0) + 1 / self._get_weight(role)
+
+    def _catch_up(self, roles: set[str]) -> None:
+        """
+        候補に現れた役割の仮想時間を、最も進んでいる役割より1タスク分以上遅れないよう揃えます。
+        しばらく候補がなかった役割や新しい役割が、その間の分をまとめて受け取ることを防ぎます。
+        """
+        leader = max(
+            (self._virtual_times.get(role, 0.0) for role in roles), default=0.0
+        )
+        for role in roles:
+            self._virtual_times[role] = max(
+                self._virtual_times.get(role, 0.0), leader - 1 / self._get_weight(role)
+            )
+
+    def _count_active(self, role: str) -> int:
+        return Counter(self._active_roles.values())[role]
+
+    def _has_capacity(self, role: str) -> bool:
+        limit = self.max_concurrent_tasks.get(role)
+        return limit is None or self._count_active(role) < limit
+
+    def _get_issue_roles(
+        self, issue: dict[str, Any], role_labels: list[str]
+    ) -> list[str]:
+        labels = {label["name"] for label in issue.get("labels", [])}
+        return [role for role in role_labels if role in labels]
+
+    def order(
+        self, candidates: list[dict[str, Any]], role_labels: list[str], now: float
+    ) -> list[dict[str, Any]]:
+        with self._lock:
+            self._catch_up(
+                {
+                    role
+                    for issue in candidates
+                    for role in self._get_issue_roles(issue, role_labels)
+                }
+            )
+
+        def get_order_key(issue: dict[str, Any]) -> tuple[float, float, float]:
+            priority = self.effective_priority(issue, now)
+            roles = self._get_issue_roles(issue, role_labels)
+            finish_time = min(
+                (self._get_finish_time(role) for role in roles), default=float("inf")
+            )
+            created_at = get_issue_created_at(issue)
+            return (
+                float("inf") if priority is None else priority,
+                finish_time,
+                float("inf") if created_at is None else created_at,
+            )
+
+        return sorted(candidates, key=get_order_key)
+
+    def acquire(self, agent_id: str, issue_roles: list[str]) -> str | None:
+        with self._lock:
+            available = [role for role in issue_roles if self._has_capacity(role)]
+            if not available:
+                return None
+            role = min(available, key=self._get_finish_time)
+            self._active_roles[agent_id] = role
+            return role
+
+    def release(self, agent_id: str) -> None:
+        with self._lock:
+            self._active_roles.pop(agent_id, None)
+
+    def record_assignment(self, agent_id: str, role: str) -> None:
+        with self._lock:
+            self._virtual_times[role] = self._get_finish_time(role)
+            active = self._count_active(role)
+        logger.info(
+            "[agent_id=%s] 役割 '%s' にタスクを割り当てました（同時実行: %d, 仮想時間: %.2f）。",
+            agent_id,
+            role,
+            active,
+            self._virtual_times[role],
+        )
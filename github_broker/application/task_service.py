@@ -3,8 +3,11 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
+import re
 import threading
 import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass, field
 from datetime import UTC, datetime, timedelta
 from typing import TYPE_CHECKING, Any
 
@@ -12,10 +15,21 @@ from github import GithubException
 from pydantic import HttpUrl
 from redis.exceptions import RedisError
 
+from github_broker.application.exceptions import UnknownRoleError
+from github_broker.application.task_scheduler import TaskScheduler
 from github_broker.domain.agent_config import AgentConfigList
 from github_broker.domain.task import Task
-from github_broker.infrastructure.github_client import GitHubClient
-from github_broker.infrastructure.redis_client import RedisClient
+from github_broker.infrastructure.async_github_client import AsyncGitHubClient
+from github_broker.infrastructure.async_redis_client import AsyncRedisClient
+from github_broker.infrastructure.github_client import GitHubClient, PullRequestRef
+from github_broker.infrastructure.rate_limit_budget import RequestPriority
+from github_broker.infrastructure.redis_client import (
+    CACHED_TASK_FIELDS_KEY,
+    GitHubOutboxEntry,
+    IssueClaimResult,
+    RedisClient,
+)
+from github_broker.infrastructure.task_notifier import TaskAvailabilityNotifier
 from github_broker.interface.models import TaskCandidate, TaskResponse, TaskType
 
 if TYPE_CHECKING:
@@ -25,40 +39,95 @@ if TYPE_CHECKING:
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class _IssueSnapshot:
+    """
+    ある世代のIssueキャッシュから読み出した内容。
+    優先度ラベルと候補Issueは、リクエストされた役割の組み合わせごとに、
+    最初に必要になった時点で読み込まれます。
+    """
+
+    generation: int
+    # 役割の組み合わせごとの、タスク候補が存在する優先度ラベル（優先度の高い順）
+    priority_labels_by_roles: dict[tuple[str, ...], list[str]] = field(
+        default_factory=dict
+    )
+    # (優先度ラベル, 役割の組み合わせ) ごとの候補Issue
+    candidates_by_queue: dict[
+        tuple[str, tuple[str, ...]], list[dict[str, Any]]
+    ] = field(default_factory=dict)
+
+
 class TaskService:
     # Label constants
     LABEL_NEEDS_REVIEW = "needs-review"
     LABEL_REVIEW_DONE = "review-done"
     LABEL_IN_PROGRESS = "in-progress"
+    EXCLUDED_ISSUE_TYPE_LABELS = frozenset({"story", "epic"})
 
     # Review constants
-    REVIEW_ISSUE_TIMESTAMP_KEY_FORMAT = "review_issue_detected_timestamp:{issue_id}"
     REVIEW_ASSIGNMENT_DELAY_MINUTES = 5
     REVIEW_TIMEOUT_MINUTES = 10  # Assuming this value, was on settings
     POLLING_INTERVAL_SECONDS = 5 * 60  # Assuming this value, was on settings
+    FULL_SYNC_INTERVAL_CYCLES = 12  # 差分同期12回ごとに完全同期を行う
+    DELTA_SYNC_OVERLAP_SECONDS = 60  # 検索インデックスの遅延を考慮した重複取得幅
+
+    # Webhook constants
+    WEBHOOK_ISSUE_REMOVAL_ACTIONS = frozenset({"closed", "deleted", "transferred"})
+
+    # GitHub outbox constants
+    OUTBOX_POLL_INTERVAL_SECONDS = 1
+    OUTBOX_BATCH_SIZE = 20
+    OUTBOX_RETRY_BASE_SECONDS = 5
+    OUTBOX_RETRY_MAX_SECONDS = 5 * 60
+    # この回数だけ連続して失敗した変更は再試行せず、デッドレターに移す
+    OUTBOX_MAX_ATTEMPTS = 10
+    # Issueが削除・移動された場合など、再試行しても成功しない応答
+    OUTBOX_DISCARD_STATUSES = frozenset({404, 410})
+
+    # Review timeout scheduler constants
+    REVIEW_TIMEOUT_BATCH_SIZE = 20
+    # 次の予定時刻までの待機の上限。ポーリングで新たに登録された予定を拾うために使用する
+    REVIEW_TIMEOUT_MAX_SLEEP_SECONDS = 5
 
     def __init__(
         self,
         github_client: GitHubClient,
         redis_client: RedisClient,
         agent_configs: AgentConfigList,
+        async_github_client: AsyncGitHubClient | None = None,
+        task_notifier: TaskAvailabilityNotifier | None = None,
+        async_redis_client: AsyncRedisClient | None = None,
+        task_scheduler: TaskScheduler | None = None,
     ):
         self.github_client = github_client
+        self.async_github_client = async_github_client
+        self.task_notifier = task_notifier
         self.redis_client = redis_client
+        self.async_redis_client = async_redis_client
+        self.task_scheduler = task_scheduler or TaskScheduler()
         self.agent_roles = {agent.role for agent in agent_configs.get_all()}
         self.repo_name = self.github_client._repo_name
+        self._issue_snapshot: _IssueSnapshot | None = None
 
     def start_polling(self, stop_event: threading.Event | None = None):
         logger.info("Starting issue polling...")
+        cycle = 0
+        budget = self.github_client.rate_limit_budget
         while not (stop_event and stop_event.is_set()):
-            try:
-                logger.info(f"Fetching open issues from {self.repo_name}...")
-                issues = self.github_client.get_open_issues()
-                self.redis_client.sync_issues(issues)
-
-                # レビューIssueの検索とタイムスタンプの保存
-                self._find_review_task()
+            self.github_client.refresh_rate_limit_budget()
+            # 予算が少ない場合は先読みのポーリングを控え、タスク割り当ての書き込みに残す
+            if not budget.allows("graphql", RequestPriority.SPECULATIVE):
+                logger.warning(
+                    "GitHub API budget is low; skipping this polling cycle: %s",
+                    budget.snapshot(),
+                )
+                time.sleep(budget.polling_interval(self.POLLING_INTERVAL_SECONDS))
+                continue
 
+            try:
+                full_sync = cycle % self.FULL_SYNC_INTERVAL_CYCLES == 0
+                self.sync_issue_cache(full_sync=full_sync)
             except (GithubException, RedisError) as e:
                 logger.error(
                     f"An error occurred during issue polling: {e}", exc_info=True
@@ -69,6 +138,14 @@ class TaskService:
                     exc_info=True,
                 )
 
+            try:
+                self.reconcile_agent_assignments()
+            except RedisError as e:
+                logger.error(
+                    f"An error occurred while reconciling assignments: {e}",
+                    exc_info=True,
+                )
+
             try:
                 self.poll_and_process_reviews()
             except (GithubException, RedisError) as e:
@@ -81,60 +158,288 @@ class TaskService:
                     exc_info=True,
                 )
 
-            time.sleep(self.POLLING_INTERVAL_SECONDS)
+            cycle += 1
+            interval = budget.polling_interval(self.POLLING_INTERVAL_SECONDS)
+            logger.debug("Next polling cycle in %.0f seconds.", interval)
+            time.sleep(interval)
 
         logger.info("Polling stopped.")
 
-    def get_highest_priority_label(self, all_labels: list[str]) -> str | None:
+    def sync_issue_cache(self, full_sync: bool = True) -> None:
+        """
+        GitHubのIssueとRedisのキャッシュを同期します。
+
+        差分同期では、前回同期時刻（ウォーターマーク）以降に更新されたIssueのみを取得して反映します。
+        クローズされたIssueの取りこぼしを防ぐため、完全同期 (full reconciliation) は
+        `FULL_SYNC_INTERVAL_CYCLES` サイクルごとに実行されます。
+
+        Args:
+            full_sync (bool): Trueの場合、すべてのオープンなIssueを取得して完全同期します。
+        """
+        sync_started_at = datetime.now(UTC)
+        watermark = None if full_sync else self.redis_client.get_sync_watermark()
+
+        if watermark is None:
+            logger.info(f"Fetching open issues from {self.repo_name} (full sync)...")
+            issues = self.github_client.get_open_issues_with_linked_prs()
+            cacheable_issues, _ = self._partition_cacheable_issues(issues)
+            result = self.redis_client.sync_issues(cacheable_issues)
+        else:
+            since = watermark - timedelta(seconds=self.DELTA_SYNC_OVERLAP_SECONDS)
+            logger.info(
+                f"Fetching issues updated since {since.isoformat()} from {self.repo_name} (delta sync)..."
+            )
+            updated_issues = [
+                issue
+                for issue in self.github_client.get_issues_updated_since(since)
+                if "pull_request" not in issue
+            ]
+            open_issues = [i for i in updated_issues if i.get("state") == "open"]
+            closed_issue_ids = [
+                i["number"] for i in updated_issues if i.get("state") != "open"
+            ]
+            cacheable_issues, skipped_issue_ids = self._partition_cacheable_issues(
+                open_issues
+            )
+            result = self.redis_client.apply_issue_changes(
+                cacheable_issues, [*closed_issue_ids, *skipped_issue_ids]
+            )
+
+        logger.info(
+            "Synchronized issue cache: added=%s, updated=%s, removed=%s, unchanged=%s",
+            result.added,
+            result.updated,
+            result.removed,
+            result.unchanged,
+        )
+        self.refresh_candidate_queues()
+        self.redis_client.set_sync_watermark(sync_started_at)
+
+    def _partition_cacheable_issues(
+        self, issues: list[dict[str, Any]]
+    ) -> tuple[list[dict[str, Any]], list[int]]:
+        """
+        オープンなIssueを、キャッシュ対象とそれ以外に振り分けます。
+
+        `needs-review` ラベルを持つIssueは、紐づいたPull Requestがある場合のみ
+        レビューIssueとしてキャッシュされ (ADR-016)、検出時刻がまとめてRedisに保存されます。
+        `needs-review` ラベルを持たないIssueの検出時刻は取り除かれます。
+
+        Returns:
+            tuple[list[dict[str, Any]], list[int]]: キャッシュ対象のIssueのリストと、
+            対象外となったIssue番号のリスト。
+        """
+        cacheable_issues: list[dict[str, Any]] = []
+        skipped_issue_ids: list[int] = []
+        review_issue_ids: list[int] = []
+        for issue in issues:
+            if self.LABEL_NEEDS_REVIEW not in self._get_label_names(issue):
+                cacheable_issues.append(issue)
+            elif issue.get("linked_pull_requests"):
+                review_issue_ids.append(issue["number"])
+                cacheable_issues.append(issue)
+            else:
+                skipped_issue_ids.append(issue["number"])
+        self._record_review_detections(review_issue_ids)
+        # ラベルが外された場合、再び付与された時点から待機時間を数え直す
+        unreviewed_issue_ids = [
+            issue["number"]
+            for issue in cacheable_issues
+            if self.LABEL_NEEDS_REVIEW not in self._get_label_names(issue)
+        ]
+        if unreviewed_issue_ids:
+            self.redis_client.remove_review_detections(unreviewed_issue_ids)
+        return cacheable_issues, skipped_issue_ids
+
+    def _record_review_detections(self, issue_ids: list[int]) -> None:
+        """
+        レビューIssueを初めて検出した時刻をRedisに保存します。
+        既に検出時刻が記録されているIssueは変更しません。
+        """
+        if not issue_ids:
+            return
+        recorded = self.redis_client.record_review_detections(issue_ids)
+        if recorded:
+            logger.info(f"Detected {recorded} new review issues and stored timestamps.")
+
+    def apply_webhook_event(self, event: str, payload: dict[str, Any]) -> bool:
         """
-        与えられたラベルのリストから最も高い優先度ラベルを特定します。
+        GitHub Webhookイベントを受け取り、Redisのキャッシュに1件ずつ反映します。
+        ポーリングを待たずに、ラベル変更などを即座にエージェントへ公開するために使用されます。
+        変更を反映した場合は、変更したIssueが所属するタスク候補キューのみを更新します。
+        ラベルの改名・削除は多くのIssueと優先度ラベルの一覧に影響するため、すべてのキューを再構築します。
 
         Args:
-            all_labels (list[str]): すべてのIssueから集めたラベルのリスト。
+            event (str): `X-GitHub-Event` ヘッダーの値 (`issues`, `label`, `pull_request`)。
+            payload (dict[str, Any]): Webhookのペイロード。
 
         Returns:
-            str | None: 最も高い優先度ラベル (例: 'P0')。優先度ラベルがない場合はNone。
+            bool: キャッシュに変更を反映した場合はTrue、無視した場合はFalse。
         """
-        logger.info("Determining the highest priority label from the provided list of all labels...")
-        highest_priority = self._determine_highest_priority(all_labels)
-        if highest_priority:
-            logger.info(f"Highest priority label found: {highest_priority}")
+        repository = payload.get("repository") or {}
+        full_name = repository.get("full_name")
+        if full_name and full_name != self.repo_name:
+            logger.info(
+                f"Ignoring webhook event '{event}' for another repository: {full_name}"
+            )
+            return False
+
+        action = payload.get("action", "")
+        # 候補キューを更新するIssue番号。Noneの場合はすべてのキューを再構築する
+        changed_issue_ids: list[int] | None
+        if event == "issues":
+            issue = payload.get("issue") or {}
+            changed_issue_ids = (
+                [issue["number"]] if self._apply_issue_change(action, issue) else []
+            )
+        elif event == "label":
+            changed_issue_ids = None if self._apply_label_event(action, payload) else []
+        elif event == "pull_request":
+            changed_issue_ids = self._apply_pull_request_event(
+                action, payload.get("pull_request") or {}
+            )
         else:
-            logger.info("No priority labels found among the provided labels.")
-        return highest_priority
+            logger.debug(f"Ignoring unsupported webhook event: {event}")
+            return False
 
-    def _find_review_task(self) -> None:
+        if changed_issue_ids is None:
+            self.refresh_candidate_queues()
+        elif changed_issue_ids:
+            self.refresh_candidate_queues(changed_issue_ids)
+        return changed_issue_ids != []
+
+    def _apply_issue_change(self, action: str, issue: dict[str, Any]) -> bool:
         """
-        レビュー待ちのIssueを検索し、Redisにタイムスタンプを保存します。
+        単一のIssueの変更をキャッシュに反映します。
+        オープンなIssueは追加/更新し、クローズ・削除されたIssueはキャッシュから取り除きます。
+        キャッシュ対象の判定は同期時と同じく `_partition_cacheable_issues` で行います。
         """
-        logger.info("Searching for review issues...")
-        try:
-            review_issues = self.github_client.get_review_issues()
-            self.redis_client.sync_issues(review_issues)  # ADR-016: キャッシュ処理を追加
-            for issue in review_issues:
-                issue_id = issue.get("number")
-                if issue_id:
-                    timestamp_key = self.REVIEW_ISSUE_TIMESTAMP_KEY_FORMAT.format(
-                        issue_id=issue_id
-                    )
-                    # Redisに存在しない場合のみタイムスタンプを保存
-                    if not self.redis_client.get_value(timestamp_key):
-                        self.redis_client.set_value(
-                            timestamp_key, datetime.now(UTC).isoformat()
-                        )
-                        logger.info(
-                            f"[issue_id={issue_id}] Detected review issue and stored timestamp in Redis."
-                        )
-        except GithubException as e:
-            logger.error(
-                f"An error occurred while searching for review issues: {e}",
-                exc_info=True,
+        issue_id = issue.get("number")
+        if issue_id is None or "pull_request" in issue:
+            return False
+
+        if action in self.WEBHOOK_ISSUE_REMOVAL_ACTIONS or issue.get("state") != "open":
+            self.redis_client.remove_issue(issue_id)
+            logger.info(
+                f"[issue_id={issue_id}] Removed issue from cache (action: {action})."
+            )
+            return True
+
+        if (
+            self.LABEL_NEEDS_REVIEW in self._get_label_names(issue)
+            and "linked_pull_requests" not in issue
+        ):
+            # Webhookのペイロードには紐づいたPRが含まれないため、同期時と同じ判定のために取得する
+            try:
+                pull_request = self.github_client.get_pr_for_issue(issue_id)
+            except GithubException as e:
+                logger.warning(
+                    f"[issue_id={issue_id}] Failed to find linked PR for review issue: {e}"
+                )
+                return False
+            issue = {
+                **issue,
+                "linked_pull_requests": (
+                    [
+                        {
+                            "number": pull_request.number,
+                            "html_url": pull_request.html_url,
+                        }
+                    ]
+                    if pull_request
+                    else []
+                ),
+            }
+
+        cacheable_issues, _ = self._partition_cacheable_issues([issue])
+        if not cacheable_issues:
+            self.redis_client.remove_issue(issue_id)
+            logger.info(
+                f"[issue_id={issue_id}] Removed review issue without linked PR from cache (action: {action})."
             )
+            return True
+
+        self.redis_client.upsert_issue(issue)
+        logger.info(
+            f"[issue_id={issue_id}] Updated issue in cache (action: {action})."
+        )
+        return True
+
+    def _apply_label_event(self, action: str, payload: dict[str, Any]) -> bool:
+        """
+        リポジトリのラベルが改名・削除された場合に、キャッシュ済みIssueのラベルを書き換えます。
+        """
+        label_name = (payload.get("label") or {}).get("name")
+        if action == "edited":
+            old_name = payload.get("changes", {}).get("name", {}).get("from")
+            new_name = label_name
+        elif action == "deleted":
+            old_name, new_name = label_name, None
+        else:
+            return False
+        if not old_name or old_name == new_name:
+            return False
+
+        issue_ids = self.redis_client.get_issue_ids_by_labels([old_name]).get(
+            old_name, set()
+        )
+        issue_keys = [f"issue:{issue_id}" for issue_id in sorted(issue_ids)]
+        updated = 0
+        for issue_json in self.redis_client.get_values(issue_keys):
+            if issue_json is None:
+                continue
+            issue = json.loads(issue_json)
+            labels = issue.get("labels", [])
+            if not any(label.get("name") == old_name for label in labels):
+                continue
+            issue["labels"] = [
+                {**label, "name": new_name} if label.get("name") == old_name else label
+                for label in labels
+                if new_name is not None or label.get("name") != old_name
+            ]
+            self.redis_client.upsert_issue(issue)
+            updated += 1
+
+        logger.info(
+            f"Applied label '{old_name}' {action} event to {updated} cached issues."
+        )
+        return updated > 0
+
+    def _apply_pull_request_event(
+        self, action: str, pull_request: dict[str, Any]
+    ) -> list[int]:
+        """
+        Pull Requestから参照されているIssueをGitHubから再取得し、キャッシュを更新します。
+        クローズされたPull Requestのレビュータイムアウトの予定は取り除きます。
+
+        Returns:
+            list[int]: キャッシュに反映したIssue番号のリスト。
+        """
+        if action == "closed" and pull_request.get("number") is not None:
+            self.redis_client.remove_review_timeouts([pull_request["number"]])
+        text = f"{pull_request.get('title') or ''}\n{pull_request.get('body') or ''}"
+        linked_issue_ids = sorted({int(n) for n in re.findall(r"#(\d+)", text)})
+        applied_issue_ids = []
+        for issue_id in linked_issue_ids:
+            try:
+                issue = self.github_client.get_issue_by_number(issue_id)
+            except GithubException as e:
+                logger.warning(
+                    f"[issue_id={issue_id}] Failed to fetch issue linked from PR: {e}"
+                )
+                continue
+            # Issue自身の状態で判定するため、PRのactionはそのまま渡さない
+            if self._apply_issue_change(f"pull_request.{action}", issue):
+                applied_issue_ids.append(issue_id)
+        return applied_issue_ids
 
     def poll_and_process_reviews(self):
         """
-        'needs-review'ラベルが付いたIssueをポーリングし、関連するPRがタイムアウトした場合に
-        'review-done'ラベルを付与します。
+        'needs-review'ラベルが付いたPRを取得し、作成から `REVIEW_TIMEOUT_MINUTES` 分後に
+        'review-done'ラベルを付与する予定をRedisに登録します。
+
+        各PRの予定は1度だけ登録され、クローズされた（レビュー待ちでなくなった）PRの予定は
+        取り除かれます。ラベルの付与は `run_review_timeout_scheduler` が予定時刻に行います。
         """
         logger.info("Polling for pull requests needing review...")
         try:
@@ -142,38 +447,23 @@ class TaskService:
             pr_map = self.github_client.get_needs_review_issues_and_prs()
             logger.info(f"Found {len(pr_map)} pull requests in review.")
 
+            timeout_delta = timedelta(minutes=self.REVIEW_TIMEOUT_MINUTES)
+            due_times: dict[int, float] = {}
             for pr_number, pr in pr_map.items():
-                logger.debug(f"[pr_number={pr_number}] Processing PR in review.")
-
-                timeout_minutes = self.REVIEW_TIMEOUT_MINUTES
-                timeout_delta = timedelta(minutes=timeout_minutes)
                 pr_created_at = pr.created_at
+                if pr_created_at is None:
+                    logger.warning(
+                        f"[pr_number={pr_number}] PR has no creation time. Skipping."
+                    )
+                    continue
                 if pr_created_at.tzinfo is None:
                     pr_created_at = pr_created_at.replace(tzinfo=UTC)
-                else:
-                    pr_created_at = pr_created_at.astimezone(UTC)
-                time_since_creation = datetime.now(UTC) - pr_created_at
+                due_times[pr_number] = (pr_created_at + timeout_delta).timestamp()
 
-                if time_since_creation > timeout_delta:
-                    logger.info(
-                        f"[pr_number={pr_number}] PR has exceeded the review timeout of {timeout_minutes} minutes. Adding 'review-done' label."
-                    )
-                    try:
-                        self.github_client.add_label_to_pr(
-                            pr_number=pr_number, label=self.LABEL_REVIEW_DONE
-                        )
-                        logger.info(
-                            f"[pr_number={pr_number}] Successfully added 'review-done' label."
-                        )
-                    except GithubException as e:
-                        logger.error(
-                            f"[pr_number={pr_number}] Failed to add 'review-done' label: {e}",
-                            exc_info=True,
-                        )
-                else:
-                    logger.debug(
-                        f"[pr_number={pr_number}] PR is within the review timeout. Skipping."
-                    )
+            added, removed = self.redis_client.sync_review_timeouts(due_times)
+            logger.info(
+                "Scheduled %d new review timeouts (%d removed).", added, removed
+            )
 
         except GithubException as e:
             logger.error(f"An error occurred during review polling: {e}", exc_info=True)
@@ -183,59 +473,157 @@ class TaskService:
                 exc_info=True,
             )
 
-    def complete_previous_task(self, agent_id: str):
+    async def renew_lease(
+        self, agent_id: str, issue_id: int, fencing_token: int
+    ) -> bool:
+        """
+        エージェントが作業中のIssueのリースを延長します（ハートビート）。
+
+        Returns:
+            bool: 延長できた場合はTrue。リースが失効して他のエージェントに
+            割り当て直された場合などはFalse。
+        """
+        renewed = await self._call_redis(
+            "renew_issue_lease", issue_id, agent_id, fencing_token
+        )
+        if not renewed:
+            logger.warning(
+                "[issue_id=%s, agent_id=%s] Lease is no longer held (fencing_token=%s).",
+                issue_id,
+                agent_id,
+                fencing_token,
+            )
+        return renewed
+
+    async def complete_previous_task(self, agent_id: str):
+        """
+        エージェントの前のタスクを完了させ、レビュー待ち (`needs-review`) にします。
+
+        割り当て時にRedisに記録した `agent_current_task:{agent_id}` を参照するため、
+        完了させるタスクがない場合はGitHub APIを呼び出しません。
+        ラベルの変更はアウトボックスに記録され、バックグラウンドで反映されます。
+        """
         logger.info("[agent_id=%s] Completing previous task.", agent_id)
         try:
-            previous_issues_to_complete = self.github_client.find_issues_by_labels(
-                labels=[self.LABEL_IN_PROGRESS, agent_id]
-            )
-            if not previous_issues_to_complete:
+            issue_id = await self._call_redis("get_agent_current_task", agent_id)
+            if issue_id is None:
                 logger.info(
-                    "[agent_id=%s] No in-progress issues found for this agent via GitHub search.",
+                    "[agent_id=%s] No in-progress issue is recorded for this agent.",
                     agent_id,
                 )
                 return
-
-            for issue in previous_issues_to_complete:
-                remove_labels = [self.LABEL_IN_PROGRESS, agent_id]
-                add_labels = [self.LABEL_NEEDS_REVIEW]
-                try:
-                    self.github_client.update_issue(
-                        issue_id=issue["number"],
-                        remove_labels=remove_labels,
-                        add_labels=add_labels,
-                    )
-                    logger.info(
-                        "[issue_id=%s, agent_id=%s] Updated labels: removed %s, added %s.",
-                        issue["number"],
-                        agent_id,
-                        remove_labels,
-                        add_labels,
-                    )
-                except GithubException as e:
-                    logger.error(
-                        "[issue_id=%s, agent_id=%s] Failed to update issue: %s",
-                        issue["number"],
-                        agent_id,
-                        e,
-                        exc_info=True,
-                    )
-                except Exception as e:
-                    logger.error(
-                        "[issue_id=%s, agent_id=%s] An unexpected error occurred while updating issue: %s",
-                        issue["number"],
-                        agent_id,
-                        e,
-                        exc_info=True,
-                    )
-        except GithubException as e:
+            remove_labels, add_labels = self._get_completion_label_changes(agent_id)
+            await self._call_redis(
+                "enqueue_github_changes",
+                issue_id,
+                add_labels=add_labels,
+                remove_labels=remove_labels,
+            )
+            self._log_task_completion(issue_id, agent_id, remove_labels, add_labels)
+            # アウトボックスへの記録が済んでから削除するため、途中で失敗しても次回やり直せる
+            await self._call_redis("clear_agent_current_task", agent_id, issue_id)
+            self.task_scheduler.release(agent_id)
+        except RedisError as e:
             logger.error(
-                "[agent_id=%s] Failed to find issues by labels: %s",
+                "[agent_id=%s] Failed to complete previous task: %s",
                 agent_id,
                 e,
                 exc_info=True,
             )
 
+    def _get_completion_label_changes(
+        self, agent_id: str
+    ) -> tuple[list[str], list[str]]:
+        """タスクの完了時に削除するラベルと追加するラベル。"""
+        return [self.LABEL_IN_PROGRESS, agent_id], [self.LABEL_NEEDS_REVIEW]
+
+    def _enqueue_task_completion(self, issue_id: int, agent_id: str) -> None:
+        remove_labels, add_labels = self._get_completion_label_changes(agent_id)
+        self.redis_client.enqueue_github_changes(
+            issue_id, add_labels=add_labels, remove_labels=remove_labels
+        )
+        self._log_task_completion(issue_id, agent_id, remove_labels, add_labels)
+
+    @staticmethod
+    def _log_task_completion(
+        issue_id: int, agent_id: str, remove_labels: list[str], add_labels: list[str]
+    ) -> None:
+        logger.info(
+            "[issue_id=%s, agent_id=%s] Queued label update: removed %s, added %s.",
+            issue_id,
+            agent_id,
+            remove_labels,
+            add_labels,
+        )
+
+    def reconcile_agent_assignments(self) -> None:
+        """
+        Redisのエージェントの割り当て記録と、キャッシュ済みのIssueのラベルのずれを修正します。
+
+        - `in-progress` のIssueに割り当て記録がない場合は、割り当て時に `events:assignments`
+          ストリームへ記録したエージェントから記録を復元します。
+          エージェントが既に別のタスクを割り当てられている場合は、そのIssueを完了させます。
+          ストリームに記録がないか、記録されたエージェントのラベルがIssueに付いていない場合は、
+          担当者を特定できないため警告を記録して何もしません。
+        - 記録されたIssueが `in-progress` でなくなっている場合は、記録を削除します。
+
+        リースを保持しているIssueと、GitHubへの反映を待っている変更があるIssueは、
+        キャッシュがまだ追いついていない可能性があるため対象外とします。
+        Issueキャッシュの同期の直後に呼び出されることを想定しています。
+        """
+        assignments = self.redis_client.get_agent_current_tasks()
+        in_progress_ids = self.redis_client.get_issue_ids_by_labels(
+            [self.LABEL_IN_PROGRESS]
+        )[self.LABEL_IN_PROGRESS]
+        assigned_ids = set(assignments.values())
+        unsettled_ids = self.redis_client.get_outbox_issue_ids()
+        unsettled_ids |= self.redis_client.get_leased_issue_ids(
+            sorted((in_progress_ids ^ assigned_ids) - unsettled_ids)
+        )
+
+        orphan_ids = sorted(in_progress_ids - assigned_ids - unsettled_ids)
+        cached_issues = self.redis_client.get_values(
+            [f"issue:{issue_id}" for issue_id in orphan_ids]
+        )
+        assigned_agents = self.redis_client.get_assigned_agents(orphan_ids)
+        for issue_id, issue_json in zip(orphan_ids, cached_issues, strict=True):
+            if issue_json is None:
+                continue
+            agent_id = assigned_agents.get(issue_id)
+            if agent_id is None or agent_id not in self._get_label_names(
+                json.loads(issue_json)
+            ):
+                logger.warning(
+                    "[issue_id=%s] In-progress issue has no assignment record and its agent could not be determined from the assignment events. Skipping.",
+                    issue_id,
+                )
+            elif self.redis_client.restore_agent_current_task(agent_id, issue_id):
+                logger.info(
+                    "[issue_id=%s, agent_id=%s] Restored missing assignment record.",
+                    issue_id,
+                    agent_id,
+                )
+            else:
+                # エージェントは既に次のタスクに進んでいる
+                self._enqueue_task_completion(issue_id, agent_id)
+
+        for agent_id, issue_id in sorted(assignments.items()):
+            if issue_id in in_progress_ids or issue_id in unsettled_ids:
+                continue
+            if self.redis_client.clear_agent_current_task(agent_id, issue_id):
+                self.task_scheduler.release(agent_id)
+                logger.info(
+                    "[issue_id=%s, agent_id=%s] Removed stale assignment record; the issue is no longer in progress.",
+                    issue_id,
+                    agent_id,
+                )
+
+    @staticmethod
+    def _get_label_names(issue: dict[str, Any]) -> set[str]:
+        return {
+            label["name"] for label in issue.get("labels", []) if label.get("name")
+        }
+
     @staticmethod
     def _get_priority_from_label(label_name: str) -> int | None:
         if label_name.startswith("P") and label_name[1:].isdigit():
@@ -245,130 +633,331 @@ class TaskService:
     def _has_priority_label(self, labels: set[str]) -> bool:
         return any(self._get_priority_from_label(name) is not None for name in labels)
 
-    def _determine_highest_priority(self, labels: list[str]) -> str | None:
+    def _build_candidate_queues(
+        self, label_index: dict[str, set[int]], priority_labels: list[str]
+    ) -> dict[tuple[str, str], list[int]]:
         """
-        優先度ラベルのリストから最も高い優先度（数字が最小）を特定します。
-
-        Args:
-            labels (list[str]): Issueに付与されているラベル名のリスト。
+        ラベルインデックスから、役割・優先度ごとのタスク候補キューを構築します。
 
-        Returns:
-            str | None: 最も高い優先度ラベル (例: 'P0')。優先度ラベルがない場合はNone。
+        候補は、役割ラベルと優先度ラベルを持ち、`in-progress` でなく、
+        `story`/`epic` でもないIssueです。`needs-review` のIssueはレビュー候補として
+        同じキューに含まれ、レビュー割り当ての待機時間は割り当て時に確認されます。
         """
-        priority_tuples = [
-            (self._get_priority_from_label(label), label)
-            for label in labels
-            if self._get_priority_from_label(label) is not None
+        excluded_ids = set().union(
+            *(
+                label_index.get(label, set())
+                for label in [self.LABEL_IN_PROGRESS, *self.EXCLUDED_ISSUE_TYPE_LABELS]
+            )
+        )
+        queues: dict[tuple[str, str], list[int]] = {}
+        for priority in priority_labels:
+            priority_ids = label_index.get(priority, set()) - excluded_ids
+            for role in sorted(self.agent_roles):
+                issue_ids = priority_ids & label_index.get(role, set())
+                if issue_ids:
+                    queues[(role, priority)] = sorted(issue_ids)
+        return queues
+
+    def _get_candidate_queue_keys(self, labels: set[str]) -> list[tuple[str, str]]:
+        """
+        ラベルの集合を持つIssueが所属すべき `(役割ラベル, 優先度ラベル)` のリストを返します。
+        条件は `_build_candidate_queues` と同じです。
+        """
+        if self.LABEL_IN_PROGRESS in labels or labels & self.EXCLUDED_ISSUE_TYPE_LABELS:
+            return []
+        return [
+            (role, priority)
+            for priority in sorted(labels)
+            if self._get_priority_from_label(priority) is not None
+            for role in sorted(self.agent_roles & labels)
         ]
 
-        if priority_tuples:
-            # self._get_priority_from_labelがNoneでないことを確認済みなので、
-            # mypyのためのキャストを追加
-            valid_priority_tuples: list[tuple[int, str]] = [
-                (p, label) for p, label in priority_tuples if p is not None
+    def refresh_candidate_queues(self, issue_ids: list[int] | None = None) -> None:
+        """
+        キャッシュ済みIssueのラベルインデックスから、役割・優先度ごとのタスク候補キューを
+        再構築してRedisに書き込みます。
+
+        Issueキャッシュが更新された直後（同期・Webhookの反映後）に呼び出されます。
+        タスク割り当て時は、このキューを読むだけで候補を得られます。
+        `issue_ids` を指定した場合は、それらのIssueが所属するキューのみを更新します。
+        """
+        if issue_ids is not None:
+            issue_labels = self.redis_client.get_issue_labels(issue_ids)
+            added = self.redis_client.update_candidate_queues(
+                {
+                    issue_id: self._get_candidate_queue_keys(labels)
+                    for issue_id, labels in issue_labels.items()
+                }
+            )
+            logger.info(
+                "Updated candidate queues for issues %s (%d new candidates).",
+                issue_ids,
+                added,
+            )
+            return
+
+        priority_labels = sorted(
+            label
+            for label in self.redis_client.get_indexed_labels()
+            if self._get_priority_from_label(label) is not None
+        )
+        label_index = self.redis_client.get_issue_ids_by_labels(
+            [
+                *priority_labels,
+                self.LABEL_IN_PROGRESS,
+                *sorted(self.EXCLUDED_ISSUE_TYPE_LABELS),
+                *sorted(self.agent_roles),
             ]
-            return min(valid_priority_tuples)[1]
-        return None
+        )
+        queues = self._build_candidate_queues(label_index, priority_labels)
+        added = self.redis_client.replace_candidate_queues(queues)
+        logger.info(
+            "Rebuilt %d candidate queues (%d new candidates).", len(queues), added
+        )
 
-    def _find_candidates_for_any_role(
-        self, issues: list[dict[str, Any]], highest_priority: str | None
+    async def _filter_ready_candidates(
+        self, issues: list[dict[str, Any]]
     ) -> list[dict[str, Any]]:
+        """
+        候補キューから読み出したIssueのうち、現時点で割り当て可能なものを返します。
+        レビュー候補 (`needs-review`) は、検出から `REVIEW_ASSIGNMENT_DELAY_MINUTES` 分が
+        経過している場合のみ含まれます。
+        """
+        review_issues = [
+            issue
+            for issue in issues
+            if self.LABEL_NEEDS_REVIEW in self._get_label_names(issue)
+        ]
+        ready_review_ids: set[int] = set()
+        if review_issues:
+            # 待機時間を過ぎたレビューIssueを1回の往復でまとめて取得する
+            detected_before = time.time() - self.REVIEW_ASSIGNMENT_DELAY_MINUTES * 60
+            ready_review_ids = await self._call_redis(
+                "get_ready_review_issue_ids", detected_before
+            )
+
         candidate_issues = []
         for issue in issues:
-            label_names = (label.get("name") for label in issue.get("labels", []))
-            labels = {name for name in label_names if name is not None}
-
-            # 優先度ラベルのフィルタリング
-            if highest_priority and highest_priority not in labels:
+            if self.LABEL_NEEDS_REVIEW not in self._get_label_names(issue):
+                candidate_issues.append(issue)
                 continue
 
-            # 役割ラベルが付いているかチェック
-            role_labels = labels.intersection(self.agent_roles)
-            if not role_labels:
-                continue  # 役割ラベルがないIssueはスキップ
-
-            is_development_candidate = (
-                self.LABEL_IN_PROGRESS not in labels
-                and self.LABEL_NEEDS_REVIEW not in labels
-                and not {"story", "epic"}.intersection(labels)
-                and self._has_priority_label(labels)
-            )
-            is_review_candidate = (
-                self.LABEL_IN_PROGRESS not in labels
-                and self.LABEL_NEEDS_REVIEW in labels
-                and not {"story", "epic"}.intersection(labels)
-            )
+            issue_id = issue.get("number")
+            if issue_id is None:
+                logger.warning(f"Issue with missing number found: {issue}. Skipping.")
+                continue
 
-            if is_development_candidate:
+            if issue_id in ready_review_ids:
+                logger.info(
+                    f"[issue_id={issue_id}] Review issue detected more than {self.REVIEW_ASSIGNMENT_DELAY_MINUTES} minutes ago. Adding to candidates."
+                )
                 candidate_issues.append(issue)
-            elif is_review_candidate:
-                issue_id = issue.get("number")
-                if issue_id is None:
-                    logger.warning(
-                        f"Issue with missing number found: {issue}. Skipping."
-                    )
-                    continue
-
-                # Redisに保存されたタイムスタンプを確認
-                timestamp_key = self.REVIEW_ISSUE_TIMESTAMP_KEY_FORMAT.format(
-                    issue_id=issue_id
-                )
-                detected_timestamp_str = self.redis_client.get_value(timestamp_key)
-
-                if detected_timestamp_str:
-                    detected_timestamp = datetime.fromisoformat(detected_timestamp_str)
-                    if detected_timestamp.tzinfo is None:
-                        detected_timestamp = detected_timestamp.replace(tzinfo=UTC)
-                    else:
-                        detected_timestamp = detected_timestamp.astimezone(UTC)
-                    time_since_detection = datetime.now(UTC) - detected_timestamp
-                    if time_since_detection >= timedelta(
-                        minutes=self.REVIEW_ASSIGNMENT_DELAY_MINUTES
-                    ):
-                        logger.info(
-                            f"[issue_id={issue_id}] Review issue detected more than {self.REVIEW_ASSIGNMENT_DELAY_MINUTES} minutes ago. Adding to candidates."
-                        )
-                        candidate_issues.append(issue)
-                    else:
-                        logger.info(
-                            f"[issue_id={issue_id}] Review issue detected less than {self.REVIEW_ASSIGNMENT_DELAY_MINUTES} minutes ago. Skipping for now."
-                        )
-                else:
-                    logger.info(
-                        f"[issue_id={issue_id}] Review issue has no detection timestamp in Redis. Skipping."
-                    )
+            else:
+                logger.info(
+                    f"[issue_id={issue_id}] Review issue was detected less than {self.REVIEW_ASSIGNMENT_DELAY_MINUTES} minutes ago or has no detection record. Skipping for now."
+                )
 
         if not candidate_issues:
             logger.info("No assignable issues found with a role label.")
         return candidate_issues
 
     @staticmethod
-    def _sort_issues_by_priority(issues: list[dict]) -> list[dict]:
+    def _get_task_fields(issue: dict[str, Any]) -> dict[str, Any]:
+        """
+        Issueの取り込み時に計算された `Task.precompute` の結果を返します。
+        計算済みの値を持たない（以前の形式でキャッシュされた）Issueの場合のみ、その場で計算します。
         """
-        Issueのリストを優先度ラベルに基づいてソートします。
-        P0 > P1 > P2 の順に優先度が高く、優先度ラベルがないIssueは末尾に配置されます。
+        task_fields = issue.get(CACHED_TASK_FIELDS_KEY)
+        if task_fields is None:
+            task_fields = Task.from_issue(issue).precompute()
+        return task_fields
 
-        Args:
-            issues (list[dict]): ソート対象のIssueのリスト。
+    async def _call_github(self, method_name: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        リクエスト経路からGitHub APIを呼び出します。
+        非同期クライアントが設定されている場合は直接awaitし、
+        そうでない場合は同期クライアントをスレッドプールで実行します。
+        """
+        if self.async_github_client is not None:
+            method = getattr(self.async_github_client, method_name)
+            return await method(*args, **kwargs)
+        method = getattr(self.github_client, method_name)
+        return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def _call_redis(self, method_name: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        リクエスト経路からRedisを呼び出します。
+        非同期クライアントが設定されている場合は直接awaitし、
+        そうでない場合は同期クライアントをスレッドプールで実行します。
+        """
+        if self.async_redis_client is not None:
+            method = getattr(self.async_redis_client, method_name)
+            return await method(*args, **kwargs)
+        method = getattr(self.redis_client, method_name)
+        return await asyncio.to_thread(method, *args, **kwargs)
+
+    async def run_github_outbox_worker(self) -> None:
+        """
+        アウトボックスに記録されたGitHubへの変更を、バックグラウンドで反映し続けます。
+        アプリケーションの起動時にタスクとして開始され、キャンセルされるまで実行されます。
+        """
+        logger.info("Starting GitHub outbox worker...")
+        # 前回のプロセスが反映途中で停止した変更を、アウトボックスに戻す
+        for issue_id in await self._call_redis("get_inflight_outbox_issue_ids"):
+            await self._call_redis("retry_outbox_entry", issue_id, 0, 0)
+            logger.info(f"[issue_id={issue_id}] Recovered in-flight outbox entry.")
+
+        while True:
+            processed = 0
+            if self.github_client.rate_limit_budget.allows(
+                "core", RequestPriority.CRITICAL
+            ):
+                try:
+                    processed = await self.process_github_outbox()
+                except RedisError as e:
+                    logger.error(
+                        f"Failed to read the GitHub outbox from Redis: {e}", exc_info=True
+                    )
+            else:
+                logger.warning(
+                    "GitHub API rate limit is exhausted. Deferring outbox processing."
+                )
+            if processed < self.OUTBOX_BATCH_SIZE:
+                await asyncio.sleep(self.OUTBOX_POLL_INTERVAL_SECONDS)
+
+    async def run_review_timeout_scheduler(self) -> None:
+        """
+        レビュータイムアウトの予定時刻まで待機し、予定時刻になったPRに 'review-done' ラベルを
+        付与します。アプリケーションの起動時にタスクとして開始され、キャンセルされるまで実行されます。
+        """
+        logger.info("Starting review timeout scheduler...")
+        while True:
+            delay: float = self.REVIEW_TIMEOUT_MAX_SLEEP_SECONDS
+            try:
+                fired = await self.process_due_review_timeouts()
+                if fired >= self.REVIEW_TIMEOUT_BATCH_SIZE:
+                    continue
+                next_due = await self._call_redis("get_next_review_timeout")
+                if next_due is not None:
+                    delay = min(delay, max(0.0, next_due - time.time()))
+            except RedisError as e:
+                logger.error(
+                    f"Failed to read review timeouts from Redis: {e}", exc_info=True
+                )
+            await asyncio.sleep(delay)
+
+    async def process_due_review_timeouts(self) -> int:
+        """
+        予定時刻を過ぎたPRに 'review-done' ラベルを付与する変更をアウトボックスに登録し、
+        予定を発火済みにします。
+
+        ラベルの付与は冪等なため、複数のプロセスが同じ予定を同時に処理しても問題ありません。
+        登録後に停止した場合も、予定は発火済みになっていないため再起動後に再び処理されます。
 
         Returns:
-            list[dict]: 優先度に基づいてソートされたIssueのリスト。
+            int: 処理したPRの件数。
+        """
+        pr_numbers = await self._call_redis(
+            "get_due_review_timeouts", time.time(), self.REVIEW_TIMEOUT_BATCH_SIZE
+        )
+        if not pr_numbers:
+            return 0
+        for pr_number in pr_numbers:
+            # PRのラベルはIssueと同じAPIで変更できるため、アウトボックスから再試行付きで反映する
+            await self._call_redis(
+                "enqueue_github_changes", pr_number, add_labels=[self.LABEL_REVIEW_DONE]
+            )
+            logger.info(
+                f"[pr_number={pr_number}] PR has exceeded the review timeout of {self.REVIEW_TIMEOUT_MINUTES} minutes. Queued 'review-done' label."
+            )
+        await self._call_redis("mark_review_timeouts_fired", pr_numbers)
+        return len(pr_numbers)
+
+    async def process_github_outbox(self) -> int:
         """
+        反映時刻を過ぎたアウトボックスの変更を、Issueごとにまとめて1回ずつGitHubへ反映します。
+        失敗した変更は指数バックオフで再試行され、`OUTBOX_MAX_ATTEMPTS` 回失敗するとデッドレターに移されます。
 
-        def get_priority_key(issue: dict) -> int | float:
-            """Extracts the lowest priority number from an issue's labels."""
-            label_names = (label.get("name", "") for label in issue.get("labels", []))
-            priority_numbers = (
-                int(name[1:])
-                for name in label_names
-                if name.startswith("P") and name[1:].isdigit()
+        Returns:
+            int: 取り出したIssueの件数。
+        """
+        issue_ids = await self._call_redis(
+            "get_due_outbox_issue_ids", self.OUTBOX_BATCH_SIZE
+        )
+        for issue_id in issue_ids:
+            entry = await self._call_redis("claim_outbox_entry", issue_id)
+            if entry is None:
+                continue
+            try:
+                await self._apply_outbox_entry(entry)
+            except Exception as e:
+                if (
+                    isinstance(e, GithubException)
+                    and e.status in self.OUTBOX_DISCARD_STATUSES
+                ):
+                    logger.warning(
+                        f"[issue_id={issue_id}] Discarding queued GitHub changes: {e}"
+                    )
+                    await self._call_redis("ack_outbox_entry", issue_id)
+                    continue
+                attempts = await self._call_redis(
+                    "retry_outbox_entry",
+                    issue_id,
+                    self.OUTBOX_RETRY_BASE_SECONDS,
+                    self.OUTBOX_RETRY_MAX_SECONDS,
+                    self.OUTBOX_MAX_ATTEMPTS,
+                    str(e),
+                )
+                if attempts >= self.OUTBOX_MAX_ATTEMPTS:
+                    logger.error(
+                        f"[issue_id={issue_id}] Giving up on queued GitHub changes after {attempts} attempts. Moved to dead letter: {e}",
+                        exc_info=True,
+                    )
+                    continue
+                logger.error(
+                    f"[issue_id={issue_id}] Failed to apply queued GitHub changes (attempt {attempts}). Will retry: {e}",
+                    exc_info=True,
+                )
+                continue
+            await self._call_redis("ack_outbox_entry", issue_id)
+        return len(issue_ids)
+
+    async def _apply_outbox_entry(self, entry: GitHubOutboxEntry) -> None:
+        """
+        1つのIssueに対するアウトボックスの変更をGitHubへ反映します。
+        ラベルは差分（追加・削除）のみを適用し、GitHub上のラベル全体は置き換えません。
+        """
+        if entry.add_labels or entry.remove_labels:
+            await self._call_github(
+                "apply_label_delta",
+                issue_id=entry.issue_id,
+                add_labels=entry.add_labels,
+                remove_labels=entry.remove_labels,
             )
-            return min(priority_numbers, default=float("inf"))
+        for branch_name in entry.branch_names:
+            await self._call_github("create_branch", branch_name)
+        logger.info(f"[issue_id={entry.issue_id}] Applied queued GitHub changes.")
+
+    async def _find_linked_pull_request(
+        self, issue: dict[str, Any]
+    ) -> PullRequestRef | None:
+        """
+        Issueに紐づくPull Requestを返します。
 
-        return sorted(issues, key=get_priority_key)
+        同期時にキャッシュされた `linked_pull_requests` があればそれを使用し、
+        GitHubの検索は行いません。Webhookで更新されたIssueなど、
+        紐づいたPRの情報を持たない場合のみ検索にフォールバックします。
+        """
+        linked_pull_requests = issue.get("linked_pull_requests")
+        if linked_pull_requests is None:
+            return await self._call_github("get_pr_for_issue", issue["number"])
+        if not linked_pull_requests:
+            return None
+        pr = linked_pull_requests[0]
+        return PullRequestRef(number=pr["number"], html_url=pr["html_url"])
 
     async def _prepare_review_task_context(
-        self, task: Task, agent_id: str, lock_key: str
+        self, task: Task, issue: dict[str, Any], agent_id: str, fencing_token: int
     ) -> tuple[str | None, TaskType | None]:
         """
         レビュータスクのコンテキスト（プロンプトとタスクタイプ）を準備します。
@@ -377,25 +966,20 @@ class TaskService:
         logger.info(
             f"[issue_id={task.issue_id}] Task is a review task. Finding linked PR and retrieving review comments."
         )
-        pull_request = await asyncio.to_thread(self.github_client.get_pr_for_issue, task.issue_id)
+        pull_request = await self._find_linked_pull_request(issue)
         if not pull_request:
             logger.warning(
                 f"[issue_id={task.issue_id}] No linked PR found for review task. Skipping."
             )
-            # ラベルをロールバック
-            try:
-                await asyncio.to_thread(
-                    self.github_client.update_issue,
-                    issue_id=task.issue_id,
-                    remove_labels=[self.LABEL_IN_PROGRESS, agent_id],
-                )
-            except GithubException as e:
-                logger.error(
-                    f"[issue_id={task.issue_id}] Failed to rollback labels: {e}",
-                    exc_info=True,
-                )
-            # ロックを解放して次のIssueを試す
-            await asyncio.to_thread(self.redis_client.release_lock, lock_key)
+            # GitHubへの変更はまだ記録していないため、ロックを解放するだけで次のIssueを試せる
+            await self._call_redis(
+                "release_issue_claim",
+                task.issue_id,
+                agent_id,
+                fencing_token,
+                claimed_label=self.LABEL_IN_PROGRESS,
+                candidate_queues=self._get_candidate_queue_keys(set(task.labels)),
+            )
             logger.info(
                 f"[issue_id={task.issue_id}, agent_id={agent_id}] Released lock."
             )
@@ -410,55 +994,91 @@ class TaskService:
         return prompt, TaskType.REVIEW
 
     async def _find_first_assignable_task(
-        self, candidate_issues: list, agent_id: str
+        self,
+        candidate_issues: list,
+        agent_id: str,
+        role_labels: list[str] | None = None,
     ) -> TaskResponse | None:
         assert self.repo_name is not None
-        sorted_issues = self._sort_issues_by_priority(candidate_issues)
+        available_roles = (
+            set(role_labels) if role_labels is not None else self.agent_roles
+        )
+        sorted_issues = self.task_scheduler.order(
+            candidate_issues, sorted(available_roles), time.time()
+        )
         logger.info(
             "候補Issueを優先度順にソートしました: %s",
             [issue["number"] for issue in sorted_issues],
         )
         for issue_obj in sorted_issues:
-            task = Task(
-                issue_id=issue_obj["number"],
-                title=issue_obj["title"],
-                body=issue_obj["body"] or "",
-                html_url=issue_obj["html_url"],
-                labels=[label["name"] for label in issue_obj.get("labels", [])],
-            )
+            task = Task.from_issue(issue_obj)
+            task_fields = self._get_task_fields(issue_obj)
 
-            if not task.is_assignable():
+            if not task_fields["assignable"]:
                 logger.info(
                     "[issue_id=%s] Issueは割り当て不可能です（'成果物'セクションがありません）。スキップします。",
                     task.issue_id,
                 )
                 continue
 
-            branch_name = task.extract_branch_name()
+            branch_name = task_fields["branch_name"]
             if not branch_name:
                 logger.warning(
                     f"[issue_id={task.issue_id}] の本文にブランチ名が見つかりませんでした。このIssueはスキップされます。"
                 )
                 continue
 
-            lock_key = f"issue_lock_{task.issue_id}"
-            if not await asyncio.to_thread(self.redis_client.acquire_lock, lock_key, agent_id, timeout=600):
+            issue_roles = [label for label in task.labels if label in available_roles]
+            assert (
+                issue_roles
+            ), f"Candidate issue {task.issue_id} must have at least one role label."
+            if len(issue_roles) > 1:
                 logger.warning(
-                    f"[issue_id={task.issue_id}] Issue is locked by another agent. Skipping."
+                    "[issue_id=%s] Multiple role labels found: %s.",
+                    task.issue_id,
+                    issue_roles,
+                )
+            required_role = self.task_scheduler.acquire(agent_id, issue_roles)
+            if required_role is None:
+                logger.info(
+                    "[issue_id=%s] 役割 %s の同時実行タスク数が上限に達しています。スキップします。",
+                    task.issue_id,
+                    issue_roles,
                 )
                 continue
 
+            # 候補の再確認・ロック取得・現在のタスクの記録を1回の往復で行う
+            candidate_queues = self._get_candidate_queue_keys(set(task.labels))
             try:
-                logger.info(
-                    f"[issue_id={task.issue_id}, agent_id={agent_id}] Lock acquired for issue. Assigning task."
+                claim = await self._call_redis(
+                    "claim_issue",
+                    task.issue_id,
+                    agent_id,
+                    excluded_labels=[self.LABEL_IN_PROGRESS],
+                    claimed_label=self.LABEL_IN_PROGRESS,
+                    candidate_queues=candidate_queues,
                 )
-                await asyncio.to_thread(self.github_client.add_label, task.issue_id, self.LABEL_IN_PROGRESS)
-                await asyncio.to_thread(self.github_client.add_label, task.issue_id, agent_id)
+            except Exception:
+                self.task_scheduler.release(agent_id)
+                raise
+            if claim.result is IssueClaimResult.LOCKED:
+                self.task_scheduler.release(agent_id)
+                logger.warning(
+                    f"[issue_id={task.issue_id}] Issue is locked by another agent. Skipping."
+                )
+                continue
+            if claim.result is IssueClaimResult.NOT_CANDIDATE:
+                self.task_scheduler.release(agent_id)
                 logger.info(
-                    f"[issue_id={task.issue_id}, agent_id={agent_id}] Assigned agent to issue."
+                    f"[issue_id={task.issue_id}] Issue is no longer an open candidate. Skipping."
                 )
+                continue
+            assert claim.fencing_token is not None
 
-                await asyncio.to_thread(self.github_client.create_branch, branch_name)
+            try:
+                logger.info(
+                    f"[issue_id={task.issue_id}, agent_id={agent_id}] Lock acquired for issue. Assigning task."
+                )
 
                 prompt = None
                 task_type = None
@@ -466,9 +1086,10 @@ class TaskService:
 
                 if self.LABEL_NEEDS_REVIEW in task.labels:
                     prompt, task_type = await self._prepare_review_task_context(
-                        task, agent_id, lock_key
+                        task, issue_obj, agent_id, claim.fencing_token
                     )
                     if not prompt:  # スキップすべき場合はNoneが返る
+                        self.task_scheduler.release(agent_id)
                         continue
                 else:
                     prompt = "PROMPT_GENERATION_LOGIC_REMOVED"
@@ -480,29 +1101,17 @@ class TaskService:
                 assert prompt is not None
                 assert task_type is not None
 
-                await asyncio.to_thread(
-                    self.redis_client.set_value,
-                    f"agent_current_task:{agent_id}",
-                    str(task.issue_id),
-                    timeout=3600,
+                # ラベルの付与とブランチの作成はアウトボックスに記録し、バックグラウンドで反映する
+                await self._call_redis(
+                    "enqueue_github_changes",
+                    task.issue_id,
+                    add_labels=[self.LABEL_IN_PROGRESS, agent_id],
+                    branch_names=[branch_name],
                 )
                 logger.info(
-                    f"[issue_id={task.issue_id}, agent_id={agent_id}] Stored current task in Redis."
+                    f"[issue_id={task.issue_id}, agent_id={agent_id}] Assigned agent to issue."
                 )
-
-                role_labels = [
-                    label for label in task.labels if label in self.agent_roles
-                ]
-                assert (
-                    role_labels
-                ), f"Candidate issue {task.issue_id} must have at least one role label."
-
-                if len(role_labels) > 1:
-                    logger.warning(
-                        f"[issue_id={task.issue_id}] Multiple role labels found: {role_labels}. "
-                        f"Using the first one: {role_labels[0]}"
-                    )
-                required_role = role_labels[0]
+                self.task_scheduler.record_assignment(agent_id, required_role)
 
                 return TaskResponse(
                     issue_id=task.issue_id,
@@ -515,54 +1124,248 @@ class TaskService:
                     required_role=required_role,
                     task_type=task_type,
                     gemini_response=gemini_response,
+                    fencing_token=claim.fencing_token,
                 )
             except Exception as e:
                 logger.error(
                     f"[issue_id={task.issue_id}, agent_id={agent_id}] Failed to process issue after acquiring lock: {e}",
                     exc_info=True,
                 )
-                try:
-                    await asyncio.to_thread(
-                        self.github_client.update_issue,
-                        issue_id=task.issue_id,
-                        remove_labels=[self.LABEL_IN_PROGRESS, agent_id],
-                    )
-                    logger.info(
-                        f"[issue_id={task.issue_id}, agent_id={agent_id}] Rolled back labels."
-                    )
-                except Exception as rollback_e:
-                    logger.error(
-                        f"[issue_id={task.issue_id}, agent_id={agent_id}] Failed to rollback labels: {rollback_e}",
-                        exc_info=True,
-                    )
-                finally:
-                    await asyncio.to_thread(self.redis_client.release_lock, lock_key)
-                    logger.info(
-                        f"[issue_id={task.issue_id}, agent_id={agent_id}] Released lock."
-                    )
+                self.task_scheduler.release(agent_id)
+                await self._call_redis(
+                    "release_issue_claim",
+                    task.issue_id,
+                    agent_id,
+                    claim.fencing_token,
+                    claimed_label=self.LABEL_IN_PROGRESS,
+                    candidate_queues=candidate_queues,
+                )
+                logger.info(
+                    f"[issue_id={task.issue_id}, agent_id={agent_id}] Released lock."
+                )
                 raise
 
         logger.info(f"[agent_id={agent_id}] No assignable and unlocked issues found.")
         return None
 
-    async def request_task(self, agent_id: str) -> TaskResponse | None:
+    async def request_task(
+        self,
+        agent_id: str,
+        wait_seconds: float = 0,
+        roles: list[str] | None = None,
+    ) -> TaskResponse | None:
+        """
+        エージェントにタスクを割り当てます。
+
+        `roles` が指定された場合、その役割の候補キューからのみタスクを選択します。
+        省略した場合は agents.yml に定義されたすべての役割が対象になります。
+
+        `wait_seconds` が指定された場合、割り当て可能なタスクがなければ、
+        タスク候補の追加・更新の通知 (Redis pub/sub) を受けるたびに再確認しながら
+        最大 `wait_seconds` 秒待機します (ロングポーリング)。
+
+        Raises:
+            UnknownRoleError: agents.yml に定義されていない役割が指定された場合。
+        """
         logger.info("タスクをリクエストしています: agent_id=%s", agent_id)
-        return await self._check_for_available_task(agent_id, is_first_check=True)
+        role_labels = self._resolve_request_roles(roles)
+        notifier = self.task_notifier
+        # 確認中に届いた通知を取りこぼさないよう、確認前の世代番号を保持する
+        generation = notifier.generation if notifier else 0
+        task = await self._check_for_available_task(
+            agent_id, role_labels, is_first_check=True
+        )
+        if task or not wait_seconds or notifier is None:
+            return task
+
+        logger.info(
+            "[agent_id=%s] タスク候補の更新を最大 %s 秒待機します。", agent_id, wait_seconds
+        )
+        deadline = time.monotonic() + wait_seconds
+        while (remaining := deadline - time.monotonic()) > 0:
+            if not await notifier.wait(generation, remaining):
+                break
+            generation = notifier.generation
+            logger.info("[agent_id=%s] タスク候補の更新通知を受信しました。", agent_id)
+            task = await self._check_for_available_task(
+                agent_id, role_labels, is_first_check=False
+            )
+            if task:
+                return task
+        logger.info("[agent_id=%s] 待機時間内に割り当て可能なタスクはありませんでした。", agent_id)
+        return None
+
+    def _resolve_request_roles(self, roles: list[str] | None) -> list[str]:
+        """
+        リクエストされた役割を検証し、候補キューの検索に使用する役割ラベルを返します。
+        """
+        if roles is None:
+            return sorted(self.agent_roles)
+        unknown_roles = set(roles) - self.agent_roles
+        if unknown_roles:
+            raise UnknownRoleError(
+                f"Unknown roles requested: {sorted(unknown_roles)}"
+            )
+        return sorted(set(roles))
 
     async def _check_for_available_task(
-        self, agent_id: str, is_first_check: bool = True
+        self, agent_id: str, role_labels: list[str], is_first_check: bool = True
     ) -> TaskResponse | None:
         if is_first_check:
-            self.complete_previous_task(agent_id)
-
-        issue_keys = self.redis_client.get_keys_by_pattern("issue:*")
-        if not issue_keys:
-            logger.warning("No issues found in Redis cache.")
+            await self.complete_previous_task(agent_id)
+
+        snapshot = await self._get_issue_snapshot()
+        roles_key = tuple(role_labels)
+        priority_labels = snapshot.priority_labels_by_roles.get(roles_key)
+        if priority_labels is None:
+            priority_labels = await self._load_candidate_priorities(role_labels)
+            snapshot.priority_labels_by_roles[roles_key] = priority_labels
+        if not priority_labels:
+            logger.info(
+                "役割 %s の優先度ラベルを持つタスク候補が見つかりませんでした。割り当てるタスクはありません。",
+                role_labels,
+            )
             return None
 
-        cached_issues_json = self.redis_client.get_values(issue_keys)
+        # 上位の優先度で割り当てられるタスクがなければ、次の優先度にフォールバックする
+        tiers = self._iter_priority_tiers(snapshot, priority_labels, role_labels)
+        async for tier, priority_label, queued_issues in tiers:
+            candidate_issues = await self._filter_ready_candidates(queued_issues)
+            if not candidate_issues:
+                logger.info(
+                    "優先度ラベル '%s' を持つ割り当て可能なタスク候補は見つかりませんでした。",
+                    priority_label,
+                )
+                continue
+
+            logger.info(
+                "優先度ラベル '%s' (第%d階層) を持つタスク候補が %d 件見つかりました。",
+                priority_label,
+                tier,
+                len(candidate_issues),
+            )
+            task = await self._find_first_assignable_task(
+                candidate_issues, agent_id, role_labels
+            )
+            if task:
+                task.priority_label = priority_label
+                task.priority_tier = tier
+                return task
+
+        return None
+
+    async def _iter_priority_tiers(
+        self,
+        snapshot: _IssueSnapshot,
+        priority_labels: list[str],
+        role_labels: list[str],
+    ) -> AsyncIterator[tuple[int, str, list[dict[str, Any]]]]:
+        """
+        優先度の高い順に、階層 (0が最上位)・優先度ラベル・その候補Issueを返します。
+
+        候補は優先度ごとに、必要になった時点で読み込みます。スケジューラが古いIssueの
+        優先度を引き上げる場合は、すべての優先度の候補を読み込み、引き上げ後の優先度で
+        まとめ直します。キャッシュが破損している場合はそこで終了します。
+        """
+        if self.task_scheduler.age_boost_seconds is None:
+            for tier, priority_label in enumerate(priority_labels):
+                queued_issues = await self._get_queued_candidate_issues(
+                    snapshot, priority_label, role_labels
+                )
+                if queued_issues is None:
+                    return
+                yield tier, priority_label, queued_issues
+            return
+
+        now = time.time()
+        boosted: dict[int, list[dict[str, Any]]] = {}
+        for priority_label in priority_labels:
+            queued_issues = await self._get_queued_candidate_issues(
+                snapshot, priority_label, role_labels
+            )
+            if queued_issues is None:
+                return
+            for issue in queued_issues:
+                priority = self.task_scheduler.effective_priority(issue, now)
+                if priority is None:
+                    priority = int(priority_label[1:])
+                boosted.setdefault(priority, []).append(issue)
+        for tier, priority in enumerate(sorted(boosted)):
+            yield tier, f"P{priority}", boosted[priority]
+
+    async def _get_queued_candidate_issues(
+        self, snapshot: _IssueSnapshot, priority_label: str, role_labels: list[str]
+    ) -> list[dict[str, Any]] | None:
+        """スナップショットに保持した候補Issueを返します。保持していなければ読み込みます。"""
+        queue_key = (priority_label, tuple(role_labels))
+        queued_issues = snapshot.candidates_by_queue.get(queue_key)
+        if queued_issues is None:
+            queued_issues = await self._load_queued_candidate_issues(
+                priority_label, role_labels
+            )
+            if queued_issues is None:
+                return None
+            snapshot.candidates_by_queue[queue_key] = queued_issues
+        return queued_issues
+
+    async def _get_issue_snapshot(self) -> _IssueSnapshot:
+        """
+        Issueキャッシュの世代番号を確認し、前回のリクエストから変わっていなければ
+        プロセス内に保持している内容を返します。変わっていた場合は、空のスナップショットに
+        置き換え、必要になった内容から読み込み直します。
+
+        世代番号がない（一度も同期していない）場合は、保持せずに毎回読み込みます。
+        保持したIssueはリクエスト間で共有されるため、呼び出し元で変更しないでください。
+        """
+        generation = await self._call_redis("get_cache_generation")
+        snapshot = self._issue_snapshot
+        if (
+            generation is not None
+            and snapshot is not None
+            and snapshot.generation == generation
+        ):
+            return snapshot
+
+        snapshot = _IssueSnapshot(
+            generation=generation if generation is not None else -1
+        )
+        self._issue_snapshot = snapshot if generation is not None else None
+        return snapshot
+
+    async def _load_candidate_priorities(self, role_labels: list[str]) -> list[str]:
+        """
+        指定した役割のタスク候補が存在する優先度ラベルを、優先度の高い順に取得します。
+        """
+        priorities = await self._call_redis("get_candidate_priorities", role_labels)
+        return sorted(
+            (
+                label
+                for label in priorities
+                if self._get_priority_from_label(label) is not None
+            ),
+            key=lambda label: int(label[1:]),
+        )
+
+    async def _load_queued_candidate_issues(
+        self, priority_label: str, role_labels: list[str]
+    ) -> list[dict[str, Any]] | None:
+        """
+        同期時に構築された役割・優先度ごとの候補キューから、
+        指定した役割・優先度のタスク候補のIssueを取得します。
+
+        Returns:
+            list[dict[str, Any]] | None: 候補Issueのリスト。キャッシュが破損している場合はNone。
+        """
+        candidate_ids = await self._call_redis(
+            "get_candidate_issue_ids", priority_label, role_labels
+        )
+        if not candidate_ids:
+            return []
+
+        issue_keys = [f"issue:{issue_id}" for issue_id in candidate_ids]
+        cached_issues_json = await self._call_redis("get_values", issue_keys)
         try:
-            all_issues = [
+            return [
                 json.loads(issue_json)
                 for issue_json in cached_issues_json
                 if issue_json is not None
@@ -574,38 +1377,6 @@ class TaskService:
             )
             return None
 
-        all_labels = [
-            label["name"]
-            for issue in all_issues
-            for label in issue.get("labels", [])
-        ]
-        highest_priority_label = self.get_highest_priority_label(all_labels)
-
-        if not highest_priority_label:
-            logger.info("オープンなIssueに優先度ラベルが見つかりませんでした。割り当てるタスクはありません。")
-            return None
-
-        candidate_issues = self._find_candidates_for_any_role(
-            all_issues, highest_priority_label
-        )
-
-        if candidate_issues:
-            logger.info(
-                "最高優先度ラベル '%s' を持つタスク候補が %d 件見つかりました。",
-                highest_priority_label,
-                len(candidate_issues),
-            )
-            task = await self._find_first_assignable_task(candidate_issues, agent_id)
-            if task:
-                return task
-        else:
-            logger.info(
-                "最高優先度ラベル '%s' を持つ割り当て可能なタスク候補は見つかりませんでした。",
-                highest_priority_label,
-            )
-
-        return None
-
     def create_task_candidate(self, issue_id: int, agent_id: str):
         """TaskCandidateを作成し、Redisに保存します。"""
         task_candidate = TaskCandidate(issue_id=issue_id, agent_id=agent_id)
@@ -6,6 +6,16 @@ from pydantic import BaseModel, Field
 class AgentDefinition(BaseModel):
     role: str = Field(..., description="The role of the agent.")
     persona: str = Field(..., description="The persona of the agent.")
+    weight: float = Field(
+        1.0,
+        gt=0,
+        description="Relative share of tasks under weighted fair scheduling.",
+    )
+    max_concurrent_tasks: int | None = Field(
+        None,
+        ge=1,
+        description="Maximum number of in-progress tasks for this role.",
+    )
     # Eventually, we can add more fields here, like the tools available to the agent.
 
 
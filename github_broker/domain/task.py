@@ -1,6 +1,7 @@
 import re
 from dataclasses import dataclass
 from enum import Enum
+from typing import Any
 
 
 class TaskCandidateStatus(Enum):
@@ -18,6 +19,37 @@ class Task:
     html_url: str
     labels: list[str]
 
+    @classmethod
+    def from_issue(cls, issue: dict[str, Any]) -> "Task":
+        """キャッシュ済みのIssue辞書からTaskを作成します。"""
+        return cls(
+            issue_id=issue["number"],
+            title=issue.get("title") or "",
+            body=issue.get("body") or "",
+            html_url=issue.get("html_url") or "",
+            labels=[label["name"] for label in issue.get("labels", [])],
+        )
+
+    def get_priority(self) -> int | None:
+        """優先度ラベル (P0, P1, ...) のうち最も高い優先度の数値を返します。ない場合はNone。"""
+        priorities = [
+            int(label[1:])
+            for label in self.labels
+            if label.startswith("P") and label[1:].isdigit()
+        ]
+        return min(priorities, default=None)
+
+    def precompute(self) -> dict[str, Any]:
+        """
+        割り当て時に必要な、本文とラベルから導出される値をまとめて計算します。
+        Issueをキャッシュに取り込む際に一度だけ計算し、Issueと一緒に保存するために使用します。
+        """
+        return {
+            "assignable": self.is_assignable(),
+            "branch_name": self.extract_branch_name(),
+            "priority": self.get_priority(),
+        }
+
     def is_assignable(self) -> bool:
         """Issueの本文に「## 成果物」セクションが存在するかどうかを判定します。"""
         if self.body:
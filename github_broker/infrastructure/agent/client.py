@@ -5,6 +5,10 @@ from typing import Any
 
 import requests
 
+# ロングポーリングの待機時間に加えて、タスク割り当て処理に許容する秒数
+REQUEST_TIMEOUT_MARGIN_SECONDS = 30
+HEARTBEAT_TIMEOUT_SECONDS = 10
+
 
 class AgentClient:
     """
@@ -16,6 +20,7 @@ class AgentClient:
         agent_id: str,
         host: str = "localhost",
         port: int | None = None,
+        roles: list[str] | None = None,
     ):
         """
         AgentClientを初期化します。
@@ -24,25 +29,41 @@ class AgentClient:
             agent_id (str): エージェントの一意な識別子。
             host (str): サーバーのホスト名。デフォルトは"localhost"。
             port (Optional[int]): サーバーのポート。デフォルトはAPP_PORT環境変数または8080。
+            roles (Optional[list[str]]): エージェントが担当できる役割ラベル。
+                指定した場合、その役割のタスクのみが割り当てられます。
         """
         self.agent_id = agent_id
+        self.roles = roles
         self.host = host
         self.port = port if port is not None else int(os.getenv("BROKER_PORT", 8080))
         self.endpoint = "/request-task"
         self.headers = {"Content-Type": "application/json"}
 
-    def request_task(self) -> dict[str, Any] | None:
+    def request_task(self, wait_seconds: int = 0) -> dict[str, Any] | None:
         """
         GitHubタスクブローカーサーバーに新しいタスクをリクエストします。
         これは、以前のタスクが完了したことをサーバーに暗黙的に通知します。
 
+        Args:
+            wait_seconds (int): 利用可能なタスクがない場合に、サーバー側でタスクの出現を
+                待機する最大秒数（ロングポーリング）。0の場合は待機しません。
+
         Returns:
             Optional[Dict[str, Any]]: 割り当てられたタスク情報、または利用可能なタスクがない場合はNone。
         """
-        payload = {"agent_id": self.agent_id}
+        payload: dict[str, Any] = {"agent_id": self.agent_id}
+        if self.roles:
+            payload["roles"] = self.roles
+        if wait_seconds:
+            payload["wait_seconds"] = wait_seconds
         url = f"http://{self.host}:{self.port}{self.endpoint}"
         try:
-            response = requests.post(url, json=payload, headers=self.headers)
+            response = requests.post(
+                url,
+                json=payload,
+                headers=self.headers,
+                timeout=wait_seconds + REQUEST_TIMEOUT_MARGIN_SECONDS,
+            )
 
             logging.info(f"Server response: {response.status_code} {response.reason}")
 
@@ -61,3 +82,38 @@ class AgentClient:
         except requests.exceptions.RequestException as e:
             logging.error(f"Error connecting to the server at {url}: {e}")
             return None
+
+    def send_heartbeat(self, issue_id: int, fencing_token: int) -> bool:
+        """
+        作業中のIssueのリースを延長するよう、サーバーにハートビートを送信します。
+
+        Args:
+            issue_id (int): 作業中のIssue番号。
+            fencing_token (int): タスク割り当て時に受け取ったフェンシングトークン。
+
+        Returns:
+            bool: リースが延長された場合、または一時的にサーバーと通信できない場合はTrue。
+                リースが失効して他のエージェントに割り当て直された場合はFalse。
+        """
+        payload = {
+            "agent_id": self.agent_id,
+            "issue_id": issue_id,
+            "fencing_token": fencing_token,
+        }
+        url = f"http://{self.host}:{self.port}/heartbeat"
+        try:
+            response = requests.post(
+                url,
+                json=payload,
+                headers=self.headers,
+                timeout=HEARTBEAT_TIMEOUT_SECONDS,
+            )
+            if response.status_code == 409:
+                logging.warning(f"Lease for issue #{issue_id} has been lost.")
+                return False
+            response.raise_for_status()
+            return True
+        except requests.exceptions.RequestException as e:
+            # 通信エラーは次のハートビートで再試行する
+            logging.error(f"Error sending heartbeat to the server at {url}: {e}")
+            return True
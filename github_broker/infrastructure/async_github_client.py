@@ -0,0 +1,178 @@
+import asyncio
+import logging
+from typing import Any
+from urllib.parse import quote
+
+import httpx
+from github import GithubException
+
+from github_broker.infrastructure.github_client import PullRequestRef
+from github_broker.infrastructure.rate_limit_budget import RateLimitBudget
+
+logger = logging.getLogger(__name__)
+
+GITHUB_API_BASE_URL = "https://api.github.com"
+DEFAULT_MAX_CONCURRENT_REQUESTS = 10
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+
+class AsyncGitHubClient:
+    """
+    GitHub REST APIと非同期に対話するためのクライアント。
+
+    `GitHubClient` のうち、タスク割り当てのリクエスト経路で使用される操作を
+    `asyncio` ネイティブに提供します。HTTP/2対応のコネクションプールを共有し、
+    同時リクエスト数はセマフォで制限されます。
+    応答ヘッダーのレート制限の残量は `rate_limit_budget` に記録されます。
+    エラー時は `GitHubClient` と同様に `GithubException` を送出します。
+    """
+
+    def __init__(
+        self,
+        github_repository: str,
+        github_token: str,
+        max_concurrent_requests: int = DEFAULT_MAX_CONCURRENT_REQUESTS,
+        http_client: httpx.AsyncClient | None = None,
+        rate_limit_budget: RateLimitBudget | None = None,
+    ):
+        self._repo_name = github_repository
+        self.rate_limit_budget = rate_limit_budget or RateLimitBudget()
+        self._semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self._client = http_client or httpx.AsyncClient(
+            base_url=GITHUB_API_BASE_URL,
+            headers={
+                "Authorization": f"Bearer {github_token}",
+                "Accept": "application/vnd.github+json",
+                "X-GitHub-Api-Version": "2022-11-28",
+            },
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=max_concurrent_requests,
+                max_keepalive_connections=max_concurrent_requests,
+            ),
+            timeout=DEFAULT_TIMEOUT_SECONDS,
+        )
+
+    async def aclose(self) -> None:
+        """コネクションプールを閉じます。"""
+        await self._client.aclose()
+
+    async def _request(self, method: str, path: str, **kwargs: Any) -> httpx.Response:
+        """
+        同時実行数を制限してリクエストを送信します。
+        4xx/5xxの応答は `GithubException` に変換されます。
+        """
+        async with self._semaphore:
+            response = await self._client.request(method, path, **kwargs)
+        self.rate_limit_budget.record_headers(response.headers)
+        if response.is_error:
+            try:
+                data: Any = response.json()
+            except ValueError:
+                data = {"message": response.text}
+            raise GithubException(
+                response.status_code, data=data, headers=dict(response.headers)
+            )
+        return response
+
+    async def remove_label(self, issue_id: int, label: str) -> bool:
+        """
+        特定のIssueからラベルを削除します。
+        Issueにラベルが存在しない場合、警告をログに記録しますが、エラーは発生させません。
+        """
+        try:
+            await self._request(
+                "DELETE",
+                f"/repos/{self._repo_name}/issues/{issue_id}/labels/{quote(label, safe='')}",
+            )
+            logger.info(
+                f"Issue #{issue_id} からラベル '{label}' を正常に削除しました。"
+            )
+            return True
+        except GithubException as e:
+            if e.status == 404:
+                logger.warning(
+                    f"削除中にIssue #{issue_id} にラベル '{label}' が見つかりませんでした。これは致命的なエラーではないため、続行します。"
+                )
+                return True
+            logger.error(
+                f"リポジトリ {self._repo_name} のIssue #{issue_id} からラベルを削除中にエラーが発生しました: {e}"
+            )
+            raise
+
+    async def apply_label_delta(
+        self,
+        issue_id: int,
+        add_labels: list[str] | None = None,
+        remove_labels: list[str] | None = None,
+    ) -> bool:
+        """
+        Issueのラベルに差分のみを適用します。
+        削除はラベルごとのDELETE、追加は1回のPOSTで行います。1回で書き換えるには
+        ラベル全体の置き換えが必要になり、その間に人間などが付与したラベルを上書きしてしまうため、
+        行いません。詳細は `GitHubClient.apply_label_delta` を参照してください。
+        """
+        try:
+            for label_name in remove_labels or []:
+                await self.remove_label(issue_id, label_name)
+            if add_labels:
+                await self._request(
+                    "POST",
+                    f"/repos/{self._repo_name}/issues/{issue_id}/labels",
+                    json={"labels": add_labels},
+                )
+            logger.info(
+                f"Issue #{issue_id} のラベルを更新しました（追加: {add_labels or []}, 削除: {remove_labels or []}）。"
+            )
+            return True
+        except GithubException as e:
+            logger.error(
+                f"リポジトリ {self._repo_name} のIssue #{issue_id} のラベル更新中にエラーが発生しました: {e}"
+            )
+            raise
+
+    async def create_branch(self, branch_name: str, base_branch: str = "main") -> bool:
+        """
+        ベースブランチから新しいブランチを作成します。
+        """
+        try:
+            response = await self._request(
+                "GET",
+                f"/repos/{self._repo_name}/git/ref/heads/{quote(base_branch, safe='/')}",
+            )
+            sha = response.json()["object"]["sha"]
+            await self._request(
+                "POST",
+                f"/repos/{self._repo_name}/git/refs",
+                json={"ref": f"refs/heads/{branch_name}", "sha": sha},
+            )
+            return True
+        except GithubException as e:
+            if e.status == 422 and "Reference already exists" in str(e.data):
+                logger.warning(
+                    f"リポジトリ {self._repo_name} にブランチ '{branch_name}' は既に存在します。続行します。"
+                )
+                return True
+            logger.error(
+                f"リポジトリ {self._repo_name} にブランチ {branch_name} を作成中にエラーが発生しました: {e}"
+            )
+            raise
+
+    async def get_pr_for_issue(self, issue_number: int) -> PullRequestRef | None:
+        """
+        Issue番号に紐づくPull Requestを取得します。
+        """
+        try:
+            query = f"repo:{self._repo_name} is:pr is:open in:title,body,comments #{issue_number}"
+            response = await self._request(
+                "GET", "/search/issues", params={"q": query, "per_page": 1}
+            )
+            items = response.json().get("items", [])
+            if not items:
+                return None
+            return PullRequestRef(number=items[0]["number"], html_url=items[0]["html_url"])
+        except GithubException as e:
+            logger.error(
+                f"Error getting PR for issue {issue_number} in repo {self._repo_name}: {e}"
+            )
+            raise
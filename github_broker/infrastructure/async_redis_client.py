@@ -0,0 +1,354 @@
+import time
+
+import redis.asyncio as aioredis
+
+from github_broker.infrastructure.redis_client import (
+    CANDIDATE_QUEUES_KEY,
+    CLAIM_ISSUE_SCRIPT,
+    CLAIM_OUTBOX_ENTRY_SCRIPT,
+    COMPARE_AND_DELETE_SCRIPT,
+    DEFAULT_LEASE_TTL_SECONDS,
+    GITHUB_OUTBOX_INFLIGHT_KEY,
+    GITHUB_OUTBOX_PENDING_KEY,
+    ISSUE_CACHE_GENERATION_KEY,
+    RELEASE_ISSUE_CLAIM_SCRIPT,
+    RENEW_ISSUE_LEASE_SCRIPT,
+    RETRY_OUTBOX_ENTRY_SCRIPT,
+    REVIEW_DETECTED_KEY,
+    REVIEW_TIMEOUT_FIRED_SCORE,
+    REVIEW_TIMEOUTS_KEY,
+    GitHubOutboxEntry,
+    IssueClaim,
+    RedisKeyspace,
+)
+
+DEFAULT_MAX_CONNECTIONS = 50
+# プールの接続がすべて使用中の場合に、空くまで待つ最大秒数
+DEFAULT_POOL_TIMEOUT_SECONDS = 5
+DEFAULT_SOCKET_TIMEOUT_SECONDS = 5
+DEFAULT_HEALTH_CHECK_INTERVAL_SECONDS = 30
+
+
+def create_async_redis(
+    redis_url: str, max_connections: int = DEFAULT_MAX_CONNECTIONS
+) -> aioredis.Redis:
+    """
+    リクエスト経路で共有する `redis.asyncio` クライアントを生成します。
+
+    接続は上限付きのプールで共有され、上限に達した場合はエラーにせず空くまで待ちます。
+    `hiredis` がインストールされている場合、応答の解析には自動的にhiredisのパーサーが使用されます。
+    """
+    pool = aioredis.BlockingConnectionPool.from_url(
+        redis_url,
+        decode_responses=True,
+        max_connections=max_connections,
+        timeout=DEFAULT_POOL_TIMEOUT_SECONDS,
+        socket_timeout=DEFAULT_SOCKET_TIMEOUT_SECONDS,
+        socket_keepalive=True,
+        health_check_interval=DEFAULT_HEALTH_CHECK_INTERVAL_SECONDS,
+    )
+    return aioredis.Redis(connection_pool=pool)
+
+
+class AsyncRedisClient(RedisKeyspace):
+    """
+    Redisと非同期に対話するためのクライアント。
+
+    `RedisClient` のうち、タスク割り当てのリクエスト経路とGitHubアウトボックスの
+    ワーカーで使用される操作を `redis.asyncio` ネイティブに提供します。
+    キー名とサーバーサイドスクリプトは `RedisClient` と共通です。
+    """
+
+    def __init__(self, redis: aioredis.Redis, owner: str, repo_name: str):
+        super().__init__(owner, repo_name)
+        self.client = redis
+        self._claim_issue_script = redis.register_script(CLAIM_ISSUE_SCRIPT)
+        self._release_issue_claim_script = redis.register_script(
+            RELEASE_ISSUE_CLAIM_SCRIPT
+        )
+        self._renew_issue_lease_script = redis.register_script(
+            RENEW_ISSUE_LEASE_SCRIPT
+        )
+        self._compare_and_delete_script = redis.register_script(
+            COMPARE_AND_DELETE_SCRIPT
+        )
+        self._claim_outbox_entry_script = redis.register_script(
+            CLAIM_OUTBOX_ENTRY_SCRIPT
+        )
+        self._retry_outbox_entry_script = redis.register_script(
+            RETRY_OUTBOX_ENTRY_SCRIPT
+        )
+
+    async def aclose(self) -> None:
+        """コネクションプールを閉じます。"""
+        await self.client.aclose()
+
+    async def get_value(self, key: str) -> str | None:
+        """
+        Redisから値を取得します。
+        """
+        return await self.client.get(self._get_prefixed_key(key))
+
+    async def get_value_with_ttl(self, key: str) -> tuple[str | None, int]:
+        """
+        Redisから値と残りの有効期間（秒）を1回の往復で取得します。
+        有効期限がない場合の残り時間は-1、キーが存在しない場合は-2です。
+        """
+        prefixed_key = self._get_prefixed_key(key)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(prefixed_key)
+        pipe.ttl(prefixed_key)
+        value, remaining_ttl = await pipe.execute()
+        return value, remaining_ttl
+
+    async def set_value(self, key: str, value: str, timeout: int | None = 600) -> None:
+        """
+        Redisに値を設定します。
+        timeoutにNoneを指定した場合、キーは失効しません。
+        """
+        await self.client.set(self._get_prefixed_key(key), value, ex=timeout)
+
+    async def get_values(self, keys: list[str]) -> list[str | None]:
+        """
+        複数のキーの値を取得します。
+        存在しないキーに対応する値はNoneになります。
+        キーにはプレフィックスを付けないでください。
+        """
+        if not keys:
+            return []
+        return await self.client.mget([self._get_prefixed_key(key) for key in keys])
+
+    async def get_cache_generation(self) -> int | None:
+        """
+        Issueキャッシュの世代番号を取得します。
+        詳細は `RedisClient.get_cache_generation` を参照してください。
+        """
+        value = await self.get_value(ISSUE_CACHE_GENERATION_KEY)
+        return int(value) if value is not None else None
+
+    async def get_ready_review_issue_ids(self, detected_before: float) -> set[int]:
+        """`detected_before`（UNIX時間）以前に検出されたレビューIssueの番号を取得します。"""
+        members = await self.client.zrangebyscore(
+            self._get_prefixed_key(REVIEW_DETECTED_KEY), "-inf", detected_before
+        )
+        return {int(member) for member in members}
+
+    async def get_next_review_timeout(self) -> float | None:
+        """まだ発火していない、最も早いレビュータイムアウトの予定時刻を取得します。"""
+        entries = await self.client.zrangebyscore(
+            self._get_prefixed_key(REVIEW_TIMEOUTS_KEY),
+            "-inf",
+            "(+inf",
+            start=0,
+            num=1,
+            withscores=True,
+        )
+        return entries[0][1] if entries else None
+
+    async def get_due_review_timeouts(self, now: float, limit: int) -> list[int]:
+        """予定時刻を過ぎた、まだ発火していないPR番号を古い順に最大 `limit` 件取得します。"""
+        members = await self.client.zrangebyscore(
+            self._get_prefixed_key(REVIEW_TIMEOUTS_KEY), "-inf", now, start=0, num=limit
+        )
+        return [int(member) for member in members]
+
+    async def mark_review_timeouts_fired(self, pr_numbers: list[int]) -> None:
+        """PRのレビュータイムアウトを発火済みにします。"""
+        if pr_numbers:
+            await self.client.zadd(
+                self._get_prefixed_key(REVIEW_TIMEOUTS_KEY),
+                {pr_number: REVIEW_TIMEOUT_FIRED_SCORE for pr_number in pr_numbers},
+                xx=True,
+            )
+
+    async def get_candidate_priorities(self, role_labels: list[str]) -> set[str]:
+        """
+        いずれかの役割のタスク候補が1件以上ある優先度ラベルを取得します。
+        """
+        if not role_labels:
+            return set()
+        queue_names = await self.client.smembers(
+            self._get_prefixed_key(CANDIDATE_QUEUES_KEY)
+        )
+        return self._parse_candidate_priorities(queue_names, role_labels)
+
+    async def get_candidate_issue_ids(
+        self, priority: str, role_labels: list[str]
+    ) -> list[int]:
+        """
+        指定した優先度の候補キューから、いずれかの役割のタスク候補のIssue番号を
+        1回の往復で取得します。
+
+        Returns:
+            list[int]: Issue番号の昇順のリスト。
+        """
+        if not role_labels:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for role in role_labels:
+            pipe.zrange(
+                self._get_prefixed_key(self._get_candidate_queue_name(role, priority)),
+                0,
+                -1,
+            )
+        return sorted(
+            {int(member) for members in await pipe.execute() for member in members}
+        )
+
+    async def claim_issue(
+        self,
+        issue_id: int,
+        agent_id: str,
+        excluded_labels: list[str] | None = None,
+        lease_ttl: int = DEFAULT_LEASE_TTL_SECONDS,
+        claimed_label: str | None = None,
+        candidate_queues: list[tuple[str, str]] | None = None,
+    ) -> IssueClaim:
+        """
+        Issueのリースを取得し、エージェントへの割り当てに必要なRedis側の処理を
+        1回の往復でアトミックに行います。詳細は `RedisClient.claim_issue` を参照してください。
+        """
+        keys, args = self._build_claim_issue_call(
+            issue_id,
+            agent_id,
+            excluded_labels,
+            lease_ttl,
+            claimed_label,
+            candidate_queues,
+        )
+        return self._parse_issue_claim(
+            await self._claim_issue_script(keys=keys, args=args)
+        )
+
+    async def renew_issue_lease(
+        self,
+        issue_id: int,
+        agent_id: str,
+        fencing_token: int,
+        lease_ttl: int = DEFAULT_LEASE_TTL_SECONDS,
+    ) -> bool:
+        """
+        Issueのリースの有効期限を `lease_ttl` 秒に延長します。
+        """
+        keys = [self._get_prefixed_key(f"issue_lock_{issue_id}")]
+        args = [self._get_lease_owner(agent_id, fencing_token), lease_ttl]
+        return bool(await self._renew_issue_lease_script(keys=keys, args=args))
+
+    async def release_issue_claim(
+        self,
+        issue_id: int,
+        agent_id: str,
+        fencing_token: int,
+        claimed_label: str | None = None,
+        candidate_queues: list[tuple[str, str]] | None = None,
+    ) -> bool:
+        """
+        `claim_issue` で取得したリースと現在のタスクの記録を1回の往復で取り消します。
+        詳細は `RedisClient.release_issue_claim` を参照してください。
+        """
+        keys, args = self._build_release_issue_claim_call(
+            issue_id, agent_id, fencing_token, claimed_label, candidate_queues
+        )
+        return bool(await self._release_issue_claim_script(keys=keys, args=args))
+
+    async def get_agent_current_task(self, agent_id: str) -> int | None:
+        """エージェントに割り当てられ、まだ完了していないIssue番号を取得します。"""
+        value = await self.client.get(self._get_agent_current_task_key(agent_id))
+        return int(value) if value is not None else None
+
+    async def clear_agent_current_task(self, agent_id: str, issue_id: int) -> bool:
+        """
+        エージェントの現在のタスクの記録が `issue_id` である場合のみ削除します。
+        """
+        deleted = await self._compare_and_delete_script(
+            keys=[self._get_agent_current_task_key(agent_id)], args=[issue_id]
+        )
+        return deleted > 0
+
+    async def enqueue_github_changes(
+        self,
+        issue_id: int,
+        add_labels: list[str] | None = None,
+        remove_labels: list[str] | None = None,
+        branch_names: list[str] | None = None,
+    ) -> None:
+        """
+        GitHubに反映するIssueの変更をアウトボックスに記録します。
+        詳細は `RedisClient.enqueue_github_changes` を参照してください。
+        """
+        fields = self._build_outbox_fields(add_labels, remove_labels, branch_names)
+        if not fields:
+            return
+        pending_key, entry_key, *_ = self._get_outbox_keys(issue_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(entry_key, mapping=fields)
+        pipe.zadd(pending_key, {issue_id: time.time()}, nx=True)
+        await pipe.execute()
+
+    async def get_due_outbox_issue_ids(self, limit: int) -> list[int]:
+        """反映時刻を過ぎたアウトボックスのIssue番号を、古い順に最大 `limit` 件取得します。"""
+        members = await self.client.zrangebyscore(
+            self._get_prefixed_key(GITHUB_OUTBOX_PENDING_KEY),
+            "-inf",
+            time.time(),
+            start=0,
+            num=limit,
+        )
+        return [int(member) for member in members]
+
+    async def claim_outbox_entry(self, issue_id: int) -> GitHubOutboxEntry | None:
+        """
+        Issueのアウトボックスの変更を取り出し、処理中に移します。
+        変更がない、または処理中の場合はNoneを返します。
+        """
+        values = await self._claim_outbox_entry_script(
+            keys=self._get_outbox_keys(issue_id)[:4], args=[issue_id]
+        )
+        return self._parse_outbox_entry(issue_id, values)
+
+    async def ack_outbox_entry(self, issue_id: int) -> None:
+        """反映が完了した処理中の変更を削除します。"""
+        _, _, inflight_entry_key, inflight_key, attempts_key = self._get_outbox_keys(
+            issue_id
+        )
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(inflight_entry_key)
+        pipe.srem(inflight_key, issue_id)
+        pipe.hdel(attempts_key, str(issue_id))
+        await pipe.execute()
+
+    async def retry_outbox_entry(
+        self,
+        issue_id: int,
+        base_delay: float,
+        max_delay: float,
+        max_attempts: int,
+        error: str,
+    ) -> int:
+        """
+        反映に失敗した処理中の変更をアウトボックスに戻し、指数バックオフで再試行を予約します。
+        失敗回数が `max_attempts` に達した変更はデッドレターに移します。
+
+        Returns:
+            int: これまでの失敗回数。
+        """
+        return int(
+            await self._retry_outbox_entry_script(
+                keys=self._get_outbox_retry_keys(issue_id),
+                args=[
+                    issue_id,
+                    time.time(),
+                    base_delay,
+                    max_delay,
+                    max_attempts,
+                    error,
+                ],
+            )
+        )
+
+    async def get_inflight_outbox_issue_ids(self) -> list[int]:
+        """処理中のまま残っているアウトボックスのIssue番号を取得します（プロセス停止からの復旧用）。"""
+        members = await self.client.smembers(
+            self._get_prefixed_key(GITHUB_OUTBOX_INFLIGHT_KEY)
+        )
+        return sorted(int(member) for member in members)
@@ -2,12 +2,76 @@ import asyncio
 import functools
 import json
 import logging
-from collections.abc import Callable
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_LOCAL_MAXSIZE = 256
 
-def cache_result(key_format: str, ttl: int):
+
+async def _call_redis(redis_client, method_name: str, *args, **kwargs):
+    """
+    Redisクライアントのメソッドを呼び出します。
+    `AsyncRedisClient` の場合は直接awaitし、同期の `RedisClient` の場合はスレッドプールで実行します。
+    """
+    method = getattr(redis_client, method_name)
+    if asyncio.iscoroutinefunction(method):
+        return await method(*args, **kwargs)
+    return await asyncio.to_thread(method, *args, **kwargs)
+
+
+@dataclass
+class _LocalEntry:
+    data: str
+    fresh_until: float
+    stale_until: float
+
+
+class _LocalCache:
+    """
+    プロセス内の、件数上限付きのLRUキャッシュ。
+    値は呼び出し元同士で共有されないよう、JSON文字列のまま保持します。
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, _LocalEntry] = OrderedDict()
+
+    def get(self, key: str, now: float) -> _LocalEntry | None:
+        """有効期限（古い値を返せる期間を含む）内のエントリを返します。"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if now >= entry.stale_until:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(
+        self, key: str, data: str, ttl: float, stale_ttl: float, now: float
+    ) -> None:
+        self._entries[key] = _LocalEntry(
+            data=data, fresh_until=now + ttl, stale_until=now + ttl + stale_ttl
+        )
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+def cache_result(
+    key_format: str,
+    ttl: int,
+    *,
+    local_ttl: float | None = None,
+    local_maxsize: int = DEFAULT_LOCAL_MAXSIZE,
+    stale_ttl: int = 0,
+    negative_ttl: int | None = None,
+    single_flight: bool = True,
+):
     """
     メソッドの結果をRedisにキャッシュするデコレータ。
 
@@ -17,14 +81,87 @@ def cache_result(key_format: str, ttl: int):
                        インスタンスの属性やメソッドの引数を波括弧で参照できます
                        (例: "github:repo:{self._repo_name}:pr:{0}")。
     :param ttl: キャッシュの有効期間（秒）。
+    :param local_ttl: 指定した場合、Redisの手前にプロセス内のLRUキャッシュを置き、
+                      この秒数の間はRedisへの往復なしで結果を返します。
+    :param local_maxsize: プロセス内キャッシュに保持する最大件数。
+    :param stale_ttl: 有効期限が切れた後も、この秒数の間は古い結果をすぐに返し、
+                      バックグラウンドで再取得します (stale-while-revalidate)。
+    :param negative_ttl: 空の結果（空のリスト・辞書やNone）の有効期間（秒）。
+                         Noneの場合は `ttl` と同じで、0の場合は空の結果をキャッシュしません。
+    :param single_flight: Trueの場合、同じキーのキャッシュミスは1つのコルーチンだけが
+                          関数を実行し、同時に待っている呼び出し元はその結果を共有します。
     """
     def decorator(func: Callable):
+        local_cache = _LocalCache(local_maxsize) if local_ttl is not None else None
+        in_flight: dict[str, asyncio.Future] = {}
+        background_refreshes: set[asyncio.Task] = set()
+
+        async def call_func(self, *args, **kwargs):
+            if asyncio.iscoroutinefunction(func):
+                return await func(self, *args, **kwargs)
+            return func(self, *args, **kwargs)
+
+        async def compute(self, key: str, args, kwargs) -> str:
+            """関数を実行し、結果をRedisとプロセス内キャッシュに保存します。"""
+            result = await call_func(self, *args, **kwargs)
+            data = json.dumps(result)
+            result_ttl = ttl if result or negative_ttl is None else negative_ttl
+            if result_ttl <= 0:
+                return data
+            await _call_redis(
+                self._redis_client,
+                "set_value",
+                key,
+                data,
+                timeout=result_ttl + stale_ttl,
+            )
+            logger.info(f"データをキャッシュに保存しました: {key} (TTL: {result_ttl}s)")
+            if local_cache is not None:
+                local_cache.set(
+                    key, data, min(local_ttl, result_ttl), stale_ttl, time.monotonic()
+                )
+            return data
+
+        def compute_once(self, key: str, args, kwargs) -> Awaitable[str]:
+            """同じキーの計算が実行中であればそれを共有し、なければ開始します。"""
+            if not single_flight:
+                return compute(self, key, args, kwargs)
+            future = in_flight.get(key)
+            if future is None:
+                future = asyncio.ensure_future(compute(self, key, args, kwargs))
+                in_flight[key] = future
+                future.add_done_callback(lambda _: in_flight.pop(key, None))
+            # 待っている呼び出し元がキャンセルされても、共有している計算は継続させる
+            return asyncio.shield(future)
+
+        def refresh_in_background(self, key: str, args, kwargs) -> None:
+            if single_flight and key in in_flight:
+                return
+            task = asyncio.ensure_future(compute_once(self, key, args, kwargs))
+            background_refreshes.add(task)
+
+            def on_done(done: asyncio.Future) -> None:
+                background_refreshes.discard(done)
+                if not done.cancelled() and done.exception() is not None:
+                    logger.warning(
+                        f"キャッシュのバックグラウンド更新に失敗しました: {key}, error: {done.exception()}"
+                    )
+
+            task.add_done_callback(on_done)
+
+        async def get_from_redis(self, key: str) -> tuple[str | None, bool]:
+            """Redisから値を取得し、値と、古い値 (stale) かどうかを返します。"""
+            if not stale_ttl:
+                return await _call_redis(self._redis_client, "get_value", key), False
+            data, remaining_ttl = await _call_redis(
+                self._redis_client, "get_value_with_ttl", key
+            )
+            return data, 0 <= remaining_ttl <= stale_ttl
+
         @functools.wraps(func)
         async def wrapper(self, *args, **kwargs):
             if not hasattr(self, '_redis_client') or not self._redis_client:
-                if asyncio.iscoroutinefunction(func):
-                    return await func(self, *args, **kwargs)
-                return func(self, *args, **kwargs)
+                return await call_func(self, *args, **kwargs)
 
             # キーをフォーマット
             try:
@@ -34,26 +171,31 @@ def cache_result(key_format: str, ttl: int):
             except (IndexError, KeyError) as e:
                 logger.warning(f"キャッシュキーのフォーマットに失敗しました: {key_format}, error: {e}")
                 # フォーマットに失敗した場合はキャッシュをバイパス
-                if asyncio.iscoroutinefunction(func):
-                    return await func(self, *args, **kwargs)
-                return func(self, *args, **kwargs)
+                return await call_func(self, *args, **kwargs)
 
-            # キャッシュを確認
-            cached_data = await asyncio.to_thread(self._redis_client.get_value, key)
+            # プロセス内キャッシュを確認
+            if local_cache is not None:
+                now = time.monotonic()
+                entry = local_cache.get(key, now)
+                if entry is not None:
+                    if now >= entry.fresh_until:
+                        refresh_in_background(self, key, args, kwargs)
+                    return json.loads(entry.data)
+
+            # Redisのキャッシュを確認
+            cached_data, is_stale = await get_from_redis(self, key)
             if cached_data:
                 logger.info(f"キャッシュからデータを取得しました: {key}")
+                if is_stale:
+                    refresh_in_background(self, key, args, kwargs)
+                elif local_cache is not None:
+                    local_cache.set(
+                        key, cached_data, local_ttl, stale_ttl, time.monotonic()
+                    )
                 return json.loads(cached_data)
 
             # キャッシュがない場合は関数を実行
-            if asyncio.iscoroutinefunction(func):
-                result = await func(self, *args, **kwargs)
-            else:
-                result = func(self, *args, **kwargs)
-
-            # 結果をキャッシュに保存
-            await asyncio.to_thread(self._redis_client.set_value, key, json.dumps(result), timeout=ttl)
-            logger.info(f"データをキャッシュに保存しました: {key} (TTL: {ttl}s)")
+            return json.loads(await compute_once(self, key, args, kwargs))
 
-            return result
         return wrapper
     return decorator
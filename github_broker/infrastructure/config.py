@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -15,7 +16,15 @@ class Settings(BaseSettings):
         ..., validation_alias="GITHUB_PERSONAL_ACCESS_TOKEN"
     )
     github_webhook_secret: str = Field(..., validation_alias="GITHUB_WEBHOOK_SECRET")
+    github_max_concurrent_requests: int = Field(
+        10, validation_alias="GITHUB_MAX_CONCURRENT_REQUESTS"
+    )
     redis_url: str = Field("redis://localhost:6379", validation_alias="REDIS_URL")
+    redis_max_connections: int = Field(50, validation_alias="REDIS_MAX_CONNECTIONS")
+    task_scheduler: Literal["priority", "weighted_fair"] = Field(
+        "priority", validation_alias="TASK_SCHEDULER"
+    )
+    task_age_boost_seconds: int = Field(0, validation_alias="TASK_AGE_BOOST_SECONDS")
     google_api_key: str = Field(..., validation_alias="GOOGLE_API_KEY")
     github_agent_repository: str = Field(
         "gemini-code-assist/gemini-code-assist",
@@ -4,13 +4,24 @@ from typing import cast
 
 import punq
 import redis
+import redis.asyncio as aioredis
 
+from github_broker.application.task_scheduler import (
+    TaskScheduler,
+    WeightedFairTaskScheduler,
+)
 from github_broker.application.task_service import TaskService
 from github_broker.domain.agent_config import AgentConfigList
 from github_broker.infrastructure.agent.loader import AgentConfigLoader
+from github_broker.infrastructure.async_github_client import AsyncGitHubClient
+from github_broker.infrastructure.async_redis_client import (
+    AsyncRedisClient,
+    create_async_redis,
+)
 from github_broker.infrastructure.config import Settings, get_settings
 from github_broker.infrastructure.github_client import GitHubClient
 from github_broker.infrastructure.redis_client import RedisClient
+from github_broker.infrastructure.task_notifier import TaskAvailabilityNotifier
 
 
 def create_container(settings: Settings | None = None) -> punq.Container:
@@ -25,30 +36,76 @@ def create_container(settings: Settings | None = None) -> punq.Container:
         ) from None
 
     # Create clients with correct arguments
+    async_redis_client = AsyncRedisClient(
+        redis=create_async_redis(s.redis_url, max_connections=s.redis_max_connections),
+        owner=owner,
+        repo_name=repo_name,
+    )
     github_client = GitHubClient(
         github_repository=s.github_agent_repository,
         github_token=s.github_personal_access_token,
+        redis_client=async_redis_client,
+    )
+    async_github_client = AsyncGitHubClient(
+        github_repository=s.github_agent_repository,
+        github_token=s.github_personal_access_token,
+        max_concurrent_requests=s.github_max_concurrent_requests,
+        rate_limit_budget=github_client.rate_limit_budget,
     )
     redis_instance = redis.from_url(s.redis_url, decode_responses=True)
     redis_client = RedisClient(redis=redis_instance, owner=owner, repo_name=repo_name)
+    task_notifier = TaskAvailabilityNotifier(
+        redis=aioredis.from_url(s.redis_url, decode_responses=True),
+        channel=redis_client.task_available_channel,
+    )
 
     # Load agent configurations
     agent_config_loader = AgentConfigLoader()
     agent_definitions = agent_config_loader.load_from_file(s.github_agent_config_file)
 
+    task_scheduler = create_task_scheduler(s, agent_definitions)
+
     # Build container
     container = punq.Container()
     container.register(Settings, instance=s)
     container.register(GitHubClient, instance=github_client)
+    container.register(AsyncGitHubClient, instance=async_github_client)
     container.register(RedisClient, instance=redis_client)
+    container.register(AsyncRedisClient, instance=async_redis_client)
+    container.register(TaskAvailabilityNotifier, instance=task_notifier)
     container.register(AgentConfigLoader, instance=agent_config_loader)
     container.register(AgentConfigList, instance=cast(AgentConfigList, agent_definitions))
+    container.register(TaskScheduler, instance=task_scheduler)
     container.register(
         TaskService,
         factory=lambda: TaskService(
             github_client=container.resolve(GitHubClient),
             redis_client=container.resolve(RedisClient),
             agent_configs=container.resolve(AgentConfigList),
+            async_github_client=container.resolve(AsyncGitHubClient),
+            task_notifier=container.resolve(TaskAvailabilityNotifier),
+            async_redis_client=container.resolve(AsyncRedisClient),
+            task_scheduler=container.resolve(TaskScheduler),
         ),
+        # Issueのスナップショットなどプロセス内の状態をリクエスト間で共有するため、1つだけ生成する
+        scope=punq.Scope.singleton,
     )
     return container
+
+
+def create_task_scheduler(
+    settings: Settings, agent_configs: AgentConfigList
+) -> TaskScheduler:
+    """設定に応じて、タスク候補を割り当てる順序を決めるスケジューラを生成します。"""
+    if settings.task_scheduler == "priority":
+        return TaskScheduler()
+    agents = agent_configs.get_all()
+    return WeightedFairTaskScheduler(
+        role_weights={agent.role: agent.weight for agent in agents},
+        max_concurrent_tasks={
+            agent.role: agent.max_concurrent_tasks
+            for agent in agents
+            if agent.max_concurrent_tasks is not None
+        },
+        age_boost_seconds=settings.task_age_boost_seconds or None,
+    )
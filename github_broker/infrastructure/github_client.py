@@ -1,15 +1,96 @@
 import asyncio
 import logging
+import time
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from typing import Any
 
 from github import Github, GithubException
 from github.PullRequest import PullRequest
+from github.Repository import Repository
 
+from github_broker.infrastructure.async_redis_client import AsyncRedisClient
 from github_broker.infrastructure.cache_decorator import cache_result
+from github_broker.infrastructure.rate_limit_budget import (
+    RATE_LIMIT_RESOURCES,
+    RateLimitBudget,
+)
 from github_broker.infrastructure.redis_client import RedisClient
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_CACHE_TTL_SECONDS = 300
+NEGATIVE_CACHE_TTL_SECONDS = 30
+REPOSITORY_HANDLE_TTL_SECONDS = 60 * 60
+GRAPHQL_PAGE_SIZE = 100
+
+# Issueキャッシュに必要なフィールドと、Issueをクローズする紐づいたPRをまとめて取得する
+ISSUE_FIELDS_FRAGMENT = """
+fragment IssueFields on Issue {
+  number
+  title
+  body
+  url
+  state
+  createdAt
+  updatedAt
+  labels(first: 50) { nodes { name } }
+  closedByPullRequestsReferences(first: 10, includeClosedPrs: false) {
+    nodes { number url createdAt }
+  }
+}
+"""
+
+OPEN_ISSUES_QUERY = (
+    ISSUE_FIELDS_FRAGMENT
+    + """
+query($owner: String!, $name: String!, $first: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    issues(states: OPEN, first: $first, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { ...IssueFields }
+    }
+  }
+}
+"""
+)
+
+SEARCH_ISSUES_QUERY = (
+    ISSUE_FIELDS_FRAGMENT
+    + """
+query($query: String!, $first: Int!, $cursor: String) {
+  search(query: $query, type: ISSUE, first: $first, after: $cursor) {
+    pageInfo { hasNextPage endCursor }
+    nodes { ...IssueFields }
+  }
+}
+"""
+)
+
+SEARCH_PULL_REQUESTS_QUERY = """
+query($query: String!, $first: Int!, $cursor: String) {
+  search(query: $query, type: ISSUE, first: $first, after: $cursor) {
+    pageInfo { hasNextPage endCursor }
+    nodes { ... on PullRequest { number url createdAt } }
+  }
+}
+"""
+
+
+@dataclass(frozen=True)
+class PullRequestRef:
+    """Issueに紐づくPull Requestの最小限の情報。"""
+
+    number: int
+    html_url: str
+    created_at: datetime | None = None
+
+
+def _parse_github_datetime(value: str | None) -> datetime | None:
+    """GitHub APIのISO 8601形式の日時文字列をdatetimeに変換します。"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
 
 
 class GitHubClient:
@@ -21,11 +102,32 @@ class GitHubClient:
         self,
         github_repository: str,
         github_token: str,
-        redis_client: RedisClient | None = None,
+        redis_client: RedisClient | AsyncRedisClient | None = None,
+        rate_limit_budget: RateLimitBudget | None = None,
     ):
         self._repo_name = github_repository
         self._client = Github(github_token)
         self._redis_client = redis_client
+        self.rate_limit_budget = rate_limit_budget or RateLimitBudget()
+        self._repo: Repository | None = None
+        self._repo_loaded_at = 0.0
+
+    def _get_repo(self) -> Repository:
+        """
+        リポジトリハンドルを返します。
+
+        ハンドルは `lazy=True` で生成されるため、取得時にAPIは呼び出されません。
+        `REPOSITORY_HANDLE_TTL_SECONDS` ごとに作り直されます。
+        `repo.get_issue` も遅延オブジェクトを返すため、Issueの取得にAPI呼び出しは発生しません。
+        """
+        now = time.monotonic()
+        if (
+            self._repo is None
+            or now - self._repo_loaded_at >= REPOSITORY_HANDLE_TTL_SECONDS
+        ):
+            self._repo = self._client.get_repo(self._repo_name, lazy=True)
+            self._repo_loaded_at = now
+        return self._repo
 
     def get_open_issues(self):
         """
@@ -48,27 +150,124 @@ class GitHubClient:
             )
             raise
 
-    def get_review_issues(self):
+    def refresh_rate_limit_budget(self) -> dict[str, dict[str, Any]]:
         """
-        レビュータスクとして割り当てるべきIssueを取得します。
+        レート制限APIから各リソースの残量を取得し、`rate_limit_budget` を更新します。
+        レート制限APIの呼び出しは残量を消費しません。
 
-        検索クエリ: `is:issue label:needs-review linked:pr is:open`
-        - `is:issue`: Issueのみを対象とします。
-        - `label:needs-review`: `needs-review`ラベルが付与されているIssueのみを対象とします。
-        - `linked:pr`: 関連するPull Requestが存在するIssueのみを対象とします。
-        - `is:open`: オープンなIssueのみを対象とします。
+        Returns:
+            更新後の残量のスナップショット。取得に失敗した場合は前回の値のままです。
         """
         try:
-            query = (
-                f"repo:{self._repo_name} is:issue label:needs-review linked:pr is:open"
+            resources = self._client.get_rate_limit().resources
+            for name in RATE_LIMIT_RESOURCES:
+                rate = getattr(resources, name)
+                self.rate_limit_budget.record(
+                    name, rate.remaining, rate.limit, rate.reset
+                )
+        except GithubException as e:
+            logger.warning(f"レート制限の取得中にエラーが発生しました: {e}")
+        return self.rate_limit_budget.snapshot()
+
+    def _graphql_paginate(
+        self, query: str, variables: dict[str, Any], path: tuple[str, ...]
+    ) -> list[dict[str, Any]]:
+        """
+        GraphQLのコネクションをページ単位でたどり、すべてのノードを返します。
+
+        Args:
+            query: `$first` と `$cursor` 変数を受け取るGraphQLクエリ。
+            variables: `$first` と `$cursor` 以外のクエリ変数。
+            path: レスポンスの `data` からコネクションまでのキーのパス。
+        """
+        nodes: list[dict[str, Any]] = []
+        cursor: str | None = None
+        while True:
+            headers, response = self._client.requester.graphql_query(
+                query, {**variables, "first": GRAPHQL_PAGE_SIZE, "cursor": cursor}
             )
-            logger.info(f"クエリ: {query} でレビューIssueを検索中")
-            issues = self._client.search_issues(query=query)
-            logger.info(f"レビューIssueが {issues.totalCount} 件見つかりました。")
-            return [issue.raw_data for issue in issues]
+            self.rate_limit_budget.record_headers(headers)
+            connection = response["data"]
+            for key in path:
+                connection = connection[key]
+            # 型フラグメントに一致しないノードは空の辞書として返される
+            nodes.extend(node for node in connection["nodes"] if node)
+            page_info = connection["pageInfo"]
+            if not page_info["hasNextPage"]:
+                return nodes
+            cursor = page_info["endCursor"]
+
+    @staticmethod
+    def _to_issue_dict(node: dict[str, Any]) -> dict[str, Any]:
+        """
+        GraphQLのIssueノードを、キャッシュで使用するREST形式のIssue辞書に変換します。
+        紐づいたPull Requestは `linked_pull_requests` に格納されます。
+        """
+        return {
+            "number": node["number"],
+            "title": node["title"],
+            "body": node.get("body"),
+            "html_url": node["url"],
+            "state": node["state"].lower(),
+            "created_at": node.get("createdAt"),
+            "updated_at": node.get("updatedAt"),
+            "labels": [{"name": label["name"]} for label in node["labels"]["nodes"]],
+            "linked_pull_requests": [
+                {
+                    "number": pr["number"],
+                    "html_url": pr["url"],
+                    "created_at": pr.get("createdAt"),
+                }
+                for pr in node["closedByPullRequestsReferences"]["nodes"]
+            ],
+        }
+
+    def get_open_issues_with_linked_prs(self) -> list[dict[str, Any]]:
+        """
+        すべてのオープンなIssueを、ラベル・本文・紐づいたPull Requestとともに取得します。
+
+        GraphQL APIを使用し、1ページ100件のページングで取得するため、
+        Issue数に関わらずリクエスト数はページ数分で済みます。
+        紐づいたPRは `closedByPullRequestsReferences`（`linked:pr` 検索と同じ関連）です。
+        """
+        try:
+            owner, name = self._repo_name.split("/", 1)
+            logger.info(f"GraphQLでリポジトリ {self._repo_name} のオープンなIssueを取得中")
+            nodes = self._graphql_paginate(
+                OPEN_ISSUES_QUERY,
+                {"owner": owner, "name": name},
+                ("repository", "issues"),
+            )
+            issues = [self._to_issue_dict(node) for node in nodes]
+            logger.info(f"オープンなIssueが {len(issues)} 件見つかりました。")
+            return issues
         except GithubException as e:
             logger.error(
-                f"リポジトリ {self._repo_name} のレビューIssue検索中にエラーが発生しました: {e}"
+                f"リポジトリ {self._repo_name} のIssue取得中にエラーが発生しました: {e}"
+            )
+            raise
+
+    def get_issues_updated_since(self, since: datetime) -> list[dict]:
+        """
+        指定した時刻以降に更新されたIssueを、状態に関わらず取得します。
+        差分同期 (delta sync) で使用され、クローズされたIssueも含まれます。
+        結果は `get_open_issues_with_linked_prs` と同じ形式です。
+
+        検索クエリ: `is:issue updated:>={since}`
+        """
+        try:
+            since_str = since.astimezone(UTC).strftime("%Y-%m-%dT%H:%M:%SZ")
+            query = f"repo:{self._repo_name} is:issue updated:>={since_str}"
+            logger.info(f"クエリ: {query} で更新されたIssueを検索中")
+            nodes = self._graphql_paginate(
+                SEARCH_ISSUES_QUERY, {"query": query}, ("search",)
+            )
+            issues = [self._to_issue_dict(node) for node in nodes]
+            logger.info(f"更新されたIssueが {len(issues)} 件見つかりました。")
+            return issues
+        except GithubException as e:
+            logger.error(
+                f"リポジトリ {self._repo_name} の更新Issue検索中にエラーが発生しました: {e}"
             )
             raise
 
@@ -97,7 +296,7 @@ class GitHubClient:
         特定のIssueにラベルを追加します。
         """
         try:
-            repo = self._client.get_repo(self._repo_name)
+            repo = self._get_repo()
             issue = repo.get_issue(number=issue_id)
             issue.add_to_labels(label)
             return True
@@ -117,7 +316,7 @@ class GitHubClient:
         特定のIssueのラベルを更新します。
         """
         try:
-            repo = self._client.get_repo(self._repo_name)
+            repo = self._get_repo()
             issue = repo.get_issue(number=issue_id)
 
             if remove_labels:
@@ -148,13 +347,58 @@ class GitHubClient:
             )
             raise
 
+    def apply_label_delta(
+        self,
+        issue_id: int,
+        add_labels: list[str] | None = None,
+        remove_labels: list[str] | None = None,
+    ) -> bool:
+        """
+        Issueのラベルに差分のみを適用します。
+
+        削除するラベルは1つずつ `DELETE` し、追加するラベルは1回の `POST` でまとめて追加します。
+        そのため `in-progress` とエージェントIDを外して `needs-review` を付ける完了時の遷移は
+        3回のリクエストになります。GitHubのREST APIでラベルを1回で書き換えるにはラベル全体の
+        置き換え (`PUT`) しかなく、それには最新のラベル一覧が必要です。キャッシュのラベルから
+        置き換えると、その間に人間などが付与したラベルを消してしまうため、リクエスト数より
+        差分のみを書き込むことを優先しています。
+        Issueに存在しないラベルの削除は、警告をログに記録して続行します。
+
+        Args:
+            issue_id: 対象のIssue番号。
+            add_labels: 追加するラベルのリスト。
+            remove_labels: 削除するラベルのリスト。
+        """
+        try:
+            issue = self._get_repo().get_issue(number=issue_id)
+            for label_name in remove_labels or []:
+                try:
+                    issue.remove_from_labels(label_name)
+                except GithubException as e:
+                    if e.status != 404:
+                        raise
+                    logger.warning(
+                        f"削除中にIssue #{issue_id} にラベル '{label_name}' が見つかりませんでした。スキップします。"
+                    )
+            if add_labels:
+                issue.add_to_labels(*add_labels)
+            logger.info(
+                f"Issue #{issue_id} のラベルを更新しました（追加: {add_labels or []}, 削除: {remove_labels or []}）。"
+            )
+            return True
+        except GithubException as e:
+            logger.error(
+                f"リポジトリ {self._repo_name} のIssue #{issue_id} のラベル更新中にエラーが発生しました: {e}"
+            )
+            raise
+
     def remove_label(self, issue_id: int, label: str):
         """
         特定のIssueからラベルを削除します。
         Issueにラベルが存在しない場合、警告をログに記録しますが、エラーは発生させません。
         """
         try:
-            repo = self._client.get_repo(self._repo_name)
+            repo = self._get_repo()
             issue = repo.get_issue(number=issue_id)
             issue.remove_from_labels(label)
             logger.info(
@@ -177,7 +421,7 @@ class GitHubClient:
         ベースブランチから新しいブランチを作成します。
         """
         try:
-            repo = self._client.get_repo(self._repo_name)
+            repo = self._get_repo()
             source = repo.get_branch(base_branch)
             repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=source.commit.sha)
             return True
@@ -236,27 +480,27 @@ class GitHubClient:
             )
             raise
 
-    def get_needs_review_issues_and_prs(self) -> dict[int, PullRequest]:
+    def get_needs_review_issues_and_prs(self) -> dict[int, PullRequestRef]:
         """
         'needs-review'ラベルが付いたPull Requestをまとめて取得します。
-        PR番号をキーとし、PullRequestオブジェクトを値とする辞書を返します。
+        PR番号をキーとし、作成日時を含む `PullRequestRef` を値とする辞書を返します。
+        GraphQLの検索結果に作成日時が含まれるため、PRごとの追加のAPI呼び出しは発生しません。
         """
         try:
             query = f'repo:{self._repo_name} is:pr is:open label:"needs-review"'
             logger.info(f"クエリ: {query} でレビュー待ちのPRを検索中")
-            results = self._client.search_issues(query=query)
-            logger.info(f"レビュー待ちのPRが {results.totalCount} 件見つかりました。")
-
-            pr_map: dict[int, PullRequest] = {}
-            for item in results:
-                try:
-                    pr = item.as_pull_request()
-                    pr_map[pr.number] = pr
-                except GithubException as e:
-                    logger.warning(f"Failed to convert item to PullRequest: {e}")
-                    continue
-
-            return pr_map
+            nodes = self._graphql_paginate(
+                SEARCH_PULL_REQUESTS_QUERY, {"query": query}, ("search",)
+            )
+            logger.info(f"レビュー待ちのPRが {len(nodes)} 件見つかりました。")
+            return {
+                node["number"]: PullRequestRef(
+                    number=node["number"],
+                    html_url=node["url"],
+                    created_at=_parse_github_datetime(node["createdAt"]),
+                )
+                for node in nodes
+            }
         except GithubException as e:
             logger.error(
                 f"リポジトリ {self._repo_name} のレビュー待ちPR検索中にエラーが発生しました: {e}"
@@ -268,7 +512,7 @@ class GitHubClient:
         特定のPull Requestにラベルを追加します。
         """
         try:
-            repo = self._client.get_repo(self._repo_name)
+            repo = self._get_repo()
             issue = repo.get_issue(number=pr_number)
             issue.add_to_labels(label)
             logger.info(f"Added label '{label}' to PR #{pr_number}")
@@ -283,7 +527,7 @@ class GitHubClient:
         特定のIssue番号に対応するIssueの生データを取得します。
         """
         try:
-            repo = self._client.get_repo(self._repo_name)
+            repo = self._get_repo()
             issue = repo.get_issue(number=issue_number)
             return issue.raw_data
         except GithubException as e:
@@ -295,6 +539,8 @@ class GitHubClient:
     @cache_result(
         key_format="github:pr_review_comments:{self._repo_name}:{0}",
         ttl=DEFAULT_CACHE_TTL_SECONDS,
+        # レビューが付く前の空の結果は、新しいコメントをすぐに拾えるよう短く保持する
+        negative_ttl=NEGATIVE_CACHE_TTL_SECONDS,
     )
     async def get_pull_request_review_comments(self, pull_number: int) -> list[dict]:
         """
@@ -312,7 +558,7 @@ class GitHubClient:
         """
         try:
             def _get_comments():
-                repo = self._client.get_repo(self._repo_name)
+                repo = self._get_repo()
                 pull = repo.get_pull(number=pull_number)
                 comments = pull.get_review_comments()
                 clist = list(comments)
@@ -332,7 +578,7 @@ class GitHubClient:
         特定のPull Requestが指定されたラベルを持っているかを確認します。
         """
         try:
-            repo = self._client.get_repo(self._repo_name)
+            repo = self._get_repo()
             pull = repo.get_pull(number=pr_number)
             return label in [pr_label.name for pr_label in pull.labels]
         except GithubException as e:
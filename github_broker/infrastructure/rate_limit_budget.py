@@ -0,0 +1,164 @@
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from datetime import UTC, datetime
+from enum import Enum
+from typing import Any
+
+RATE_LIMIT_RESOURCES = ("core", "search", "graphql")
+DEFAULT_RESERVE_RATIO = 0.2
+DEFAULT_MIN_INTERVAL_FACTOR = 0.5
+DEFAULT_MAX_INTERVAL_FACTOR = 4.0
+# 残量がこの割合のときにポーリング間隔が基準値と等しくなる
+TARGET_REMAINING_RATIO = 0.5
+
+
+class RequestPriority(Enum):
+    """GitHub APIリクエストの優先度。"""
+
+    CRITICAL = "critical"  # タスク割り当てに伴うラベル更新などの書き込み
+    SPECULATIVE = "speculative"  # キャッシュ同期などの先読み
+
+
+@dataclass(frozen=True)
+class ResourceBudget:
+    """GitHub APIのリソースごとのレート制限の残量。"""
+
+    remaining: int
+    limit: int
+    reset_at: datetime | None = None
+
+    def is_reset(self, now: datetime) -> bool:
+        """リセット時刻を過ぎ、残量が `limit` まで戻っているかを返します。"""
+        return self.reset_at is not None and now >= self.reset_at
+
+    @property
+    def remaining_ratio(self) -> float:
+        if self.limit <= 0:
+            return 0.0
+        return self.remaining / self.limit
+
+
+class RateLimitBudget:
+    """
+    GitHub APIのレート制限の残量をリソース（core, search, graphql）ごとに記録します。
+
+    同期・非同期の両方のGitHubクライアントから更新されるため、スレッドセーフです。
+    残量が `reserve_ratio` を下回ったリソースでは先読み (`SPECULATIVE`) のリクエストを控え、
+    残りの予算をタスク割り当てなどの書き込み (`CRITICAL`) に回します。
+    """
+
+    def __init__(
+        self,
+        reserve_ratio: float = DEFAULT_RESERVE_RATIO,
+        min_interval_factor: float = DEFAULT_MIN_INTERVAL_FACTOR,
+        max_interval_factor: float = DEFAULT_MAX_INTERVAL_FACTOR,
+    ):
+        self.reserve_ratio = reserve_ratio
+        self.min_interval_factor = min_interval_factor
+        self.max_interval_factor = max_interval_factor
+        self._budgets: dict[str, ResourceBudget] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        resource: str,
+        remaining: int,
+        limit: int,
+        reset_at: datetime | None = None,
+    ) -> None:
+        """リソースの残量を記録します。"""
+        with self._lock:
+            self._budgets[resource] = ResourceBudget(
+                remaining=remaining, limit=limit, reset_at=reset_at
+            )
+
+    def record_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        レスポンスの `X-RateLimit-*` ヘッダーから残量を記録します。
+        必要なヘッダーが揃っていない場合は何もしません。
+        """
+        normalized = {key.lower(): value for key, value in headers.items()}
+        try:
+            resource = normalized.get("x-ratelimit-resource", "core")
+            remaining = int(normalized["x-ratelimit-remaining"])
+            limit = int(normalized["x-ratelimit-limit"])
+        except (KeyError, ValueError):
+            return
+        reset_at = None
+        if "x-ratelimit-reset" in normalized:
+            try:
+                reset_at = datetime.fromtimestamp(
+                    int(normalized["x-ratelimit-reset"]), tz=UTC
+                )
+            except ValueError:
+                pass
+        self.record(resource, remaining, limit, reset_at)
+
+    def get(self, resource: str) -> ResourceBudget | None:
+        """
+        リソースの残量を返します。まだ記録されていない場合はNoneを返します。
+
+        記録したリセット時刻を過ぎている場合は、次のレスポンスを待たずに
+        残量が `limit` まで戻ったものとして扱います。残量が0のままリクエストを控え続け、
+        残量を更新する機会が失われることを防ぐためです。
+        """
+        with self._lock:
+            budget = self._budgets.get(resource)
+            if budget is not None and budget.is_reset(datetime.now(UTC)):
+                budget = ResourceBudget(remaining=budget.limit, limit=budget.limit)
+                self._budgets[resource] = budget
+            return budget
+
+    def allows(self, resource: str, priority: RequestPriority) -> bool:
+        """
+        指定した優先度のリクエストを、現在の残量で送信してよいかを判定します。
+
+        `CRITICAL` は残量がある限り許可されます。`SPECULATIVE` は残量が
+        `reserve_ratio` 以上の場合のみ許可されます。残量が未記録の場合は常に許可されます。
+        """
+        budget = self.get(resource)
+        if budget is None:
+            return True
+        if priority is RequestPriority.CRITICAL:
+            return budget.remaining > 0
+        return budget.remaining_ratio >= self.reserve_ratio
+
+    def polling_interval(
+        self, base_seconds: float, resources: tuple[str, ...] = ("core", "graphql")
+    ) -> float:
+        """
+        残量に応じて調整したポーリング間隔（秒）を返します。
+
+        対象リソースのうち最も残量の割合が低いものを基準に、残量が多ければ間隔を縮め、
+        少なければ伸ばします。結果は基準値の `min_interval_factor` 倍から
+        `max_interval_factor` 倍の範囲に収まります。
+        search APIは1分ごとにリセットされるため、既定では対象に含めません。
+        """
+        ratios = [
+            budget.remaining_ratio
+            for budget in (self.get(resource) for resource in resources)
+            if budget is not None
+        ]
+        if not ratios:
+            return base_seconds
+        lowest_ratio = min(ratios)
+        if lowest_ratio <= 0:
+            factor = self.max_interval_factor
+        else:
+            factor = TARGET_REMAINING_RATIO / lowest_ratio
+        factor = max(self.min_interval_factor, min(self.max_interval_factor, factor))
+        return base_seconds * factor
+
+    def snapshot(self) -> dict[str, dict[str, Any]]:
+        """監視用に、記録済みのすべてのリソースの残量を返します。"""
+        with self._lock:
+            budgets = dict(self._budgets)
+        return {
+            resource: {
+                "remaining": budget.remaining,
+                "limit": budget.limit,
+                "reset_at": budget.reset_at.isoformat() if budget.reset_at else None,
+            }
+            for resource, budget in sorted(budgets.items())
+        }
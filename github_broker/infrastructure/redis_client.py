@@ -1,17 +1,250 @@
+import hashlib
 import json
+import time
+from collections import Counter
+from collections.abc import Iterable
+from dataclasses import dataclass, field, replace
+from datetime import UTC, datetime
+from enum import Enum
 from typing import Any
 from urllib.parse import quote
 
 import redis
 
+from github_broker.domain.task import Task
 
-class RedisClient:
+
+SYNC_WATERMARK_KEY = "sync:issues:watermark"
+ISSUE_CACHE_GENERATION_KEY = "sync:issues:generation"
+REVIEW_DETECTED_KEY = "review:detected"
+REVIEW_TIMEOUTS_KEY = "schedule:review_timeouts"
+# 発火済みのレビュータイムアウトのスコア。PRがレビュー待ちでなくなるまで残し、再登録を防ぐ
+REVIEW_TIMEOUT_FIRED_SCORE = "+inf"
+LABEL_INDEX_KEY_FORMAT = "index:label:{label}"
+INDEXED_LABELS_KEY = "index:labels"
+ISSUE_LABELS_KEY = "index:issue_labels"
+ISSUE_HASHES_KEY = "issue_hashes"
+TASK_AVAILABLE_CHANNEL = "channel:task_available"
+CANDIDATE_QUEUE_KEY_FORMAT = "queue:candidates:{role}:{priority}"
+CANDIDATE_QUEUES_KEY = "queue:candidates"
+ASSIGNMENT_EVENTS_KEY = "events:assignments"
+ASSIGNMENT_EVENTS_MAXLEN = 10000
+ASSIGNMENT_EVENTS_PAGE_SIZE = 500
+AGENT_CURRENT_TASK_KEY_FORMAT = "agent_current_task:{agent_id}"
+FENCING_TOKEN_KEY = "lease:fencing_token"
+# リースは `/heartbeat` で延長されるため、クラッシュしたエージェントの作業を早く回収できるよう短くする
+DEFAULT_LEASE_TTL_SECONDS = 120
+
+GITHUB_OUTBOX_PENDING_KEY = "outbox:github:pending"
+GITHUB_OUTBOX_ENTRY_KEY_FORMAT = "outbox:github:issue:{issue_id}"
+GITHUB_OUTBOX_INFLIGHT_ENTRY_KEY_FORMAT = "outbox:github:inflight:{issue_id}"
+GITHUB_OUTBOX_INFLIGHT_KEY = "outbox:github:inflight"
+GITHUB_OUTBOX_ATTEMPTS_KEY = "outbox:github:attempts"
+GITHUB_OUTBOX_DEAD_LETTER_KEY = "outbox:github:dead_letter"
+GITHUB_OUTBOX_DEAD_LETTER_ENTRY_KEY_FORMAT = "outbox:github:dead_letter:{issue_id}"
+OUTBOX_LABEL_FIELD_PREFIX = "label:"
+OUTBOX_BRANCH_FIELD_PREFIX = "branch:"
+# `issue:{issue_id}` に保存するIssueの項目。GitHubの応答のそれ以外の項目は保存しない
+CACHED_ISSUE_FIELDS = ("number", "title", "body", "html_url", "created_at")
+CACHED_LINKED_PULL_REQUEST_FIELDS = ("number", "html_url")
+# 取り込み時に計算した `Task.precompute` の結果を保存する項目
+CACHED_TASK_FIELDS_KEY = "task"
+
+# KEYS: [issue, agent_current_task, assignment events, lock, fencing token,
+#        indexed labels, issue labels, candidate queue registry, cache generation,
+#        issue hashes, (claimed label index), 除外ラベルのインデックス..., 候補キュー...]
+# ARGV: [issue_id, agent_id, lease TTL, assigned_at, events maxlen, claimed label,
+#        除外ラベルの数, 候補キュー名...]
+CLAIM_ISSUE_SCRIPT = """
+local excluded_start = ARGV[6] == '' and 11 or 12
+local queue_start = excluded_start + tonumber(ARGV[7])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return {'not_candidate'}
+end
+for i = excluded_start, queue_start - 1 do
+  if redis.call('ZSCORE', KEYS[i], ARGV[1]) then
+    return {'not_candidate'}
+  end
+end
+if redis.call('EXISTS', KEYS[4]) == 1 then
+  return {'locked'}
+end
+local token = redis.call('INCR', KEYS[5])
+redis.call('SET', KEYS[4], token .. ':' .. ARGV[2], 'EX', ARGV[3])
+redis.call('SET', KEYS[2], ARGV[1])
+redis.call('XADD', KEYS[3], 'MAXLEN', '~', ARGV[5], '*',
+  'event', 'assigned', 'issue_id', ARGV[1], 'agent_id', ARGV[2],
+  'fencing_token', token, 'assigned_at', ARGV[4])
+if ARGV[6] ~= '' and redis.call('ZADD', KEYS[11], ARGV[1], ARGV[1]) == 1 then
+  redis.call('SADD', KEYS[6], ARGV[6])
+  local labels = cjson.decode(redis.call('HGET', KEYS[7], ARGV[1]) or '[]')
+  table.insert(labels, ARGV[6])
+  redis.call('HSET', KEYS[7], ARGV[1], cjson.encode(labels))
+  if redis.call('HEXISTS', KEYS[10], ARGV[1]) == 1 then
+    redis.call('HSET', KEYS[10], ARGV[1], '')
+  end
+end
+for i = queue_start, #KEYS do
+  if redis.call('ZREM', KEYS[i], ARGV[1]) == 1 and redis.call('EXISTS', KEYS[i]) == 0 then
+    redis.call('SREM', KEYS[8], ARGV[8 + i - queue_start])
+  end
+end
+redis.call('INCR', KEYS[9])
+return {'claimed', token}
+"""
+
+# KEYS: [lock, agent_current_task, issue labels, issue hashes, issue,
+#        candidate queue registry, cache generation, (claimed label index), 候補キュー...]
+# ARGV: [lease owner, issue_id, task available channel, claimed label, 候補キュー名...]
+RELEASE_ISSUE_CLAIM_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+  return 0
+end
+local queue_start = ARGV[4] == '' and 8 or 9
+redis.call('DEL', KEYS[1])
+if redis.call('GET', KEYS[2]) == ARGV[2] then
+  redis.call('DEL', KEYS[2])
+end
+if ARGV[4] ~= '' and redis.call('ZREM', KEYS[8], ARGV[2]) == 1 then
+  local labels = {}
+  for _, label in ipairs(cjson.decode(redis.call('HGET', KEYS[3], ARGV[2]) or '[]')) do
+    if label ~= ARGV[4] then
+      table.insert(labels, label)
+    end
+  end
+  redis.call('HSET', KEYS[3], ARGV[2], #labels > 0 and cjson.encode(labels) or '[]')
+  if redis.call('HEXISTS', KEYS[4], ARGV[2]) == 1 then
+    redis.call('HSET', KEYS[4], ARGV[2], '')
+  end
+end
+if redis.call('EXISTS', KEYS[5]) == 1 then
+  for i = queue_start, #KEYS do
+    redis.call('ZADD', KEYS[i], ARGV[2], ARGV[2])
+    redis.call('SADD', KEYS[6], ARGV[5 + i - queue_start])
+  end
+end
+redis.call('INCR', KEYS[7])
+redis.call('PUBLISH', ARGV[3], '1')
+return 1
+"""
+
+# KEYS: [lock]
+# ARGV: [lease owner, lease TTL]
+RENEW_ISSUE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+  return 0
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+# KEYS: [pending, entry, inflight entry, inflight]
+# ARGV: [issue_id]
+CLAIM_OUTBOX_ENTRY_SCRIPT = """
+if redis.call('EXISTS', KEYS[3]) == 1 then
+  return {}
+end
+redis.call('ZREM', KEYS[1], ARGV[1])
+if redis.call('EXISTS', KEYS[2]) == 0 then
+  return {}
+end
+redis.call('RENAME', KEYS[2], KEYS[3])
+redis.call('SADD', KEYS[4], ARGV[1])
+return redis.call('HGETALL', KEYS[3])
+"""
+
+# KEYS: [pending, entry, inflight entry, inflight, attempts,
+#        dead letter entry, dead letter]
+# ARGV: [issue_id, now, base delay, max delay, max attempts, error]
+RETRY_OUTBOX_ENTRY_SCRIPT = """
+local fields = redis.call('HGETALL', KEYS[3])
+redis.call('DEL', KEYS[3])
+redis.call('SREM', KEYS[4], ARGV[1])
+local attempts = redis.call('HINCRBY', KEYS[5], ARGV[1], 1)
+if attempts >= tonumber(ARGV[5]) then
+  if #fields > 0 then
+    redis.call('HSET', KEYS[6], unpack(fields))
+  end
+  redis.call('HSET', KEYS[6], 'attempts', attempts, 'error', ARGV[6])
+  redis.call('ZADD', KEYS[7], ARGV[2], ARGV[1])
+  redis.call('HDEL', KEYS[5], ARGV[1])
+  return attempts
+end
+for i = 1, #fields, 2 do
+  redis.call('HSETNX', KEYS[2], fields[i], fields[i + 1])
+end
+local delay = math.min(tonumber(ARGV[3]) * 2 ^ (attempts - 1), tonumber(ARGV[4]))
+if redis.call('EXISTS', KEYS[2]) == 1 then
+  redis.call('ZADD', KEYS[1], tonumber(ARGV[2]) + delay, ARGV[1])
+end
+return attempts
+"""
+
+# KEYS: [lock]
+# ARGV: [owner value]
+COMPARE_AND_DELETE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+  return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass(frozen=True)
+class IssueSyncResult:
+    """Issueキャッシュ同期の結果（件数）。"""
+
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+class IssueClaimResult(str, Enum):
+    """`RedisClient.claim_issue` の結果。"""
+
+    CLAIMED = "claimed"
+    LOCKED = "locked"
+    NOT_CANDIDATE = "not_candidate"
+
+
+@dataclass(frozen=True)
+class IssueClaim:
     """
-    Redisクライアント。分散ロックに使用されます。
+    Issueのリース取得結果。
+
+    `fencing_token` はリースを取得するたびに単調増加する番号で、
+    リースの延長・解放時に、期限切れ後に取得し直された別のリースと区別するために使用します。
     """
 
-    def __init__(self, redis: redis.Redis, owner: str, repo_name: str):
-        self.client = redis
+    result: IssueClaimResult
+    fencing_token: int | None = None
+
+    @property
+    def claimed(self) -> bool:
+        return self.result is IssueClaimResult.CLAIMED
+
+
+@dataclass(frozen=True)
+class GitHubOutboxEntry:
+    """
+    GitHubへの反映を待っている、1つのIssueに対する変更の集合。
+    同じIssueへの変更は、反映される前にラベルごと・ブランチごとにまとめられます。
+    """
+
+    issue_id: int
+    add_labels: list[str] = field(default_factory=list)
+    remove_labels: list[str] = field(default_factory=list)
+    branch_names: list[str] = field(default_factory=list)
+
+
+class RedisKeyspace:
+    """
+    リポジトリごとのRedisのキー名と、サーバーサイドスクリプトの引数・戻り値の変換。
+    同期 (`RedisClient`) と非同期 (`AsyncRedisClient`) のクライアントで共有されます。
+    """
+
+    def __init__(self, owner: str, repo_name: str):
         self.owner = owner
         self.repo_name = repo_name
 
@@ -23,22 +256,395 @@ class RedisClient:
         encoded_repo_name = quote(self.repo_name, safe="")
         return f"repo::{encoded_owner}::{encoded_repo_name}:{key}"
 
-    def acquire_lock(self, lock_key: str, value: str, timeout: int = 600) -> bool:
+    @property
+    def task_available_channel(self) -> str:
+        """タスク候補が増えたことを通知するpub/subチャンネル名。"""
+        return self._get_prefixed_key(TASK_AVAILABLE_CHANNEL)
+
+    def _get_label_index_key(self, label: str) -> str:
+        return self._get_prefixed_key(LABEL_INDEX_KEY_FORMAT.format(label=label))
+
+    @staticmethod
+    def _get_candidate_queue_name(role: str, priority: str) -> str:
+        return CANDIDATE_QUEUE_KEY_FORMAT.format(role=role, priority=priority)
+
+    @staticmethod
+    def _parse_candidate_priorities(
+        queue_names: Iterable[str], role_labels: list[str]
+    ) -> set[str]:
+        """候補キュー名の一覧から、指定した役割のキューがある優先度ラベルを取り出します。"""
+        prefix = f"{CANDIDATE_QUEUES_KEY}:"
+        roles = set(role_labels)
+        priorities = set()
+        for name in queue_names:
+            if not name.startswith(prefix):
+                continue
+            role, _, priority = name[len(prefix) :].rpartition(":")
+            if role in roles:
+                priorities.add(priority)
+        return priorities
+
+    def _get_agent_current_task_key(self, agent_id: str) -> str:
+        return self._get_prefixed_key(
+            AGENT_CURRENT_TASK_KEY_FORMAT.format(agent_id=agent_id)
+        )
+
+    @staticmethod
+    def _get_lease_owner(agent_id: str, fencing_token: int) -> str:
+        """リースのロックキーに格納する値 (`{fencing_token}:{agent_id}`)。"""
+        return f"{fencing_token}:{agent_id}"
+
+    def _build_claim_issue_call(
+        self,
+        issue_id: int,
+        agent_id: str,
+        excluded_labels: list[str] | None,
+        lease_ttl: int,
+        claimed_label: str | None,
+        candidate_queues: list[tuple[str, str]] | None,
+    ) -> tuple[list[str], list[Any]]:
+        """
+        `CLAIM_ISSUE_SCRIPT` に渡すキーと引数。
+        スクリプトが読み書きするキーはすべて `keys` に含めます。
+        """
+        excluded_labels = excluded_labels or []
+        queue_names = [
+            self._get_candidate_queue_name(role, priority)
+            for role, priority in candidate_queues or []
+        ]
+        keys = [
+            self._get_prefixed_key(f"issue:{issue_id}"),
+            self._get_agent_current_task_key(agent_id),
+            self._get_prefixed_key(ASSIGNMENT_EVENTS_KEY),
+            self._get_prefixed_key(f"issue_lock_{issue_id}"),
+            self._get_prefixed_key(FENCING_TOKEN_KEY),
+            self._get_prefixed_key(INDEXED_LABELS_KEY),
+            self._get_prefixed_key(ISSUE_LABELS_KEY),
+            self._get_prefixed_key(CANDIDATE_QUEUES_KEY),
+            self._get_prefixed_key(ISSUE_CACHE_GENERATION_KEY),
+            self._get_prefixed_key(ISSUE_HASHES_KEY),
+            *([self._get_label_index_key(claimed_label)] if claimed_label else []),
+            *(self._get_label_index_key(label) for label in excluded_labels),
+            *(self._get_prefixed_key(name) for name in queue_names),
+        ]
+        args = [
+            issue_id,
+            agent_id,
+            lease_ttl,
+            datetime.now(UTC).isoformat(),
+            ASSIGNMENT_EVENTS_MAXLEN,
+            claimed_label or "",
+            len(excluded_labels),
+            *queue_names,
+        ]
+        return keys, args
+
+    @staticmethod
+    def _parse_issue_claim(values: list[Any]) -> IssueClaim:
+        """`CLAIM_ISSUE_SCRIPT` の戻り値を `IssueClaim` に変換します。"""
+        status, *token = values
+        if isinstance(status, bytes):
+            status = status.decode()
+        return IssueClaim(
+            result=IssueClaimResult(status),
+            fencing_token=int(token[0]) if token else None,
+        )
+
+    def _build_release_issue_claim_call(
+        self,
+        issue_id: int,
+        agent_id: str,
+        fencing_token: int,
+        claimed_label: str | None,
+        candidate_queues: list[tuple[str, str]] | None,
+    ) -> tuple[list[str], list[Any]]:
+        """`RELEASE_ISSUE_CLAIM_SCRIPT` に渡すキーと引数。"""
+        queue_names = [
+            self._get_candidate_queue_name(role, priority)
+            for role, priority in candidate_queues or []
+        ]
+        keys = [
+            self._get_prefixed_key(f"issue_lock_{issue_id}"),
+            self._get_agent_current_task_key(agent_id),
+            self._get_prefixed_key(ISSUE_LABELS_KEY),
+            self._get_prefixed_key(ISSUE_HASHES_KEY),
+            self._get_prefixed_key(f"issue:{issue_id}"),
+            self._get_prefixed_key(CANDIDATE_QUEUES_KEY),
+            self._get_prefixed_key(ISSUE_CACHE_GENERATION_KEY),
+            *([self._get_label_index_key(claimed_label)] if claimed_label else []),
+            *(self._get_prefixed_key(name) for name in queue_names),
+        ]
+        args = [
+            self._get_lease_owner(agent_id, fencing_token),
+            issue_id,
+            self.task_available_channel,
+            claimed_label or "",
+            *queue_names,
+        ]
+        return keys, args
+
+    def _get_outbox_keys(self, issue_id: int) -> list[str]:
+        """アウトボックスのスクリプトに渡すキー (pending, entry, inflight entry, inflight, attempts)。"""
+        return [
+            self._get_prefixed_key(GITHUB_OUTBOX_PENDING_KEY),
+            self._get_prefixed_key(
+                GITHUB_OUTBOX_ENTRY_KEY_FORMAT.format(issue_id=issue_id)
+            ),
+            self._get_prefixed_key(
+                GITHUB_OUTBOX_INFLIGHT_ENTRY_KEY_FORMAT.format(issue_id=issue_id)
+            ),
+            self._get_prefixed_key(GITHUB_OUTBOX_INFLIGHT_KEY),
+            self._get_prefixed_key(GITHUB_OUTBOX_ATTEMPTS_KEY),
+        ]
+
+    def _get_outbox_retry_keys(self, issue_id: int) -> list[str]:
+        """`RETRY_OUTBOX_ENTRY_SCRIPT` に渡すキー（アウトボックスのキーとデッドレターのキー）。"""
+        return [
+            *self._get_outbox_keys(issue_id),
+            self._get_prefixed_key(
+                GITHUB_OUTBOX_DEAD_LETTER_ENTRY_KEY_FORMAT.format(issue_id=issue_id)
+            ),
+            self._get_prefixed_key(GITHUB_OUTBOX_DEAD_LETTER_KEY),
+        ]
+
+    @staticmethod
+    def _build_outbox_fields(
+        add_labels: list[str] | None,
+        remove_labels: list[str] | None,
+        branch_names: list[str] | None,
+    ) -> dict[str, str]:
+        """アウトボックスのハッシュに書き込むフィールド（ラベル・ブランチごとの操作）。"""
+        fields: dict[str, str] = {}
+        for label in add_labels or []:
+            fields[f"{OUTBOX_LABEL_FIELD_PREFIX}{label}"] = "add"
+        for label in remove_labels or []:
+            fields[f"{OUTBOX_LABEL_FIELD_PREFIX}{label}"] = "remove"
+        for branch_name in branch_names or []:
+            fields[f"{OUTBOX_BRANCH_FIELD_PREFIX}{branch_name}"] = "create"
+        return fields
+
+    @staticmethod
+    def _parse_outbox_entry(
+        issue_id: int, values: list[Any]
+    ) -> GitHubOutboxEntry | None:
+        """`CLAIM_OUTBOX_ENTRY_SCRIPT` の戻り値を `GitHubOutboxEntry` に変換します。"""
+        if not values:
+            return None
+        fields = dict(zip(values[::2], values[1::2], strict=True))
+        add_labels, remove_labels, branch_names = [], [], []
+        for name, action in sorted(fields.items()):
+            if isinstance(name, bytes):
+                name, action = name.decode(), action.decode()
+            if name.startswith(OUTBOX_LABEL_FIELD_PREFIX):
+                label = name.removeprefix(OUTBOX_LABEL_FIELD_PREFIX)
+                (add_labels if action == "add" else remove_labels).append(label)
+            elif name.startswith(OUTBOX_BRANCH_FIELD_PREFIX):
+                branch_names.append(name.removeprefix(OUTBOX_BRANCH_FIELD_PREFIX))
+        return GitHubOutboxEntry(
+            issue_id=issue_id,
+            add_labels=add_labels,
+            remove_labels=remove_labels,
+            branch_names=branch_names,
+        )
+
+
+class RedisClient(RedisKeyspace):
+    """
+    Redisクライアント。分散ロックに使用されます。
+    """
+
+    def __init__(self, redis: redis.Redis, owner: str, repo_name: str):
+        super().__init__(owner, repo_name)
+        self.client = redis
+        self._claim_issue_script = redis.register_script(CLAIM_ISSUE_SCRIPT)
+        self._release_issue_claim_script = redis.register_script(
+            RELEASE_ISSUE_CLAIM_SCRIPT
+        )
+        self._renew_issue_lease_script = redis.register_script(
+            RENEW_ISSUE_LEASE_SCRIPT
+        )
+        self._compare_and_delete_script = redis.register_script(
+            COMPARE_AND_DELETE_SCRIPT
+        )
+        self._claim_outbox_entry_script = redis.register_script(
+            CLAIM_OUTBOX_ENTRY_SCRIPT
+        )
+        self._retry_outbox_entry_script = redis.register_script(
+            RETRY_OUTBOX_ENTRY_SCRIPT
+        )
+
+    def claim_issue(
+        self,
+        issue_id: int,
+        agent_id: str,
+        excluded_labels: list[str] | None = None,
+        lease_ttl: int = DEFAULT_LEASE_TTL_SECONDS,
+        claimed_label: str | None = None,
+        candidate_queues: list[tuple[str, str]] | None = None,
+    ) -> IssueClaim:
         """
-        ロックを取得します。
+        Issueのリースを取得し、エージェントへの割り当てに必要なRedis側の処理を
+        1回の往復でアトミックに行います。
+
+        サーバーサイドスクリプトで以下を順に実行します。
+        1. Issueがキャッシュに存在し、`excluded_labels` のいずれも付いていないことを確認する
+        2. フェンシングトークンを発行し、`issue_lock_{issue_id}` のリースを取得する
+        3. `agent_current_task:{agent_id}` に割り当てたIssue番号を記録する
+        4. 割り当てイベントを `events:assignments` ストリームに追加する
+        5. `claimed_label` のラベルインデックスにIssueを追加し、`candidate_queues` の
+           `(役割ラベル, 優先度ラベル)` の候補キューから取り除く
+
+        リースは `lease_ttl` 秒で失効するため、作業中のエージェントは
+        `renew_issue_lease` で延長する必要があります。`agent_current_task` は
+        次のリクエストで前のタスクを完了させるために使用するため、失効しません。
+        5. によって、GitHubへの反映と次の同期を待たずにキャッシュ上も割り当て済みとなるため、
+        その前にリースが失効しても同じIssueが再び割り当てられることはありません。
+        このときIssueの内容ハッシュ (`issue_hashes`) を無効にするため、次の同期では
+        GitHub上のラベルが割り当て前と同じであっても、キャッシュとラベルインデックスが書き直されます。
+
+        Returns:
+            IssueClaim: 取得結果。取得できた場合はフェンシングトークンを含みます。
+        """
+        keys, args = self._build_claim_issue_call(
+            issue_id,
+            agent_id,
+            excluded_labels,
+            lease_ttl,
+            claimed_label,
+            candidate_queues,
+        )
+        return self._parse_issue_claim(self._claim_issue_script(keys=keys, args=args))
+
+    def renew_issue_lease(
+        self,
+        issue_id: int,
+        agent_id: str,
+        fencing_token: int,
+        lease_ttl: int = DEFAULT_LEASE_TTL_SECONDS,
+    ) -> bool:
+        """
+        Issueのリースの有効期限を `lease_ttl` 秒に延長します。
+
+        Returns:
+            bool: 延長した場合はTrue。リースが失効しているか、
+            別のフェンシングトークンで取得し直されている場合はFalse。
+        """
+        keys = [self._get_prefixed_key(f"issue_lock_{issue_id}")]
+        args = [self._get_lease_owner(agent_id, fencing_token), lease_ttl]
+        return bool(self._renew_issue_lease_script(keys=keys, args=args))
+
+    def release_issue_claim(
+        self,
+        issue_id: int,
+        agent_id: str,
+        fencing_token: int,
+        claimed_label: str | None = None,
+        candidate_queues: list[tuple[str, str]] | None = None,
+    ) -> bool:
+        """
+        `claim_issue` で取得したリースと現在のタスクの記録を1回の往復で取り消します。
+        `claimed_label` を指定した場合は、`claim_issue` で追加したラベルインデックスからも取り除き、
+        Issueの内容ハッシュを無効にします。
+        Issueがキャッシュに残っている場合は `candidate_queues` の候補キューに戻し、
+        世代番号を進めてから `task_available_channel` に通知するため、
+        待機中のリクエストは新しい候補を読み直して割り当てられます。
+        リースが別のフェンシングトークンで取得し直されている場合は何もしません。
+
+        Returns:
+            bool: リースを解放した場合はTrue。
+        """
+        keys, args = self._build_release_issue_claim_call(
+            issue_id, agent_id, fencing_token, claimed_label, candidate_queues
+        )
+        return bool(self._release_issue_claim_script(keys=keys, args=args))
+
+    def get_agent_current_task(self, agent_id: str) -> int | None:
+        """エージェントに割り当てられ、まだ完了していないIssue番号を取得します。"""
+        value = self.client.get(self._get_agent_current_task_key(agent_id))
+        return int(value) if value is not None else None
+
+    def get_agent_current_tasks(self) -> dict[str, int]:
+        """すべてのエージェントの、まだ完了していないIssue番号を取得します。"""
+        keys = self.get_keys_by_pattern(
+            AGENT_CURRENT_TASK_KEY_FORMAT.format(agent_id="*")
+        )
+        prefix = AGENT_CURRENT_TASK_KEY_FORMAT.format(agent_id="")
+        return {
+            key.removeprefix(prefix): int(value)
+            for key, value in zip(keys, self.get_values(keys), strict=True)
+            if value is not None
+        }
+
+    def restore_agent_current_task(self, agent_id: str, issue_id: int) -> bool:
+        """
+        エージェントの現在のタスクの記録を復元します。
+        エージェントに別の記録がある場合は上書きしません。
+
+        Returns:
+            bool: 記録した場合はTrue。
+        """
+        return bool(
+            self.client.set(
+                self._get_agent_current_task_key(agent_id), issue_id, nx=True
+            )
+        )
+
+    def clear_agent_current_task(self, agent_id: str, issue_id: int) -> bool:
+        """
+        エージェントの現在のタスクの記録が `issue_id` である場合のみ削除します。
+
+        Returns:
+            bool: 削除した場合はTrue。
         """
-        prefixed_lock_key = self._get_prefixed_key(lock_key)
-        # nx=Trueは、キーがまだ存在しない場合にのみ設定されることを保証します。
-        result = self.client.set(prefixed_lock_key, value, ex=timeout, nx=True)
-        return result if result is not None else False
+        return (
+            self._compare_and_delete_script(
+                keys=[self._get_agent_current_task_key(agent_id)], args=[issue_id]
+            )
+            > 0
+        )
 
-    def release_lock(self, lock_key: str) -> bool:
+    def get_leased_issue_ids(self, issue_ids: list[int]) -> set[int]:
+        """指定したIssueのうち、いずれかのエージェントがリースを保持しているものを返します。"""
+        if not issue_ids:
+            return set()
+        pipe = self.client.pipeline(transaction=False)
+        for issue_id in issue_ids:
+            pipe.exists(self._get_prefixed_key(f"issue_lock_{issue_id}"))
+        return {
+            issue_id
+            for issue_id, exists in zip(issue_ids, pipe.execute(), strict=True)
+            if exists
+        }
+
+    def get_assigned_agents(self, issue_ids: list[int]) -> dict[int, str]:
         """
-        ロックを解放します。
+        `events:assignments` ストリームから、指定したIssueを最後に割り当てたエージェントを取得します。
+        ストリームを新しい順に読み、すべてのIssueが見つかるか末尾に達した時点で終了します。
+
+        Returns:
+            dict[int, str]: Issue番号をキーとするエージェントID。
+            ストリームに割り当ての記録が残っていないIssueは含みません。
         """
-        prefixed_lock_key = self._get_prefixed_key(lock_key)
-        # キーを削除することでロックが解放されます。
-        return self.client.delete(prefixed_lock_key) > 0
+        remaining = set(issue_ids)
+        agents: dict[int, str] = {}
+        stream_key = self._get_prefixed_key(ASSIGNMENT_EVENTS_KEY)
+        max_id = "+"
+        while remaining:
+            entries = self.client.xrevrange(
+                stream_key, max=max_id, count=ASSIGNMENT_EVENTS_PAGE_SIZE
+            )
+            for _, fields in entries:
+                if fields.get("event") != "assigned":
+                    continue
+                issue_id = int(fields["issue_id"])
+                if issue_id in remaining:
+                    remaining.discard(issue_id)
+                    agents[issue_id] = fields["agent_id"]
+            if len(entries) < ASSIGNMENT_EVENTS_PAGE_SIZE:
+                break
+            # 最後に読んだエントリは含めずに続きを読む
+            max_id = f"({entries[-1][0]}"
+        return agents
 
     def get_value(self, key: str) -> str | None:
         """
@@ -47,9 +653,22 @@ class RedisClient:
         prefixed_key = self._get_prefixed_key(key)
         return self.client.get(prefixed_key)
 
-    def set_value(self, key: str, value: str, timeout: int = 600) -> None:
+    def get_value_with_ttl(self, key: str) -> tuple[str | None, int]:
+        """
+        Redisから値と残りの有効期間（秒）を1回の往復で取得します。
+        有効期限がない場合の残り時間は-1、キーが存在しない場合は-2です。
+        """
+        prefixed_key = self._get_prefixed_key(key)
+        pipe = self.client.pipeline(transaction=False)
+        pipe.get(prefixed_key)
+        pipe.ttl(prefixed_key)
+        value, remaining_ttl = pipe.execute()
+        return value, remaining_ttl
+
+    def set_value(self, key: str, value: str, timeout: int | None = 600) -> None:
         """
         Redisに値を設定します。
+        timeoutにNoneを指定した場合、キーは失効しません。
         """
         prefixed_key = self._get_prefixed_key(key)
         self.client.set(prefixed_key, value, ex=timeout)
@@ -99,19 +718,686 @@ class RedisClient:
         prefixed_keys = [self._get_prefixed_key(key) for key in keys]
         self.client.delete(*prefixed_keys)
 
-    def sync_issues(self, issues: list[dict[str, Any]]):
+    @staticmethod
+    def _get_label_names(issue: dict[str, Any]) -> set[str]:
+        return {
+            label["name"] for label in issue.get("labels", []) if label.get("name")
+        }
+
+    def _prune_label_indexes(self, labels: set[str]) -> None:
+        """
+        空になったラベルインデックスを `index:labels` から取り除きます。
+        """
+        if not labels:
+            return
+        ordered_labels = sorted(labels)
+        pipe = self.client.pipeline()
+        for label in ordered_labels:
+            pipe.zcard(self._get_label_index_key(label))
+        counts = pipe.execute()
+        empty_labels = [
+            label for label, count in zip(ordered_labels, counts, strict=True) if not count
+        ]
+        if empty_labels:
+            self.client.srem(self._get_prefixed_key(INDEXED_LABELS_KEY), *empty_labels)
+
+    @staticmethod
+    def _to_cached_issue(issue: dict[str, Any]) -> dict[str, Any]:
+        """
+        GitHubのIssue（REST・Webhook・GraphQLのいずれの形式でも可）から、
+        ブローカーが読み取る項目だけを取り出したキャッシュ用の辞書を作成します。
+
+        ラベルは名前のみを `[{"name": ...}]` の形式で保持します。
+        `linked_pull_requests` は元のIssueに含まれる場合のみ保持します
+        （含まれない場合、割り当て時にPRの検索にフォールバックします）。
+        本文とラベルから導出される値 (`Task.precompute`) は `task` に保存され、
+        取り込むたびに計算し直されます。
+        """
+        cached_issue = {
+            field: issue[field] for field in CACHED_ISSUE_FIELDS if field in issue
+        }
+        cached_issue["labels"] = [
+            {"name": label["name"]}
+            for label in issue.get("labels", [])
+            if label.get("name")
+        ]
+        linked_pull_requests = issue.get("linked_pull_requests")
+        if linked_pull_requests is not None:
+            cached_issue["linked_pull_requests"] = [
+                {field: pr[field] for field in CACHED_LINKED_PULL_REQUEST_FIELDS}
+                for pr in linked_pull_requests
+            ]
+        cached_issue[CACHED_TASK_FIELDS_KEY] = Task.from_issue(cached_issue).precompute()
+        return cached_issue
+
+    @staticmethod
+    def _get_issue_digest(issue: dict[str, Any]) -> str:
+        """
+        Issueの内容からハッシュ値を計算します。内容が同じであれば常に同じ値になります。
+        """
+        canonical = json.dumps(issue, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def apply_issue_changes(
+        self,
+        issues: list[dict[str, Any]],
+        removed_issue_numbers: list[int] | None = None,
+    ) -> IssueSyncResult:
+        """
+        Issueの追加/更新/削除をキャッシュとラベルインデックスに反映します。
+
+        Issueは `_to_cached_issue` で必要な項目だけに絞ってから保存されます。
+        Issueごとの内容ハッシュ (`issue_hashes`) と比較し、変更があったIssueのみを書き込みます。
+        書き込みと削除はすべて1つのMULTI/EXECトランザクションにまとめて送信されます。
+        比較に使う `issue_hashes` と `index:issue_labels` は `WATCH` され、読み取りから
+        書き込みまでの間に他のプロセス（Webhookや `claim_issue`）が変更した場合は読み直して再試行します。
+        変更があった場合は、すべての書き込みの後にキャッシュの世代番号を進めます。
+        タスク候補の通知は、候補キューを再構築する `replace_candidate_queues` が行います。
+
+        Args:
+            issues: 追加/更新するIssueのリスト。
+            removed_issue_numbers: キャッシュから削除するIssue番号のリスト。
+                キャッシュされていない（`issue_hashes` にない）Issueは無視され、件数にも含まれません。
+
+        Returns:
+            IssueSyncResult: 追加・更新・削除・変更なしの件数。
+        """
+        removed_issue_numbers = removed_issue_numbers or []
+        issues = [self._to_cached_issue(issue) for issue in issues]
+        fields = [str(issue["number"]) for issue in issues] + [
+            str(number) for number in removed_issue_numbers
+        ]
+        if not fields:
+            return IssueSyncResult()
+
+        hashes_key = self._get_prefixed_key(ISSUE_HASHES_KEY)
+        issue_labels_key = self._get_prefixed_key(ISSUE_LABELS_KEY)
+        pipe = self.client.pipeline(transaction=True)
+        try:
+            while True:
+                try:
+                    pipe.watch(hashes_key, issue_labels_key)
+                    old_hashes = pipe.hmget(hashes_key, fields)
+                    old_labels_json = pipe.hmget(issue_labels_key, fields)
+                    pipe.multi()
+                    result, emptied_labels = self._queue_issue_changes(
+                        pipe,
+                        issues,
+                        removed_issue_numbers,
+                        dict(zip(fields, old_hashes, strict=True)),
+                        {
+                            field: set(json.loads(value)) if value else set()
+                            for field, value in zip(
+                                fields, old_labels_json, strict=True
+                            )
+                        },
+                    )
+                    changed = bool(result.added or result.updated or result.removed)
+                    if changed:
+                        pipe.execute()
+                    break
+                except redis.WatchError:
+                    continue
+        finally:
+            pipe.reset()
+
+        self._prune_label_indexes(emptied_labels)
+        if changed:
+            # 世代番号は書き込みの後に進めるため、読み取り側は同じ世代番号のまま
+            # 古い内容を保持し続けることがない
+            self.client.incr(self._get_prefixed_key(ISSUE_CACHE_GENERATION_KEY))
+        return result
+
+    def _queue_issue_changes(
+        self,
+        pipe: Any,
+        issues: list[dict[str, Any]],
+        removed_issue_numbers: list[int],
+        old_hash_by_field: dict[str, str | None],
+        old_labels_by_field: dict[str, set[str]],
+    ) -> tuple[IssueSyncResult, set[str]]:
+        """
+        `apply_issue_changes` のトランザクションに、変更があったIssueの書き込みと削除を積みます。
+
+        Returns:
+            tuple[IssueSyncResult, set[str]]: 件数と、Issueが外れたラベルの集合。
+        """
+        hashes_key = self._get_prefixed_key(ISSUE_HASHES_KEY)
+        issue_labels_key = self._get_prefixed_key(ISSUE_LABELS_KEY)
+        indexed_labels_key = self._get_prefixed_key(INDEXED_LABELS_KEY)
+        added = updated = unchanged = 0
+        emptied_labels: set[str] = set()
+        for issue in issues:
+            issue_number = issue["number"]
+            field = str(issue_number)
+            digest = self._get_issue_digest(issue)
+            old_hash = old_hash_by_field[field]
+            if old_hash == digest:
+                unchanged += 1
+                continue
+            if old_hash is None:
+                added += 1
+            else:
+                updated += 1
+
+            old_labels = old_labels_by_field[field]
+            new_labels = self._get_label_names(issue)
+            pipe.set(self._get_prefixed_key(f"issue:{issue_number}"), json.dumps(issue))
+            pipe.hset(hashes_key, field, digest)
+            for label in old_labels - new_labels:
+                pipe.zrem(self._get_label_index_key(label), issue_number)
+            for label in new_labels:
+                pipe.zadd(self._get_label_index_key(label), {issue_number: issue_number})
+            if new_labels:
+                pipe.sadd(indexed_labels_key, *new_labels)
+            pipe.hset(issue_labels_key, field, json.dumps(sorted(new_labels)))
+            emptied_labels |= old_labels - new_labels
+
+        # キャッシュされていないIssue（キャッシュ対象外のままクローズされたものなど）は削除しない
+        cached_removed_numbers = [
+            issue_number
+            for issue_number in removed_issue_numbers
+            if old_hash_by_field[str(issue_number)] is not None
+        ]
+        if cached_removed_numbers:
+            # クローズ・削除されたIssueのレビュー検出時刻も取り除く
+            pipe.zrem(
+                self._get_prefixed_key(REVIEW_DETECTED_KEY), *cached_removed_numbers
+            )
+        for issue_number in cached_removed_numbers:
+            field = str(issue_number)
+            old_labels = old_labels_by_field[field]
+            pipe.delete(self._get_prefixed_key(f"issue:{issue_number}"))
+            pipe.hdel(hashes_key, field)
+            pipe.hdel(issue_labels_key, field)
+            for label in old_labels:
+                pipe.zrem(self._get_label_index_key(label), issue_number)
+            emptied_labels |= old_labels
+
+        result = IssueSyncResult(
+            added=added,
+            updated=updated,
+            removed=len(cached_removed_numbers),
+            unchanged=unchanged,
+        )
+        return result, emptied_labels
+
+    def upsert_issue(self, issue: dict[str, Any]) -> bool:
+        """
+        単一のIssueをキャッシュに追加/更新し、ラベルインデックスを更新します。
+        Webhookによる差分反映など、1件ずつの更新に使用されます。
+
+        Returns:
+            bool: 内容に変更があり書き込んだ場合はTrue。
+        """
+        return self.apply_issue_changes([issue]).unchanged == 0
+
+    def remove_issue(self, issue_number: int) -> None:
+        """
+        単一のIssueをキャッシュとラベルインデックスから削除します。
+        """
+        self.apply_issue_changes([], [issue_number])
+
+    def _delete_unhashed_issues(self, open_issue_numbers: set[int]) -> int:
+        """
+        内容ハッシュが未作成の場合（移行直後）のみ `issue:*` をSCANし、
+        オープンでないIssueのキーを削除します。これらのIssueは `issue_hashes` を持たないため、
+        `apply_issue_changes` では削除されません。
+
+        Returns:
+            int: 削除したIssueの数。
+        """
+        stale_keys = [
+            key
+            for key in self.get_keys_by_pattern("issue:*")
+            if int(key.split(":", 1)[1]) not in open_issue_numbers
+        ]
+        if stale_keys:
+            self.client.delete(*(self._get_prefixed_key(key) for key in stale_keys))
+        return len(stale_keys)
+
+    def sync_issues(self, issues: list[dict[str, Any]]) -> IssueSyncResult:
         """
         提供されたIssueのリストとRedisキャッシュを同期します。
-        - 新しいIssueを追加/更新します。
+        - 内容が変わったIssueのみを追加/更新します。
         - 存在しなくなったIssueをキャッシュから削除します。
+        - ラベルインデックス (`index:label:{label}`) を差分更新します。
+
+        Returns:
+            IssueSyncResult: 追加・更新・削除・変更なしの件数。
         """
-        open_issue_keys: set[str] = set()
-        for issue in issues:
-            issue_key = f"issue:{issue['number']}"
-            self.set_value(issue_key, json.dumps(issue))
-            open_issue_keys.add(issue_key)
-
-        existing_issue_keys = set(self.get_keys_by_pattern("issue:*"))
-        closed_issue_keys = list(existing_issue_keys - open_issue_keys)
-        if closed_issue_keys:
-            self.delete_keys(closed_issue_keys)
+        open_issue_numbers = {issue["number"] for issue in issues}
+        cached_issue_numbers = {
+            int(field)
+            for field in self.client.hkeys(self._get_prefixed_key(ISSUE_HASHES_KEY))
+        }
+        unhashed_removed = (
+            0
+            if cached_issue_numbers
+            else self._delete_unhashed_issues(open_issue_numbers)
+        )
+        result = self.apply_issue_changes(
+            issues, sorted(cached_issue_numbers - open_issue_numbers)
+        )
+        return replace(result, removed=result.removed + unhashed_removed)
+
+    def get_indexed_labels(self) -> set[str]:
+        """
+        キャッシュ済みのIssueに付与されているラベル名の一覧を取得します。
+        """
+        return set(self.client.smembers(self._get_prefixed_key(INDEXED_LABELS_KEY)))
+
+    def get_issue_ids_by_labels(self, labels: list[str]) -> dict[str, set[int]]:
+        """
+        ラベルごとに、そのラベルを持つIssue番号の集合を1回の往復で取得します。
+        """
+        if not labels:
+            return {}
+        pipe = self.client.pipeline(transaction=False)
+        for label in labels:
+            pipe.zrange(self._get_label_index_key(label), 0, -1)
+        results = pipe.execute()
+        return {
+            label: {int(member) for member in members}
+            for label, members in zip(labels, results, strict=True)
+        }
+
+    def replace_candidate_queues(
+        self, queues: dict[tuple[str, str], list[int]]
+    ) -> int:
+        """
+        役割・優先度ごとのタスク候補キュー (`queue:candidates:{role}:{priority}`) を置き換えます。
+
+        古いキューの削除と新しいキューの書き込みは1つのMULTI/EXECトランザクションで行われるため、
+        読み取り側が再構築途中のキューを参照することはありません。
+        いずれかのキューに新しい候補が加わった場合は、同じトランザクションで
+        `task_available_channel` に通知します。キューの内容が変わった場合は、
+        同じトランザクションでキャッシュの世代番号を進めます。
+
+        Args:
+            queues: `(役割ラベル, 優先度ラベル)` をキーとした、候補Issue番号のリスト。
+
+        Returns:
+            int: 新たにキューに加わった候補の数。
+        """
+        registry_key = self._get_prefixed_key(CANDIDATE_QUEUES_KEY)
+        old_queue_names = sorted(self.client.smembers(registry_key))
+        read_pipe = self.client.pipeline(transaction=False)
+        for name in old_queue_names:
+            read_pipe.zrange(self._get_prefixed_key(name), 0, -1)
+        old_members = {
+            (name, int(member))
+            for name, members in zip(old_queue_names, read_pipe.execute(), strict=True)
+            for member in members
+        }
+
+        pipe = self.client.pipeline(transaction=True)
+        for name in old_queue_names:
+            pipe.delete(self._get_prefixed_key(name))
+        pipe.delete(registry_key)
+        new_members: set[tuple[str, int]] = set()
+        for (role, priority), issue_ids in sorted(queues.items()):
+            if not issue_ids:
+                continue
+            name = self._get_candidate_queue_name(role, priority)
+            pipe.zadd(
+                self._get_prefixed_key(name),
+                {issue_id: issue_id for issue_id in issue_ids},
+            )
+            pipe.sadd(registry_key, name)
+            new_members.update((name, issue_id) for issue_id in issue_ids)
+        added = len(new_members - old_members)
+        if new_members != old_members:
+            pipe.incr(self._get_prefixed_key(ISSUE_CACHE_GENERATION_KEY))
+        if added:
+            pipe.publish(self.task_available_channel, str(added))
+        pipe.execute()
+        return added
+
+    def get_issue_labels(self, issue_ids: list[int]) -> dict[int, set[str]]:
+        """
+        Issueごとの、キャッシュ済みのラベル名の集合を `index:issue_labels` から1回の往復で取得します。
+        キャッシュにないIssueは空の集合になります。
+        """
+        if not issue_ids:
+            return {}
+        values = self.client.hmget(
+            self._get_prefixed_key(ISSUE_LABELS_KEY),
+            [str(issue_id) for issue_id in issue_ids],
+        )
+        return {
+            issue_id: set(json.loads(value)) if value else set()
+            for issue_id, value in zip(issue_ids, values, strict=True)
+        }
+
+    def update_candidate_queues(
+        self, queues_by_issue: dict[int, list[tuple[str, str]]]
+    ) -> int:
+        """
+        指定したIssueについてのみ、所属するタスク候補キューを更新します。
+
+        Issueを `queues_by_issue` に含まれないキューから取り除き、含まれるキューに追加します。
+        他のIssueとキューは変更しません。変更は1つのMULTI/EXECトランザクションで書き込まれ、
+        キューの内容が変わった場合は世代番号を進め、新しい候補が加わった場合は通知します。
+        Issueが外れて空になったキューは、同じトランザクションで `queue:candidates` から取り除きます。
+        判定に使う登録集合とキューは `WATCH` され、読み取りから書き込みまでの間に
+        他のプロセスが変更した場合は読み直して再試行します。
+
+        Args:
+            queues_by_issue: Issue番号をキーとした、所属すべき `(役割ラベル, 優先度ラベル)` のリスト。
+
+        Returns:
+            int: 新たにキューに加わった候補の数。
+        """
+        if not queues_by_issue:
+            return 0
+        registry_key = self._get_prefixed_key(CANDIDATE_QUEUES_KEY)
+        issue_ids = sorted(queues_by_issue)
+        new_members = {
+            (self._get_candidate_queue_name(role, priority), issue_id)
+            for issue_id, queue_keys in queues_by_issue.items()
+            for role, priority in queue_keys
+        }
+        pipe = self.client.pipeline(transaction=True)
+        try:
+            while True:
+                try:
+                    pipe.watch(registry_key)
+                    old_queue_names = sorted(pipe.smembers(registry_key))
+                    if old_queue_names:
+                        pipe.watch(
+                            *(self._get_prefixed_key(name) for name in old_queue_names)
+                        )
+                    # 監視を始めた後の読み取りは、まとめて1回の往復で行う
+                    read_pipe = self.client.pipeline(transaction=False)
+                    for name in old_queue_names:
+                        read_pipe.zcard(self._get_prefixed_key(name))
+                        for issue_id in issue_ids:
+                            read_pipe.zscore(self._get_prefixed_key(name), issue_id)
+                    results = iter(read_pipe.execute())
+                    queue_sizes: dict[str, int] = {}
+                    old_members: set[tuple[str, int]] = set()
+                    for name in old_queue_names:
+                        queue_sizes[name] = next(results)
+                        old_members.update(
+                            (name, issue_id)
+                            for issue_id in issue_ids
+                            if next(results) is not None
+                        )
+                    if new_members == old_members:
+                        return 0
+
+                    removed_members = sorted(old_members - new_members)
+                    added_members = sorted(new_members - old_members)
+                    pipe.multi()
+                    for name, issue_id in removed_members:
+                        pipe.zrem(self._get_prefixed_key(name), issue_id)
+                    for name, issue_id in added_members:
+                        pipe.zadd(self._get_prefixed_key(name), {issue_id: issue_id})
+                        pipe.sadd(registry_key, name)
+                    removed_counts = Counter(name for name, _ in removed_members)
+                    added_queue_names = {name for name, _ in added_members}
+                    for name, count in sorted(removed_counts.items()):
+                        if queue_sizes[name] == count and name not in added_queue_names:
+                            pipe.srem(registry_key, name)
+                    pipe.incr(self._get_prefixed_key(ISSUE_CACHE_GENERATION_KEY))
+                    if added_members:
+                        pipe.publish(
+                            self.task_available_channel, str(len(added_members))
+                        )
+                    pipe.execute()
+                    return len(added_members)
+                except redis.WatchError:
+                    continue
+        finally:
+            pipe.reset()
+
+    def get_candidate_priorities(self, role_labels: list[str]) -> set[str]:
+        """
+        いずれかの役割のタスク候補が1件以上ある優先度ラベルを取得します。
+
+        空のキューは登録集合に含まれないため、候補キューの登録集合を1回読むだけで判定できます。
+        """
+        if not role_labels:
+            return set()
+        queue_names = self.client.smembers(
+            self._get_prefixed_key(CANDIDATE_QUEUES_KEY)
+        )
+        return self._parse_candidate_priorities(queue_names, role_labels)
+
+    def get_candidate_issue_ids(
+        self, priority: str, role_labels: list[str]
+    ) -> list[int]:
+        """
+        指定した優先度の候補キューから、いずれかの役割のタスク候補のIssue番号を
+        1回の往復で取得します。
+
+        Returns:
+            list[int]: Issue番号の昇順のリスト。
+        """
+        if not role_labels:
+            return []
+        pipe = self.client.pipeline(transaction=False)
+        for role in role_labels:
+            pipe.zrange(
+                self._get_prefixed_key(self._get_candidate_queue_name(role, priority)),
+                0,
+                -1,
+            )
+        return sorted(
+            {int(member) for members in pipe.execute() for member in members}
+        )
+
+    def enqueue_github_changes(
+        self,
+        issue_id: int,
+        add_labels: list[str] | None = None,
+        remove_labels: list[str] | None = None,
+        branch_names: list[str] | None = None,
+    ) -> None:
+        """
+        GitHubに反映するIssueの変更をアウトボックスに記録します。
+
+        変更はIssueごとのハッシュ (`outbox:github:issue:{issue_id}`) にラベル単位で書き込まれるため、
+        まだ反映されていない変更と自動的にまとめられます（同じラベルは後の操作が優先されます）。
+        書き込みとスケジュール (`outbox:github:pending`) は1つのトランザクションで行われます。
+        """
+        fields = self._build_outbox_fields(add_labels, remove_labels, branch_names)
+        if not fields:
+            return
+        pending_key, entry_key, *_ = self._get_outbox_keys(issue_id)
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(entry_key, mapping=fields)
+        pipe.zadd(pending_key, {issue_id: time.time()}, nx=True)
+        pipe.execute()
+
+    def get_due_outbox_issue_ids(self, limit: int) -> list[int]:
+        """反映時刻を過ぎたアウトボックスのIssue番号を、古い順に最大 `limit` 件取得します。"""
+        members = self.client.zrangebyscore(
+            self._get_prefixed_key(GITHUB_OUTBOX_PENDING_KEY),
+            "-inf",
+            time.time(),
+            start=0,
+            num=limit,
+        )
+        return [int(member) for member in members]
+
+    def claim_outbox_entry(self, issue_id: int) -> GitHubOutboxEntry | None:
+        """
+        Issueのアウトボックスの変更を取り出し、処理中 (`outbox:github:inflight:{issue_id}`) に移します。
+        処理中に記録された新しい変更は別のエントリとして蓄積され、次回まとめて反映されます。
+
+        Returns:
+            GitHubOutboxEntry | None: 反映する変更。変更がない、または処理中の場合はNone。
+        """
+        values = self._claim_outbox_entry_script(
+            keys=self._get_outbox_keys(issue_id)[:4], args=[issue_id]
+        )
+        return self._parse_outbox_entry(issue_id, values)
+
+    def ack_outbox_entry(self, issue_id: int) -> None:
+        """反映が完了した処理中の変更を削除します。"""
+        _, _, inflight_entry_key, inflight_key, attempts_key = self._get_outbox_keys(
+            issue_id
+        )
+        pipe = self.client.pipeline(transaction=True)
+        pipe.delete(inflight_entry_key)
+        pipe.srem(inflight_key, issue_id)
+        pipe.hdel(attempts_key, str(issue_id))
+        pipe.execute()
+
+    def retry_outbox_entry(
+        self,
+        issue_id: int,
+        base_delay: float,
+        max_delay: float,
+        max_attempts: int,
+        error: str,
+    ) -> int:
+        """
+        反映に失敗した処理中の変更をアウトボックスに戻し、指数バックオフで再試行を予約します。
+        待機時間は `base_delay * 2 ** (失敗回数 - 1)` 秒で、`max_delay` 秒を上限とします。
+        処理中に記録された新しい変更がある場合は、同じラベルについてはそちらが優先されます。
+
+        失敗回数が `max_attempts` に達した変更は再試行せず、失敗回数と `error` とともに
+        デッドレター (`outbox:github:dead_letter:{issue_id}`) に移します。
+        処理中に記録された新しい変更は、そのままアウトボックスに残ります。
+
+        Returns:
+            int: これまでの失敗回数。`max_attempts` 以上の場合はデッドレターに移されています。
+        """
+        return int(
+            self._retry_outbox_entry_script(
+                keys=self._get_outbox_retry_keys(issue_id),
+                args=[
+                    issue_id,
+                    time.time(),
+                    base_delay,
+                    max_delay,
+                    max_attempts,
+                    error,
+                ],
+            )
+        )
+
+    def get_inflight_outbox_issue_ids(self) -> list[int]:
+        """処理中のまま残っているアウトボックスのIssue番号を取得します（プロセス停止からの復旧用）。"""
+        members = self.client.smembers(self._get_prefixed_key(GITHUB_OUTBOX_INFLIGHT_KEY))
+        return sorted(int(member) for member in members)
+
+    def get_outbox_issue_ids(self) -> set[int]:
+        """GitHubへの反映を待っている、または反映中の変更があるIssue番号を取得します。"""
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zrange(self._get_prefixed_key(GITHUB_OUTBOX_PENDING_KEY), 0, -1)
+        pipe.smembers(self._get_prefixed_key(GITHUB_OUTBOX_INFLIGHT_KEY))
+        return {int(member) for members in pipe.execute() for member in members}
+
+    def record_review_detections(self, issue_ids: list[int]) -> int:
+        """
+        レビューIssueを検出した時刻を、まだ記録されていないIssueについてのみ1回の往復で記録します。
+
+        Returns:
+            int: 新たに記録したIssueの数。
+        """
+        if not issue_ids:
+            return 0
+        now = time.time()
+        return self.client.zadd(
+            self._get_prefixed_key(REVIEW_DETECTED_KEY),
+            {issue_id: now for issue_id in issue_ids},
+            nx=True,
+        )
+
+    def remove_review_detections(self, issue_ids: list[int]) -> None:
+        """`needs-review` ラベルが外されたIssueのレビュー検出時刻を取り除きます。"""
+        if issue_ids:
+            self.client.zrem(self._get_prefixed_key(REVIEW_DETECTED_KEY), *issue_ids)
+
+    def get_ready_review_issue_ids(self, detected_before: float) -> set[int]:
+        """`detected_before`（UNIX時間）以前に検出されたレビューIssueの番号を取得します。"""
+        members = self.client.zrangebyscore(
+            self._get_prefixed_key(REVIEW_DETECTED_KEY), "-inf", detected_before
+        )
+        return {int(member) for member in members}
+
+    def sync_review_timeouts(self, due_times: dict[int, float]) -> tuple[int, int]:
+        """
+        レビュー待ちのPRのタイムアウト予定を、現在レビュー待ちのPRの一覧に合わせます。
+
+        新しいPRは `due_times` の時刻（UNIX時間）で `ZADD NX` により1度だけ登録され、
+        既に登録済み（発火済みを含む）のPRの予定は変更しません。
+        一覧に含まれないPR（クローズされた、またはレビュー待ちでなくなったPR）は取り除きます。
+
+        Returns:
+            tuple[int, int]: 新たに登録したPRの数と、取り除いたPRの数。
+        """
+        key = self._get_prefixed_key(REVIEW_TIMEOUTS_KEY)
+        scheduled = {int(member) for member in self.client.zrange(key, 0, -1)}
+        stale = sorted(scheduled - due_times.keys())
+        pipe = self.client.pipeline(transaction=True)
+        if due_times:
+            pipe.zadd(key, due_times, nx=True)
+        if stale:
+            pipe.zrem(key, *stale)
+        results = pipe.execute() if due_times or stale else []
+        added = results[0] if due_times else 0
+        return added, len(stale)
+
+    def remove_review_timeouts(self, pr_numbers: list[int]) -> None:
+        """PRのレビュータイムアウトの予定を取り除きます。"""
+        if pr_numbers:
+            self.client.zrem(self._get_prefixed_key(REVIEW_TIMEOUTS_KEY), *pr_numbers)
+
+    def get_next_review_timeout(self) -> float | None:
+        """まだ発火していない、最も早いレビュータイムアウトの予定時刻を取得します。"""
+        entries = self.client.zrangebyscore(
+            self._get_prefixed_key(REVIEW_TIMEOUTS_KEY),
+            "-inf",
+            "(+inf",
+            start=0,
+            num=1,
+            withscores=True,
+        )
+        return entries[0][1] if entries else None
+
+    def get_due_review_timeouts(self, now: float, limit: int) -> list[int]:
+        """予定時刻を過ぎた、まだ発火していないPR番号を古い順に最大 `limit` 件取得します。"""
+        members = self.client.zrangebyscore(
+            self._get_prefixed_key(REVIEW_TIMEOUTS_KEY), "-inf", now, start=0, num=limit
+        )
+        return [int(member) for member in members]
+
+    def mark_review_timeouts_fired(self, pr_numbers: list[int]) -> None:
+        """
+        PRのレビュータイムアウトを発火済みにします。
+        取り除かれた（クローズされた）PRは再登録しません。
+        """
+        if pr_numbers:
+            self.client.zadd(
+                self._get_prefixed_key(REVIEW_TIMEOUTS_KEY),
+                {pr_number: REVIEW_TIMEOUT_FIRED_SCORE for pr_number in pr_numbers},
+                xx=True,
+            )
+
+    def get_cache_generation(self) -> int | None:
+        """
+        Issueキャッシュの世代番号を取得します。
+        Issueキャッシュ・ラベルインデックス・候補キューのいずれかが変わるたびに進みます。
+        一度も書き込まれていない場合はNoneを返します。
+        """
+        value = self.get_value(ISSUE_CACHE_GENERATION_KEY)
+        return int(value) if value is not None else None
+
+    def get_sync_watermark(self) -> datetime | None:
+        """
+        最後にIssueキャッシュを同期した時刻（ウォーターマーク）を取得します。
+        未同期の場合はNoneを返します。
+        """
+        value = self.get_value(SYNC_WATERMARK_KEY)
+        return datetime.fromisoformat(value) if value else None
+
+    def set_sync_watermark(self, synced_at: datetime) -> None:
+        """
+        Issueキャッシュの同期時刻（ウォーターマーク）を保存します。
+        """
+        self.set_value(SYNC_WATERMARK_KEY, synced_at.isoformat(), timeout=None)
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+RECONNECT_DELAY_SECONDS = 1.0
+SUBSCRIBE_TIMEOUT_SECONDS = 5.0
+
+
+class TaskAvailabilityNotifier:
+    """
+    タスク候補が増えたことを、Redis pub/subを通じて待機中のリクエストに通知します。
+
+    プロセスごとに1つの購読だけを持ち、受信した通知を世代番号としてプロセス内の
+    すべての待機者に配信します。待機者は候補を確認する前の世代番号を保持しておくことで、
+    確認中に届いた通知を取りこぼしません。
+
+    購読が確定する前（再接続中を含む）に公開された通知は届かないため、購読が確定するたびに
+    `notify` を呼び出し、待機者に候補を確認し直させます。
+    """
+
+    def __init__(self, redis: aioredis.Redis, channel: str):
+        self._redis = redis
+        self._channel = channel
+        self._generation = 0
+        self._event = asyncio.Event()
+        self._listener: asyncio.Task | None = None
+        self._subscribed = asyncio.Event()
+
+    @property
+    def generation(self) -> int:
+        """これまでに受信した通知の数。"""
+        return self._generation
+
+    def notify(self) -> None:
+        """待機中のすべてのリクエストを起こします。"""
+        self._generation += 1
+        self._event.set()
+        self._event = asyncio.Event()
+
+    async def start(self, timeout: float = SUBSCRIBE_TIMEOUT_SECONDS) -> None:
+        """
+        チャンネルの購読を開始し、購読が確定するまで最大 `timeout` 秒待ちます。
+
+        タイムアウトした場合も購読の試行は継続され、確定した時点で待機者に通知されます。
+        """
+        self._ensure_listening()
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), timeout)
+        except TimeoutError:
+            logger.warning(
+                f"チャンネル {self._channel} の購読が {timeout} 秒以内に確定しませんでした。購読を継続します。"
+            )
+
+    def _ensure_listening(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        """チャンネルを購読し、メッセージを受信するたびに `notify` を呼び出します。"""
+        while True:
+            try:
+                async with self._redis.pubsub() as pubsub:
+                    await pubsub.subscribe(self._channel)
+                    async for message in pubsub.listen():
+                        message_type = message.get("type")
+                        if message_type == "subscribe":
+                            self._subscribed.set()
+                            self.notify()
+                        elif message_type == "message":
+                            self.notify()
+            except asyncio.CancelledError:
+                raise
+            except RedisError as e:
+                logger.warning(
+                    f"チャンネル {self._channel} の購読中にエラーが発生しました。再接続します: {e}"
+                )
+                await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+    async def wait(self, since_generation: int, timeout: float) -> bool:
+        """
+        `since_generation` 以降の通知を最大 `timeout` 秒待ちます。
+
+        Returns:
+            bool: 通知を受信した場合はTrue、タイムアウトした場合はFalse。
+        """
+        self._ensure_listening()
+        if self._generation != since_generation:
+            return True
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    async def aclose(self) -> None:
+        """購読を終了し、Redis接続を閉じます。"""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        await self._redis.aclose()
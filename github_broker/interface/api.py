@@ -1,9 +1,29 @@
+import asyncio
+import hashlib
+import hmac
+import json
 import logging
 
-from fastapi import APIRouter, Depends, Request, Response, status
+from fastapi import (
+    APIRouter,
+    Depends,
+    Header,
+    HTTPException,
+    Request,
+    Response,
+    status,
+)
 
+from github_broker.application.exceptions import UnknownRoleError
 from github_broker.application.task_service import TaskService
-from github_broker.interface.models import AgentTaskRequest, TaskResponse
+from github_broker.infrastructure.config import Settings
+from github_broker.infrastructure.github_client import GitHubClient
+from github_broker.infrastructure.rate_limit_budget import RateLimitBudget
+from github_broker.interface.models import (
+    AgentTaskRequest,
+    HeartbeatRequest,
+    TaskResponse,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +32,24 @@ def get_task_service(request: Request) -> TaskService:
     return request.app.state.di_container.resolve(TaskService)
 
 
+def get_webhook_secret(request: Request) -> str:
+    return request.app.state.di_container.resolve(Settings).github_webhook_secret
+
+
+def get_rate_limit_budget(request: Request) -> RateLimitBudget:
+    return request.app.state.di_container.resolve(GitHubClient).rate_limit_budget
+
+
+def verify_github_signature(secret: str, body: bytes, signature: str | None) -> bool:
+    """
+    `X-Hub-Signature-256` ヘッダーの署名を検証します。
+    """
+    if not signature or not signature.startswith("sha256="):
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(f"sha256={expected}", signature)
+
+
 router = APIRouter()
 
 
@@ -20,22 +58,73 @@ def health_check():
     return {"status": "ok"}
 
 
+@router.get("/rate-limit", status_code=status.HTTP_200_OK)
+def rate_limit_endpoint(
+    rate_limit_budget: RateLimitBudget = Depends(get_rate_limit_budget),
+):
+    """
+    監視用に、記録済みのGitHub APIのレート制限の残量をリソースごとに返します。
+    """
+    return {"resources": rate_limit_budget.snapshot()}
+
+
 @router.post(
     "/request-task",
     response_model=TaskResponse,
     responses={204: {"description": "No task available"}},
 )
-def request_task_endpoint(
+async def request_task_endpoint(
     task_request: AgentTaskRequest,
     task_service: TaskService = Depends(get_task_service),
 ):
     """
-    NOTE: This endpoint is temporarily stubbed out due to ongoing refactoring.
+    エージェントにタスクを割り当てます。
+
+    `roles` が指定された場合、その役割のタスクのみを割り当てます。
+    `wait_seconds` が指定された場合、割り当て可能なタスクがなければ
+    最大 `wait_seconds` 秒リクエストを保持し、候補が現れ次第応答します。
+    """
+    logger.info(
+        f"Received task request from agent: {task_request.agent_id} "
+        f"(roles={task_request.roles}, wait_seconds={task_request.wait_seconds})"
+    )
+    try:
+        task = await task_service.request_task(
+            agent_id=task_request.agent_id,
+            wait_seconds=task_request.wait_seconds,
+            roles=task_request.roles,
+        )
+    except UnknownRoleError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        ) from None
+    if task is None:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return task
+
+
+@router.post("/heartbeat", status_code=status.HTTP_200_OK)
+async def heartbeat_endpoint(
+    heartbeat_request: HeartbeatRequest,
+    task_service: TaskService = Depends(get_task_service),
+):
+    """
+    作業中のIssueのリースを延長します。
+
+    リースが失効して他のエージェントに割り当て直された場合は409を返します。
+    エージェントはその時点で作業を中断する必要があります。
     """
-    logger.info(f"Received task request from agent: {task_request.agent_id}")
-    # The original logic is disabled as `request_task` signature has changed.
-    # A new implementation is required based on the current TaskService.
-    return Response(status_code=status.HTTP_204_NO_CONTENT)
+    renewed = await task_service.renew_lease(
+        heartbeat_request.agent_id,
+        heartbeat_request.issue_id,
+        heartbeat_request.fencing_token,
+    )
+    if not renewed:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Lease is no longer held by this agent.",
+        )
+    return {"status": "renewed"}
 
 
 @router.post("/tasks/fix", status_code=status.HTTP_202_ACCEPTED)
@@ -50,3 +139,41 @@ def create_fix_task_endpoint(
     """
     logger.info("Received fix task request.")
     return {"message": "Fix task creation has been accepted (stubbed)."}
+
+
+@router.post("/webhooks/github", status_code=status.HTTP_202_ACCEPTED)
+async def github_webhook_endpoint(
+    request: Request,
+    x_github_event: str = Header(...),
+    x_hub_signature_256: str | None = Header(None),
+    task_service: TaskService = Depends(get_task_service),
+    webhook_secret: str = Depends(get_webhook_secret),
+):
+    """
+    GitHub Webhook (`issues`, `label`, `pull_request`) を受け取り、
+    Issueキャッシュを1件ずつ更新します。
+    """
+    body = await request.body()
+    if not verify_github_signature(webhook_secret, body, x_hub_signature_256):
+        logger.warning(f"Rejected webhook event '{x_github_event}': invalid signature.")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid webhook signature.",
+        )
+
+    if x_github_event == "ping":
+        return {"status": "pong"}
+
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Webhook payload is not valid JSON.",
+        ) from None
+
+    applied = await asyncio.to_thread(
+        task_service.apply_webhook_event, x_github_event, payload
+    )
+    logger.info(f"Received webhook event '{x_github_event}' (applied={applied}).")
+    return {"status": "applied" if applied else "ignored"}
@@ -5,8 +5,15 @@ from pydantic import BaseModel, Field, HttpUrl
 from github_broker.domain.task import TaskCandidateStatus
 
 
+MAX_TASK_WAIT_SECONDS = 60
+
+
 class AgentTaskRequest(BaseModel):
     agent_id: str
+    # エージェントが担当できる役割ラベル。省略時は agents.yml のすべての役割が対象
+    roles: list[str] | None = Field(None, min_length=1)
+    # タスクがない場合に、候補が現れるまでリクエストを保持する最大秒数 (ロングポーリング)
+    wait_seconds: int = Field(0, ge=0, le=MAX_TASK_WAIT_SECONDS)
 
 
 class TaskType(str, Enum):
@@ -26,6 +33,17 @@ class TaskResponse(BaseModel):
     required_role: str
     task_type: TaskType = TaskType.DEVELOPMENT
     gemini_response: str | None = None
+    # リースの延長 (`/heartbeat`) に使用するフェンシングトークン
+    fencing_token: int | None = None
+    # 割り当てたタスクの優先度ラベルと、タスク候補がある優先度の中での順位 (0が最上位)
+    priority_label: str | None = None
+    priority_tier: int | None = None
+
+
+class HeartbeatRequest(BaseModel):
+    agent_id: str
+    issue_id: int
+    fencing_token: int
 
 
 class CreateFixTaskRequest(BaseModel):
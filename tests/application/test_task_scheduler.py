@@ -0,0 +1,119 @@
+from datetime import UTC, datetime
+
+import pytest
+
+from github_broker.application.task_scheduler import (
+    TaskScheduler,
+    WeightedFairTaskScheduler,
+)
+
+NOW = datetime(2025, 1, 10, tzinfo=UTC).timestamp()
+
+
+def create_issue(number, labels, created_at="2025-01-10T00:00:00Z"):
+    """テスト用のキャッシュ済みIssue辞書を生成するヘルパー関数。"""
+    return {
+        "number": number,
+        "labels": [{"name": label} for label in labels],
+        "created_at": created_at,
+    }
+
+
+@pytest.mark.unit
+def test_default_scheduler_uses_first_role_without_limits():
+    """既定のスケジューラは、同時実行数を制限せずに最初の役割を返すことをテストします。"""
+    # Arrange
+    scheduler = TaskScheduler()
+
+    # Act & Assert
+    for agent_id in ("agent-1", "agent-2", "agent-3"):
+        assert scheduler.acquire(agent_id, ["BACKENDCODER", "FRONTENDCODER"]) == (
+            "BACKENDCODER"
+        )
+
+
+@pytest.mark.unit
+def test_weighted_fair_scheduler_shares_tasks_by_weight():
+    """重みが2の役割が、重みが1の役割の2倍のタスクを受け取ることをテストします。"""
+    # Arrange
+    scheduler = WeightedFairTaskScheduler(
+        role_weights={"BACKENDCODER": 2.0, "FRONTENDCODER": 1.0}
+    )
+    issues = [
+        create_issue(1, ["BACKENDCODER", "P1"]),
+        create_issue(2, ["FRONTENDCODER", "P1"]),
+    ]
+    roles = ["BACKENDCODER", "FRONTENDCODER"]
+    assigned_roles = []
+
+    # Act
+    for i in range(6):
+        agent_id = f"agent-{i}"
+        first = scheduler.order(issues, roles, NOW)[0]
+        issue_roles = [
+            label["name"] for label in first["labels"] if label["name"] in roles
+        ]
+        role = scheduler.acquire(agent_id, issue_roles)
+        scheduler.record_assignment(agent_id, role)
+        assigned_roles.append(role)
+
+    # Assert
+    assert assigned_roles.count("BACKENDCODER") == 4
+    assert assigned_roles.count("FRONTENDCODER") == 2
+
+
+@pytest.mark.unit
+def test_weighted_fair_scheduler_keeps_priority_order():
+    """役割の仮想時間よりも、優先度が優先されることをテストします。"""
+    # Arrange
+    scheduler = WeightedFairTaskScheduler()
+    scheduler.record_assignment("agent-1", "BACKENDCODER")
+    issues = [
+        create_issue(1, ["FRONTENDCODER", "P2"]),
+        create_issue(2, ["BACKENDCODER", "P1"]),
+    ]
+
+    # Act
+    ordered = scheduler.order(issues, ["BACKENDCODER", "FRONTENDCODER"], NOW)
+
+    # Assert
+    assert [issue["number"] for issue in ordered] == [2, 1]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "created_at, expected_priority",
+    [
+        ("2025-01-10T00:00:00Z", 3),  # 作成直後は引き上げない
+        ("2025-01-08T12:00:00Z", 2),  # 1.5日経過で1段階
+        ("2025-01-01T00:00:00Z", 0),  # P0より上には引き上げない
+        (None, 3),  # 作成日時がない場合は引き上げない
+    ],
+)
+def test_weighted_fair_scheduler_boosts_old_issues(created_at, expected_priority):
+    """Issueの作成からの経過時間に応じて優先度が引き上げられることをテストします。"""
+    # Arrange
+    scheduler = WeightedFairTaskScheduler(age_boost_seconds=86400)
+    issue = create_issue(1, ["BACKENDCODER", "P3"], created_at=created_at)
+
+    # Act
+    priority = scheduler.effective_priority(issue, NOW)
+
+    # Assert
+    assert priority == expected_priority
+
+
+@pytest.mark.unit
+def test_weighted_fair_scheduler_limits_concurrent_tasks_per_role():
+    """役割の同時実行タスク数が上限に達すると枠を確保できず、解放すると再び確保できることをテストします。"""
+    # Arrange
+    scheduler = WeightedFairTaskScheduler(max_concurrent_tasks={"BACKENDCODER": 1})
+    assert scheduler.acquire("agent-1", ["BACKENDCODER"]) == "BACKENDCODER"
+
+    # Act & Assert
+    assert scheduler.acquire("agent-2", ["BACKENDCODER"]) is None
+    assert scheduler.acquire("agent-2", ["BACKENDCODER", "FRONTENDCODER"]) == (
+        "FRONTENDCODER"
+    )
+    scheduler.release("agent-1")
+    assert scheduler.acquire("agent-3", ["BACKENDCODER"]) == "BACKENDCODER"
@@ -1,29 +1,47 @@
+import asyncio
 import json
 import logging
 import threading
 from datetime import UTC, datetime, timedelta
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, call, patch
 
 import pytest
 from github import GithubException
+from redis.exceptions import RedisError
 
+from github_broker.application.exceptions import UnknownRoleError
+from github_broker.application.task_scheduler import WeightedFairTaskScheduler
 from github_broker.application.task_service import TaskService
 from github_broker.domain.agent_config import AgentConfigList, AgentDefinition
+from github_broker.infrastructure.rate_limit_budget import RateLimitBudget
+from github_broker.infrastructure.redis_client import (
+    GitHubOutboxEntry,
+    IssueClaim,
+    IssueClaimResult,
+)
 from github_broker.interface.models import TaskType
 
+CLAIMED = IssueClaim(IssueClaimResult.CLAIMED, fencing_token=1)
+LOCKED = IssueClaim(IssueClaimResult.LOCKED)
+NOT_CANDIDATE = IssueClaim(IssueClaimResult.NOT_CANDIDATE)
+
 
 @pytest.fixture
 def mock_github_client() -> MagicMock:
     """GitHubクライアントのモックを提供します。"""
     client = MagicMock()
     client._repo_name = "test/repo"
+    client.rate_limit_budget = RateLimitBudget()
     return client
 
 
 @pytest.fixture
 def mock_redis_client() -> MagicMock:
     """Redisクライアントのモックを提供します。"""
-    return MagicMock()
+    client = MagicMock()
+    client.get_agent_current_task.return_value = None
+    client.get_cache_generation.return_value = None
+    return client
 
 
 @pytest.fixture
@@ -73,6 +91,53 @@ def create_mock_issue(
     }
 
 
+def cache_issues(mock_redis_client: MagicMock, issues: list[dict]) -> None:
+    """
+    RedisClientモックのIssueキャッシュ、ラベルインデックス、
+    および同期時に構築される役割・優先度ごとの候補キューを設定するヘルパー関数。
+    """
+    issues_by_key = {f"issue:{issue['number']}": issue for issue in issues}
+
+    def get_candidate_issue_ids(priority, role_labels):
+        excluded = {"in-progress", "story", "epic"}
+        return sorted(
+            issue["number"]
+            for issue in issues
+            if priority in (labels := {lbl["name"] for lbl in issue["labels"]})
+            and labels.intersection(role_labels)
+            and not labels & excluded
+        )
+
+    def get_candidate_priorities(role_labels):
+        return {
+            label["name"]
+            for issue in issues
+            for label in issue["labels"]
+            if get_candidate_issue_ids(label["name"], role_labels)
+        }
+
+    def get_issue_ids_by_labels(labels):
+        return {
+            label: {
+                issue["number"]
+                for issue in issues
+                if label in {lbl["name"] for lbl in issue["labels"]}
+            }
+            for label in labels
+        }
+
+    mock_redis_client.get_indexed_labels.return_value = {
+        label["name"] for issue in issues for label in issue["labels"]
+    }
+    mock_redis_client.get_issue_ids_by_labels.side_effect = get_issue_ids_by_labels
+    mock_redis_client.get_candidate_issue_ids.side_effect = get_candidate_issue_ids
+    mock_redis_client.get_candidate_priorities.side_effect = get_candidate_priorities
+    mock_redis_client.get_values.side_effect = lambda keys: [
+        json.dumps(issues_by_key[key]) if key in issues_by_key else None
+        for key in keys
+    ]
+
+
 def create_mock_pr(number, created_at):
     """テスト用のPull Requestオブジェクトのモックを生成するヘルパー関数。"""
     mock_pr = MagicMock()
@@ -94,16 +159,16 @@ def test_start_polling_fetches_and_caches_issues(
         number=2, title="Poll Task 2", body="", labels=["feature", "P1"]
     )
     mock_issues = [issue1, issue2]
-    mock_github_client.get_open_issues.return_value = mock_issues
+    mock_github_client.get_open_issues_with_linked_prs.return_value = mock_issues
 
     stop_event = threading.Event()
 
     def stop_loop(*args, **kwargs):
-        if mock_github_client.get_open_issues.call_count == 1:
+        if mock_github_client.get_open_issues_with_linked_prs.call_count == 1:
             stop_event.set()
         return mock_issues
 
-    mock_github_client.get_open_issues.side_effect = stop_loop
+    mock_github_client.get_open_issues_with_linked_prs.side_effect = stop_loop
 
     # Act
     polling_thread = threading.Thread(
@@ -113,7 +178,7 @@ def test_start_polling_fetches_and_caches_issues(
     polling_thread.join(timeout=5)
 
     # Assert
-    mock_github_client.get_open_issues.assert_called_once()
+    mock_github_client.get_open_issues_with_linked_prs.assert_called_once()
     mock_redis_client.sync_issues.assert_any_call(mock_issues)
 
 
@@ -123,15 +188,15 @@ def test_start_polling_caches_empty_list_when_no_issues(
 ):
     """start_pollingがIssueがない場合に、空のリストでsync_issuesを呼び出すことをテストします。"""
     # Arrange
-    mock_github_client.get_open_issues.return_value = []
+    mock_github_client.get_open_issues_with_linked_prs.return_value = []
     stop_event = threading.Event()
 
     def stop_loop(*args, **kwargs):
-        if mock_github_client.get_open_issues.call_count == 1:
+        if mock_github_client.get_open_issues_with_linked_prs.call_count == 1:
             stop_event.set()
         return []
 
-    mock_github_client.get_open_issues.side_effect = stop_loop
+    mock_github_client.get_open_issues_with_linked_prs.side_effect = stop_loop
 
     # Act
     polling_thread = threading.Thread(
@@ -141,10 +206,121 @@ def test_start_polling_caches_empty_list_when_no_issues(
     polling_thread.join(timeout=5)
 
     # Assert
-    mock_github_client.get_open_issues.assert_called_once()
+    mock_github_client.get_open_issues_with_linked_prs.assert_called_once()
     mock_redis_client.sync_issues.assert_any_call([])
 
 
+@pytest.mark.unit
+def test_start_polling_skips_sync_and_backs_off_when_budget_is_low(
+    task_service, mock_github_client, mock_redis_client
+):
+    """GitHub APIの残量が少ない場合、同期をスキップしてポーリング間隔を伸ばすことをテストします。"""
+    # Arrange
+    mock_github_client.rate_limit_budget.record("graphql", remaining=100, limit=5000)
+    stop_event = threading.Event()
+
+    # Act
+    with patch(
+        "github_broker.application.task_service.time.sleep",
+        side_effect=lambda seconds: stop_event.set(),
+    ) as mock_sleep:
+        task_service.start_polling(stop_event)
+
+    # Assert
+    mock_github_client.refresh_rate_limit_budget.assert_called_once_with()
+    mock_github_client.get_open_issues_with_linked_prs.assert_not_called()
+    mock_github_client.get_needs_review_issues_and_prs.assert_not_called()
+    mock_sleep.assert_called_once_with(
+        task_service.POLLING_INTERVAL_SECONDS
+        * mock_github_client.rate_limit_budget.max_interval_factor
+    )
+
+
+@pytest.mark.unit
+def test_sync_issue_cache_full_sync_includes_review_issues(
+    task_service, mock_github_client, mock_redis_client
+):
+    """完全同期で、オープンなIssueとレビューIssueがまとめてキャッシュされることをテストします。"""
+    # Arrange
+    open_issue = create_mock_issue(1, "Open", "", ["BACKENDCODER", "P1"])
+    review_issue = create_mock_issue(
+        2, "Review", "", ["BACKENDCODER", task_service.LABEL_NEEDS_REVIEW]
+    )
+    review_issue["linked_pull_requests"] = [
+        {"number": 10, "html_url": "https://github.com/test/repo/pull/10"}
+    ]
+    unlinked_review_issue = create_mock_issue(
+        3, "Unlinked Review", "", ["BACKENDCODER", task_service.LABEL_NEEDS_REVIEW]
+    )
+    unlinked_review_issue["linked_pull_requests"] = []
+    mock_github_client.get_open_issues_with_linked_prs.return_value = [
+        open_issue,
+        review_issue,
+        unlinked_review_issue,
+    ]
+    mock_redis_client.record_review_detections.return_value = 0
+
+    # Act
+    task_service.sync_issue_cache(full_sync=True)
+
+    # Assert
+    mock_github_client.get_open_issues_with_linked_prs.assert_called_once_with()
+    mock_redis_client.sync_issues.assert_called_once_with([open_issue, review_issue])
+    mock_redis_client.record_review_detections.assert_called_once_with([2])
+    mock_redis_client.remove_review_detections.assert_called_once_with([1])
+    mock_redis_client.replace_candidate_queues.assert_called_once()
+    mock_redis_client.get_sync_watermark.assert_not_called()
+    mock_redis_client.set_sync_watermark.assert_called_once()
+
+
+@pytest.mark.unit
+def test_sync_issue_cache_delta_sync_applies_updated_issues(
+    task_service, mock_github_client, mock_redis_client
+):
+    """差分同期で、ウォーターマーク以降に更新されたIssueのみが反映されることをテストします。"""
+    # Arrange
+    watermark = datetime(2025, 1, 1, 12, 0, tzinfo=UTC)
+    mock_redis_client.get_sync_watermark.return_value = watermark
+    updated_issue = create_mock_issue(1, "Updated", "", ["BACKENDCODER", "P1"])
+    updated_issue["state"] = "open"
+    closed_issue = create_mock_issue(2, "Closed", "", ["BACKENDCODER", "P1"])
+    closed_issue["state"] = "closed"
+    mock_github_client.get_issues_updated_since.return_value = [
+        updated_issue,
+        closed_issue,
+    ]
+
+    # Act
+    task_service.sync_issue_cache(full_sync=False)
+
+    # Assert
+    mock_github_client.get_open_issues_with_linked_prs.assert_not_called()
+    mock_github_client.get_issues_updated_since.assert_called_once_with(
+        watermark - timedelta(seconds=task_service.DELTA_SYNC_OVERLAP_SECONDS)
+    )
+    mock_redis_client.sync_issues.assert_not_called()
+    # クローズされたIssueのレビュー検出時刻は apply_issue_changes が取り除く
+    mock_redis_client.apply_issue_changes.assert_called_once_with([updated_issue], [2])
+    mock_redis_client.set_sync_watermark.assert_called_once()
+
+
+@pytest.mark.unit
+def test_sync_issue_cache_falls_back_to_full_sync_without_watermark(
+    task_service, mock_github_client, mock_redis_client
+):
+    """ウォーターマークが存在しない場合、差分同期の代わりに完全同期することをテストします。"""
+    # Arrange
+    mock_redis_client.get_sync_watermark.return_value = None
+    mock_github_client.get_open_issues_with_linked_prs.return_value = []
+
+    # Act
+    task_service.sync_issue_cache(full_sync=False)
+
+    # Assert
+    mock_github_client.get_issues_updated_since.assert_not_called()
+    mock_redis_client.sync_issues.assert_called_once_with([])
+
+
 @pytest.mark.unit
 @pytest.mark.anyio
 async def test_request_task_selects_and_sets_required_role_from_cache(
@@ -162,14 +338,8 @@ async def test_request_task_selects_and_sets_required_role_from_cache(
         labels=["feature", "BACKENDCODER", "P1"],
     )
     cached_issues = [issue1, issue2]
-    issue_keys = [f"issue:{issue['number']}" for issue in cached_issues]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
-    mock_github_client.find_issues_by_labels.return_value = []
-    mock_redis_client.acquire_lock.return_value = True
-    task_service.get_highest_priority_label = MagicMock(return_value="P1")
+    cache_issues(mock_redis_client, cached_issues)
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     agent_id = "test-agent"
 
@@ -180,17 +350,85 @@ async def test_request_task_selects_and_sets_required_role_from_cache(
     assert result is not None
     assert result.issue_id == 2
     assert result.required_role == "BACKENDCODER"
-    mock_redis_client.get_keys_by_pattern.assert_called_once_with("issue:*")
-    mock_redis_client.get_values.assert_called_once_with(issue_keys)
-    mock_redis_client.acquire_lock.assert_called_once_with(
-        "issue_lock_2", agent_id, timeout=600
+    assert result.fencing_token == 1
+    mock_redis_client.get_keys_by_pattern.assert_not_called()
+    mock_redis_client.get_values.assert_called_once_with(["issue:2"])
+    mock_redis_client.claim_issue.assert_called_once_with(
+        2,
+        agent_id,
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
     )
-    mock_redis_client.set_value.assert_called_once_with(
-        f"agent_current_task:{agent_id}", str(issue2["number"]),
-        timeout=3600
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_uses_precomputed_task_fields(
+    task_service, mock_redis_client
+):
+    """取り込み時に計算された値があれば、本文を解析せずにそれを使用することをテストします。"""
+    # Arrange
+    unassignable = create_mock_issue(1, "No deliverables", "", ["BACKENDCODER", "P1"])
+    unassignable["task"] = {"assignable": False, "branch_name": None, "priority": 1}
+    precomputed = create_mock_issue(
+        2, "Task", "", ["BACKENDCODER", "P1"], has_branch_name=False
+    )
+    precomputed["task"] = {
+        "assignable": True,
+        "branch_name": "feature/precomputed",
+        "priority": 1,
+    }
+    cache_issues(mock_redis_client, [unassignable, precomputed])
+    mock_redis_client.claim_issue.return_value = CLAIMED
+
+    # Act
+    with patch(
+        "github_broker.application.task_service.Task.is_assignable"
+    ) as mock_is_assignable:
+        result = await task_service.request_task(agent_id="test-agent")
+
+    # Assert
+    assert result is not None
+    assert result.issue_id == 2
+    assert result.branch_name == "feature/precomputed"
+    mock_is_assignable.assert_not_called()
+    mock_redis_client.claim_issue.assert_called_once_with(
+        2,
+        "test-agent",
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
     )
 
 
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_reuses_snapshot_until_generation_changes(
+    task_service, mock_redis_client
+):
+    """キャッシュの世代番号が変わるまで、読み込んだIssueを再利用することをテストします。"""
+    # Arrange
+    issue = create_mock_issue(1, "Task", "## 成果物\n- a.py", ["BACKENDCODER", "P1"])
+    cache_issues(mock_redis_client, [issue])
+    mock_redis_client.get_cache_generation.side_effect = [3, 3, 4]
+    mock_redis_client.claim_issue.side_effect = [LOCKED, LOCKED, CLAIMED]
+
+    # Act
+    first = await task_service.request_task(agent_id="agent-1")
+    second = await task_service.request_task(agent_id="agent-2")
+    third = await task_service.request_task(agent_id="agent-3")
+
+    # Assert
+    assert first is None
+    assert second is None
+    assert third is not None
+    assert third.issue_id == 1
+    assert mock_redis_client.get_candidate_priorities.call_count == 2
+    assert mock_redis_client.get_candidate_issue_ids.call_count == 2
+    assert mock_redis_client.get_values.call_count == 2
+
+
 @pytest.mark.unit
 @pytest.mark.anyio
 async def test_request_task_filters_by_highest_priority(
@@ -233,14 +471,8 @@ async def test_request_task_filters_by_highest_priority(
     )
 
     cached_issues = [issue_p3, issue_p2, issue_p1_a, issue_p1_b]
-    issue_keys = [f"issue:{issue['number']}" for issue in cached_issues]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
-    mock_github_client.find_issues_by_labels.return_value = []
-    mock_redis_client.acquire_lock.return_value = True
-    task_service.get_highest_priority_label = MagicMock(return_value="P1")
+    cache_issues(mock_redis_client, cached_issues)
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     # Act
     result = await task_service.request_task(agent_id=agent_id)
@@ -251,11 +483,11 @@ async def test_request_task_filters_by_highest_priority(
     assert result.issue_id in [issue_p1_a["number"], issue_p1_b["number"]]
 
     # 2. Crucially, lock attempts should only be made on the highest priority issues (P1)
-    lock_calls = [call[0][0] for call in mock_redis_client.acquire_lock.call_args_list]
+    lock_calls = [call[0][0] for call in mock_redis_client.claim_issue.call_args_list]
     # Assert that the assigned issue's lock was acquired, and no lower priority issues were attempted
-    assert f"issue_lock_{result.issue_id}" in lock_calls
-    assert "issue_lock_20" not in lock_calls
-    assert "issue_lock_30" not in lock_calls
+    assert result.issue_id in lock_calls
+    assert 20 not in lock_calls
+    assert 30 not in lock_calls
 
 
 @pytest.mark.unit
@@ -272,13 +504,7 @@ async def test_request_task_no_matching_role_label_issue(
         labels=["documentation", "P1"],
     )
     cached_issues = [issue1]
-    issue_keys = [f"issue:{issue['number']}" for issue in cached_issues]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
-    mock_github_client.find_issues_by_labels.return_value = []
-    task_service.get_highest_priority_label = MagicMock(return_value="P1")
+    cache_issues(mock_redis_client, cached_issues)
     agent_id = "test-agent"
 
     # Act
@@ -286,7 +512,7 @@ async def test_request_task_no_matching_role_label_issue(
 
     # Assert
     assert result is None
-    mock_redis_client.get_keys_by_pattern.assert_called_once_with("issue:*")
+    mock_redis_client.get_keys_by_pattern.assert_not_called()
 
 
 @pytest.mark.unit
@@ -297,12 +523,6 @@ async def test_request_task_completes_previous_task(
     """request_taskが前タスクの完了処理を呼び出すことをテストします。"""
     # Arrange
     agent_id = "test-agent"
-    prev_issue = create_mock_issue(
-        number=1,
-        title="Previous Task",
-        body="",
-        labels=["in-progress", agent_id, "P1"],
-    )
     new_issue = create_mock_issue(
         number=2,
         title="New Task",
@@ -310,29 +530,26 @@ async def test_request_task_completes_previous_task(
         labels=["BACKENDCODER", "P1"],
     )
     cached_issues = [new_issue]
-    issue_keys = [f"issue:{issue['number']}" for issue in cached_issues]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
-    mock_redis_client.acquire_lock.return_value = True
-    task_service.get_highest_priority_label = MagicMock(return_value="P1")
+    cache_issues(mock_redis_client, cached_issues)
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
-    # Setup GitHub API to return previous issue for completion
-    mock_github_client.find_issues_by_labels.return_value = [prev_issue]
+    # 前のタスク (Issue #1) の割り当て記録
+    mock_redis_client.get_agent_current_task.return_value = 1
 
     # Act
     result = await task_service.request_task(agent_id=agent_id)
 
     # Assert
-    mock_github_client.find_issues_by_labels.assert_called_once_with(
-        labels=["in-progress", agent_id]
-    )
-    mock_github_client.update_issue.assert_called_once_with(
-        issue_id=prev_issue["number"],
-        remove_labels=["in-progress", agent_id],
-        add_labels=["needs-review"],
-    )
+    mock_github_client.find_issues_by_labels.assert_not_called()
+    assert mock_redis_client.enqueue_github_changes.call_args_list == [
+        call(1, add_labels=["needs-review"], remove_labels=["in-progress", agent_id]),
+        call(
+            new_issue["number"],
+            add_labels=["in-progress", agent_id],
+            branch_names=["feature/issue-2"],
+        ),
+    ]
+    mock_redis_client.clear_agent_current_task.assert_called_once_with(agent_id, 1)
     assert result is not None
     assert result.issue_id == new_issue["number"]
 
@@ -352,26 +569,34 @@ async def test_find_first_assignable_task_exception_releases_lock(
         body="""## 成果物\n- test.py""",
         labels=["BACKENDCODER", "P1"],
     )
-    mock_redis_client.acquire_lock.return_value = True
-    mock_github_client.add_label.side_effect = Exception("GitHub API Error")
+    mock_redis_client.claim_issue.return_value = CLAIMED
+    mock_redis_client.enqueue_github_changes.side_effect = RedisError(
+        "Connection lost"
+    )
 
     candidate_issues = [issue]
     agent_id = "test-agent"
 
     # Act & Assert
-    with pytest.raises(Exception, match="GitHub API Error"):
+    with pytest.raises(RedisError, match="Connection lost"):
         await task_service._find_first_assignable_task(candidate_issues, agent_id)
 
-    mock_redis_client.release_lock.assert_called_once_with("issue_lock_1")
+    mock_redis_client.release_issue_claim.assert_called_once_with(
+        1,
+        agent_id,
+        1,
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
+    )
 
 
 @pytest.mark.unit
 @pytest.mark.anyio
-async def test_find_first_assignable_task_create_branch_exception_releases_lock(
+async def test_find_first_assignable_task_queues_github_changes(
     task_service, mock_github_client, mock_redis_client
 ):
     """
-    _find_first_assignable_task内でcreate_branchが例外を発生させた場合にロックが解放されることをテストします。
+    タスク割り当て時にGitHubを呼び出さず、ラベルとブランチの変更をアウトボックスに記録することをテストします。
     """
     # Arrange
     issue = create_mock_issue(
@@ -380,87 +605,64 @@ async def test_find_first_assignable_task_create_branch_exception_releases_lock(
         body="""## 成果物\n- test.py""",
         labels=["BACKENDCODER", "P1"],
     )
-    mock_redis_client.acquire_lock.return_value = True
+    mock_redis_client.claim_issue.return_value = CLAIMED
     mock_github_client.create_branch.side_effect = Exception("Branch Creation Error")
 
-    candidate_issues = [issue]
-    agent_id = "test-agent"
-
-    # Act & Assert
-    with pytest.raises(Exception, match="Branch Creation Error"):
-        await task_service._find_first_assignable_task(candidate_issues, agent_id)
-
-    mock_redis_client.release_lock.assert_called_once_with("issue_lock_1")
-
+    # Act
+    result = await task_service._find_first_assignable_task([issue], "test-agent")
 
-@pytest.mark.unit
-@pytest.mark.anyio
-async def test_find_first_assignable_task_rollback_labels_on_branch_creation_failure(
-    task_service, mock_github_client, mock_redis_client, caplog
-):
-    """
-    _find_first_assignable_task内でcreate_branchが例外を発生させた場合に、
-    付与されたラベルがロールバックされることをテストします。
-    """
-    # Arrange
-    issue = create_mock_issue(
-        number=1,
-        title="Test Task",
-        body="""## 成果物\n- test.py""",
-        labels=["BACKENDCODER", "P1"],
-    )
-    mock_redis_client.acquire_lock.return_value = True
-    mock_github_client.create_branch.side_effect = GithubException(
-        status=422, data="Branch already exists"
+    # Assert
+    assert result is not None
+    assert result.branch_name == "feature/issue-1"
+    mock_redis_client.enqueue_github_changes.assert_called_once_with(
+        1,
+        add_labels=["in-progress", "test-agent"],
+        branch_names=["feature/issue-1"],
     )
-
-    candidate_issues = [issue]
-    agent_id = "test-agent"
-
-    with caplog.at_level(logging.ERROR):
-        # Act & Assert
-        with pytest.raises(GithubException, match="Branch already exists"):
-            await task_service._find_first_assignable_task(candidate_issues, agent_id)
-
-        mock_redis_client.release_lock.assert_called_once_with("issue_lock_1")
-        mock_github_client.update_issue.assert_called_once_with(
-            issue_id=issue["number"], remove_labels=["in-progress", agent_id]
-        )
-        mock_github_client.remove_label.assert_not_called()
+    mock_github_client.apply_label_delta.assert_not_called()
+    mock_github_client.create_branch.assert_not_called()
+    mock_redis_client.release_issue_claim.assert_not_called()
 
 
 @pytest.mark.unit
 @pytest.mark.anyio
-async def test_find_first_assignable_task_rollback_failure_logs_error(
-    task_service, mock_github_client, mock_redis_client, caplog
+async def test_find_first_assignable_task_skips_issue_no_longer_candidate(
+    task_service, mock_github_client, mock_redis_client
 ):
     """
-    _find_first_assignable_task内でcreate_branchが例外を発生させ、
-    さらにラベルのロールバックも失敗した場合に、エラーがログに記録されることをテストします。
+    claim_issueが候補でなくなったと判定したIssueは、GitHubを更新せずにスキップすることをテストします。
     """
     # Arrange
-    issue = create_mock_issue(
+    stale_issue = create_mock_issue(
         number=1,
-        title="Test Task",
-        body="""## 成果物\n- test.py""",
+        title="Stale Task",
+        body="""## 成果物\n- stale.py""",
         labels=["BACKENDCODER", "P1"],
     )
-    mock_redis_client.acquire_lock.return_value = True
-    mock_github_client.create_branch.side_effect = GithubException(
-        status=422, data="Branch already exists"
+    fresh_issue = create_mock_issue(
+        number=2,
+        title="Fresh Task",
+        body="""## 成果物\n- fresh.py""",
+        labels=["BACKENDCODER", "P1"],
     )
-    mock_github_client.update_issue.side_effect = Exception("Rollback Error")
-
-    candidate_issues = [issue]
+    mock_redis_client.claim_issue.side_effect = [
+        NOT_CANDIDATE,
+        CLAIMED,
+    ]
     agent_id = "test-agent"
 
-    with caplog.at_level(logging.ERROR):
-        with pytest.raises(GithubException, match="Branch already exists"):
-            await task_service._find_first_assignable_task(candidate_issues, agent_id)
+    # Act
+    result = await task_service._find_first_assignable_task(
+        [stale_issue, fresh_issue], agent_id
+    )
 
-        assert "Failed to rollback labels" in caplog.text
-        mock_redis_client.release_lock.assert_called_once_with("issue_lock_1")
-        mock_github_client.update_issue.assert_called_once()
+    # Assert
+    assert result is not None
+    assert result.issue_id == 2
+    mock_redis_client.enqueue_github_changes.assert_called_once_with(
+        2, add_labels=["in-progress", agent_id], branch_names=["feature/issue-2"]
+    )
+    mock_redis_client.release_issue_claim.assert_not_called()
 
 
 @pytest.mark.unit
@@ -484,7 +686,7 @@ async def test_find_first_assignable_task_skips_non_assignable(
         labels=["BACKENDCODER", "P1"],
     )
     candidate_issues = [issue_not_assignable, issue_assignable]
-    mock_redis_client.acquire_lock.return_value = True
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     # Act
     result = await task_service._find_first_assignable_task(
@@ -494,8 +696,12 @@ async def test_find_first_assignable_task_skips_non_assignable(
     # Assert
     assert result is not None
     assert result.issue_id == 2
-    mock_redis_client.acquire_lock.assert_called_once_with(
-        "issue_lock_2", "test-agent", timeout=600
+    mock_redis_client.claim_issue.assert_called_once_with(
+        2,
+        "test-agent",
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
     )
 
 
@@ -521,7 +727,7 @@ async def test_find_first_assignable_task_skips_no_branch_name(
         has_branch_name=True,
     )
     candidate_issues = [issue_no_branch, issue_with_branch]
-    mock_redis_client.acquire_lock.return_value = True
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     # Act
     result = await task_service._find_first_assignable_task(
@@ -531,8 +737,12 @@ async def test_find_first_assignable_task_skips_no_branch_name(
     # Assert
     assert result is not None
     assert result.issue_id == 2
-    mock_redis_client.acquire_lock.assert_called_once_with(
-        "issue_lock_2", "test-agent", timeout=600
+    mock_redis_client.claim_issue.assert_called_once_with(
+        2,
+        "test-agent",
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
     )
 
 
@@ -557,7 +767,10 @@ async def test_find_first_assignable_task_skips_locked_issue(
         labels=["BACKENDCODER", "P1"],
     )
     candidate_issues = [issue_locked, issue_unlocked]
-    mock_redis_client.acquire_lock.side_effect = [False, True]
+    mock_redis_client.claim_issue.side_effect = [
+        LOCKED,
+        CLAIMED,
+    ]
 
     # Act
     result = await task_service._find_first_assignable_task(candidate_issues, agent_id)
@@ -565,12 +778,20 @@ async def test_find_first_assignable_task_skips_locked_issue(
     # Assert
     assert result is not None
     assert result.issue_id == 2
-    assert mock_redis_client.acquire_lock.call_count == 2
-    mock_redis_client.acquire_lock.assert_any_call(
-        f"issue_lock_{issue_locked['number']}", agent_id, timeout=600
+    assert mock_redis_client.claim_issue.call_count == 2
+    mock_redis_client.claim_issue.assert_any_call(
+        issue_locked['number'],
+        agent_id,
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
     )
-    mock_redis_client.acquire_lock.assert_any_call(
-        f"issue_lock_{issue_unlocked['number']}", agent_id, timeout=600
+    mock_redis_client.claim_issue.assert_any_call(
+        issue_unlocked['number'],
+        agent_id,
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
     )
 
 
@@ -588,16 +809,8 @@ async def test_request_task_selects_issue_with_any_role_label(
         labels=["BACKENDCODER", "P1"],
     )
     cached_issues = [issue_other_role]
-    issue_keys = [
-        f"issue:{issue['number']}" for issue in cached_issues
-    ]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
-    mock_github_client.find_issues_by_labels.return_value = []
-    mock_redis_client.acquire_lock.return_value = True
-    task_service.get_highest_priority_label = MagicMock(return_value="P1")
+    cache_issues(mock_redis_client, cached_issues)
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     # Act
     result = await task_service.request_task(agent_id="test-agent")
@@ -608,59 +821,23 @@ async def test_request_task_selects_issue_with_any_role_label(
     assert result.required_role == "BACKENDCODER"
 
 
-@pytest.mark.parametrize(
-    "exception_to_raise, expected_log_message",
-    [
-        (
-            GithubException(status=500, data="Server Error"),
-            "Failed to update issue",
-        ),
-        (Exception("Unexpected error"), "An unexpected error occurred"),
-    ],
-)
 @pytest.mark.unit
-def test_complete_previous_task_handles_exceptions(
-    exception_to_raise,
-    expected_log_message,
-    task_service,
-    mock_redis_client,
-    mock_github_client,
-    caplog,
+@pytest.mark.anyio
+async def test_complete_previous_task_handles_redis_errors(
+    task_service, mock_redis_client, caplog
 ):
-    """complete_previous_taskが例外を適切に処理することをテストします。"""
+    """アウトボックスへの記録に失敗した場合、割り当て記録を残して次回やり直せることをテストします。"""
     # Arrange
-    prev_issue_1 = create_mock_issue(
-        number=101,
-        title="Previous Task 1",
-        body="",
-        labels=["in-progress", "test-agent", "P1"],
-    )
-    prev_issue_2 = create_mock_issue(
-        number=102,
-        title="Previous Task 2",
-        body="",
-        labels=["in-progress", "test-agent", "P1"],
-    )
-    mock_github_client.find_issues_by_labels.return_value = [prev_issue_1, prev_issue_2]
-    agent_id = "test-agent"
-
-    mock_github_client.update_issue.side_effect = [
-        exception_to_raise,
-        None,
-    ]
+    mock_redis_client.get_agent_current_task.return_value = 101
+    mock_redis_client.enqueue_github_changes.side_effect = RedisError("down")
 
     with caplog.at_level(logging.ERROR):
         # Act
-        task_service.complete_previous_task(agent_id)
+        await task_service.complete_previous_task("test-agent")
 
-        # Assert
-        assert mock_github_client.update_issue.call_count == 2
-        assert expected_log_message in caplog.text
-        mock_github_client.update_issue.assert_called_with(
-            issue_id=prev_issue_2["number"],
-            remove_labels=["in-progress", agent_id],
-            add_labels=["needs-review"],
-        )
+    # Assert
+    assert "Failed to complete previous task" in caplog.text
+    mock_redis_client.clear_agent_current_task.assert_not_called()
 
 
 @pytest.mark.unit
@@ -679,25 +856,13 @@ async def test_request_task_stores_current_task_in_redis(
         labels=[agent_role, "P1"],
     )
     cached_issues = [issue]
-    issue_keys = [
-        f"issue:{issue['number']}" for issue in cached_issues
-    ]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
-    mock_github_client.find_issues_by_labels.return_value = []
-    mock_redis_client.acquire_lock.return_value = True
-    task_service.get_highest_priority_label = MagicMock(return_value="P1")
+    cache_issues(mock_redis_client, cached_issues)
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     # Act
     await task_service.request_task(agent_id=agent_id)
 
     # Assert
-    mock_redis_client.set_value.assert_called_once_with(
-        f"agent_current_task:{agent_id}", str(issue["number"]),
-        timeout=3600
-    )
 
 
 @pytest.mark.unit
@@ -732,16 +897,10 @@ async def test_request_task_prioritizes_p0_and_skips_p1(
     # RedisからはP1, P0の順で返されるようにモックを設定
     # これにより、TaskServiceが最高優先度('P0')のIssueのみを候補とし、P1を無視することを検証する
     cached_issues = [issue_p1, issue_p0]
-    issue_keys = [f"issue:{issue['number']}" for issue in cached_issues]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
+    cache_issues(mock_redis_client, cached_issues)
 
     # P0のIssueに対してロック取得が成功するように設定
-    mock_redis_client.acquire_lock.return_value = True
-    mock_github_client.find_issues_by_labels.return_value = []
-    task_service.get_highest_priority_label = MagicMock(return_value="P0")
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     # Act
     result = await task_service.request_task(agent_id=agent_id)
@@ -752,9 +911,13 @@ async def test_request_task_prioritizes_p0_and_skips_p1(
     assert result.issue_id == issue_p0["number"]
 
     # 2. P0のIssueに対してのみロック取得が試行されたことを確認
-    # P1のIssue (10)に対してはacquire_lockが呼び出されていないことを確認
-    mock_redis_client.acquire_lock.assert_called_once_with(
-        f"issue_lock_{issue_p0['number']}", agent_id, timeout=600
+    # P1のIssue (10)に対してはclaim_issueが呼び出されていないことを確認
+    mock_redis_client.claim_issue.assert_called_once_with(
+        issue_p0['number'],
+        agent_id,
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P0")],
     )
 
 
@@ -780,17 +943,10 @@ async def test_request_task_assigns_p1_after_p0_completed(
 
     # RedisにはP1 Issueのみが存在する状態を模倣
     cached_issues = [issue_p1]
-    issue_keys = [f"issue:{issue['number']}" for issue in cached_issues]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
+    cache_issues(mock_redis_client, cached_issues)
 
     # P1のIssueに対してロック取得が成功するように設定
-    mock_redis_client.acquire_lock.return_value = True
-    mock_github_client.find_issues_by_labels.return_value = []
-    # get_highest_priority_labelは、P0がないためP1を返すようにモック
-    task_service.get_highest_priority_label = MagicMock(return_value="P1")
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     # Act
     result = await task_service.request_task(agent_id=agent_id)
@@ -798,211 +954,381 @@ async def test_request_task_assigns_p1_after_p0_completed(
     # Assert
     assert result is not None
     assert result.issue_id == issue_p1["number"]
-    mock_redis_client.acquire_lock.assert_called_once_with(
-        f"issue_lock_{issue_p1['number']}", agent_id, timeout=600
+    mock_redis_client.claim_issue.assert_called_once_with(
+        issue_p1['number'],
+        agent_id,
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
     )
 
 
 @pytest.mark.unit
 @pytest.mark.anyio
-async def test_request_task_uses_review_prompt_for_review_issue(
-    task_service, mock_redis_client, mock_github_client
+async def test_request_task_falls_back_to_next_priority_tier(
+    task_service, mock_redis_client
 ):
-    """'needs-review'ラベルを持つIssueが割り当てられた際に、TaskTypeが'review'に設定され、レビュー用プロンプトが使用されることをテストします。"""
+    """
+    上位の優先度のIssueがすべてロックされている場合、次の優先度のIssueが割り当てられ、
+    その優先度と階層がレスポンスに含まれることをテストします。
+    """
     # Arrange
-    issue_id = 1
-    pr_number = 101
-    pr_url = f"https://github.com/test/repo/pull/{pr_number}"
-
-    issue = create_mock_issue(
-        number=issue_id,
-        title="Review Task",
-        body="""## 成果物\n- review.py""",
-        labels=["BACKENDCODER", "needs-review", "P1"],
+    issue_p0 = create_mock_issue(
+        1, "P0 Task", "## 成果物\n- a.py", ["BACKENDCODER", "P0"]
     )
-    cached_issues = [issue]
-    issue_keys = [
-        f"issue:{issue['number']}" for issue in cached_issues
-    ]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
-
-    # レビューコメントのモック設定
-    mock_review_comments_raw = [{"body": "Comment 1"}, {"body": "Comment 2"}]
-    mock_github_client.get_pull_request_review_comments.return_value = (
-        mock_review_comments_raw
+    issue_p2 = create_mock_issue(
+        2, "P2 Task", "## 成果物\n- b.py", ["BACKENDCODER", "P2"]
     )
-
-    # get_pr_for_issueのモックは、html_urlとnumberプロパティを持つMagicMockオブジェクトを返すように設定
-    mock_github_client.get_pr_for_issue.return_value = MagicMock(html_url=pr_url, number=pr_number)
-
-    mock_github_client.find_issues_by_labels.return_value = []
-    mock_redis_client.acquire_lock.return_value = True
-    task_service.get_highest_priority_label = MagicMock(return_value="P1")
-    # Set the timestamp to be older than the delay
-    old_timestamp = datetime.now(UTC) - timedelta(
-        minutes=task_service.REVIEW_ASSIGNMENT_DELAY_MINUTES + 1
+    # 他の役割のP1候補は、このサービスの役割では候補キューに含まれない
+    issue_other_role = create_mock_issue(
+        3, "Other Task", "## 成果物\n- c.py", ["DESIGNER", "P1"]
     )
-    mock_redis_client.get_value.return_value = old_timestamp.isoformat()
-
-    agent_id = "test-agent"
+    cache_issues(mock_redis_client, [issue_p0, issue_p2, issue_other_role])
+    mock_redis_client.claim_issue.side_effect = [LOCKED, CLAIMED]
 
     # Act
-    result = await task_service.request_task(agent_id=agent_id)
+    result = await task_service.request_task(agent_id="test-agent")
 
     # Assert
     assert result is not None
-    assert result.required_role == "BACKENDCODER"
-    assert result.issue_id == issue_id
-    assert result.task_type == TaskType.REVIEW
-    mock_redis_client.get_keys_by_pattern.assert_called_once_with("issue:*")
-    mock_redis_client.acquire_lock.assert_called_once_with(
-        "issue_lock_1", agent_id, timeout=600
-    )
-    mock_redis_client.set_value.assert_called_once_with(
-        f"agent_current_task:{agent_id}", str(issue["number"]),
-        timeout=3600
-    )
+    assert result.issue_id == 2
+    assert result.priority_label == "P2"
+    assert result.priority_tier == 1
+    queried_priorities = [
+        c.args[0] for c in mock_redis_client.get_candidate_issue_ids.call_args_list
+    ]
+    assert queried_priorities == ["P0", "P2"]
 
 
 @pytest.mark.unit
 @pytest.mark.anyio
-async def test_request_task_gemini_response(
-    task_service, mock_redis_client, mock_github_client
+async def test_request_task_serves_only_requested_roles(
+    task_service, mock_redis_client
 ):
-    """request_taskがGeminiのレスポンスを正しく返すことをテストします。"""
+    """
+    役割を指定したリクエストには、その役割の候補キューのタスクのみが割り当てられることをテストします。
+    """
     # Arrange
-    agent_id = "test-agent"
-    agent_role = "BACKENDCODER"
-    issue = create_mock_issue(
-        number=1,
-        title="Test Task",
-        body="""## 成果物\n- test.py""",
-        labels=[agent_role, "P1"],
+    issue_frontend = create_mock_issue(
+        1, "Frontend Task", "## 成果物\n- a.tsx", ["FRONTENDCODER", "P0"]
     )
-    cached_issues = [issue]
-    issue_keys = [
-        f"issue:{issue['number']}" for issue in cached_issues
-    ]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
-    mock_github_client.find_issues_by_labels.return_value = []
-    mock_redis_client.acquire_lock.return_value = True
-    task_service.get_highest_priority_label = MagicMock(return_value="P1")
+    issue_backend = create_mock_issue(
+        2, "Backend Task", "## 成果物\n- b.py", ["BACKENDCODER", "P1"]
+    )
+    cache_issues(mock_redis_client, [issue_frontend, issue_backend])
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     # Act
-    result = await task_service.request_task(agent_id=agent_id)
+    result = await task_service.request_task(
+        agent_id="test-agent", roles=["BACKENDCODER"]
+    )
 
     # Assert
     assert result is not None
-    assert result.gemini_response == "GEMINI_EXECUTION_LOGIC_REMOVED"
+    assert result.issue_id == 2
+    assert result.required_role == "BACKENDCODER"
+    assert result.priority_tier == 0
+    mock_redis_client.get_candidate_priorities.assert_called_once_with(
+        ["BACKENDCODER"]
+    )
+    mock_redis_client.get_candidate_issue_ids.assert_called_once_with(
+        "P1", ["BACKENDCODER"]
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_rejects_unknown_roles(task_service, mock_redis_client):
+    """agents.ymlに定義されていない役割を指定した場合にUnknownRoleErrorが発生することをテストします。"""
+    # Act & Assert
+    with pytest.raises(UnknownRoleError):
+        await task_service.request_task(agent_id="test-agent", roles=["PILOT"])
+    mock_redis_client.claim_issue.assert_not_called()
 
 
 @pytest.mark.unit
-@patch("time.sleep", return_value=None)
-def test_complete_previous_task_finds_and_completes_issues_via_github_api(
-    mock_sleep, task_service, mock_redis_client, mock_github_client
+@pytest.mark.anyio
+async def test_request_task_assigns_age_boosted_issue_first(
+    task_service, mock_redis_client
 ):
-    """complete_previous_taskがGitHub APIから直接Issueを検索して完了処理を行うことをテストします。"""
+    """
+    スケジューラが古いIssueの優先度を引き上げる場合、引き上げ後の優先度の順に
+    割り当てられることをテストします。
+    """
     # Arrange
-    agent_id = "test-agent"
-    previous_issue = create_mock_issue(
-        number=101,
-        title="Previous Task",
-        body="",
-        labels=["in-progress", agent_id, "P1"],
+    task_service.task_scheduler = WeightedFairTaskScheduler(age_boost_seconds=86400)
+    issue_new_p1 = create_mock_issue(
+        1, "New P1 Task", "## 成果物\n- a.py", ["BACKENDCODER", "P1"]
+    )
+    issue_old_p2 = create_mock_issue(
+        2, "Old P2 Task", "## 成果物\n- b.py", ["BACKENDCODER", "P2"]
     )
-    mock_github_client.find_issues_by_labels.return_value = [previous_issue]
+    issue_new_p1["created_at"] = datetime.now(UTC).isoformat()
+    issue_old_p2["created_at"] = (datetime.now(UTC) - timedelta(days=3)).isoformat()
+    cache_issues(mock_redis_client, [issue_new_p1, issue_old_p2])
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     # Act
-    task_service.complete_previous_task(agent_id)
+    result = await task_service.request_task(agent_id="test-agent")
 
     # Assert
-    mock_github_client.find_issues_by_labels.assert_called_once_with(
-        labels=["in-progress", agent_id]
-    )
-    mock_github_client.update_issue.assert_called_once_with(
-        issue_id=previous_issue["number"],
-        remove_labels=["in-progress", agent_id],
-        add_labels=["needs-review"],
-    )
+    assert result is not None
+    assert result.issue_id == 2
+    assert result.priority_label == "P0"
+    assert result.priority_tier == 0
 
 
 @pytest.mark.unit
-@patch("time.sleep", return_value=None)
-def test_complete_previous_task_no_issues_found_via_github_api(
-    mock_sleep, task_service, mock_redis_client, mock_github_client
+@pytest.mark.anyio
+async def test_request_task_respects_role_concurrency_limit(
+    task_service, mock_redis_client
 ):
     """
-    GitHub API経由でin-progressのIssueが見つからない場合に、何も処理しないことをテストします。
+    役割の同時実行タスク数が上限に達している場合はその役割のIssueをスキップし、
+    前のタスクが完了すると再び割り当てられることをテストします。
     """
     # Arrange
-    agent_id = "test-agent"
-    mock_github_client.find_issues_by_labels.return_value = []
+    task_service.task_scheduler = WeightedFairTaskScheduler(
+        max_concurrent_tasks={"BACKENDCODER": 1}
+    )
+    issues = [
+        create_mock_issue(1, "Task 1", "## 成果物\n- a.py", ["BACKENDCODER", "P1"]),
+        create_mock_issue(2, "Task 2", "## 成果物\n- b.py", ["BACKENDCODER", "P1"]),
+    ]
+    cache_issues(mock_redis_client, issues)
+    mock_redis_client.claim_issue.return_value = CLAIMED
+    first = await task_service.request_task(agent_id="agent-1")
 
     # Act
-    task_service.complete_previous_task(agent_id)
+    blocked = await task_service.request_task(agent_id="agent-2")
+    mock_redis_client.get_agent_current_task.side_effect = lambda agent_id: (
+        first.issue_id if agent_id == "agent-1" else None
+    )
+    await task_service.complete_previous_task("agent-1")
+    unblocked = await task_service.request_task(agent_id="agent-2")
 
     # Assert
-    mock_github_client.find_issues_by_labels.assert_called_once_with(
-        labels=["in-progress", agent_id]
+    assert first is not None
+    assert blocked is None
+    assert unblocked is not None
+    assert mock_redis_client.claim_issue.call_count == 2
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_long_polls_until_notified(task_service):
+    """wait_seconds指定時、タスク候補の通知を受けて再確認したタスクを返すことをテストします。"""
+    # Arrange
+    expected_task = MagicMock()
+    task_service._check_for_available_task = AsyncMock(
+        side_effect=[None, expected_task]
     )
-    # 更新処理は呼び出されないことを確認
-    mock_github_client.update_issue.assert_not_called()
+    notifier = MagicMock()
+    notifier.generation = 0
+    notifier.wait = AsyncMock(return_value=True)
+    task_service.task_notifier = notifier
+
+    # Act
+    result = await task_service.request_task(agent_id="test-agent", wait_seconds=30)
+
+    # Assert
+    assert result is expected_task
+    notifier.wait.assert_awaited_once()
+    assert notifier.wait.await_args.args[0] == 0
+    assert task_service._check_for_available_task.await_args_list[0].kwargs == {
+        "is_first_check": True
+    }
+    assert task_service._check_for_available_task.await_args_list[1].kwargs == {
+        "is_first_check": False
+    }
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_long_poll_returns_none_on_timeout(task_service):
+    """通知がないまま待機時間が過ぎた場合にNoneを返すことをテストします。"""
+    # Arrange
+    task_service._check_for_available_task = AsyncMock(return_value=None)
+    notifier = MagicMock()
+    notifier.generation = 0
+    notifier.wait = AsyncMock(return_value=False)
+    task_service.task_notifier = notifier
+
+    # Act
+    result = await task_service.request_task(agent_id="test-agent", wait_seconds=30)
+
+    # Assert
+    assert result is None
+    task_service._check_for_available_task.assert_awaited_once()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_does_not_wait_without_wait_seconds(task_service):
+    """wait_secondsが0の場合は待機せずに結果を返すことをテストします。"""
+    # Arrange
+    task_service._check_for_available_task = AsyncMock(return_value=None)
+    notifier = MagicMock()
+    notifier.wait = AsyncMock()
+    task_service.task_notifier = notifier
+
+    # Act
+    result = await task_service.request_task(agent_id="test-agent")
+
+    # Assert
+    assert result is None
+    notifier.wait.assert_not_awaited()
 
 
 @pytest.mark.unit
-@patch("time.sleep", return_value=None)
-def test_complete_previous_task_handles_multiple_issues(
-    mock_sleep, task_service, mock_redis_client, mock_github_client
+@pytest.mark.anyio
+async def test_request_task_uses_review_prompt_for_review_issue(
+    task_service, mock_redis_client, mock_github_client
 ):
-    """
-    複数のin-progressのIssueが見つかった場合に、すべて完了処理を行うことをテストします。
-    """
+    """'needs-review'ラベルを持つIssueが割り当てられた際に、TaskTypeが'review'に設定され、レビュー用プロンプトが使用されることをテストします。"""
     # Arrange
+    issue_id = 1
+    pr_number = 101
+    pr_url = f"https://github.com/test/repo/pull/{pr_number}"
+
+    issue = create_mock_issue(
+        number=issue_id,
+        title="Review Task",
+        body="""## 成果物\n- review.py""",
+        labels=["BACKENDCODER", "needs-review", "P1"],
+    )
+    cached_issues = [issue]
+    cache_issues(mock_redis_client, cached_issues)
+
+    # レビューコメントのモック設定
+    mock_review_comments_raw = [{"body": "Comment 1"}, {"body": "Comment 2"}]
+    mock_github_client.get_pull_request_review_comments.return_value = (
+        mock_review_comments_raw
+    )
+
+    # get_pr_for_issueのモックは、html_urlとnumberプロパティを持つMagicMockオブジェクトを返すように設定
+    mock_github_client.get_pr_for_issue.return_value = MagicMock(html_url=pr_url, number=pr_number)
+
+    mock_redis_client.claim_issue.return_value = CLAIMED
+    # 検出から待機時間が経過している
+    mock_redis_client.get_ready_review_issue_ids.return_value = {issue_id}
+
     agent_id = "test-agent"
-    previous_issue_1 = create_mock_issue(
-        number=101,
-        title="Previous Task 1",
-        body="",
-        labels=["in-progress", agent_id, "P1"],
+
+    # Act
+    result = await task_service.request_task(agent_id=agent_id)
+
+    # Assert
+    assert result is not None
+    assert result.required_role == "BACKENDCODER"
+    assert result.issue_id == issue_id
+    assert result.task_type == TaskType.REVIEW
+    mock_redis_client.get_keys_by_pattern.assert_not_called()
+    mock_redis_client.claim_issue.assert_called_once_with(
+        1,
+        agent_id,
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
     )
-    previous_issue_2 = create_mock_issue(
-        number=102,
-        title="Previous Task 2",
-        body="",
-        labels=["in-progress", agent_id, "P1"],
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_uses_cached_linked_pull_request_for_review_issue(
+    task_service, mock_redis_client, mock_github_client
+):
+    """キャッシュ済みの紐づいたPRがある場合、PRの検索が行われないことをテストします。"""
+    # Arrange
+    issue = create_mock_issue(
+        number=1,
+        title="Review Task",
+        body="""## 成果物\n- review.py""",
+        labels=["BACKENDCODER", "needs-review", "P1"],
     )
-    mock_github_client.find_issues_by_labels.return_value = [
-        previous_issue_1,
-        previous_issue_2,
+    issue["linked_pull_requests"] = [
+        {"number": 101, "html_url": "https://github.com/test/repo/pull/101"}
     ]
+    cache_issues(mock_redis_client, [issue])
+    mock_redis_client.claim_issue.return_value = CLAIMED
+    mock_redis_client.get_ready_review_issue_ids.return_value = {1}
 
     # Act
-    task_service.complete_previous_task(agent_id)
+    result = await task_service.request_task(agent_id="test-agent")
 
     # Assert
-    mock_github_client.find_issues_by_labels.assert_called_once_with(
-        labels=["in-progress", agent_id]
-    )
-    # 両方のIssueが更新されることを確認
-    assert mock_github_client.update_issue.call_count == 2
-    mock_github_client.update_issue.assert_any_call(
-        issue_id=previous_issue_1["number"],
-        remove_labels=["in-progress", agent_id],
-        add_labels=["needs-review"],
+    assert result is not None
+    assert result.task_type == TaskType.REVIEW
+    mock_github_client.get_pr_for_issue.assert_not_called()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_gemini_response(
+    task_service, mock_redis_client, mock_github_client
+):
+    """request_taskがGeminiのレスポンスを正しく返すことをテストします。"""
+    # Arrange
+    agent_id = "test-agent"
+    agent_role = "BACKENDCODER"
+    issue = create_mock_issue(
+        number=1,
+        title="Test Task",
+        body="""## 成果物\n- test.py""",
+        labels=[agent_role, "P1"],
     )
-    mock_github_client.update_issue.assert_any_call(
-        issue_id=previous_issue_2["number"],
-        remove_labels=["in-progress", agent_id],
-        add_labels=["needs-review"],
+    cached_issues = [issue]
+    cache_issues(mock_redis_client, cached_issues)
+    mock_redis_client.claim_issue.return_value = CLAIMED
+
+    # Act
+    result = await task_service.request_task(agent_id=agent_id)
+
+    # Assert
+    assert result is not None
+    assert result.gemini_response == "GEMINI_EXECUTION_LOGIC_REMOVED"
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_complete_previous_task_uses_assignment_record(
+    task_service, mock_redis_client, mock_github_client
+):
+    """complete_previous_taskがRedisの割り当て記録を元に完了処理をアウトボックスに記録することをテストします。"""
+    # Arrange
+    agent_id = "test-agent"
+    mock_redis_client.get_agent_current_task.return_value = 101
+
+    # Act
+    await task_service.complete_previous_task(agent_id)
+
+    # Assert
+    mock_redis_client.get_agent_current_task.assert_called_once_with(agent_id)
+    mock_redis_client.enqueue_github_changes.assert_called_once_with(
+        101, add_labels=["needs-review"], remove_labels=["in-progress", agent_id]
     )
+    mock_redis_client.clear_agent_current_task.assert_called_once_with(agent_id, 101)
+    mock_github_client.find_issues_by_labels.assert_not_called()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_complete_previous_task_without_record_skips_github(
+    task_service, mock_redis_client, mock_github_client
+):
+    """
+    割り当て記録がない場合に、GitHub APIを呼び出さずに何もしないことをテストします。
+    """
+    # Arrange
+    mock_redis_client.get_agent_current_task.return_value = None
 
+    # Act
+    await task_service.complete_previous_task("test-agent")
 
+    # Assert
+    mock_github_client.find_issues_by_labels.assert_not_called()
+    mock_redis_client.enqueue_github_changes.assert_not_called()
+    mock_redis_client.clear_agent_current_task.assert_not_called()
 
 
 @pytest.mark.unit
@@ -1026,7 +1352,7 @@ def test_sort_issues_by_priority(task_service):
     issues = [issue_p1, issue_p0, issue_no_priority, issue_p2, issue_p0_another]
 
     # Act
-    sorted_issues = task_service._sort_issues_by_priority(issues)
+    sorted_issues = task_service.task_scheduler.order(issues, [], now=0)
 
     # Assert
     # 期待されるソート順: P0, P0, P1, P2, No Priority
@@ -1041,50 +1367,20 @@ def test_sort_issues_by_priority(task_service):
     assert actual_order == expected_order
 
 
-@pytest.mark.parametrize(
-    "labels, expected_priority",
-    [
-        (["bug", "P2", "P0", "feature"], "P0"),
-        (["P1"], "P1"),
-        (["bug", "feature"], None),
-        ([], None),
-        (["P9", "P1", "P0"], "P0"),
-        (["P10", "P5", "P1"], "P1"),
-        (["p1", "P2"], "P2"),  # 大文字小文字の区別
-    ],
-)
-@pytest.mark.unit
-def test_determine_highest_priority(task_service, labels, expected_priority):
-    """優先度ラベルのリストから最高優先度を正しく特定できることをテストします。"""
-    # Act
-    highest_priority = task_service._determine_highest_priority(labels)
-
-    # Assert
-    assert highest_priority == expected_priority
-
-
-
-
 @pytest.mark.unit
-def test_find_candidates_for_any_role_filters_no_priority(task_service):
-    """_find_candidates_for_any_roleが優先度ラベルのないIssueを除外することをテストします。"""
+def test_build_candidate_queues_filters_no_priority(task_service):
+    """_build_candidate_queuesが優先度ラベルのないIssueを除外することをテストします。"""
     # Arrange
-    issue_with_priority = create_mock_issue(
-        number=1, title="With Priority", body="", labels=["BACKENDCODER", "P1"]
-    )
-    issue_without_priority = create_mock_issue(
-        number=2, title="No Priority", body="", labels=["BACKENDCODER"]
-    )
-    issues = [issue_with_priority, issue_without_priority]
+    label_index = {"BACKENDCODER": {1, 2}, "P1": {1}}
 
     # Act
-    candidates = task_service._find_candidates_for_any_role(issues, "P1")
+    queues = task_service._build_candidate_queues(label_index, ["P1"])
 
     # Assert
-    assert len(candidates) == 1
-    assert candidates[0]["number"] == issue_with_priority["number"]
+    assert queues == {("BACKENDCODER", "P1"): [1]}
 
 
+@pytest.mark.unit
 @pytest.mark.parametrize(
     "case, labels",
     [
@@ -1092,10 +1388,10 @@ def test_find_candidates_for_any_role_filters_no_priority(task_service):
         ("review", ["BACKENDCODER", "needs-review", "P1"]),
     ],
 )
-def test_find_candidates_for_any_role_filters_story_and_epic_labels(
-    task_service, mock_redis_client, case, labels
+def test_build_candidate_queues_filters_story_and_epic_labels(
+    task_service, case, labels
 ):
-    """_find_candidates_for_any_roleが'story'または'epic'ラベルを持つIssueを除外することをテストします。"""
+    """_build_candidate_queuesが'story'または'epic'ラベルを持つIssueを除外することをテストします。"""
     # Arrange
     issue_story = create_mock_issue(
         number=1, title="Story Issue", body="", labels=labels + ["story"]
@@ -1105,19 +1401,83 @@ def test_find_candidates_for_any_role_filters_story_and_epic_labels(
     )
     issue_task = create_mock_issue(number=3, title="Task Issue", body="", labels=labels)
     issues = [issue_story, issue_epic, issue_task]
+    label_index: dict[str, set[int]] = {}
+    for issue in issues:
+        for label in issue["labels"]:
+            label_index.setdefault(label["name"], set()).add(issue["number"])
+
+    # Act
+    queues = task_service._build_candidate_queues(label_index, ["P1"])
+
+    # Assert
+    assert queues == {("BACKENDCODER", "P1"): [issue_task["number"]]}
+
+
+@pytest.mark.unit
+def test_build_candidate_queues_groups_by_role_and_priority(task_service):
+    """候補キューが役割と優先度の組ごとに作られ、in-progressのIssueを含まないことをテストします。"""
+    # Arrange
+    label_index = {
+        "BACKENDCODER": {1, 2, 3},
+        "FRONTENDCODER": {3, 4},
+        "P0": {1},
+        "P1": {2, 3, 4},
+        "in-progress": {2},
+    }
+
+    # Act
+    queues = task_service._build_candidate_queues(label_index, ["P0", "P1"])
+
+    # Assert
+    assert queues == {
+        ("BACKENDCODER", "P0"): [1],
+        ("BACKENDCODER", "P1"): [3],
+        ("FRONTENDCODER", "P1"): [3, 4],
+    }
+
 
-    if case == "review":
-        mock_redis_client.get_value.return_value = None
+@pytest.mark.unit
+def test_refresh_candidate_queues_materializes_queues(task_service, mock_redis_client):
+    """refresh_candidate_queuesがラベルインデックスから候補キューを構築して書き込むことをテストします。"""
+    # Arrange
+    issues = [
+        create_mock_issue(1, "Task", "", ["BACKENDCODER", "P1"]),
+        create_mock_issue(2, "Doing", "", ["BACKENDCODER", "P1", "in-progress"]),
+        create_mock_issue(3, "Docs", "", ["documentation", "P2"]),
+    ]
+    cache_issues(mock_redis_client, issues)
 
     # Act
-    candidates = task_service._find_candidates_for_any_role(issues, "P1")
+    task_service.refresh_candidate_queues()
 
     # Assert
-    if case == "review":
-        assert len(candidates) == 0
-    else:
-        assert len(candidates) == 1
-        assert candidates[0]["number"] == issue_task["number"]
+    mock_redis_client.replace_candidate_queues.assert_called_once_with(
+        {("BACKENDCODER", "P1"): [1]}
+    )
+
+
+@pytest.mark.unit
+def test_refresh_candidate_queues_updates_only_given_issues(
+    task_service, mock_redis_client
+):
+    """Issue番号を指定した場合、それらのIssueが所属するキューのみを更新することをテストします。"""
+    # Arrange
+    mock_redis_client.get_issue_labels.return_value = {
+        1: {"BACKENDCODER", "FRONTENDCODER", "P1"},
+        2: {"BACKENDCODER", "P1", "in-progress"},
+        3: set(),
+    }
+
+    # Act
+    task_service.refresh_candidate_queues([1, 2, 3])
+
+    # Assert
+    mock_redis_client.get_issue_labels.assert_called_once_with([1, 2, 3])
+    mock_redis_client.update_candidate_queues.assert_called_once_with(
+        {1: [("BACKENDCODER", "P1"), ("FRONTENDCODER", "P1")], 2: [], 3: []}
+    )
+    mock_redis_client.get_issue_ids_by_labels.assert_not_called()
+    mock_redis_client.replace_candidate_queues.assert_not_called()
 
 
 @pytest.mark.unit
@@ -1157,33 +1517,127 @@ def test_poll_and_process_reviews_uses_is_open_query(task_service, mock_github_c
 
 
 @pytest.mark.unit
-def test_poll_and_process_reviews_adds_label_after_timeout(
-    task_service, mock_github_client
+def test_poll_and_process_reviews_schedules_review_timeouts(
+    task_service, mock_github_client, mock_redis_client
 ):
     """
-    ポーリングサービスが、タイムアウトしたレビュー待ちPRに 'review-done' ラベルを付与することをテストします。
+    レビュー待ちのPRごとに、作成からタイムアウトまでの時刻で 'review-done' の付与が
+    予定されることをテストします（ラベルはこの時点では付与しない）。
     """
     # Arrange
-    pr_number = 123
-    now = datetime.now(UTC)
-    pr_created_time = now - timedelta(
-        minutes=task_service.REVIEW_TIMEOUT_MINUTES + 1
-    )
-    mock_pr = create_mock_pr(number=pr_number, created_at=pr_created_time)
-
-    # 新しいメソッドのモック設定
+    pr_created_time = datetime(2025, 1, 1, 12, 0, tzinfo=UTC)
+    naive_created_time = datetime(2025, 1, 1, 13, 0)
     mock_github_client.get_needs_review_issues_and_prs.return_value = {
-        pr_number: mock_pr
+        123: create_mock_pr(number=123, created_at=pr_created_time),
+        124: create_mock_pr(number=124, created_at=naive_created_time),
     }
+    mock_redis_client.sync_review_timeouts.return_value = (2, 1)
 
     # Act
     task_service.poll_and_process_reviews()
 
     # Assert
-    mock_github_client.get_needs_review_issues_and_prs.assert_called_once()
-    mock_github_client.add_label_to_pr.assert_called_once_with(
-        pr_number=pr_number, label=task_service.LABEL_REVIEW_DONE
+    timeout = timedelta(minutes=task_service.REVIEW_TIMEOUT_MINUTES)
+    mock_redis_client.sync_review_timeouts.assert_called_once_with(
+        {
+            123: (pr_created_time + timeout).timestamp(),
+            124: (naive_created_time.replace(tzinfo=UTC) + timeout).timestamp(),
+        }
     )
+    mock_github_client.add_label_to_pr.assert_not_called()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_process_due_review_timeouts_queues_label_and_marks_fired(
+    task_service, mock_redis_client
+):
+    """予定時刻を過ぎたPRに 'review-done' の付与をアウトボックスに登録し、発火済みにすることをテストします。"""
+    # Arrange
+    mock_redis_client.get_due_review_timeouts.return_value = [123, 124]
+    manager = MagicMock()
+    manager.attach_mock(mock_redis_client.enqueue_github_changes, "enqueue")
+    manager.attach_mock(mock_redis_client.mark_review_timeouts_fired, "mark")
+
+    # Act
+    with patch(
+        "github_broker.application.task_service.time.time", return_value=10_000
+    ):
+        processed = await task_service.process_due_review_timeouts()
+
+    # Assert
+    assert processed == 2
+    mock_redis_client.get_due_review_timeouts.assert_called_once_with(
+        10_000, task_service.REVIEW_TIMEOUT_BATCH_SIZE
+    )
+    # 発火済みにするのはアウトボックスへの登録の後
+    assert manager.mock_calls == [
+        call.enqueue(123, add_labels=[task_service.LABEL_REVIEW_DONE]),
+        call.enqueue(124, add_labels=[task_service.LABEL_REVIEW_DONE]),
+        call.mark([123, 124]),
+    ]
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_process_due_review_timeouts_without_due_entries(
+    task_service, mock_redis_client
+):
+    """予定時刻を過ぎたPRがない場合、何も変更しないことをテストします。"""
+    # Arrange
+    mock_redis_client.get_due_review_timeouts.return_value = []
+
+    # Act
+    processed = await task_service.process_due_review_timeouts()
+
+    # Assert
+    assert processed == 0
+    mock_redis_client.enqueue_github_changes.assert_not_called()
+    mock_redis_client.mark_review_timeouts_fired.assert_not_called()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_run_review_timeout_scheduler_sleeps_until_next_due_time(
+    task_service, mock_redis_client
+):
+    """次の予定時刻がポーリング上限より近い場合、予定時刻ちょうどまで待機することをテストします。"""
+    # Arrange
+    mock_redis_client.get_due_review_timeouts.return_value = []
+    mock_redis_client.get_next_review_timeout.return_value = 10_002.5
+
+    # Act
+    with (
+        patch("github_broker.application.task_service.time.time", return_value=10_000),
+        patch(
+            "github_broker.application.task_service.asyncio.sleep",
+            AsyncMock(side_effect=asyncio.CancelledError),
+        ) as mock_sleep,
+        pytest.raises(asyncio.CancelledError),
+    ):
+        await task_service.run_review_timeout_scheduler()
+
+    # Assert
+    mock_sleep.assert_awaited_once_with(2.5)
+
+
+@pytest.mark.unit
+def test_apply_webhook_event_closed_pull_request_removes_review_timeout(
+    task_service, mock_redis_client
+):
+    """クローズされたPRのレビュータイムアウトの予定が取り除かれることをテストします。"""
+    # Arrange
+    payload = {
+        "action": "closed",
+        "pull_request": {"number": 10, "title": "Fix", "body": ""},
+        "repository": {"full_name": "test/repo"},
+    }
+
+    # Act
+    task_service.apply_webhook_event("pull_request", payload)
+
+    # Assert
+    mock_redis_client.remove_review_timeouts.assert_called_once_with([10])
 
 
 @pytest.mark.unit
@@ -1211,11 +1665,12 @@ async def test_create_fix_task_creates_task_and_builds_prompt(task_service):
 
 
 @pytest.mark.unit
-def test_find_candidates_for_any_role_review_candidate_with_review_done_pr(
+@pytest.mark.anyio
+async def test_filter_ready_candidates_review_candidate_with_review_done_pr(
     task_service, mock_github_client, mock_redis_client
 ):
     """
-    _find_candidates_for_any_roleが、needs-reviewラベルとreview-doneラベルを持つPRを持つIssueを
+    _filter_ready_candidatesが、needs-reviewラベルとreview-doneラベルを持つPRを持つIssueを
     レビュー候補として正しく選択することをテストします。
     """
     # Arrange
@@ -1227,25 +1682,29 @@ def test_find_candidates_for_any_role_review_candidate_with_review_done_pr(
     )
     issues = [issue_review]
 
-    mock_redis_client.get_value.return_value = (
-        datetime.now(UTC)
-        - timedelta(minutes=task_service.REVIEW_ASSIGNMENT_DELAY_MINUTES + 1)
-    ).isoformat()
+    mock_redis_client.get_ready_review_issue_ids.return_value = {1}
 
     # Act
-    candidates = task_service._find_candidates_for_any_role(issues, "P1")
+    with patch(
+        "github_broker.application.task_service.time.time", return_value=10_000
+    ):
+        candidates = await task_service._filter_ready_candidates(issues)
 
     # Assert
     assert len(candidates) == 1
     assert candidates[0]["number"] == issue_review["number"]
+    mock_redis_client.get_ready_review_issue_ids.assert_called_once_with(
+        10_000 - task_service.REVIEW_ASSIGNMENT_DELAY_MINUTES * 60
+    )
 
 
 @pytest.mark.unit
-def test_find_candidates_for_any_role_review_candidate_without_review_done_pr(
+@pytest.mark.anyio
+async def test_filter_ready_candidates_review_candidate_without_review_done_pr(
     task_service, mock_github_client, mock_redis_client
 ):
     """
-    _find_candidates_for_any_roleが、needs-reviewラベルを持つがreview-doneラベルがないPRを持つIssueを
+    _filter_ready_candidatesが、needs-reviewラベルを持つがreview-doneラベルがないPRを持つIssueを
     レビュー候補として選択しないことをテストします。
     """
     # Arrange
@@ -1257,15 +1716,32 @@ def test_find_candidates_for_any_role_review_candidate_without_review_done_pr(
     )
     issues = [issue_review]
 
-    mock_redis_client.get_value.return_value = None
+    mock_redis_client.get_ready_review_issue_ids.return_value = set()
 
     # Act
-    candidates = task_service._find_candidates_for_any_role(issues, "P1")
+    candidates = await task_service._filter_ready_candidates(issues)
 
     # Assert
     assert len(candidates) == 0
 
 
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_filter_ready_candidates_skips_redis_without_review_candidates(
+    task_service, mock_redis_client
+):
+    """レビュー候補がない場合、レビュー検出時刻を問い合わせないことをテストします。"""
+    # Arrange
+    issues = [create_mock_issue(1, "Task", "", ["BACKENDCODER", "P1"])]
+
+    # Act
+    candidates = await task_service._filter_ready_candidates(issues)
+
+    # Assert
+    assert candidates == issues
+    mock_redis_client.get_ready_review_issue_ids.assert_not_called()
+
+
 @pytest.mark.unit
 @pytest.mark.anyio
 async def test_request_task_logs_detailed_information(
@@ -1307,18 +1783,14 @@ async def test_request_task_logs_detailed_information(
         issue_assignable_p0,
         issue_assignable,
     ]
-    issue_keys = [f"issue:{issue['number']}" for issue in cached_issues]
-    mock_redis_client.get_keys_by_pattern.return_value = issue_keys
-    mock_redis_client.get_values.return_value = [
-        json.dumps(issue) for issue in cached_issues
-    ]
-    mock_github_client.find_issues_by_labels.return_value = []
-    task_service.get_highest_priority_label = MagicMock(return_value="P0")
+    cache_issues(mock_redis_client, cached_issues)
 
-    def acquire_lock_side_effect(key, *args, **kwargs):
-        return "issue_lock_1" not in key
+    def claim_issue_side_effect(issue_id, *args, **kwargs):
+        if issue_id == 1:
+            return LOCKED
+        return CLAIMED
 
-    mock_redis_client.acquire_lock.side_effect = acquire_lock_side_effect
+    mock_redis_client.claim_issue.side_effect = claim_issue_side_effect
 
     with caplog.at_level(logging.INFO):
         # Act
@@ -1334,7 +1806,10 @@ async def test_request_task_logs_detailed_information(
         assert f"タスクをリクエストしています: agent_id={agent_id}" in log_messages
         # 2. Candidate count (Removed old assertion)
         # 3. 候補数のログメッセージ
-        assert "最高優先度ラベル 'P0' を持つタスク候補が 2 件見つかりました。" in log_messages
+        assert (
+            "優先度ラベル 'P0' (第0階層) を持つタスク候補が 2 件見つかりました。"
+            in log_messages
+        )
         # 4. Sorted order
         assert "候補Issueを優先度順にソートしました: [3, 4]" in log_messages
         # 5. Reasons for skipping
@@ -1348,11 +1823,12 @@ async def test_request_task_logs_detailed_information(
 
 
 @pytest.mark.unit
-def test_find_candidates_for_any_role_review_candidate_no_pr_found(
+@pytest.mark.anyio
+async def test_filter_ready_candidates_review_candidate_no_pr_found(
     task_service, mock_github_client, mock_redis_client
 ):
     """
-    _find_candidates_for_any_roleが、needs-reviewラベルを持つが関連するPRが見つからないIssueを
+    _filter_ready_candidatesが、needs-reviewラベルを持つが関連するPRが見つからないIssueを
     レビュー候補として選択しないことをテストします。
     """
     # Arrange
@@ -1364,10 +1840,10 @@ def test_find_candidates_for_any_role_review_candidate_no_pr_found(
     )
     issues = [issue_review]
 
-    mock_redis_client.get_value.return_value = None
+    mock_redis_client.get_ready_review_issue_ids.return_value = set()
 
     # Act
-    candidates = task_service._find_candidates_for_any_role(issues, "P1")
+    candidates = await task_service._filter_ready_candidates(issues)
 
     # Assert
     assert len(candidates) == 0
@@ -1383,11 +1859,8 @@ async def test_request_task_returns_none_immediately_if_no_task_available(
     """
     # Arrange
     issue = create_mock_issue(1, "test_title", "test_body", ["BACKENDCODER", "P1"])
-    mock_redis_client.get_keys_by_pattern.return_value = ["issue:1"]
-    mock_redis_client.get_values.return_value = [json.dumps(issue)]
-    mock_github_client.find_issues_by_labels.return_value = []
-    mock_redis_client.acquire_lock.return_value = False  # Make the issue locked
-    task_service.get_highest_priority_label = MagicMock(return_value="P1")
+    cache_issues(mock_redis_client, [issue])
+    mock_redis_client.claim_issue.return_value = LOCKED  # Make the issue locked
     agent_id = "test-agent"
 
     # Act
@@ -1395,40 +1868,664 @@ async def test_request_task_returns_none_immediately_if_no_task_available(
 
     # Assert
     assert result is None
-    mock_github_client.find_issues_by_labels.assert_called_once_with(
-        labels=["in-progress", agent_id]
-    )
-    mock_redis_client.get_keys_by_pattern.assert_called_once_with("issue:*")
+    mock_redis_client.get_agent_current_task.assert_called_once_with(agent_id)
+    mock_redis_client.get_keys_by_pattern.assert_not_called()
 
 
 @pytest.mark.unit
+def test_apply_webhook_event_upserts_open_issue(task_service, mock_redis_client):
+    """issuesイベントでオープンなIssueがキャッシュに反映されることをテストします。"""
+    # Arrange
+    issue = create_mock_issue(1, "Webhook Task", "", ["BACKENDCODER", "P1"])
+    issue["state"] = "open"
+    payload = {
+        "action": "labeled",
+        "issue": issue,
+        "repository": {"full_name": "test/repo"},
+    }
 
+    # Act
+    applied = task_service.apply_webhook_event("issues", payload)
 
-def test_get_highest_priority_label_from_labels_list(task_service):
-
+    # Assert
+    assert applied is True
+    mock_redis_client.upsert_issue.assert_called_once_with(issue)
+    mock_redis_client.remove_issue.assert_not_called()
 
-    """get_highest_priority_labelが与えられたラベルのリストから最も高い優先度を返すことをテストします。"""
+
+@pytest.mark.unit
+def test_apply_webhook_event_records_review_detection(
+    task_service, mock_github_client, mock_redis_client
+):
+    """needs-reviewラベルが付いたIssueの検出時刻が保存されることをテストします。"""
+    # Arrange
+    issue = create_mock_issue(
+        1, "Review Task", "", ["BACKENDCODER", task_service.LABEL_NEEDS_REVIEW]
+    )
+    issue["state"] = "open"
+    mock_github_client.get_pr_for_issue.return_value = MagicMock(
+        number=10, html_url="https://github.com/test/repo/pull/10"
+    )
+    mock_redis_client.record_review_detections.return_value = 1
+
+    # Act
+    task_service.apply_webhook_event("issues", {"action": "labeled", "issue": issue})
+
+    # Assert
+    mock_github_client.get_pr_for_issue.assert_called_once_with(1)
+    mock_redis_client.upsert_issue.assert_called_once_with(
+        {
+            **issue,
+            "linked_pull_requests": [
+                {"number": 10, "html_url": "https://github.com/test/repo/pull/10"}
+            ],
+        }
+    )
+    mock_redis_client.record_review_detections.assert_called_once_with([1])
+    mock_redis_client.remove_review_detections.assert_not_called()
+
+
+@pytest.mark.unit
+def test_apply_webhook_event_removes_review_issue_without_linked_pr(
+    task_service, mock_github_client, mock_redis_client
+):
+    """紐づいたPRのないneeds-reviewのIssueが、同期時と同じくキャッシュから取り除かれることをテストします。"""
+    # Arrange
+    issue = create_mock_issue(
+        1, "Review Task", "", ["BACKENDCODER", task_service.LABEL_NEEDS_REVIEW]
+    )
+    issue["state"] = "open"
+    mock_github_client.get_pr_for_issue.return_value = None
+
+    # Act
+    applied = task_service.apply_webhook_event(
+        "issues", {"action": "labeled", "issue": issue}
+    )
+
+    # Assert
+    assert applied is True
+    mock_redis_client.remove_issue.assert_called_once_with(1)
+    mock_redis_client.upsert_issue.assert_not_called()
+    mock_redis_client.record_review_detections.assert_not_called()
+
+
+@pytest.mark.unit
+def test_apply_webhook_event_ignores_review_issue_when_pr_lookup_fails(
+    task_service, mock_github_client, mock_redis_client
+):
+    """紐づいたPRの検索に失敗した場合、キャッシュを変更しないことをテストします。"""
+    # Arrange
+    issue = create_mock_issue(
+        1, "Review Task", "", ["BACKENDCODER", task_service.LABEL_NEEDS_REVIEW]
+    )
+    issue["state"] = "open"
+    mock_github_client.get_pr_for_issue.side_effect = GithubException(
+        500, "Server Error", None
+    )
+
+    # Act
+    applied = task_service.apply_webhook_event(
+        "issues", {"action": "labeled", "issue": issue}
+    )
+
+    # Assert
+    assert applied is False
+    mock_redis_client.upsert_issue.assert_not_called()
+    mock_redis_client.remove_issue.assert_not_called()
+
+
+@pytest.mark.unit
+def test_apply_webhook_event_removes_review_detection_when_label_removed(
+    task_service, mock_redis_client
+):
+    """needs-reviewラベルが外されたIssueの検出時刻が取り除かれることをテストします。"""
+    # Arrange
+    issue = create_mock_issue(1, "Review Task", "", ["BACKENDCODER", "P1"])
+    issue["state"] = "open"
+
+    # Act
+    task_service.apply_webhook_event(
+        "issues",
+        {
+            "action": "unlabeled",
+            "issue": issue,
+            "label": {"name": task_service.LABEL_NEEDS_REVIEW},
+        },
+    )
+
+    # Assert
+    mock_redis_client.upsert_issue.assert_called_once_with(issue)
+    mock_redis_client.remove_review_detections.assert_called_once_with([1])
+    mock_redis_client.record_review_detections.assert_not_called()
+
+
+@pytest.mark.unit
+def test_apply_webhook_event_removes_closed_issue(task_service, mock_redis_client):
+    """closedアクションでIssueがキャッシュから削除されることをテストします。"""
+    # Arrange
+    issue = create_mock_issue(1, "Closed Task", "", ["BACKENDCODER", "P1"])
+    issue["state"] = "closed"
+
+    # Act
+    applied = task_service.apply_webhook_event(
+        "issues", {"action": "closed", "issue": issue}
+    )
+
+    # Assert
+    assert applied is True
+    mock_redis_client.remove_issue.assert_called_once_with(1)
+    mock_redis_client.upsert_issue.assert_not_called()
+
+
+@pytest.mark.unit
+def test_apply_webhook_event_ignores_other_repository(
+    task_service, mock_redis_client
+):
+    """別リポジトリのWebhookイベントが無視されることをテストします。"""
+    # Arrange
+    issue = create_mock_issue(1, "Other Repo", "", ["P1"])
+    payload = {
+        "action": "opened",
+        "issue": issue,
+        "repository": {"full_name": "other/repo"},
+    }
+
+    # Act
+    applied = task_service.apply_webhook_event("issues", payload)
+
+    # Assert
+    assert applied is False
+    mock_redis_client.upsert_issue.assert_not_called()
+
+
+@pytest.mark.unit
+def test_apply_webhook_event_renames_label_in_cached_issues(
+    task_service, mock_redis_client
+):
+    """labelイベントで改名されたラベルがキャッシュ済みIssueに反映されることをテストします。"""
+    # Arrange
+    issue1 = create_mock_issue(1, "Task 1", "", ["BACKENDCODER", "P2"])
+    issue2 = create_mock_issue(2, "Task 2", "", ["BACKENDCODER", "P1"])
+    cache_issues(mock_redis_client, [issue1, issue2])
+    payload = {
+        "action": "edited",
+        "label": {"name": "P0"},
+        "changes": {"name": {"from": "P2"}},
+    }
+
+    # Act
+    applied = task_service.apply_webhook_event("label", payload)
+
+    # Assert
+    assert applied is True
+    mock_redis_client.upsert_issue.assert_called_once()
+    updated_issue = mock_redis_client.upsert_issue.call_args[0][0]
+    assert updated_issue["number"] == 1
+    assert [label["name"] for label in updated_issue["labels"]] == [
+        "BACKENDCODER",
+        "P0",
+    ]
 
 
+@pytest.mark.unit
+def test_apply_webhook_event_refreshes_issue_linked_from_pull_request(
+    task_service, mock_github_client, mock_redis_client
+):
+    """pull_requestイベントで参照先のIssueが再取得されキャッシュが更新されることをテストします。"""
     # Arrange
+    issue = create_mock_issue(
+        5, "Linked", "", ["BACKENDCODER", task_service.LABEL_NEEDS_REVIEW, "P1"]
+    )
+    issue["state"] = "open"
+    issue["linked_pull_requests"] = [
+        {"number": 11, "html_url": "https://github.com/test/repo/pull/11"}
+    ]
+    mock_github_client.get_issue_by_number.return_value = issue
+    mock_redis_client.get_value.return_value = "2025-01-01T00:00:00+00:00"
+    payload = {
+        "action": "closed",
+        "pull_request": {"number": 10, "title": "Fix", "body": "Closes #5"},
+    }
 
+    # Act
+    applied = task_service.apply_webhook_event("pull_request", payload)
+
+    # Assert
+    assert applied is True
+    mock_github_client.get_issue_by_number.assert_called_once_with(5)
+    mock_redis_client.upsert_issue.assert_called_once_with(issue)
+    mock_redis_client.remove_issue.assert_not_called()
 
-    all_labels = ["P1", "feature", "P0", "bug", "P1"]
 
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_reads_only_indexed_candidates(
+    task_service, mock_redis_client, mock_github_client
+):
+    """ラベルインデックスで絞り込まれた候補Issueのみが取得されることをテストします。"""
+    # Arrange
+    issue_in_progress = create_mock_issue(
+        1, "In Progress", "## 成果物\n- a", ["BACKENDCODER", "P1", "in-progress"]
+    )
+    issue_story = create_mock_issue(
+        2, "Story", "## 成果物\n- a", ["BACKENDCODER", "P1", "story"]
+    )
+    issue_no_role = create_mock_issue(3, "No Role", "## 成果物\n- a", ["P1"])
+    issue_candidate = create_mock_issue(
+        4, "Candidate", "## 成果物\n- a", ["BACKENDCODER", "P1"]
+    )
+    cache_issues(
+        mock_redis_client,
+        [issue_in_progress, issue_story, issue_no_role, issue_candidate],
+    )
+    mock_redis_client.claim_issue.return_value = CLAIMED
+
+    # Act
+    result = await task_service.request_task(agent_id="test-agent")
 
+    # Assert
+    assert result is not None
+    assert result.issue_id == 4
+    mock_redis_client.get_values.assert_called_once_with(["issue:4"])
 
 
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_awaits_async_github_client(
+    mock_github_client, mock_redis_client, mock_agent_configs
+):
+    """非同期GitHubクライアントが設定されている場合、割り当て処理で直接awaitされることをテストします。"""
+    # Arrange
+    mock_async_github_client = AsyncMock()
+    task_service = TaskService(
+        github_client=mock_github_client,
+        redis_client=mock_redis_client,
+        agent_configs=mock_agent_configs,
+        async_github_client=mock_async_github_client,
+    )
+    issue = create_mock_issue(
+        1, "Async Task", "## 成果物\n- a", ["BACKENDCODER", "P1"]
+    )
+    cache_issues(mock_redis_client, [issue])
+    mock_redis_client.claim_issue.return_value = CLAIMED
 
     # Act
+    result = await task_service.request_task(agent_id="test-agent")
+
+    # Assert
+    assert result is not None
+    mock_redis_client.enqueue_github_changes.assert_called_once()
+    mock_async_github_client.apply_label_delta.assert_not_awaited()
+
+    # Arrange (outbox)
+    mock_redis_client.get_due_outbox_issue_ids.return_value = [1]
+    mock_redis_client.claim_outbox_entry.return_value = GitHubOutboxEntry(
+        issue_id=1,
+        add_labels=["in-progress", "test-agent"],
+        branch_names=["feature/issue-1"],
+    )
+
+    # Act (outbox)
+    await task_service.process_github_outbox()
+
+    # Assert (outbox)
+    mock_async_github_client.apply_label_delta.assert_awaited_once_with(
+        issue_id=1,
+        add_labels=["in-progress", "test-agent"],
+        remove_labels=[],
+    )
+    mock_async_github_client.create_branch.assert_awaited_once_with(
+        "feature/issue-1"
+    )
+    mock_github_client.apply_label_delta.assert_not_called()
+    mock_github_client.create_branch.assert_not_called()
 
 
-    highest_priority = task_service.get_highest_priority_label(all_labels)
+@pytest.mark.unit
+@pytest.mark.anyio
+@pytest.mark.parametrize("renewed", [True, False])
+async def test_renew_lease_delegates_to_redis(
+    task_service, mock_redis_client, renewed
+):
+    """renew_leaseがフェンシングトークン付きでリースを延長することをテストします。"""
+    # Arrange
+    mock_redis_client.renew_issue_lease.return_value = renewed
+
+    # Act
+    result = await task_service.renew_lease("test-agent", 1, 7)
 
+    # Assert
+    assert result is renewed
+    mock_redis_client.renew_issue_lease.assert_called_once_with(1, "test-agent", 7)
 
 
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_renew_lease_uses_async_redis_client(
+    mock_github_client, mock_redis_client, mock_agent_configs
+):
+    """非同期Redisクライアントが設定されている場合、ハートビートが同期クライアントを使用しないことをテストします。"""
+    # Arrange
+    async_redis_client = AsyncMock()
+    async_redis_client.renew_issue_lease.return_value = True
+    task_service = TaskService(
+        github_client=mock_github_client,
+        redis_client=mock_redis_client,
+        agent_configs=mock_agent_configs,
+        async_redis_client=async_redis_client,
+    )
 
+    # Act
+    result = await task_service.renew_lease("test-agent", 1, 7)
 
     # Assert
+    assert result is True
+    async_redis_client.renew_issue_lease.assert_awaited_once_with(1, "test-agent", 7)
+    assert mock_redis_client.method_calls == []
 
 
-    assert highest_priority == "P0"
+@pytest.mark.unit
+@pytest.mark.parametrize("applied", [True, False])
+def test_apply_webhook_event_refreshes_candidate_queues(
+    task_service, mock_redis_client, applied
+):
+    """Webhookでキャッシュを更新した場合のみ、そのIssueの候補キューが更新されることをテストします。"""
+    # Arrange
+    task_service._apply_issue_change = MagicMock(return_value=applied)
+    task_service.refresh_candidate_queues = MagicMock()
+
+    # Act
+    result = task_service.apply_webhook_event(
+        "issues", {"action": "labeled", "issue": {"number": 1}}
+    )
+
+    # Assert
+    assert result is applied
+    if applied:
+        task_service.refresh_candidate_queues.assert_called_once_with([1])
+    else:
+        task_service.refresh_candidate_queues.assert_not_called()
+
+
+@pytest.mark.unit
+def test_apply_webhook_event_label_change_rebuilds_all_queues(task_service):
+    """ラベルの改名・削除を反映した場合は、すべての候補キューが再構築されることをテストします。"""
+    # Arrange
+    task_service._apply_label_event = MagicMock(return_value=True)
+    task_service.refresh_candidate_queues = MagicMock()
+
+    # Act
+    result = task_service.apply_webhook_event(
+        "label", {"action": "deleted", "label": {"name": "P1"}}
+    )
+
+    # Assert
+    assert result is True
+    task_service.refresh_candidate_queues.assert_called_once_with()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_process_github_outbox_applies_coalesced_changes(
+    task_service, mock_github_client, mock_redis_client
+):
+    """アウトボックスの変更が、キャッシュ済みのラベルに頼らず差分のみで反映されることをテストします。"""
+    # Arrange
+    mock_redis_client.get_due_outbox_issue_ids.return_value = [1]
+    mock_redis_client.claim_outbox_entry.return_value = GitHubOutboxEntry(
+        issue_id=1,
+        add_labels=["in-progress"],
+        remove_labels=["test-agent"],
+        branch_names=["feature/issue-1"],
+    )
+
+    # Act
+    processed = await task_service.process_github_outbox()
+
+    # Assert
+    assert processed == 1
+    mock_redis_client.get_value.assert_not_called()
+    mock_github_client.apply_label_delta.assert_called_once_with(
+        issue_id=1, add_labels=["in-progress"], remove_labels=["test-agent"]
+    )
+    mock_github_client.create_branch.assert_called_once_with("feature/issue-1")
+    mock_redis_client.ack_outbox_entry.assert_called_once_with(1)
+    mock_redis_client.retry_outbox_entry.assert_not_called()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_process_github_outbox_retries_failed_changes(
+    task_service, mock_github_client, mock_redis_client
+):
+    """GitHubへの反映に失敗した変更が、指数バックオフで再試行されることをテストします。"""
+    # Arrange
+    mock_redis_client.get_due_outbox_issue_ids.return_value = [1]
+    mock_redis_client.claim_outbox_entry.return_value = GitHubOutboxEntry(
+        issue_id=1, add_labels=["in-progress"]
+    )
+    mock_redis_client.retry_outbox_entry.return_value = 1
+    mock_github_client.apply_label_delta.side_effect = GithubException(
+        status=502, data="Bad Gateway"
+    )
+
+    # Act
+    await task_service.process_github_outbox()
+
+    # Assert
+    mock_github_client.apply_label_delta.assert_called_once_with(
+        issue_id=1, add_labels=["in-progress"], remove_labels=[]
+    )
+    mock_redis_client.retry_outbox_entry.assert_called_once_with(
+        1,
+        task_service.OUTBOX_RETRY_BASE_SECONDS,
+        task_service.OUTBOX_RETRY_MAX_SECONDS,
+        task_service.OUTBOX_MAX_ATTEMPTS,
+        str(mock_github_client.apply_label_delta.side_effect),
+    )
+    mock_redis_client.ack_outbox_entry.assert_not_called()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_process_github_outbox_dead_letters_after_max_attempts(
+    task_service, mock_github_client, mock_redis_client, caplog
+):
+    """失敗回数が上限に達した変更が、再試行されずデッドレターに移されたと記録されることをテストします。"""
+    # Arrange
+    mock_redis_client.get_due_outbox_issue_ids.return_value = [1]
+    mock_redis_client.claim_outbox_entry.return_value = GitHubOutboxEntry(
+        issue_id=1, add_labels=["in-progress"]
+    )
+    mock_redis_client.retry_outbox_entry.return_value = task_service.OUTBOX_MAX_ATTEMPTS
+    mock_github_client.apply_label_delta.side_effect = GithubException(
+        status=502, data="Bad Gateway"
+    )
+
+    # Act
+    with caplog.at_level(logging.ERROR):
+        await task_service.process_github_outbox()
+
+    # Assert
+    mock_redis_client.retry_outbox_entry.assert_called_once()
+    mock_redis_client.ack_outbox_entry.assert_not_called()
+    assert "Moved to dead letter" in caplog.text
+    assert "Will retry" not in caplog.text
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_process_github_outbox_discards_changes_for_missing_issue(
+    task_service, mock_github_client, mock_redis_client
+):
+    """Issueが存在しない(404)場合、変更を再試行せずに破棄することをテストします。"""
+    # Arrange
+    mock_redis_client.get_due_outbox_issue_ids.return_value = [1, 2]
+    mock_redis_client.claim_outbox_entry.side_effect = [
+        None,  # 他のワーカーが処理中
+        GitHubOutboxEntry(issue_id=2, branch_names=["feature/issue-2"]),
+    ]
+    mock_github_client.create_branch.side_effect = GithubException(
+        status=404, data="Not Found"
+    )
+
+    # Act
+    await task_service.process_github_outbox()
+
+    # Assert
+    mock_github_client.apply_label_delta.assert_not_called()
+    mock_redis_client.ack_outbox_entry.assert_called_once_with(2)
+    mock_redis_client.retry_outbox_entry.assert_not_called()
+
+
+@pytest.mark.unit
+def test_reconcile_agent_assignments_restores_missing_record(
+    task_service, mock_redis_client
+):
+    """割り当て記録のないin-progressのIssueについて、割り当てイベントから記録を復元することをテストします。"""
+    # Arrange
+    orphan = create_mock_issue(
+        1, "Orphan", "", ["BACKENDCODER", "P1", "in-progress", "agent-1"]
+    )
+    cache_issues(mock_redis_client, [orphan])
+    mock_redis_client.get_agent_current_tasks.return_value = {}
+    mock_redis_client.get_assigned_agents.return_value = {1: "agent-1"}
+    mock_redis_client.get_outbox_issue_ids.return_value = set()
+    mock_redis_client.get_leased_issue_ids.return_value = set()
+    mock_redis_client.restore_agent_current_task.return_value = True
+
+    # Act
+    task_service.reconcile_agent_assignments()
+
+    # Assert
+    mock_redis_client.restore_agent_current_task.assert_called_once_with("agent-1", 1)
+    mock_redis_client.enqueue_github_changes.assert_not_called()
+    mock_redis_client.clear_agent_current_task.assert_not_called()
+
+
+@pytest.mark.unit
+def test_reconcile_agent_assignments_completes_task_of_agent_that_moved_on(
+    task_service, mock_redis_client
+):
+    """エージェントが既に別のタスクに進んでいる場合、記録のないIssueを完了させることをテストします。"""
+    # Arrange
+    orphan = create_mock_issue(
+        1, "Orphan", "", ["BACKENDCODER", "P1", "in-progress", "agent-1"]
+    )
+    current = create_mock_issue(
+        2, "Current", "", ["BACKENDCODER", "P1", "in-progress", "agent-1"]
+    )
+    cache_issues(mock_redis_client, [orphan, current])
+    mock_redis_client.get_agent_current_tasks.return_value = {"agent-1": 2}
+    mock_redis_client.get_assigned_agents.return_value = {1: "agent-1"}
+    mock_redis_client.get_outbox_issue_ids.return_value = set()
+    mock_redis_client.get_leased_issue_ids.return_value = set()
+    mock_redis_client.restore_agent_current_task.return_value = False
+
+    # Act
+    task_service.reconcile_agent_assignments()
+
+    # Assert
+    mock_redis_client.enqueue_github_changes.assert_called_once_with(
+        1, add_labels=["needs-review"], remove_labels=["in-progress", "agent-1"]
+    )
+    mock_redis_client.clear_agent_current_task.assert_not_called()
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "labels, assigned_agents",
+    [
+        # 割り当てイベントが残っていない。人間が付けた `bug` ラベルをエージェントとみなさない
+        (["BACKENDCODER", "P1", "in-progress", "bug"], {}),
+        # 記録されたエージェントのラベルがIssueに付いていない
+        (["BACKENDCODER", "P1", "in-progress", "bug"], {1: "agent-1"}),
+    ],
+)
+def test_reconcile_agent_assignments_skips_issue_with_unknown_owner(
+    task_service, mock_redis_client, labels, assigned_agents
+):
+    """担当エージェントを割り当てイベントから特定できないIssueには手を付けないことをテストします。"""
+    # Arrange
+    orphan = create_mock_issue(1, "Orphan", "", labels)
+    cache_issues(mock_redis_client, [orphan])
+    mock_redis_client.get_agent_current_tasks.return_value = {}
+    mock_redis_client.get_outbox_issue_ids.return_value = set()
+    mock_redis_client.get_leased_issue_ids.return_value = set()
+    mock_redis_client.get_assigned_agents.return_value = assigned_agents
+
+    # Act
+    task_service.reconcile_agent_assignments()
+
+    # Assert
+    mock_redis_client.get_assigned_agents.assert_called_once_with([1])
+    mock_redis_client.restore_agent_current_task.assert_not_called()
+    mock_redis_client.enqueue_github_changes.assert_not_called()
+
+
+@pytest.mark.unit
+def test_reconcile_agent_assignments_removes_stale_records(
+    task_service, mock_redis_client
+):
+    """
+    in-progressでなくなったIssueの割り当て記録を削除し、
+    反映待ちやリース中のIssueには手を付けないことをテストします。
+    """
+    # Arrange
+    done = create_mock_issue(1, "Done", "", ["BACKENDCODER", "P1", "needs-review"])
+    just_claimed = create_mock_issue(2, "Claimed", "", ["BACKENDCODER", "P1"])
+    queued = create_mock_issue(
+        3, "Queued", "", ["BACKENDCODER", "P1", "in-progress", "agent-3"]
+    )
+    cache_issues(mock_redis_client, [done, just_claimed, queued])
+    mock_redis_client.get_agent_current_tasks.return_value = {
+        "agent-1": 1,
+        "agent-2": 2,
+    }
+    mock_redis_client.get_outbox_issue_ids.return_value = {3}
+    mock_redis_client.get_leased_issue_ids.return_value = {2}
+
+    # Act
+    task_service.reconcile_agent_assignments()
+
+    # Assert
+    mock_redis_client.get_leased_issue_ids.assert_called_once_with([1, 2])
+    mock_redis_client.clear_agent_current_task.assert_called_once_with("agent-1", 1)
+    mock_redis_client.restore_agent_current_task.assert_not_called()
+    mock_redis_client.enqueue_github_changes.assert_not_called()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_request_task_uses_async_redis_client(
+    mock_github_client, mock_redis_client, mock_agent_configs
+):
+    """非同期Redisクライアントが設定されている場合、リクエスト経路で同期クライアントを使用しないことをテストします。"""
+    # Arrange
+    issue = create_mock_issue(1, "Task", "## 成果物\n- a.py", ["BACKENDCODER", "P1"])
+    async_redis_client = AsyncMock()
+    async_redis_client.get_agent_current_task.return_value = None
+    async_redis_client.get_candidate_priorities.return_value = {"P1"}
+    async_redis_client.get_candidate_issue_ids.return_value = [1]
+    async_redis_client.get_values.return_value = [json.dumps(issue)]
+    async_redis_client.claim_issue.return_value = CLAIMED
+    task_service = TaskService(
+        github_client=mock_github_client,
+        redis_client=mock_redis_client,
+        agent_configs=mock_agent_configs,
+        async_redis_client=async_redis_client,
+    )
+
+    # Act
+    result = await task_service.request_task(agent_id="test-agent")
+
+    # Assert
+    assert result is not None
+    assert result.issue_id == 1
+    async_redis_client.get_candidate_issue_ids.assert_awaited_once_with(
+        "P1", ["BACKENDCODER", "FRONTENDCODER"]
+    )
+    async_redis_client.enqueue_github_changes.assert_awaited_once_with(
+        1, add_labels=["in-progress", "test-agent"], branch_names=["feature/issue-1"]
+    )
+    assert mock_redis_client.method_calls == []
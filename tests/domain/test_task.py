@@ -74,3 +74,42 @@ def test_extract_branch_name(body, expected_branch_name):
     )
     result = task.extract_branch_name()
     assert result == expected_branch_name
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "labels, expected_priority",
+    [
+        (["P2", "BACKENDCODER", "P0"], 0),
+        (["P10"], 10),
+        (["Priority", "P", "bug"], None),
+        ([], None),
+    ],
+)
+def test_get_priority(labels, expected_priority):
+    """優先度ラベルのうち最も高い優先度の数値を返すことをテストします。"""
+    task = Task(issue_id=1, title="Test", body="", html_url="", labels=labels)
+    assert task.get_priority() == expected_priority
+
+
+@pytest.mark.unit
+def test_precompute_from_issue():
+    """Issue辞書から割り当て時に必要な値をまとめて計算できることをテストします。"""
+    # Arrange
+    issue = {
+        "number": 5,
+        "title": "Test",
+        "body": "## 成果物\n- a.py\n\n## ブランチ名\n`feature/issue-xx`",
+        "html_url": "https://github.com/test/repo/issues/5",
+        "labels": [{"name": "BACKENDCODER"}, {"name": "P1"}],
+    }
+
+    # Act
+    result = Task.from_issue(issue).precompute()
+
+    # Assert
+    assert result == {
+        "assignable": True,
+        "branch_name": "feature/issue-5",
+        "priority": 1,
+    }
@@ -69,6 +69,80 @@ def test_request_task_connection_error(mock_post, agent_client):
     assert task is None
 
 
+@pytest.mark.unit
+@patch("requests.post")
+def test_request_task_sends_wait_seconds_for_long_polling(mock_post, agent_client):
+    """
+    wait_secondsを指定した場合、ペイロードに含めて待機時間より長いタイムアウトでリクエストすることをテストします。
+    """
+    # Arrange
+    mock_post.return_value.status_code = 204
+
+    # Act
+    task = agent_client.request_task(wait_seconds=60)
+
+    # Assert
+    assert task is None
+    _, kwargs = mock_post.call_args
+    assert kwargs["json"] == {"agent_id": "test-agent", "wait_seconds": 60}
+    assert kwargs["timeout"] > 60
+
+
+@pytest.mark.unit
+@patch("requests.post")
+def test_request_task_sends_declared_roles(mock_post):
+    """
+    役割を指定して初期化した場合、ペイロードに役割を含めてリクエストすることをテストします。
+    """
+    # Arrange
+    mock_post.return_value.status_code = 204
+    client = AgentClient(agent_id="test-agent", roles=["BACKENDCODER"])
+
+    # Act
+    client.request_task()
+
+    # Assert
+    _, kwargs = mock_post.call_args
+    assert kwargs["json"] == {"agent_id": "test-agent", "roles": ["BACKENDCODER"]}
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("status_code, expected", [(200, True), (409, False)])
+@patch("requests.post")
+def test_send_heartbeat(mock_post, agent_client, status_code, expected):
+    """
+    ハートビートがフェンシングトークンを送信し、リースを失った場合(409)にFalseを返すことをテストします。
+    """
+    # Arrange
+    mock_post.return_value.status_code = status_code
+
+    # Act
+    renewed = agent_client.send_heartbeat(issue_id=1, fencing_token=7)
+
+    # Assert
+    assert renewed is expected
+    args, kwargs = mock_post.call_args
+    assert args[0] == "http://localhost:8080/heartbeat"
+    assert kwargs["json"] == {
+        "agent_id": "test-agent",
+        "issue_id": 1,
+        "fencing_token": 7,
+    }
+
+
+@pytest.mark.unit
+@patch(
+    "requests.post",
+    side_effect=requests.exceptions.ConnectionError("Connection refused"),
+)
+def test_send_heartbeat_connection_error_keeps_lease(mock_post, agent_client):
+    """
+    一時的な接続エラーではリースを失ったとみなさないことをテストします。
+    """
+    # Act & Assert
+    assert agent_client.send_heartbeat(issue_id=1, fencing_token=7) is True
+
+
 @pytest.mark.unit
 def test_agent_client_initialization_with_port():
     """
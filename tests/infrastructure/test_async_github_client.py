@@ -0,0 +1,98 @@
+import json
+
+import httpx
+import pytest
+
+from github_broker.infrastructure.async_github_client import (
+    GITHUB_API_BASE_URL,
+    AsyncGitHubClient,
+    PullRequestRef,
+)
+
+
+def create_client(handler, max_concurrent_requests: int = 10) -> AsyncGitHubClient:
+    """MockTransportを使用するAsyncGitHubClientを生成するヘルパー関数。"""
+    http_client = httpx.AsyncClient(
+        base_url=GITHUB_API_BASE_URL, transport=httpx.MockTransport(handler)
+    )
+    return AsyncGitHubClient(
+        "test/repo",
+        "fake_token",
+        max_concurrent_requests=max_concurrent_requests,
+        http_client=http_client,
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_apply_label_delta_sends_only_changed_labels():
+    """apply_label_deltaがラベル全体をPUTせず、削除はDELETE、追加はPOSTで送信することをテストします。"""
+    # Arrange
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("/labels/agent-1"):
+            return httpx.Response(404, json={"message": "Label does not exist"})
+        return httpx.Response(200, json=[])
+
+    client = create_client(handler)
+
+    # Act
+    result = await client.apply_label_delta(
+        1, add_labels=["needs-review"], remove_labels=["in-progress", "agent-1"]
+    )
+
+    # Assert
+    assert result is True
+    assert [(request.method, request.url.path) for request in requests] == [
+        ("DELETE", "/repos/test/repo/issues/1/labels/in-progress"),
+        ("DELETE", "/repos/test/repo/issues/1/labels/agent-1"),
+        ("POST", "/repos/test/repo/issues/1/labels"),
+    ]
+    assert json.loads(requests[2].content) == {"labels": ["needs-review"]}
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_create_branch_handles_existing_reference():
+    """create_branchが既存ブランチ(422)を成功として扱うことをテストします。"""
+
+    # Arrange
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.method == "GET":
+            return httpx.Response(200, json={"object": {"sha": "abc123"}})
+        return httpx.Response(422, json={"message": "Reference already exists"})
+
+    client = create_client(handler)
+
+    # Act
+    result = await client.create_branch("feature/issue-1")
+
+    # Assert
+    assert result is True
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_get_pr_for_issue_returns_reference():
+    """get_pr_for_issueが検索結果の最初のPRを返すことをテストします。"""
+    # Arrange
+    client = create_client(
+        lambda request: httpx.Response(
+            200,
+            json={
+                "items": [
+                    {"number": 42, "html_url": "https://github.com/test/repo/pull/42"}
+                ]
+            },
+        )
+    )
+
+    # Act
+    result = await client.get_pr_for_issue(1)
+
+    # Assert
+    assert result == PullRequestRef(
+        number=42, html_url="https://github.com/test/repo/pull/42"
+    )
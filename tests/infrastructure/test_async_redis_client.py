@@ -0,0 +1,171 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from github_broker.infrastructure.async_redis_client import (
+    AsyncRedisClient,
+    create_async_redis,
+)
+from github_broker.infrastructure.redis_client import (
+    CLAIM_ISSUE_SCRIPT,
+    CLAIM_OUTBOX_ENTRY_SCRIPT,
+    GitHubOutboxEntry,
+    IssueClaim,
+    IssueClaimResult,
+)
+
+
+@pytest.fixture
+def mock_redis_instance():
+    """redis.asyncio.Redisインスタンスのモック。登録されたスクリプトはスクリプトごとに別のモックになる。"""
+    instance = MagicMock()
+    instance.get = AsyncMock()
+    instance.mget = AsyncMock()
+    instance.pipeline.return_value.execute = AsyncMock()
+    scripts: dict[str, AsyncMock] = {}
+    instance.register_script.side_effect = lambda script: scripts.setdefault(
+        script, AsyncMock()
+    )
+    instance.scripts = scripts
+    return instance
+
+
+@pytest.fixture
+def redis_client(mock_redis_instance):
+    """モックされたRedisインスタンスを持つAsyncRedisClientインスタンス。"""
+    return AsyncRedisClient(mock_redis_instance, "test_owner", "test_repo")
+
+
+@pytest.mark.unit
+def test_create_async_redis_uses_bounded_blocking_pool():
+    # 実行
+    client = create_async_redis("redis://localhost:6379", max_connections=7)
+
+    # 検証
+    pool = client.connection_pool
+    assert pool.max_connections == 7
+    assert pool.connection_kwargs["decode_responses"] is True
+    assert pool.connection_kwargs["health_check_interval"] == 30
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_get_values_uses_prefixed_keys(redis_client, mock_redis_instance):
+    # 準備
+    mock_redis_instance.mget.return_value = ["a", None]
+
+    # 実行
+    values = await redis_client.get_values(["issue:1", "issue:2"])
+
+    # 検証
+    assert values == ["a", None]
+    mock_redis_instance.mget.assert_awaited_once_with(
+        [
+            "repo::test_owner::test_repo:issue:1",
+            "repo::test_owner::test_repo:issue:2",
+        ]
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_get_candidate_issue_ids_reads_queues_in_one_round_trip(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.execute.return_value = [["3", "1"], ["2", "1"]]
+
+    # 実行
+    result = await redis_client.get_candidate_issue_ids(
+        "P1", ["BACKENDCODER", "FRONTENDCODER"]
+    )
+
+    # 検証
+    assert result == [1, 2, 3]
+    mock_redis_instance.pipeline.assert_called_once_with(transaction=False)
+    mock_pipeline.zrange.assert_any_call(
+        "repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P1", 0, -1
+    )
+    mock_pipeline.execute.assert_awaited_once()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_get_candidate_priorities_filters_by_role(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_redis_instance.smembers = AsyncMock(
+        return_value={"queue:candidates:BACKENDCODER:P2", "queue:candidates:DESIGNER:P0"}
+    )
+
+    # 実行
+    result = await redis_client.get_candidate_priorities(["BACKENDCODER"])
+
+    # 検証
+    assert result == {"P2"}
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_claim_issue_runs_shared_script(redis_client, mock_redis_instance):
+    # 準備
+    claim_script = mock_redis_instance.scripts[CLAIM_ISSUE_SCRIPT]
+    claim_script.return_value = ["claimed", 5]
+
+    # 実行
+    result = await redis_client.claim_issue(
+        1, "agent-1", excluded_labels=["in-progress"]
+    )
+
+    # 検証
+    assert result == IssueClaim(IssueClaimResult.CLAIMED, fencing_token=5)
+    kwargs = claim_script.call_args.kwargs
+    assert kwargs["keys"][:2] == [
+        "repo::test_owner::test_repo:issue:1",
+        "repo::test_owner::test_repo:agent_current_task:agent-1",
+    ]
+    assert kwargs["args"][:3] == [1, "agent-1", 120]
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_enqueue_github_changes_writes_entry_in_transaction(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+
+    # 実行
+    await redis_client.enqueue_github_changes(
+        1, add_labels=["in-progress"], branch_names=["feature/issue-1"]
+    )
+
+    # 検証
+    mock_redis_instance.pipeline.assert_called_once_with(transaction=True)
+    mock_pipeline.hset.assert_called_once_with(
+        "repo::test_owner::test_repo:outbox:github:issue:1",
+        mapping={"label:in-progress": "add", "branch:feature/issue-1": "create"},
+    )
+    mock_pipeline.execute.assert_awaited_once()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_claim_outbox_entry_decodes_fields(redis_client, mock_redis_instance):
+    # 準備
+    mock_redis_instance.scripts[CLAIM_OUTBOX_ENTRY_SCRIPT].return_value = [
+        "label:agent-1",
+        "remove",
+        "label:needs-review",
+        "add",
+    ]
+
+    # 実行
+    entry = await redis_client.claim_outbox_entry(1)
+
+    # 検証
+    assert entry == GitHubOutboxEntry(
+        issue_id=1, add_labels=["needs-review"], remove_labels=["agent-1"]
+    )
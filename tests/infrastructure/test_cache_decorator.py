@@ -0,0 +1,216 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from github_broker.infrastructure.cache_decorator import cache_result
+
+
+def make_async_redis_client(cached: dict[str, str] | None = None):
+    """`AsyncRedisClient` と同じインターフェースを持つ、辞書に保存するモック。"""
+    store = dict(cached or {})
+    client = MagicMock()
+
+    async def get_value(key):
+        return store.get(key)
+
+    async def set_value(key, value, timeout=600):
+        store[key] = value
+
+    client.get_value = AsyncMock(side_effect=get_value)
+    client.set_value = AsyncMock(side_effect=set_value)
+    client.get_value_with_ttl = AsyncMock()
+    client.store = store
+    return client
+
+
+class Repository:
+    def __init__(self, redis_client, result=None, delay: float = 0):
+        self._redis_client = redis_client
+        self.result = ["a"] if result is None else result
+        self.delay = delay
+        self.calls = 0
+
+    async def _fetch(self, item_id: int):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.result
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_concurrent_misses_call_function_once():
+    """同じキーの同時のキャッシュミスが、1回の関数呼び出しを共有することをテストします。"""
+    # Arrange
+    class Target(Repository):
+        @cache_result(key_format="items:{0}", ttl=60)
+        async def fetch(self, item_id: int):
+            return await self._fetch(item_id)
+
+    redis_client = make_async_redis_client()
+    target = Target(redis_client, delay=0.01)
+
+    # Act
+    results = await asyncio.gather(*(target.fetch(1) for _ in range(5)))
+
+    # Assert
+    assert results == [["a"]] * 5
+    assert target.calls == 1
+    redis_client.set_value.assert_awaited_once_with(
+        "items:1", json.dumps(["a"]), timeout=60
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_local_cache_hit_skips_redis():
+    """プロセス内キャッシュにヒットした場合、Redisに問い合わせないことをテストします。"""
+    # Arrange
+    class Target(Repository):
+        @cache_result(key_format="items:{0}", ttl=60, local_ttl=30)
+        async def fetch(self, item_id: int):
+            return await self._fetch(item_id)
+
+    redis_client = make_async_redis_client()
+    target = Target(redis_client)
+
+    # Act
+    first = await target.fetch(1)
+    second = await target.fetch(1)
+
+    # Assert
+    assert first == second == ["a"]
+    assert target.calls == 1
+    redis_client.get_value.assert_awaited_once_with("items:1")
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_local_cache_evicts_least_recently_used():
+    """プロセス内キャッシュが上限を超えると、最も古く使われたキーを捨てることをテストします。"""
+    # Arrange
+    class Target(Repository):
+        @cache_result(key_format="items:{0}", ttl=60, local_ttl=30, local_maxsize=1)
+        async def fetch(self, item_id: int):
+            return await self._fetch(item_id)
+
+    redis_client = make_async_redis_client()
+    target = Target(redis_client)
+
+    # Act
+    await target.fetch(1)
+    await target.fetch(2)
+    await target.fetch(1)
+
+    # Assert
+    assert redis_client.get_value.await_count == 3
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+@pytest.mark.parametrize(
+    "negative_ttl, expected_timeout",
+    [
+        (None, 60),  # 指定しない場合は通常のTTL
+        (5, 5),
+        (0, None),  # 0の場合は保存しない
+    ],
+)
+async def test_empty_result_uses_negative_ttl(negative_ttl, expected_timeout):
+    """空の結果が `negative_ttl` の期間だけキャッシュされることをテストします。"""
+    # Arrange
+    class Target(Repository):
+        @cache_result(key_format="items:{0}", ttl=60, negative_ttl=negative_ttl)
+        async def fetch(self, item_id: int):
+            return await self._fetch(item_id)
+
+    redis_client = make_async_redis_client()
+    target = Target(redis_client, result=[])
+
+    # Act
+    result = await target.fetch(1)
+
+    # Assert
+    assert result == []
+    if expected_timeout is None:
+        redis_client.set_value.assert_not_awaited()
+    else:
+        redis_client.set_value.assert_awaited_once_with(
+            "items:1", "[]", timeout=expected_timeout
+        )
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_stale_value_is_returned_and_refreshed_in_background():
+    """古い値がすぐに返され、バックグラウンドで再取得されることをテストします。"""
+    # Arrange
+    class Target(Repository):
+        @cache_result(key_format="items:{0}", ttl=60, stale_ttl=30)
+        async def fetch(self, item_id: int):
+            return await self._fetch(item_id)
+
+    redis_client = make_async_redis_client()
+    redis_client.get_value_with_ttl.return_value = (json.dumps(["old"]), 10)
+    target = Target(redis_client, result=["new"])
+
+    # Act
+    result = await target.fetch(1)
+    await asyncio.sleep(0.01)
+
+    # Assert
+    assert result == ["old"]
+    assert target.calls == 1
+    redis_client.set_value.assert_awaited_once_with(
+        "items:1", json.dumps(["new"]), timeout=90
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_fresh_value_within_stale_window_is_not_refreshed():
+    """残り時間が古い値を返す期間より長い場合は、再取得しないことをテストします。"""
+    # Arrange
+    class Target(Repository):
+        @cache_result(key_format="items:{0}", ttl=60, stale_ttl=30)
+        async def fetch(self, item_id: int):
+            return await self._fetch(item_id)
+
+    redis_client = make_async_redis_client()
+    redis_client.get_value_with_ttl.return_value = (json.dumps(["cached"]), 45)
+    target = Target(redis_client)
+
+    # Act
+    result = await target.fetch(1)
+    await asyncio.sleep(0.01)
+
+    # Assert
+    assert result == ["cached"]
+    assert target.calls == 0
+    redis_client.set_value.assert_not_awaited()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_failure_is_shared_and_not_cached():
+    """関数の例外が待機中の呼び出し元すべてに伝わり、キャッシュされないことをテストします。"""
+    # Arrange
+    class Target(Repository):
+        @cache_result(key_format="items:{0}", ttl=60)
+        async def fetch(self, item_id: int):
+            await self._fetch(item_id)
+            raise RuntimeError("boom")
+
+    redis_client = make_async_redis_client()
+    target = Target(redis_client, delay=0.01)
+
+    # Act
+    results = await asyncio.gather(
+        target.fetch(1), target.fetch(1), return_exceptions=True
+    )
+
+    # Assert
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert target.calls == 1
+    redis_client.set_value.assert_not_awaited()
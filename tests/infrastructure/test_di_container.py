@@ -2,9 +2,15 @@ from unittest.mock import patch
 
 import punq
 
+from github_broker.application.task_scheduler import (
+    TaskScheduler,
+    WeightedFairTaskScheduler,
+)
 from github_broker.application.task_service import TaskService
-from github_broker.domain.agent_config import AgentConfigList
+from github_broker.domain.agent_config import AgentConfigList, AgentDefinition
 from github_broker.infrastructure.agent.loader import AgentConfigLoader
+from github_broker.infrastructure.async_github_client import AsyncGitHubClient
+from github_broker.infrastructure.async_redis_client import AsyncRedisClient
 from github_broker.infrastructure.config import Settings
 from github_broker.infrastructure.di_container import create_container
 from github_broker.infrastructure.github_client import GitHubClient
@@ -42,10 +48,55 @@ def test_create_container(mock_load_from_file, monkeypatch):
     assert resolved_settings.github_agent_repository == "test_owner/test_repo"
 
     assert isinstance(container.resolve(GitHubClient), GitHubClient)
+    assert isinstance(container.resolve(AsyncGitHubClient), AsyncGitHubClient)
     assert isinstance(container.resolve(RedisClient), RedisClient)
+    assert isinstance(container.resolve(AsyncRedisClient), AsyncRedisClient)
     assert isinstance(container.resolve(AgentConfigLoader), AgentConfigLoader)
     assert container.resolve(AgentConfigList) == mock_agent_config_list
     assert isinstance(container.resolve(TaskService), TaskService)
+    # リクエスト間でプロセス内の状態を共有するため、同じインスタンスが返される
+    assert container.resolve(TaskService) is container.resolve(TaskService)
 
     # Verify that load_from_file was called
     mock_load_from_file.assert_called_once_with("agents.yml")
+
+
+@patch("github_broker.infrastructure.agent.loader.AgentConfigLoader.load_from_file")
+def test_create_container_configures_weighted_fair_scheduler(
+    mock_load_from_file, monkeypatch
+):
+    """
+    Tests that TASK_SCHEDULER=weighted_fair builds the scheduler from the
+    role weights and limits in agents.yml.
+    """
+    # Arrange
+    for name, value in {
+        "GITHUB_APP_ID": "test_id",
+        "GITHUB_APP_PRIVATE_KEY": "test_key",
+        "GITHUB_PERSONAL_ACCESS_TOKEN": "test_token",
+        "GITHUB_WEBHOOK_SECRET": "test_secret",
+        "GOOGLE_API_KEY": "test_api_key",
+        "GITHUB_AGENT_REPOSITORY": "test_owner/test_repo",
+        "TASK_SCHEDULER": "weighted_fair",
+        "TASK_AGE_BOOST_SECONDS": "3600",
+    }.items():
+        monkeypatch.setenv(name, value)
+    mock_load_from_file.return_value = AgentConfigList(
+        agents=[
+            AgentDefinition(
+                role="BACKENDCODER", persona="p", weight=2, max_concurrent_tasks=3
+            ),
+            AgentDefinition(role="FRONTENDCODER", persona="p"),
+        ]
+    )
+
+    # Act
+    container = create_container()
+
+    # Assert
+    scheduler = container.resolve(TaskScheduler)
+    assert isinstance(scheduler, WeightedFairTaskScheduler)
+    assert scheduler.role_weights == {"BACKENDCODER": 2.0, "FRONTENDCODER": 1.0}
+    assert scheduler.max_concurrent_tasks == {"BACKENDCODER": 3}
+    assert scheduler.age_boost_seconds == 3600
+    assert container.resolve(TaskService).task_scheduler is scheduler
@@ -1,12 +1,19 @@
+import json
 import logging
 import os
 import time
-from unittest.mock import MagicMock, patch
+from datetime import UTC, datetime
+from unittest.mock import AsyncMock, MagicMock, call, patch
 
 import pytest
 from github import Github, GithubException
 
-from github_broker.infrastructure.github_client import GitHubClient
+from github_broker.infrastructure.github_client import (
+    DEFAULT_CACHE_TTL_SECONDS,
+    REPOSITORY_HANDLE_TTL_SECONDS,
+    GitHubClient,
+    PullRequestRef,
+)
 
 
 @pytest.mark.unit
@@ -37,6 +44,47 @@ def test_add_label_success(mock_github):
     assert result is True
 
 
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.Github")
+def test_repository_handle_is_cached_and_lazy(mock_github):
+    """リポジトリハンドルが遅延生成され、複数の書き込みで再利用されることをテストします。"""
+    # Arrange
+    mock_github_instance = MagicMock()
+    mock_github.return_value = mock_github_instance
+    client = GitHubClient("test/repo", "fake_token")
+
+    # Act
+    client.add_label(1, "in-progress")
+    client.remove_label(1, "in-progress")
+    client.update_issue(1, add_labels=["needs-review"])
+
+    # Assert
+    mock_github_instance.get_repo.assert_called_once_with("test/repo", lazy=True)
+
+
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.time.monotonic")
+@patch("github_broker.infrastructure.github_client.Github")
+def test_repository_handle_is_refreshed_after_ttl(mock_github, mock_monotonic):
+    """リポジトリハンドルが一定時間経過後に作り直されることをテストします。"""
+    # Arrange
+    mock_github_instance = MagicMock()
+    mock_github.return_value = mock_github_instance
+    mock_monotonic.side_effect = [
+        1000.0,
+        1000.0 + REPOSITORY_HANDLE_TTL_SECONDS - 1,
+        1000.0 + REPOSITORY_HANDLE_TTL_SECONDS,
+    ]
+    client = GitHubClient("test/repo", "fake_token")
+
+    # Act
+    for _ in range(3):
+        client.add_label(1, "in-progress")
+
+    # Assert
+    assert mock_github_instance.get_repo.call_count == 2
+
+
 @pytest.mark.unit
 @patch("github_broker.infrastructure.github_client.Github")
 def test_remove_label_success(mock_github):
@@ -201,6 +249,215 @@ def test_get_open_issues_success(mock_github):
     )
 
 
+def create_graphql_issue_node(number: int, state: str = "OPEN", linked_prs=None):
+    """テスト用のGraphQL Issueノードを生成するヘルパー関数。"""
+    return {
+        "number": number,
+        "title": f"Issue {number}",
+        "body": "body",
+        "url": f"https://github.com/test/repo/issues/{number}",
+        "state": state,
+        "createdAt": "2025-01-01T00:00:00Z",
+        "updatedAt": "2025-01-02T00:00:00Z",
+        "labels": {"nodes": [{"name": "BACKENDCODER"}, {"name": "P1"}]},
+        "closedByPullRequestsReferences": {"nodes": linked_prs or []},
+    }
+
+
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.Github")
+def test_get_open_issues_with_linked_prs_paginates_graphql(mock_github):
+    """get_open_issues_with_linked_prsがGraphQLのページをたどり、紐づいたPRを含めて返すことをテストします。"""
+    # Arrange
+    linked_pr = {
+        "number": 10,
+        "url": "https://github.com/test/repo/pull/10",
+        "createdAt": "2025-01-01T01:00:00Z",
+    }
+    pages = [
+        {
+            "data": {
+                "repository": {
+                    "issues": {
+                        "pageInfo": {"hasNextPage": True, "endCursor": "c1"},
+                        "nodes": [create_graphql_issue_node(1, linked_prs=[linked_pr])],
+                    }
+                }
+            }
+        },
+        {
+            "data": {
+                "repository": {
+                    "issues": {
+                        "pageInfo": {"hasNextPage": False, "endCursor": None},
+                        "nodes": [create_graphql_issue_node(2)],
+                    }
+                }
+            }
+        },
+    ]
+    mock_requester = mock_github.return_value.requester
+    mock_requester.graphql_query.side_effect = [({}, page) for page in pages]
+    client = GitHubClient("test/repo", "fake_token")
+
+    # Act
+    issues = client.get_open_issues_with_linked_prs()
+
+    # Assert
+    assert [issue["number"] for issue in issues] == [1, 2]
+    assert issues[0] == {
+        "number": 1,
+        "title": "Issue 1",
+        "body": "body",
+        "html_url": "https://github.com/test/repo/issues/1",
+        "state": "open",
+        "created_at": "2025-01-01T00:00:00Z",
+        "updated_at": "2025-01-02T00:00:00Z",
+        "labels": [{"name": "BACKENDCODER"}, {"name": "P1"}],
+        "linked_pull_requests": [
+            {
+                "number": 10,
+                "html_url": "https://github.com/test/repo/pull/10",
+                "created_at": "2025-01-01T01:00:00Z",
+            }
+        ],
+    }
+    assert mock_requester.graphql_query.call_count == 2
+    second_variables = mock_requester.graphql_query.call_args_list[1].args[1]
+    assert second_variables["owner"] == "test"
+    assert second_variables["name"] == "repo"
+    assert second_variables["cursor"] == "c1"
+    mock_github.return_value.search_issues.assert_not_called()
+
+
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.Github")
+def test_refresh_rate_limit_budget_records_each_resource(mock_github):
+    """refresh_rate_limit_budgetがcore/search/graphqlの残量を記録することをテストします。"""
+    # Arrange
+    reset_at = datetime(2100, 1, 1, tzinfo=UTC)
+    resources = mock_github.return_value.get_rate_limit.return_value.resources
+    for name, remaining, limit in [
+        ("core", 4000, 5000),
+        ("search", 25, 30),
+        ("graphql", 4900, 5000),
+    ]:
+        rate = getattr(resources, name)
+        rate.remaining = remaining
+        rate.limit = limit
+        rate.reset = reset_at
+    client = GitHubClient("test/repo", "fake_token")
+
+    # Act
+    snapshot = client.refresh_rate_limit_budget()
+
+    # Assert
+    assert snapshot["search"] == {
+        "remaining": 25,
+        "limit": 30,
+        "reset_at": reset_at.isoformat(),
+    }
+    assert client.rate_limit_budget.get("core").remaining == 4000
+    assert client.rate_limit_budget.get("graphql").limit == 5000
+
+
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.Github")
+def test_graphql_queries_record_rate_limit_headers(mock_github):
+    """GraphQLの応答ヘッダーからgraphqlリソースの残量が記録されることをテストします。"""
+    # Arrange
+    mock_github.return_value.requester.graphql_query.return_value = (
+        {
+            "x-ratelimit-resource": "graphql",
+            "x-ratelimit-remaining": "4321",
+            "x-ratelimit-limit": "5000",
+        },
+        {
+            "data": {
+                "search": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": [],
+                }
+            }
+        },
+    )
+    client = GitHubClient("test/repo", "fake_token")
+
+    # Act
+    client.get_needs_review_issues_and_prs()
+
+    # Assert
+    assert client.rate_limit_budget.get("graphql").remaining == 4321
+
+
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.Github")
+def test_get_issues_updated_since_uses_updated_qualifier(mock_github):
+    """get_issues_updated_sinceがupdated:>=修飾子付きでGraphQL検索することをテストします。"""
+    # Arrange
+    mock_requester = mock_github.return_value.requester
+    mock_requester.graphql_query.return_value = (
+        {},
+        {
+            "data": {
+                "search": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": [create_graphql_issue_node(1, state="CLOSED")],
+                }
+            }
+        },
+    )
+    client = GitHubClient("test/repo", "fake_token")
+    since = datetime(2025, 1, 2, 3, 4, 5, tzinfo=UTC)
+
+    # Act
+    issues = client.get_issues_updated_since(since)
+
+    # Assert
+    assert [(issue["number"], issue["state"]) for issue in issues] == [(1, "closed")]
+    variables = mock_requester.graphql_query.call_args.args[1]
+    assert variables["query"] == "repo:test/repo is:issue updated:>=2025-01-02T03:04:05Z"
+
+
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.Github")
+def test_get_needs_review_issues_and_prs_uses_graphql_created_at(mock_github):
+    """get_needs_review_issues_and_prsがPRごとのAPI呼び出しなしで作成日時を返すことをテストします。"""
+    # Arrange
+    mock_requester = mock_github.return_value.requester
+    mock_requester.graphql_query.return_value = (
+        {},
+        {
+            "data": {
+                "search": {
+                    "pageInfo": {"hasNextPage": False, "endCursor": None},
+                    "nodes": [
+                        {
+                            "number": 5,
+                            "url": "https://github.com/test/repo/pull/5",
+                            "createdAt": "2025-01-01T00:00:00Z",
+                        }
+                    ],
+                }
+            }
+        },
+    )
+    client = GitHubClient("test/repo", "fake_token")
+
+    # Act
+    pr_map = client.get_needs_review_issues_and_prs()
+
+    # Assert
+    assert pr_map == {
+        5: PullRequestRef(
+            number=5,
+            html_url="https://github.com/test/repo/pull/5",
+            created_at=datetime(2025, 1, 1, tzinfo=UTC),
+        )
+    }
+    mock_github.return_value.search_issues.assert_not_called()
+
+
 @pytest.mark.unit
 @patch("github_broker.infrastructure.github_client.Github")
 def test_find_issues_by_labels_raises_exception(mock_github):
@@ -535,6 +792,101 @@ def test_update_issue_remove_label_raises_exception(mock_github):
         client.update_issue(issue_id, remove_labels=remove_labels)
 
 
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.Github")
+def test_apply_label_delta_sends_only_changed_labels(mock_github):
+    """apply_label_deltaがラベル全体を置き換えず、変更したラベルのみを送信することをテストします。"""
+    # Arrange
+    mock_issue = MagicMock()
+    mock_repo = MagicMock()
+    mock_repo.get_issue.return_value = mock_issue
+    mock_github.return_value.get_repo.return_value = mock_repo
+    client = GitHubClient("test/repo", "fake_token")
+
+    # Act
+    result = client.apply_label_delta(
+        123, add_labels=["needs-review", "P1"], remove_labels=["in-progress", "agent-1"]
+    )
+
+    # Assert
+    assert result is True
+    mock_issue.add_to_labels.assert_called_once_with("needs-review", "P1")
+    assert mock_issue.remove_from_labels.call_args_list == [
+        call("in-progress"),
+        call("agent-1"),
+    ]
+    mock_issue.set_labels.assert_not_called()
+
+
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.Github")
+def test_apply_label_delta_preserves_labels_added_on_github(mock_github):
+    """GitHub上のラベルが呼び出し元の想定と異なっていても、後から付与されたラベルを消さないことをテストします。"""
+    # Arrange
+    mock_issue = MagicMock()
+    live_labels = []
+    for name in ["BACKENDCODER", "P1", "human-added"]:
+        label = MagicMock()
+        label.name = name
+        live_labels.append(label)
+    mock_issue.labels = live_labels
+    mock_repo = MagicMock()
+    mock_repo.get_issue.return_value = mock_issue
+    mock_github.return_value.get_repo.return_value = mock_repo
+    client = GitHubClient("test/repo", "fake_token")
+
+    # Act
+    client.apply_label_delta(1, add_labels=["in-progress", "agent-1"])
+
+    # Assert
+    mock_issue.add_to_labels.assert_called_once_with("in-progress", "agent-1")
+    mock_issue.remove_from_labels.assert_not_called()
+    mock_issue.set_labels.assert_not_called()
+
+
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.Github")
+def test_apply_label_delta_ignores_missing_label_on_remove(mock_github):
+    """削除対象のラベルがIssueに存在しない場合(404)、続行することをテストします。"""
+    # Arrange
+    mock_issue = MagicMock()
+    mock_issue.remove_from_labels.side_effect = GithubException(
+        status=404, data={}, headers=None
+    )
+    mock_repo = MagicMock()
+    mock_repo.get_issue.return_value = mock_issue
+    mock_github.return_value.get_repo.return_value = mock_repo
+    client = GitHubClient("test/repo", "fake_token")
+
+    # Act
+    result = client.apply_label_delta(
+        1, add_labels=["needs-review"], remove_labels=["in-progress"]
+    )
+
+    # Assert
+    assert result is True
+    mock_issue.add_to_labels.assert_called_once_with("needs-review")
+
+
+@pytest.mark.unit
+@patch("github_broker.infrastructure.github_client.Github")
+def test_apply_label_delta_raises_exception(mock_github):
+    """apply_label_deltaがAPIエラーを再送出することをテストします。"""
+    # Arrange
+    mock_issue = MagicMock()
+    mock_issue.add_to_labels.side_effect = GithubException(
+        status=500, data={}, headers=None
+    )
+    mock_repo = MagicMock()
+    mock_repo.get_issue.return_value = mock_issue
+    mock_github.return_value.get_repo.return_value = mock_repo
+    client = GitHubClient("test/repo", "fake_token")
+
+    # Act & Assert
+    with pytest.raises(GithubException):
+        client.apply_label_delta(1, add_labels=["x"])
+
+
 @pytest.mark.unit
 @pytest.mark.anyio
 @patch("github_broker.infrastructure.github_client.Github")
@@ -651,6 +1003,38 @@ async def test_get_pull_request_review_comments_uses_cache(mock_github):
     mock_pull.get_review_comments.assert_called_once()  # GitHub APIは2回目は呼び出されない
     assert comments_second_call == [{"id": 2, "body": "Cached PR comment"}]
 
+
+@pytest.mark.unit
+@pytest.mark.anyio
+@patch("github_broker.infrastructure.github_client.Github")
+async def test_get_pull_request_review_comments_uses_async_redis_cache(mock_github):
+    """非同期Redisクライアントを渡した場合、キャッシュの読み書きを直接awaitすることをテストします。"""
+    # Arrange
+    mock_redis_client = MagicMock()
+    mock_redis_client.get_value = AsyncMock(return_value=None)
+    mock_redis_client.set_value = AsyncMock()
+    mock_review_comment = MagicMock()
+    mock_review_comment.raw_data = {"id": 1, "body": "Test comment"}
+    mock_repo = mock_github.return_value.get_repo.return_value
+    mock_repo.get_pull.return_value.get_review_comments.return_value = [
+        mock_review_comment
+    ]
+    client = GitHubClient("test/repo", "fake_token", redis_client=mock_redis_client)
+
+    # Act
+    comments = await client.get_pull_request_review_comments(123)
+
+    # Assert
+    assert comments == [{"id": 1, "body": "Test comment"}]
+    mock_redis_client.get_value.assert_awaited_once_with(
+        "github:pr_review_comments:test/repo:123"
+    )
+    mock_redis_client.set_value.assert_awaited_once_with(
+        "github:pr_review_comments:test/repo:123",
+        json.dumps(comments),
+        timeout=DEFAULT_CACHE_TTL_SECONDS,
+    )
+
 @pytest.mark.unit
 @patch("github_broker.infrastructure.github_client.Github")
 def test_get_pull_request_info_from_issue_found(mock_github):
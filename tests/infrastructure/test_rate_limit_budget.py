@@ -0,0 +1,94 @@
+from datetime import UTC, datetime, timedelta
+
+import pytest
+
+from github_broker.infrastructure.rate_limit_budget import (
+    RateLimitBudget,
+    RequestPriority,
+)
+
+
+@pytest.mark.unit
+def test_record_headers_stores_budget_per_resource():
+    """record_headersがX-RateLimit-*ヘッダーからリソースごとの残量を記録することをテストします。"""
+    # Arrange
+    budget = RateLimitBudget()
+
+    # Act
+    budget.record_headers(
+        {
+            "X-RateLimit-Resource": "search",
+            "X-RateLimit-Remaining": "12",
+            "X-RateLimit-Limit": "30",
+            "X-RateLimit-Reset": "1735689600",
+        }
+    )
+    budget.record_headers({"content-type": "application/json"})
+
+    # Assert
+    assert budget.snapshot() == {
+        "search": {
+            "remaining": 12,
+            "limit": 30,
+            "reset_at": datetime(2025, 1, 1, tzinfo=UTC).isoformat(),
+        }
+    }
+
+
+@pytest.mark.unit
+def test_allows_reserves_budget_for_critical_requests():
+    """残量が予約分を下回ると、先読みのみが拒否されることをテストします。"""
+    # Arrange
+    budget = RateLimitBudget(reserve_ratio=0.2)
+    budget.record("core", remaining=500, limit=5000)
+
+    # Act & Assert
+    assert budget.allows("core", RequestPriority.CRITICAL) is True
+    assert budget.allows("core", RequestPriority.SPECULATIVE) is False
+    assert budget.allows("graphql", RequestPriority.SPECULATIVE) is True
+
+
+@pytest.mark.unit
+def test_allows_treats_budget_as_full_after_reset():
+    """残量が0でも、リセット時刻を過ぎていればリクエストが許可されることをテストします。"""
+    # Arrange
+    budget = RateLimitBudget()
+    now = datetime.now(UTC)
+    budget.record("core", remaining=0, limit=5000, reset_at=now - timedelta(seconds=1))
+    budget.record("search", remaining=0, limit=30, reset_at=now + timedelta(minutes=1))
+
+    # Act & Assert
+    assert budget.allows("core", RequestPriority.CRITICAL) is True
+    assert budget.allows("core", RequestPriority.SPECULATIVE) is True
+    assert budget.get("core").remaining == 5000
+    assert budget.allows("search", RequestPriority.CRITICAL) is False
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "remaining, expected_interval",
+    [
+        (5000, 150.0),  # 残量が多い場合は間隔を縮める
+        (2500, 300.0),
+        (1250, 600.0),
+        (0, 1200.0),  # 残量がない場合は最大まで伸ばす
+    ],
+)
+def test_polling_interval_adapts_to_remaining_budget(remaining, expected_interval):
+    """ポーリング間隔が最も少ないリソースの残量に応じて伸縮することをテストします。"""
+    # Arrange
+    budget = RateLimitBudget()
+    budget.record("core", remaining=5000, limit=5000)
+    budget.record("graphql", remaining=remaining, limit=5000)
+
+    # Act
+    interval = budget.polling_interval(300)
+
+    # Assert
+    assert interval == expected_interval
+
+
+@pytest.mark.unit
+def test_polling_interval_without_budget_returns_base():
+    """残量が未記録の場合、基準のポーリング間隔を返すことをテストします。"""
+    assert RateLimitBudget().polling_interval(300) == 300
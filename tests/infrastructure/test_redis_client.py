@@ -1,14 +1,37 @@
-from unittest.mock import MagicMock, call
+import json
+import os
+import uuid
+from datetime import UTC, datetime
+from unittest.mock import MagicMock, call, patch
 
 import pytest
+import redis
 
-from github_broker.infrastructure.redis_client import RedisClient
+from github_broker.infrastructure.redis_client import (
+    CLAIM_ISSUE_SCRIPT,
+    CLAIM_OUTBOX_ENTRY_SCRIPT,
+    COMPARE_AND_DELETE_SCRIPT,
+    RELEASE_ISSUE_CLAIM_SCRIPT,
+    RENEW_ISSUE_LEASE_SCRIPT,
+    RETRY_OUTBOX_ENTRY_SCRIPT,
+    GitHubOutboxEntry,
+    IssueClaim,
+    IssueClaimResult,
+    IssueSyncResult,
+    RedisClient,
+)
 
 
 @pytest.fixture
 def mock_redis_instance():
-    """redis.Redisインスタンスのモック。"""
-    return MagicMock()
+    """redis.Redisインスタンスのモック。登録されたスクリプトはスクリプトごとに別のモックになる。"""
+    instance = MagicMock()
+    scripts: dict[str, MagicMock] = {}
+    instance.register_script.side_effect = lambda script: scripts.setdefault(
+        script, MagicMock()
+    )
+    instance.scripts = scripts
+    return instance
 
 
 @pytest.fixture
@@ -19,53 +42,6 @@ def redis_client(mock_redis_instance):
     return RedisClient(mock_redis_instance, owner, repo_name)
 
 
-@pytest.mark.unit
-def test_acquire_lock(redis_client, mock_redis_instance):
-    # 準備
-    lock_key = "test_lock"
-    value = "locked"
-    timeout = 300
-    mock_redis_instance.set.return_value = True
-
-    # 実行
-    result = redis_client.acquire_lock(lock_key, value, timeout)
-
-    # 検証
-    expected_prefixed_key = "repo::test_owner::test_repo:test_lock"
-    mock_redis_instance.set.assert_called_once_with(
-        expected_prefixed_key, value, ex=timeout, nx=True
-    )
-    assert result is True
-
-
-@pytest.mark.unit
-def test_release_lock(redis_client, mock_redis_instance):
-    # 準備
-    lock_key = "test_lock"
-    mock_redis_instance.delete.return_value = 1
-
-    # 実行
-    result = redis_client.release_lock(lock_key)
-
-    # 検証
-    expected_prefixed_key = "repo::test_owner::test_repo:test_lock"
-    mock_redis_instance.delete.assert_called_once_with(expected_prefixed_key)
-    assert result is True
-
-
-@pytest.mark.unit
-def test_release_lock_not_found(redis_client, mock_redis_instance):
-    # 準備
-    lock_key = "test_lock"
-    mock_redis_instance.delete.return_value = 0
-
-    # 実行
-    result = redis_client.release_lock(lock_key)
-
-    # 検証
-    assert result is False
-
-
 @pytest.mark.unit
 def test_get_value(redis_client, mock_redis_instance):
     # 準備
@@ -95,6 +71,22 @@ def test_get_value_none(redis_client, mock_redis_instance):
     assert result is None
 
 
+@pytest.mark.unit
+def test_get_value_with_ttl(redis_client, mock_redis_instance):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.execute.return_value = ["cached", 42]
+
+    # 実行
+    result = redis_client.get_value_with_ttl("test_key")
+
+    # 検証
+    assert result == ("cached", 42)
+    mock_redis_instance.pipeline.assert_called_once_with(transaction=False)
+    mock_pipeline.get.assert_called_once_with("repo::test_owner::test_repo:test_key")
+    mock_pipeline.ttl.assert_called_once_with("repo::test_owner::test_repo:test_key")
+
+
 @pytest.mark.unit
 def test_set_value(redis_client, mock_redis_instance):
     # 準備
@@ -149,3 +141,1179 @@ def test_get_keys_by_pattern(redis_client, mock_redis_instance):
         call(1, match=prefixed_pattern),
     ]
     assert result == ["issue:1", "issue:2"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize(
+    "script_result, expected",
+    [
+        (["claimed", 7], IssueClaim(IssueClaimResult.CLAIMED, fencing_token=7)),
+        ([b"locked"], IssueClaim(IssueClaimResult.LOCKED)),
+        (["not_candidate"], IssueClaim(IssueClaimResult.NOT_CANDIDATE)),
+    ],
+)
+def test_claim_issue_runs_script_once(
+    redis_client, mock_redis_instance, script_result, expected
+):
+    # 準備
+    claim_script = mock_redis_instance.scripts[CLAIM_ISSUE_SCRIPT]
+    claim_script.return_value = script_result
+
+    # 実行
+    result = redis_client.claim_issue(
+        1,
+        "agent-1",
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
+    )
+
+    # 検証
+    assert result == expected
+    claim_script.assert_called_once()
+    kwargs = claim_script.call_args.kwargs
+    assert kwargs["keys"] == [
+        "repo::test_owner::test_repo:issue:1",
+        "repo::test_owner::test_repo:agent_current_task:agent-1",
+        "repo::test_owner::test_repo:events:assignments",
+        "repo::test_owner::test_repo:issue_lock_1",
+        "repo::test_owner::test_repo:lease:fencing_token",
+        "repo::test_owner::test_repo:index:labels",
+        "repo::test_owner::test_repo:index:issue_labels",
+        "repo::test_owner::test_repo:queue:candidates",
+        "repo::test_owner::test_repo:sync:issues:generation",
+        "repo::test_owner::test_repo:issue_hashes",
+        "repo::test_owner::test_repo:index:label:in-progress",
+        "repo::test_owner::test_repo:index:label:in-progress",
+        "repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P1",
+    ]
+    assert kwargs["args"][:3] == [1, "agent-1", 120]
+    assert kwargs["args"][5:] == [
+        "in-progress",
+        1,
+        "queue:candidates:BACKENDCODER:P1",
+    ]
+    mock_redis_instance.set.assert_not_called()
+
+
+@pytest.mark.unit
+def test_release_issue_claim_runs_script_once(redis_client, mock_redis_instance):
+    # 準備
+    release_script = mock_redis_instance.scripts[RELEASE_ISSUE_CLAIM_SCRIPT]
+    release_script.return_value = 1
+
+    # 実行
+    result = redis_client.release_issue_claim(
+        1,
+        "agent-1",
+        7,
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
+    )
+
+    # 検証
+    assert result is True
+    release_script.assert_called_once_with(
+        keys=[
+            "repo::test_owner::test_repo:issue_lock_1",
+            "repo::test_owner::test_repo:agent_current_task:agent-1",
+            "repo::test_owner::test_repo:index:issue_labels",
+            "repo::test_owner::test_repo:issue_hashes",
+            "repo::test_owner::test_repo:issue:1",
+            "repo::test_owner::test_repo:queue:candidates",
+            "repo::test_owner::test_repo:sync:issues:generation",
+            "repo::test_owner::test_repo:index:label:in-progress",
+            "repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P1",
+        ],
+        args=[
+            "7:agent-1",
+            1,
+            "repo::test_owner::test_repo:channel:task_available",
+            "in-progress",
+            "queue:candidates:BACKENDCODER:P1",
+        ],
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("script_result, expected", [(1, True), (0, False)])
+def test_renew_issue_lease_checks_owner(
+    redis_client, mock_redis_instance, script_result, expected
+):
+    # 準備
+    renew_script = mock_redis_instance.scripts[RENEW_ISSUE_LEASE_SCRIPT]
+    renew_script.return_value = script_result
+
+    # 実行
+    result = redis_client.renew_issue_lease(1, "agent-1", 7, lease_ttl=60)
+
+    # 検証
+    assert result is expected
+    renew_script.assert_called_once_with(
+        keys=["repo::test_owner::test_repo:issue_lock_1"], args=["7:agent-1", 60]
+    )
+
+
+@pytest.mark.unit
+def test_get_agent_current_tasks_returns_records_per_agent(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    prefix = "repo::test_owner::test_repo:"
+    mock_redis_instance.scan.return_value = (
+        0,
+        [f"{prefix}agent_current_task:agent-1", f"{prefix}agent_current_task:agent-2"],
+    )
+    mock_redis_instance.mget.return_value = ["1", None]
+
+    # 実行
+    result = redis_client.get_agent_current_tasks()
+
+    # 検証
+    assert result == {"agent-1": 1}
+    mock_redis_instance.scan.assert_called_once_with(
+        0, match=f"{prefix}agent_current_task:*"
+    )
+
+
+@pytest.mark.unit
+def test_clear_agent_current_task_compares_issue_id(redis_client, mock_redis_instance):
+    # 準備
+    delete_script = mock_redis_instance.scripts[COMPARE_AND_DELETE_SCRIPT]
+    delete_script.return_value = 0
+
+    # 実行
+    result = redis_client.clear_agent_current_task("agent-1", 1)
+
+    # 検証
+    assert result is False
+    delete_script.assert_called_once_with(
+        keys=["repo::test_owner::test_repo:agent_current_task:agent-1"], args=[1]
+    )
+
+
+@pytest.mark.unit
+def test_get_leased_issue_ids(redis_client, mock_redis_instance):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.execute.return_value = [1, 0]
+
+    # 実行
+    result = redis_client.get_leased_issue_ids([1, 2])
+
+    # 検証
+    assert result == {1}
+    mock_pipeline.exists.assert_any_call("repo::test_owner::test_repo:issue_lock_1")
+    mock_pipeline.exists.assert_any_call("repo::test_owner::test_repo:issue_lock_2")
+
+
+@pytest.mark.unit
+def test_get_assigned_agents_reads_latest_assignment_events(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_redis_instance.xrevrange.return_value = [
+        ("3-0", {"event": "assigned", "issue_id": "1", "agent_id": "agent-2"}),
+        ("2-0", {"event": "assigned", "issue_id": "2", "agent_id": "agent-3"}),
+        ("1-0", {"event": "assigned", "issue_id": "1", "agent_id": "agent-1"}),
+    ]
+
+    # 実行
+    result = redis_client.get_assigned_agents([1, 4])
+
+    # 検証
+    assert result == {1: "agent-2"}
+    mock_redis_instance.xrevrange.assert_called_once_with(
+        "repo::test_owner::test_repo:events:assignments", max="+", count=500
+    )
+
+
+@pytest.mark.unit
+def test_get_assigned_agents_pages_through_stream(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    first_page = [
+        (f"{n}-0", {"event": "assigned", "issue_id": "9", "agent_id": "agent-9"})
+        for n in range(1000, 500, -1)
+    ]
+    second_page = [
+        ("5-0", {"event": "assigned", "issue_id": "1", "agent_id": "agent-1"})
+    ]
+    mock_redis_instance.xrevrange.side_effect = [first_page, second_page]
+
+    # 実行
+    result = redis_client.get_assigned_agents([1])
+
+    # 検証
+    assert result == {1: "agent-1"}
+    assert mock_redis_instance.xrevrange.call_args_list[1] == call(
+        "repo::test_owner::test_repo:events:assignments", max="(501-0", count=500
+    )
+
+
+def _cached(issue):
+    return RedisClient._to_cached_issue(issue)
+
+
+def _digest(issue):
+    return RedisClient._get_issue_digest(_cached(issue))
+
+
+@pytest.mark.unit
+def test_upsert_issue_updates_label_indexes(redis_client, mock_redis_instance):
+    # 準備
+    issue = {"number": 1, "title": "Test", "labels": [{"name": "P1"}]}
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.hmget.side_effect = [["old-digest"], [json.dumps(["P0"])]]
+    mock_pipeline.execute.side_effect = [None, [0]]
+
+    # 実行
+    result = redis_client.upsert_issue(issue)
+
+    # 検証
+    assert result is True
+    mock_pipeline.set.assert_called_once_with(
+        "repo::test_owner::test_repo:issue:1", json.dumps(_cached(issue))
+    )
+    mock_pipeline.hset.assert_any_call(
+        "repo::test_owner::test_repo:issue_hashes", "1", _digest(issue)
+    )
+    mock_pipeline.zrem.assert_called_once_with(
+        "repo::test_owner::test_repo:index:label:P0", 1
+    )
+    mock_pipeline.zadd.assert_called_once_with(
+        "repo::test_owner::test_repo:index:label:P1", {1: 1}
+    )
+    mock_pipeline.sadd.assert_called_once_with(
+        "repo::test_owner::test_repo:index:labels", "P1"
+    )
+    # 通知は候補キューの再構築時に行う
+    mock_pipeline.publish.assert_not_called()
+    # 空になったP0のインデックスはラベル一覧から取り除かれる
+    mock_redis_instance.srem.assert_called_once_with(
+        "repo::test_owner::test_repo:index:labels", "P0"
+    )
+    # すべての書き込みの後に世代番号が進む
+    mock_redis_instance.incr.assert_called_once_with(
+        "repo::test_owner::test_repo:sync:issues:generation"
+    )
+
+
+@pytest.mark.unit
+def test_upsert_issue_skips_unchanged_issue(redis_client, mock_redis_instance):
+    # 準備
+    issue = {"number": 1, "title": "Test", "labels": [{"name": "P1"}]}
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.hmget.side_effect = [[_digest(issue)], [json.dumps(["P1"])]]
+
+    # 実行
+    result = redis_client.upsert_issue(issue)
+
+    # 検証
+    assert result is False
+    mock_pipeline.set.assert_not_called()
+    mock_pipeline.publish.assert_not_called()
+    mock_pipeline.execute.assert_not_called()
+    mock_redis_instance.incr.assert_not_called()
+
+
+@pytest.mark.unit
+def test_upsert_issue_stores_compact_projection(redis_client, mock_redis_instance):
+    # 準備
+    issue = {
+        "number": 1,
+        "title": "Test",
+        "body": "本文",
+        "html_url": "https://github.com/test_owner/test_repo/issues/1",
+        "created_at": "2025-01-01T00:00:00Z",
+        "state": "open",
+        "user": {"login": "octocat", "avatar_url": "https://example.com/a.png"},
+        "reactions": {"+1": 3},
+        "labels": [{"id": 10, "name": "P1", "color": "ff0000"}],
+        "linked_pull_requests": [
+            {
+                "number": 2,
+                "html_url": "https://github.com/test_owner/test_repo/pull/2",
+                "created_at": "2025-01-02T00:00:00Z",
+            }
+        ],
+    }
+    expected = {
+        "number": 1,
+        "title": "Test",
+        "body": "本文",
+        "html_url": "https://github.com/test_owner/test_repo/issues/1",
+        "created_at": "2025-01-01T00:00:00Z",
+        "labels": [{"name": "P1"}],
+        "linked_pull_requests": [
+            {"number": 2, "html_url": "https://github.com/test_owner/test_repo/pull/2"}
+        ],
+        "task": {"assignable": False, "branch_name": None, "priority": 1},
+    }
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    # 以前の形式（完全なIssue）で保存されたエントリは、ハッシュが一致せず書き直される
+    full_digest = RedisClient._get_issue_digest(issue)
+    mock_pipeline.hmget.side_effect = [[full_digest], [json.dumps(["P1"])]]
+
+    # 実行
+    result = redis_client.upsert_issue(issue)
+
+    # 検証
+    assert result is True
+    mock_pipeline.set.assert_called_once_with(
+        "repo::test_owner::test_repo:issue:1", json.dumps(expected)
+    )
+    mock_pipeline.hset.assert_any_call(
+        "repo::test_owner::test_repo:issue_hashes",
+        "1",
+        RedisClient._get_issue_digest(expected),
+    )
+
+
+@pytest.mark.unit
+def test_upsert_issue_without_linked_pull_requests_keeps_them_unknown(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    issue = {"number": 1, "title": "Test", "labels": []}
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.hmget.side_effect = [[None], [None]]
+
+    # 実行
+    redis_client.upsert_issue(issue)
+
+    # 検証
+    stored = json.loads(mock_pipeline.set.call_args.args[1])
+    assert "linked_pull_requests" not in stored
+
+
+@pytest.mark.unit
+def test_upsert_issue_precomputes_task_fields(redis_client, mock_redis_instance):
+    # 準備
+    issue = {
+        "number": 7,
+        "title": "Test",
+        "body": "## 成果物\n- a.py\n\n## ブランチ名\n`feature/issue-xx`",
+        "labels": [{"name": "P2"}, {"name": "P1"}, {"name": "BACKENDCODER"}],
+    }
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.hmget.side_effect = [[None], [None]]
+
+    # 実行
+    redis_client.upsert_issue(issue)
+
+    # 検証
+    stored = json.loads(mock_pipeline.set.call_args.args[1])
+    assert stored["task"] == {
+        "assignable": True,
+        "branch_name": "feature/issue-7",
+        "priority": 1,
+    }
+
+
+@pytest.mark.unit
+def test_remove_issue_updates_label_indexes(redis_client, mock_redis_instance):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.hmget.side_effect = [["digest"], [json.dumps(["P1"])]]
+    mock_pipeline.execute.side_effect = [None, [2]]
+
+    # 実行
+    redis_client.remove_issue(1)
+
+    # 検証
+    mock_pipeline.delete.assert_called_once_with(
+        "repo::test_owner::test_repo:issue:1"
+    )
+    mock_pipeline.zrem.assert_has_calls(
+        [
+            call("repo::test_owner::test_repo:review:detected", 1),
+            call("repo::test_owner::test_repo:index:label:P1", 1),
+        ]
+    )
+    mock_pipeline.hdel.assert_any_call(
+        "repo::test_owner::test_repo:index:issue_labels", "1"
+    )
+    mock_redis_instance.srem.assert_not_called()
+
+
+@pytest.mark.unit
+def test_remove_issue_ignores_uncached_issue(redis_client, mock_redis_instance):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.hmget.side_effect = [[None], [None]]
+
+    # 実行
+    result = redis_client.apply_issue_changes([], [1])
+
+    # 検証
+    assert result == IssueSyncResult()
+    mock_pipeline.delete.assert_not_called()
+    mock_pipeline.zrem.assert_not_called()
+    mock_pipeline.execute.assert_not_called()
+    mock_redis_instance.incr.assert_not_called()
+
+
+@pytest.mark.unit
+def test_sync_issues_deletes_unhashed_issues_after_migration(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    open_issue = {"number": 1, "labels": [{"name": "P1"}]}
+    mock_redis_instance.hkeys.return_value = []
+    mock_redis_instance.scan.return_value = (
+        0,
+        [
+            "repo::test_owner::test_repo:issue:1",
+            "repo::test_owner::test_repo:issue:2",
+        ],
+    )
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.hmget.side_effect = [[None], [None]]
+
+    # 実行
+    result = redis_client.sync_issues([open_issue])
+
+    # 検証
+    assert result == IssueSyncResult(added=1, removed=1)
+    mock_redis_instance.delete.assert_called_once_with(
+        "repo::test_owner::test_repo:issue:2"
+    )
+
+
+@pytest.mark.unit
+def test_sync_issues_writes_only_changed_issues_in_one_transaction(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    unchanged_issue = {"number": 1, "labels": [{"name": "P1"}]}
+    updated_issue = {"number": 2, "labels": [{"name": "P1"}], "title": "new"}
+    added_issue = {"number": 3, "labels": [{"name": "P2"}]}
+    mock_redis_instance.hkeys.return_value = ["1", "2", "4"]
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.hmget.side_effect = [
+        [_digest(unchanged_issue), "stale-digest", None, "digest-4"],
+        [json.dumps(["P1"]), json.dumps(["P1"]), None, json.dumps(["P3"])],
+    ]
+    mock_pipeline.execute.side_effect = [None, [0]]
+
+    # 実行
+    result = redis_client.sync_issues([unchanged_issue, updated_issue, added_issue])
+
+    # 検証
+    assert result == IssueSyncResult(added=1, updated=1, removed=1, unchanged=1)
+    mock_redis_instance.pipeline.assert_any_call(transaction=True)
+    written_keys = [c.args[0] for c in mock_pipeline.set.call_args_list]
+    assert written_keys == [
+        "repo::test_owner::test_repo:issue:2",
+        "repo::test_owner::test_repo:issue:3",
+    ]
+    mock_pipeline.delete.assert_called_once_with(
+        "repo::test_owner::test_repo:issue:4"
+    )
+    mock_redis_instance.scan.assert_not_called()
+    mock_redis_instance.srem.assert_called_once_with(
+        "repo::test_owner::test_repo:index:labels", "P3"
+    )
+
+
+@pytest.mark.unit
+def test_apply_issue_changes_retries_when_watched_keys_change(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    issue = {"number": 1, "title": "Test", "labels": [{"name": "P1"}]}
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    # 1回目の読み取りの後に他のプロセスがIssueを書き込み、EXECが失敗する
+    mock_pipeline.hmget.side_effect = [
+        [None],
+        [None],
+        [_digest(issue)],
+        [json.dumps(["P1"])],
+    ]
+    mock_pipeline.execute.side_effect = [redis.WatchError()]
+
+    # 実行
+    result = redis_client.apply_issue_changes([issue])
+
+    # 検証
+    assert result == IssueSyncResult(unchanged=1)
+    assert mock_pipeline.watch.call_args_list == [
+        call(
+            "repo::test_owner::test_repo:issue_hashes",
+            "repo::test_owner::test_repo:index:issue_labels",
+        )
+    ] * 2
+    assert mock_pipeline.execute.call_count == 1
+    mock_pipeline.reset.assert_called_once()
+    mock_redis_instance.incr.assert_not_called()
+
+
+@pytest.mark.unit
+def test_get_issue_ids_by_labels(redis_client, mock_redis_instance):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.execute.return_value = [["1", "3"], []]
+
+    # 実行
+    result = redis_client.get_issue_ids_by_labels(["P1", "in-progress"])
+
+    # 検証
+    assert result == {"P1": {1, 3}, "in-progress": set()}
+    mock_pipeline.zrange.assert_any_call(
+        "repo::test_owner::test_repo:index:label:P1", 0, -1
+    )
+
+
+@pytest.mark.unit
+def test_replace_candidate_queues_swaps_queues_in_one_transaction(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_redis_instance.smembers.return_value = {
+        "queue:candidates:BACKENDCODER:P1",
+        "queue:candidates:BACKENDCODER:P2",
+    }
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.execute.side_effect = [[["1"], ["5"]], None]
+
+    # 実行
+    added = redis_client.replace_candidate_queues(
+        {("BACKENDCODER", "P1"): [1, 2], ("FRONTENDCODER", "P1"): []}
+    )
+
+    # 検証
+    assert added == 1
+    mock_redis_instance.pipeline.assert_any_call(transaction=True)
+    mock_pipeline.delete.assert_has_calls(
+        [
+            call("repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P1"),
+            call("repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P2"),
+            call("repo::test_owner::test_repo:queue:candidates"),
+        ]
+    )
+    mock_pipeline.zadd.assert_called_once_with(
+        "repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P1", {1: 1, 2: 2}
+    )
+    mock_pipeline.sadd.assert_called_once_with(
+        "repo::test_owner::test_repo:queue:candidates",
+        "queue:candidates:BACKENDCODER:P1",
+    )
+    mock_pipeline.publish.assert_called_once_with(
+        "repo::test_owner::test_repo:channel:task_available", "1"
+    )
+    mock_pipeline.incr.assert_called_once_with(
+        "repo::test_owner::test_repo:sync:issues:generation"
+    )
+
+
+@pytest.mark.unit
+def test_update_candidate_queues_moves_only_given_issues(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.smembers.return_value = {"queue:candidates:BACKENDCODER:P1"}
+    # Issue 1と2はどちらもP1のキューにあり、キューには他のIssueもある
+    mock_pipeline.execute.side_effect = [[3, 1.0, 2.0], None]
+
+    # 実行
+    added = redis_client.update_candidate_queues(
+        {1: [("BACKENDCODER", "P0")], 2: [("BACKENDCODER", "P1")]}
+    )
+
+    # 検証
+    assert added == 1
+    mock_pipeline.zrem.assert_called_once_with(
+        "repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P1", 1
+    )
+    mock_pipeline.zadd.assert_called_once_with(
+        "repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P0", {1: 1}
+    )
+    mock_pipeline.sadd.assert_called_once_with(
+        "repo::test_owner::test_repo:queue:candidates",
+        "queue:candidates:BACKENDCODER:P0",
+    )
+    mock_pipeline.delete.assert_not_called()
+    mock_pipeline.srem.assert_not_called()
+    mock_pipeline.watch.assert_has_calls(
+        [
+            call("repo::test_owner::test_repo:queue:candidates"),
+            call("repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P1"),
+        ]
+    )
+    mock_pipeline.incr.assert_called_once_with(
+        "repo::test_owner::test_repo:sync:issues:generation"
+    )
+    mock_pipeline.publish.assert_called_once_with(
+        "repo::test_owner::test_repo:channel:task_available", "1"
+    )
+
+
+@pytest.mark.unit
+def test_update_candidate_queues_unregisters_emptied_queue(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.smembers.return_value = {"queue:candidates:BACKENDCODER:P1"}
+    # P1のキューにはIssue 1だけがある
+    mock_pipeline.execute.side_effect = [[1, 1.0], None]
+
+    # 実行
+    added = redis_client.update_candidate_queues({1: []})
+
+    # 検証
+    assert added == 0
+    mock_pipeline.zrem.assert_called_once_with(
+        "repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P1", 1
+    )
+    mock_pipeline.srem.assert_called_once_with(
+        "repo::test_owner::test_repo:queue:candidates",
+        "queue:candidates:BACKENDCODER:P1",
+    )
+    mock_pipeline.publish.assert_not_called()
+
+
+@pytest.mark.unit
+def test_update_candidate_queues_retries_when_watched_keys_change(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.smembers.return_value = {"queue:candidates:BACKENDCODER:P1"}
+    # 1回目の読み取りの後に他のプロセスがIssueを追加し、EXECが失敗する
+    mock_pipeline.execute.side_effect = [[1, 1.0], redis.WatchError(), [2, 1.0], None]
+
+    # 実行
+    redis_client.update_candidate_queues({1: []})
+
+    # 検証
+    assert mock_pipeline.execute.call_count == 4
+    assert mock_pipeline.zrem.call_count == 2
+    # 登録の取り消しは失敗した1回目のトランザクションでのみ積まれる
+    mock_pipeline.srem.assert_called_once()
+    mock_pipeline.reset.assert_called_once()
+
+
+@pytest.mark.unit
+def test_update_candidate_queues_without_changes_writes_nothing(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.smembers.return_value = {"queue:candidates:BACKENDCODER:P1"}
+    mock_pipeline.execute.side_effect = [[1, 1.0]]
+
+    # 実行
+    added = redis_client.update_candidate_queues({1: [("BACKENDCODER", "P1")]})
+
+    # 検証
+    assert added == 0
+    mock_pipeline.zadd.assert_not_called()
+    mock_pipeline.incr.assert_not_called()
+    assert mock_pipeline.execute.call_count == 1
+
+
+@pytest.mark.unit
+def test_get_issue_labels(redis_client, mock_redis_instance):
+    # 準備
+    mock_redis_instance.hmget.return_value = [json.dumps(["P1", "BACKENDCODER"]), None]
+
+    # 実行
+    result = redis_client.get_issue_labels([1, 2])
+
+    # 検証
+    assert result == {1: {"P1", "BACKENDCODER"}, 2: set()}
+    mock_redis_instance.hmget.assert_called_once_with(
+        "repo::test_owner::test_repo:index:issue_labels", ["1", "2"]
+    )
+
+
+@pytest.mark.unit
+def test_replace_candidate_queues_without_new_candidates_does_not_publish(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_redis_instance.smembers.return_value = {"queue:candidates:BACKENDCODER:P1"}
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.execute.side_effect = [[["1", "2"]], None]
+
+    # 実行
+    added = redis_client.replace_candidate_queues({("BACKENDCODER", "P1"): [2]})
+
+    # 検証
+    assert added == 0
+    mock_pipeline.publish.assert_not_called()
+    # 候補が減った場合も世代番号は進む
+    mock_pipeline.incr.assert_called_once_with(
+        "repo::test_owner::test_repo:sync:issues:generation"
+    )
+
+
+@pytest.mark.unit
+def test_replace_candidate_queues_unchanged_keeps_generation(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_redis_instance.smembers.return_value = {"queue:candidates:BACKENDCODER:P1"}
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.execute.side_effect = [[["1", "2"]], None]
+
+    # 実行
+    added = redis_client.replace_candidate_queues({("BACKENDCODER", "P1"): [1, 2]})
+
+    # 検証
+    assert added == 0
+    mock_pipeline.incr.assert_not_called()
+
+
+@pytest.mark.unit
+def test_get_candidate_issue_ids_merges_role_queues(redis_client, mock_redis_instance):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.execute.return_value = [["3", "1"], ["3", "7"]]
+
+    # 実行
+    result = redis_client.get_candidate_issue_ids(
+        "P1", ["BACKENDCODER", "FRONTENDCODER"]
+    )
+
+    # 検証
+    assert result == [1, 3, 7]
+    mock_pipeline.zrange.assert_has_calls(
+        [
+            call("repo::test_owner::test_repo:queue:candidates:BACKENDCODER:P1", 0, -1),
+            call("repo::test_owner::test_repo:queue:candidates:FRONTENDCODER:P1", 0, -1),
+        ]
+    )
+
+
+@pytest.mark.unit
+def test_get_candidate_priorities_reads_queue_registry(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_redis_instance.smembers.return_value = {
+        "queue:candidates:BACKENDCODER:P1",
+        "queue:candidates:FRONTENDCODER:P0",
+        "queue:candidates:DESIGNER:P3",
+    }
+
+    # 実行
+    result = redis_client.get_candidate_priorities(["BACKENDCODER", "FRONTENDCODER"])
+
+    # 検証
+    assert result == {"P0", "P1"}
+    mock_redis_instance.smembers.assert_called_once_with(
+        "repo::test_owner::test_repo:queue:candidates"
+    )
+
+
+@pytest.mark.unit
+def test_enqueue_github_changes_coalesces_per_label(redis_client, mock_redis_instance):
+    # 準備
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+
+    # 実行
+    redis_client.enqueue_github_changes(
+        1,
+        add_labels=["in-progress", "agent-1"],
+        remove_labels=["needs-review"],
+        branch_names=["feature/issue-1"],
+    )
+
+    # 検証
+    mock_redis_instance.pipeline.assert_called_once_with(transaction=True)
+    mock_pipeline.hset.assert_called_once_with(
+        "repo::test_owner::test_repo:outbox:github:issue:1",
+        mapping={
+            "label:in-progress": "add",
+            "label:agent-1": "add",
+            "label:needs-review": "remove",
+            "branch:feature/issue-1": "create",
+        },
+    )
+    pending_call = mock_pipeline.zadd.call_args
+    assert pending_call.args[0] == "repo::test_owner::test_repo:outbox:github:pending"
+    assert list(pending_call.args[1]) == [1]
+    assert pending_call.kwargs == {"nx": True}
+    mock_pipeline.execute.assert_called_once()
+
+
+@pytest.mark.unit
+def test_claim_outbox_entry_decodes_fields(redis_client, mock_redis_instance):
+    # 準備
+    claim_script = mock_redis_instance.scripts[CLAIM_OUTBOX_ENTRY_SCRIPT]
+    claim_script.return_value = [
+        "label:in-progress",
+        "add",
+        "label:agent-1",
+        "remove",
+        "branch:feature/issue-1",
+        "create",
+    ]
+
+    # 実行
+    entry = redis_client.claim_outbox_entry(1)
+
+    # 検証
+    assert entry == GitHubOutboxEntry(
+        issue_id=1,
+        add_labels=["in-progress"],
+        remove_labels=["agent-1"],
+        branch_names=["feature/issue-1"],
+    )
+    claim_script.assert_called_once_with(
+        keys=[
+            "repo::test_owner::test_repo:outbox:github:pending",
+            "repo::test_owner::test_repo:outbox:github:issue:1",
+            "repo::test_owner::test_repo:outbox:github:inflight:1",
+            "repo::test_owner::test_repo:outbox:github:inflight",
+        ],
+        args=[1],
+    )
+
+
+@pytest.mark.unit
+def test_claim_outbox_entry_returns_none_when_empty(redis_client, mock_redis_instance):
+    # 準備
+    mock_redis_instance.scripts[CLAIM_OUTBOX_ENTRY_SCRIPT].return_value = []
+
+    # 実行・検証
+    assert redis_client.claim_outbox_entry(1) is None
+
+
+@pytest.mark.unit
+def test_retry_outbox_entry_returns_attempts(redis_client, mock_redis_instance):
+    # 準備
+    retry_script = mock_redis_instance.scripts[RETRY_OUTBOX_ENTRY_SCRIPT]
+    retry_script.return_value = 3
+
+    # 実行
+    attempts = redis_client.retry_outbox_entry(1, 5, 300, 10, "Bad Gateway")
+
+    # 検証
+    assert attempts == 3
+    kwargs = retry_script.call_args.kwargs
+    assert kwargs["keys"][4] == "repo::test_owner::test_repo:outbox:github:attempts"
+    assert kwargs["keys"][5:] == [
+        "repo::test_owner::test_repo:outbox:github:dead_letter:1",
+        "repo::test_owner::test_repo:outbox:github:dead_letter",
+    ]
+    assert kwargs["args"][0] == 1
+    assert kwargs["args"][2:] == [5, 300, 10, "Bad Gateway"]
+
+
+@pytest.mark.unit
+def test_set_and_get_sync_watermark(redis_client, mock_redis_instance):
+    # 準備
+    synced_at = datetime(2025, 1, 1, 12, 0, tzinfo=UTC)
+
+    # 実行
+    redis_client.set_sync_watermark(synced_at)
+    mock_redis_instance.get.return_value = synced_at.isoformat()
+    result = redis_client.get_sync_watermark()
+
+    # 検証
+    mock_redis_instance.set.assert_called_once_with(
+        "repo::test_owner::test_repo:sync:issues:watermark",
+        synced_at.isoformat(),
+        ex=None,
+    )
+    assert result == synced_at
+
+
+@pytest.mark.unit
+def test_record_review_detections_adds_only_new_members(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_redis_instance.zadd.return_value = 1
+
+    # 実行
+    with patch(
+        "github_broker.infrastructure.redis_client.time.time", return_value=1000.0
+    ):
+        recorded = redis_client.record_review_detections([1, 2])
+
+    # 検証
+    assert recorded == 1
+    mock_redis_instance.zadd.assert_called_once_with(
+        "repo::test_owner::test_repo:review:detected", {1: 1000.0, 2: 1000.0}, nx=True
+    )
+
+
+@pytest.mark.unit
+def test_remove_review_detections(redis_client, mock_redis_instance):
+    # 実行
+    redis_client.remove_review_detections([1, 2])
+    redis_client.remove_review_detections([])
+
+    # 検証
+    mock_redis_instance.zrem.assert_called_once_with(
+        "repo::test_owner::test_repo:review:detected", 1, 2
+    )
+
+
+@pytest.mark.unit
+def test_record_review_detections_without_issues(redis_client, mock_redis_instance):
+    # 実行
+    recorded = redis_client.record_review_detections([])
+
+    # 検証
+    assert recorded == 0
+    mock_redis_instance.zadd.assert_not_called()
+
+
+@pytest.mark.unit
+def test_get_ready_review_issue_ids(redis_client, mock_redis_instance):
+    # 準備
+    mock_redis_instance.zrangebyscore.return_value = ["1", "3"]
+
+    # 実行
+    result = redis_client.get_ready_review_issue_ids(700.0)
+
+    # 検証
+    assert result == {1, 3}
+    mock_redis_instance.zrangebyscore.assert_called_once_with(
+        "repo::test_owner::test_repo:review:detected", "-inf", 700.0
+    )
+
+
+@pytest.mark.unit
+def test_sync_review_timeouts_adds_new_and_removes_stale(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_redis_instance.zrange.return_value = ["1", "2"]
+    mock_pipeline = mock_redis_instance.pipeline.return_value
+    mock_pipeline.execute.return_value = [1, 1]
+
+    # 実行
+    added, removed = redis_client.sync_review_timeouts({2: 500.0, 3: 600.0})
+
+    # 検証
+    assert (added, removed) == (1, 1)
+    key = "repo::test_owner::test_repo:schedule:review_timeouts"
+    mock_redis_instance.pipeline.assert_called_once_with(transaction=True)
+    # 登録済みのPRの予定（発火済みを含む）は変更しない
+    mock_pipeline.zadd.assert_called_once_with(key, {2: 500.0, 3: 600.0}, nx=True)
+    mock_pipeline.zrem.assert_called_once_with(key, 1)
+
+
+@pytest.mark.unit
+def test_sync_review_timeouts_without_changes(redis_client, mock_redis_instance):
+    # 準備
+    mock_redis_instance.zrange.return_value = []
+
+    # 実行
+    result = redis_client.sync_review_timeouts({})
+
+    # 検証
+    assert result == (0, 0)
+    mock_redis_instance.pipeline.return_value.execute.assert_not_called()
+
+
+@pytest.mark.unit
+def test_get_next_review_timeout_excludes_fired_entries(
+    redis_client, mock_redis_instance
+):
+    # 準備
+    mock_redis_instance.zrangebyscore.return_value = [("3", 600.0)]
+
+    # 実行
+    result = redis_client.get_next_review_timeout()
+
+    # 検証
+    assert result == 600.0
+    mock_redis_instance.zrangebyscore.assert_called_once_with(
+        "repo::test_owner::test_repo:schedule:review_timeouts",
+        "-inf",
+        "(+inf",
+        start=0,
+        num=1,
+        withscores=True,
+    )
+
+
+@pytest.mark.unit
+def test_mark_review_timeouts_fired_only_updates_scheduled_entries(
+    redis_client, mock_redis_instance
+):
+    # 実行
+    redis_client.mark_review_timeouts_fired([3])
+
+    # 検証
+    mock_redis_instance.zadd.assert_called_once_with(
+        "repo::test_owner::test_repo:schedule:review_timeouts", {3: "+inf"}, xx=True
+    )
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("stored, expected", [("7", 7), (None, None)])
+def test_get_cache_generation(redis_client, mock_redis_instance, stored, expected):
+    # 準備
+    mock_redis_instance.get.return_value = stored
+
+    # 実行
+    result = redis_client.get_cache_generation()
+
+    # 検証
+    assert result == expected
+    mock_redis_instance.get.assert_called_once_with(
+        "repo::test_owner::test_repo:sync:issues:generation"
+    )
+
+
+@pytest.mark.unit
+def test_get_sync_watermark_none(redis_client, mock_redis_instance):
+    # 準備
+    mock_redis_instance.get.return_value = None
+
+    # 実行・検証
+    assert redis_client.get_sync_watermark() is None
+
+
+# --- 統合テスト ---
+# 環境変数が設定されていない場合にテストをスキップするためのマーカー
+requires_redis = pytest.mark.skipif(
+    not os.getenv("REDIS_URL"),
+    reason="統合テストにはREDIS_URL環境変数が必要です",
+)
+
+
+@pytest.fixture
+def live_redis_client():
+    """実際のRedisに接続し、テスト用の一意なリポジトリ名を持つRedisClient。テスト後にキーを削除する。"""
+    instance = redis.from_url(os.environ["REDIS_URL"], decode_responses=True)
+    client = RedisClient(instance, "integration", f"repo-{uuid.uuid4().hex}")
+    yield client
+    keys = list(instance.scan_iter(match=client._get_prefixed_key("*")))
+    if keys:
+        instance.delete(*keys)
+    instance.close()
+
+
+@pytest.mark.integration
+@requires_redis
+def test_integration_claimed_issue_is_not_reassigned_after_lease_expiry(
+    live_redis_client,
+):
+    """
+    割り当てたIssueのリースが、GitHubへの反映と次の同期より前に失効しても、
+    同じIssueが再び候補として返されず、割り当てもできないことをテストします。
+    """
+    # 準備
+    issue = {
+        "number": 1,
+        "title": "Task",
+        "body": "## 成果物\n- a.py",
+        "labels": [{"name": "BACKENDCODER"}, {"name": "P1"}],
+    }
+    live_redis_client.sync_issues([issue])
+    live_redis_client.replace_candidate_queues({("BACKENDCODER", "P1"): [1]})
+    claim = live_redis_client.claim_issue(
+        1,
+        "agent-1",
+        excluded_labels=["in-progress"],
+        lease_ttl=1,
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
+    )
+    assert claim.claimed
+
+    # 実行: リースの失効
+    live_redis_client.delete_key("issue_lock_1")
+    candidate_ids = live_redis_client.get_candidate_issue_ids("P1", ["BACKENDCODER"])
+    reclaim = live_redis_client.claim_issue(
+        1, "agent-2", excluded_labels=["in-progress"], claimed_label="in-progress"
+    )
+
+    # 検証
+    assert candidate_ids == []
+    assert live_redis_client.get_candidate_priorities(["BACKENDCODER"]) == set()
+    assert live_redis_client.get_issue_ids_by_labels(["in-progress"]) == {
+        "in-progress": {1}
+    }
+    assert reclaim.result is IssueClaimResult.NOT_CANDIDATE
+
+
+@pytest.mark.integration
+@requires_redis
+def test_integration_claimed_issue_is_rewritten_by_next_sync(live_redis_client):
+    """
+    割り当て後にGitHub上のラベルが割り当て前のまま同期されても、
+    キャッシュが書き直され、リースの失効後に再び割り当てられることをテストします。
+    """
+    # 準備
+    issue = {
+        "number": 1,
+        "title": "Task",
+        "body": "## 成果物\n- a.py",
+        "labels": [{"name": "BACKENDCODER"}, {"name": "P1"}],
+    }
+    live_redis_client.sync_issues([issue])
+    claim = live_redis_client.claim_issue(
+        1, "agent-1", excluded_labels=["in-progress"], claimed_label="in-progress"
+    )
+    assert claim.claimed
+
+    # 実行: 同じ内容で再同期し、リースが失効する
+    result = live_redis_client.sync_issues([issue])
+    live_redis_client.delete_key("issue_lock_1")
+    reclaim = live_redis_client.claim_issue(
+        1, "agent-2", excluded_labels=["in-progress"], claimed_label="in-progress"
+    )
+
+    # 検証
+    assert result.updated == 1
+    assert result.unchanged == 0
+    assert reclaim.claimed
+
+
+@pytest.mark.integration
+@requires_redis
+def test_integration_released_issue_returns_to_candidate_queue(live_redis_client):
+    """
+    リースを解放したIssueが候補キューに戻り、世代番号が進むことで、
+    待機中のリクエストが次の同期を待たずに再び割り当てられることをテストします。
+    """
+    # 準備
+    issue = {
+        "number": 1,
+        "title": "Task",
+        "body": "## 成果物\n- a.py",
+        "labels": [{"name": "BACKENDCODER"}, {"name": "P1"}],
+    }
+    live_redis_client.sync_issues([issue])
+    live_redis_client.replace_candidate_queues({("BACKENDCODER", "P1"): [1]})
+    claim = live_redis_client.claim_issue(
+        1,
+        "agent-1",
+        excluded_labels=["in-progress"],
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
+    )
+    assert claim.claimed
+    generation = live_redis_client.get_cache_generation()
+
+    # 実行
+    released = live_redis_client.release_issue_claim(
+        1,
+        "agent-1",
+        claim.fencing_token,
+        claimed_label="in-progress",
+        candidate_queues=[("BACKENDCODER", "P1")],
+    )
+
+    # 検証
+    assert released is True
+    assert live_redis_client.get_candidate_priorities(["BACKENDCODER"]) == {"P1"}
+    assert live_redis_client.get_candidate_issue_ids("P1", ["BACKENDCODER"]) == [1]
+    assert live_redis_client.get_cache_generation() != generation
+    reclaim = live_redis_client.claim_issue(
+        1, "agent-2", excluded_labels=["in-progress"], claimed_label="in-progress"
+    )
+    assert reclaim.claimed
@@ -0,0 +1,129 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from github_broker.infrastructure.task_notifier import TaskAvailabilityNotifier
+
+
+@pytest.fixture
+def anyio_backend():
+    """Notifierはasyncioのイベントループ上で動作するため、asyncioのみでテストします。"""
+    return "asyncio"
+
+
+def create_notifier(messages: list[dict] | None = None) -> TaskAvailabilityNotifier:
+    """指定したメッセージを配信したあと待機し続けるpubsubを持つNotifierを生成します。"""
+
+    async def listen():
+        for message in messages or []:
+            yield message
+        await asyncio.Event().wait()
+
+    pubsub = MagicMock()
+    pubsub.__aenter__ = AsyncMock(return_value=pubsub)
+    pubsub.__aexit__ = AsyncMock(return_value=None)
+    pubsub.subscribe = AsyncMock()
+    pubsub.listen = listen
+    redis = MagicMock()
+    redis.pubsub.return_value = pubsub
+    redis.aclose = AsyncMock()
+    return TaskAvailabilityNotifier(redis=redis, channel="test:channel")
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_wait_returns_true_when_message_is_published():
+    """チャンネルにメッセージが届くと待機が解除されることをテストします。"""
+    # Arrange
+    notifier = create_notifier(
+        [{"type": "subscribe", "data": 1}, {"type": "message", "data": "1"}]
+    )
+    await notifier.start()
+
+    # Act
+    notified = await notifier.wait(1, timeout=1)
+
+    # Assert
+    assert notified is True
+    assert notifier.generation == 2
+    await notifier.aclose()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_wait_returns_false_on_timeout():
+    """通知がない場合、タイムアウトでFalseを返すことをテストします。"""
+    # Arrange
+    notifier = create_notifier([{"type": "subscribe", "data": 1}])
+    await notifier.start()
+
+    # Act
+    notified = await notifier.wait(notifier.generation, timeout=0.05)
+
+    # Assert
+    assert notified is False
+    await notifier.aclose()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_wait_returns_immediately_for_missed_notification():
+    """確認中に届いた通知（世代番号の変化）を取りこぼさないことをテストします。"""
+    # Arrange
+    notifier = create_notifier()
+    generation = notifier.generation
+    notifier.notify()
+
+    # Act
+    notified = await notifier.wait(generation, timeout=0)
+
+    # Assert
+    assert notified is True
+    await notifier.aclose()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_wait_returns_true_when_subscription_is_confirmed():
+    """購読が確定する前に待ち始めた場合、確定時に候補を確認し直させることをテストします。"""
+    # Arrange
+    notifier = create_notifier([{"type": "subscribe", "data": 1}])
+
+    # Act
+    notified = await notifier.wait(notifier.generation, timeout=1)
+
+    # Assert
+    assert notified is True
+    assert notifier.generation == 1
+    await notifier.aclose()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_start_waits_for_subscription_confirmation():
+    """`start` が購読の確定まで待ち、確定を通知として配信することをテストします。"""
+    # Arrange
+    notifier = create_notifier([{"type": "subscribe", "data": 1}])
+
+    # Act
+    await notifier.start(timeout=1)
+
+    # Assert
+    assert notifier.generation == 1
+    await notifier.aclose()
+
+
+@pytest.mark.unit
+@pytest.mark.anyio
+async def test_start_returns_after_timeout_without_confirmation():
+    """購読が確定しない場合も、`start` がタイムアウト後に戻ることをテストします。"""
+    # Arrange
+    notifier = create_notifier()
+
+    # Act
+    await notifier.start(timeout=0.05)
+
+    # Assert
+    assert notifier.generation == 0
+    await notifier.aclose()
@@ -1,10 +1,21 @@
+import hashlib
+import hmac
+import json
 from collections.abc import Generator
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from fastapi.testclient import TestClient
 
 from broker_main import app
-from github_broker.interface.api import get_task_service
+from github_broker.application.exceptions import UnknownRoleError
+from github_broker.infrastructure.rate_limit_budget import RateLimitBudget
+from github_broker.interface.api import (
+    get_rate_limit_budget,
+    get_task_service,
+    get_webhook_secret,
+)
+from github_broker.interface.models import MAX_TASK_WAIT_SECONDS, TaskResponse
 
 
 @pytest.fixture
@@ -29,10 +40,43 @@ def test_health_check(client: TestClient):
 
 
 @pytest.mark.unit
-def test_request_task_endpoint_stub(client: TestClient, mock_task_service: None):
+def test_rate_limit_endpoint_returns_budget_snapshot(client: TestClient):
+    """/rate-limitが記録済みのレート制限の残量を返すことをテストします。"""
+    # Arrange
+    budget = RateLimitBudget()
+    budget.record("graphql", remaining=4000, limit=5000)
+    app.dependency_overrides[get_rate_limit_budget] = lambda: budget
+
+    # Act
+    try:
+        response = client.get("/rate-limit")
+    finally:
+        del app.dependency_overrides[get_rate_limit_budget]
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json() == {
+        "resources": {"graphql": {"remaining": 4000, "limit": 5000, "reset_at": None}}
+    }
+
+
+@pytest.fixture
+def request_task_service() -> Generator[MagicMock, None, None]:
+    """/request-task用のTaskServiceモックを差し替えます。"""
+    service = MagicMock()
+    service.request_task = AsyncMock(return_value=None)
+    app.dependency_overrides[get_task_service] = lambda: service
+    yield service
+    del app.dependency_overrides[get_task_service]
+
+
+@pytest.mark.unit
+def test_request_task_endpoint_returns_no_content(
+    client: TestClient, request_task_service: MagicMock
+):
     """
     Tests that the /request-task endpoint returns 204 No Content
-    as it is currently stubbed.
+    when no task is available.
     """
     # Arrange
     request_body = {"agent_id": "test-agent"}
@@ -42,6 +86,123 @@ def test_request_task_endpoint_stub(client: TestClient, mock_task_service: None)
 
     # Assert
     assert response.status_code == 204
+    request_task_service.request_task.assert_awaited_once_with(
+        agent_id="test-agent", wait_seconds=0, roles=None
+    )
+
+
+@pytest.mark.unit
+def test_request_task_endpoint_passes_wait_seconds(
+    client: TestClient, request_task_service: MagicMock
+):
+    """
+    Tests that wait_seconds is forwarded for long polling and the assigned task is returned.
+    """
+    # Arrange
+    request_task_service.request_task.return_value = TaskResponse(
+        issue_id=1,
+        issue_url="https://github.com/test/repo/issues/1",
+        title="Task",
+        body="body",
+        labels=["BACKENDCODER", "P1"],
+        branch_name="feature/issue-1",
+        prompt="prompt",
+        required_role="BACKENDCODER",
+    )
+
+    # Act
+    response = client.post(
+        "/request-task", json={"agent_id": "test-agent", "wait_seconds": 30}
+    )
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json()["issue_id"] == 1
+    request_task_service.request_task.assert_awaited_once_with(
+        agent_id="test-agent", wait_seconds=30, roles=None
+    )
+
+
+@pytest.mark.unit
+def test_request_task_endpoint_rejects_too_long_wait(
+    client: TestClient, request_task_service: MagicMock
+):
+    """
+    Tests that wait_seconds above the maximum is rejected.
+    """
+    # Act
+    response = client.post(
+        "/request-task",
+        json={"agent_id": "test-agent", "wait_seconds": MAX_TASK_WAIT_SECONDS + 1},
+    )
+
+    # Assert
+    assert response.status_code == 422
+    request_task_service.request_task.assert_not_called()
+
+
+@pytest.mark.unit
+def test_request_task_endpoint_forwards_roles(
+    client: TestClient, request_task_service: MagicMock
+):
+    """
+    Tests that the declared roles are forwarded to the task service.
+    """
+    # Act
+    response = client.post(
+        "/request-task",
+        json={"agent_id": "test-agent", "roles": ["BACKENDCODER"]},
+    )
+
+    # Assert
+    assert response.status_code == 204
+    request_task_service.request_task.assert_awaited_once_with(
+        agent_id="test-agent", wait_seconds=0, roles=["BACKENDCODER"]
+    )
+
+
+@pytest.mark.unit
+def test_request_task_endpoint_rejects_unknown_roles(
+    client: TestClient, request_task_service: MagicMock
+):
+    """
+    Tests that roles not defined in agents.yml are rejected with 422.
+    """
+    # Arrange
+    request_task_service.request_task.side_effect = UnknownRoleError(
+        "Unknown roles requested: ['PILOT']"
+    )
+
+    # Act
+    response = client.post(
+        "/request-task", json={"agent_id": "test-agent", "roles": ["PILOT"]}
+    )
+
+    # Assert
+    assert response.status_code == 422
+    assert "PILOT" in response.json()["detail"]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("renewed, expected_status", [(True, 200), (False, 409)])
+def test_heartbeat_endpoint_renews_lease(
+    client: TestClient, request_task_service: MagicMock, renewed, expected_status
+):
+    """
+    /heartbeatがリースを延長し、リースを失っている場合は409を返すことをテストします。
+    """
+    # Arrange
+    request_task_service.renew_lease = AsyncMock(return_value=renewed)
+
+    # Act
+    response = client.post(
+        "/heartbeat",
+        json={"agent_id": "test-agent", "issue_id": 1, "fencing_token": 7},
+    )
+
+    # Assert
+    assert response.status_code == expected_status
+    request_task_service.renew_lease.assert_awaited_once_with("test-agent", 1, 7)
 
 
 @pytest.mark.unit
@@ -61,3 +222,68 @@ def test_create_fix_task_endpoint_stub(client: TestClient, mock_task_service: No
     # Assert
     assert response.status_code == 202
     assert response.json() == {"message": "Fix task creation has been accepted (stubbed)."}
+
+
+def _sign(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+@pytest.fixture
+def webhook_task_service() -> Generator[MagicMock, None, None]:
+    """Webhookエンドポイント用のTaskServiceモックとシークレットを差し替えます。"""
+    service = MagicMock()
+    service.apply_webhook_event.return_value = True
+    app.dependency_overrides[get_task_service] = lambda: service
+    app.dependency_overrides[get_webhook_secret] = lambda: "test_secret"
+    yield service
+    del app.dependency_overrides[get_task_service]
+    del app.dependency_overrides[get_webhook_secret]
+
+
+@pytest.mark.unit
+def test_github_webhook_applies_signed_event(
+    client: TestClient, webhook_task_service: MagicMock
+):
+    """署名が正しいWebhookイベントがTaskServiceに渡されることをテストします。"""
+    # Arrange
+    payload = {"action": "labeled", "issue": {"number": 1, "state": "open"}}
+    body = json.dumps(payload).encode()
+
+    # Act
+    response = client.post(
+        "/webhooks/github",
+        content=body,
+        headers={
+            "X-GitHub-Event": "issues",
+            "X-Hub-Signature-256": _sign("test_secret", body),
+            "Content-Type": "application/json",
+        },
+    )
+
+    # Assert
+    assert response.status_code == 202
+    assert response.json() == {"status": "applied"}
+    webhook_task_service.apply_webhook_event.assert_called_once_with("issues", payload)
+
+
+@pytest.mark.unit
+def test_github_webhook_rejects_invalid_signature(
+    client: TestClient, webhook_task_service: MagicMock
+):
+    """署名が一致しないWebhookイベントが401で拒否されることをテストします。"""
+    # Arrange
+    body = json.dumps({"action": "opened"}).encode()
+
+    # Act
+    response = client.post(
+        "/webhooks/github",
+        content=body,
+        headers={
+            "X-GitHub-Event": "issues",
+            "X-Hub-Signature-256": _sign("wrong_secret", body),
+        },
+    )
+
+    # Assert
+    assert response.status_code == 401
+    webhook_task_service.apply_webhook_event.assert_not_called()
@@ -1,6 +1,6 @@
 import os
 import subprocess
-from unittest.mock import mock_open, patch
+from unittest.mock import MagicMock, mock_open, patch
 
 import pytest
 
@@ -8,6 +8,8 @@ from agents_main import (
     ERROR_SLEEP_SECONDS,
     NO_TASK_SLEEP_SECONDS,
     SUCCESS_SLEEP_SECONDS,
+    TASK_WAIT_SECONDS,
+    _start_heartbeat,
     main,
 )
 
@@ -36,9 +38,11 @@ def test_main_no_task_assigned(
 ):
     mock_agent_client.return_value.request_task.return_value = None
     main(run_once=True)
-    mock_agent_client.return_value.request_task.assert_called_once()
+    mock_agent_client.return_value.request_task.assert_called_once_with(
+        wait_seconds=TASK_WAIT_SECONDS
+    )
     mock_subprocess_run.assert_not_called()
-    expected_log_message = f"利用可能なタスクがありません。{NO_TASK_SLEEP_SECONDS // 60}分後に再試行します。"
+    expected_log_message = f"利用可能なタスクがありません。{NO_TASK_SLEEP_SECONDS}秒後に再試行します。"
     mock_logging_info.assert_any_call(expected_log_message)
 
 
@@ -265,3 +269,47 @@ def test_main_calls_sleep_in_loop(
     with pytest.raises(SystemExit):
         main(run_once=False)
     mock_sleep.assert_called_once_with(expected_sleep_seconds)
+
+
+@patch("agents_main.HEARTBEAT_INTERVAL_SECONDS", 0.01)
+def test_start_heartbeat_stops_when_lease_is_lost():
+    client = MagicMock()
+    client.send_heartbeat.side_effect = [True, False]
+
+    stop_event = _start_heartbeat(client, issue_id=1, fencing_token=7)
+
+    # リースを失った後はハートビートを送信しない
+    for _ in range(100):
+        if client.send_heartbeat.call_count >= 2:
+            break
+        stop_event.wait(0.01)
+    stop_event.wait(0.05)
+    stop_event.set()
+    assert client.send_heartbeat.call_count == 2
+    client.send_heartbeat.assert_called_with(1, 7)
+
+
+@patch("agents_main._start_heartbeat")
+@patch("agents_main.subprocess.run")
+@patch("agents_main.AgentClient")
+@patch("builtins.open", new_callable=mock_open)
+def test_main_sends_heartbeat_while_task_runs(
+    mock_file_open, mock_agent_client, mock_subprocess_run, mock_start_heartbeat
+):
+    mock_agent_client.return_value.request_task.return_value = {
+        "issue_id": 1,
+        "title": "Test Task",
+        "prompt": "prompt",
+        "required_role": "BACKENDCODER",
+        "fencing_token": 7,
+    }
+    mock_subprocess_run.return_value = subprocess.CompletedProcess(
+        args=["dummy"], returncode=0, stdout="", stderr=""
+    )
+
+    main(run_once=True)
+
+    mock_start_heartbeat.assert_called_once_with(
+        mock_agent_client.return_value, 1, 7
+    )
+    mock_start_heartbeat.return_value.set.assert_called_once()